@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+from typing import Dict
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.instrumentation import IN_FLIGHT_METRIC, REGISTRY
+from app.core.warmup import warmup_state
+
+router = APIRouter()
+
+_STARTED_AT = time.monotonic()
+
+
+@router.get("/health")
+def health() -> Dict[str, object]:
+    """Liveness: процесс жив и обслуживает event loop (без проверки прогрева и нагрузки)."""
+    return {"status": "ok", "uptime_s": round(time.monotonic() - _STARTED_AT, 1)}
+
+
+@router.get("/ready")
+def ready() -> JSONResponse:
+    """
+    Готовность к трафику: 200, если прогрев завершён без ошибок и пул не насыщен
+    (выполняющихся /process и страниц документов меньше лимитов ReadinessConfig), иначе 503.
+    scan_pipeline — сканы, которые сейчас считаются в пуле пайплайна; остальные из process ждут
+    свободного потока.
+    Упавший шаг прогрева (open3d не импортируется, синтетический скан не проходит) — 503
+    warmup_failed: такой под трафик не получает.
+    """
+    limits = settings.readiness
+    state = warmup_state()
+    in_flight = {
+        "process": int(REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="process")),
+        "scan_pipeline": int(REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="scan_pipeline")),
+        "document_page": int(REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="document_page")),
+    }
+    if not state.done:
+        status = "warming_up"
+    elif state.error is not None:
+        status = "warmup_failed"
+    elif (
+        in_flight["process"] >= limits.max_in_flight_scans
+        or in_flight["document_page"] >= limits.max_in_flight_document_pages
+    ):
+        status = "saturated"
+    else:
+        status = "ready"
+    payload = {"status": status, "warmup": state.snapshot(), "in_flight": in_flight}
+    return JSONResponse(payload, status_code=200 if status == "ready" else 503)
@@ -1,18 +1,37 @@
 from __future__ import annotations
 
+import asyncio
 import json
-import tempfile
-from pathlib import Path
-from typing import List, Optional
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, Header, HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import ValidationError
 
 from app.core.config import settings
+from app.core.instrumentation import IN_FLIGHT_METRIC, REGISTRY, in_flight, span
 from app.core.processing.scan_processor import ScanProcessor
-from app.ml.document_analyzer import analyze_document
+from app.core.processing.video import (
+    VIDEO_EXTENSIONS,
+    VideoBackendUnavailable,
+    VideoDecodeError,
+    VideoTooLargeError,
+)
+from app.core.profiles import ProcessingProfile, get_processing_profiles
+from app.core.profiling import PROFILE_SUFFIX, get_profile_store, profiling_requested
+from app.core.result_cache import InputHasher, get_result_cache
+from app.ml.document_analyzer import (
+    analyze_document_bytes,
+    get_document_executor,
+    summarize_document_batch,
+)
 from app.models.schemas import (
+    DocumentBatchResult,
+    DocumentPageResult,
     DocumentScanResult,
+    ProcessingProfilesResponse,
     ScanFinishRequest,
     ScanFinishResponse,
     ScanProcessResponse,
@@ -22,6 +41,9 @@ from app.models.schemas import (
 router = APIRouter()
 processor = ScanProcessor()
 
+# Блок чтения загруженного документа
+_DOCUMENT_CHUNK_BYTES = 1024 * 1024
+
 
 def parse_trajectory(trajectory_raw: Optional[str]) -> Optional[List[TrajectoryPoint]]:
     if trajectory_raw is None or not trajectory_raw.strip():
@@ -40,14 +62,44 @@ def parse_trajectory(trajectory_raw: Optional[str]) -> Optional[List[TrajectoryP
         raise HTTPException(status_code=400, detail=f"Invalid trajectory structure: {exc.errors()}") from exc
 
 
+def resolve_processing_profile(name: Optional[str], project_id: str) -> ProcessingProfile:
+    try:
+        return get_processing_profiles().resolve((name or "").strip() or None, project_id)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@router.get("/profiles", response_model=ProcessingProfilesResponse)
+async def list_processing_profiles() -> ProcessingProfilesResponse:
+    """Профили обработки (поле processing_profile в /process и /video) и их бюджеты задержки."""
+    profiles = get_processing_profiles()
+    return ProcessingProfilesResponse(
+        default=profiles.default,
+        latency_budgets_ms={
+            name: profile.latency_budget_ms for name, profile in sorted(profiles.profiles.items())
+        },
+    )
+
+
 @router.post("/process", response_model=ScanProcessResponse)
 async def process_scan(
+    request: Request,
+    response: Response,
     project_id: str = Form(...),
     room_id: str = Form(...),
     scan_id: str = Form(...),
     frames: List[UploadFile] = File(...),
     trajectory: Optional[str] = Form(None),
     depth: Optional[List[UploadFile]] = File(None),
+    timings: bool = Form(
+        False, description="Вернуть разбивку времени по этапам (quality_metrics.timings_ms)"
+    ),
+    processing_profile: Optional[str] = Form(
+        None, description="Профиль обработки (GET /profiles); по умолчанию — профиль проекта"
+    ),
+    x_scan_profile: Optional[str] = Header(
+        None, description="1 — снять профиль пайплайна этого запроса"
+    ),
 ) -> ScanProcessResponse:
     if not frames:
         raise HTTPException(status_code=400, detail="frames is required")
@@ -75,14 +127,92 @@ async def process_scan(
         )
 
     trajectory_points = parse_trajectory(trajectory)
+    selected_profile = resolve_processing_profile(processing_profile, project_id)
 
-    return await processor.process_scan(
+    profile = profiling_requested(x_scan_profile)
+    result = await processor.process_scan(
         project_id=project_id,
         room_id=room_id,
         scan_id=scan_id,
         frames=frames,
         trajectory=trajectory_points,
         depth=depth,
+        include_timings=timings,
+        profile=profile,
+        processing_profile=selected_profile,
+    )
+    profile_path = get_profile_store().get(scan_id) if profile else None
+    if profile_path is not None:
+        url = request.url_for("download_profile", scan_id=profile_path.stem)
+        response.headers["X-Profile-Url"] = url.path
+    return result
+
+
+@router.post("/video", response_model=ScanProcessResponse)
+async def process_video(
+    request: Request,
+    response: Response,
+    project_id: str = Form(...),
+    room_id: str = Form(...),
+    scan_id: str = Form(...),
+    video: UploadFile = File(..., description="Видео скана (MP4/MOV)"),
+    trajectory: Optional[str] = Form(None, description="Позы камеры; t — секунды от начала видео"),
+    timings: bool = Form(
+        False, description="Вернуть разбивку времени по этапам (quality_metrics.timings_ms)"
+    ),
+    processing_profile: Optional[str] = Form(
+        None, description="Профиль обработки (GET /profiles); по умолчанию — профиль проекта"
+    ),
+    x_scan_profile: Optional[str] = Header(
+        None, description="1 — снять профиль пайплайна этого запроса"
+    ),
+) -> ScanProcessResponse:
+    """
+    Скан из видео вместо нарезанных JPEG: загрузка копируется во временный файл блоками,
+    кадры декодируются в фоновом потоке, ключевые (резкие, с движением камеры) сразу
+    сливаются в облако точек. Сводка декодирования — в поле video ответа.
+    """
+    if not (video.filename or "").lower().endswith(VIDEO_EXTENSIONS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"video must be one of {list(VIDEO_EXTENSIONS)}",
+        )
+    trajectory_points = parse_trajectory(trajectory)
+    selected_profile = resolve_processing_profile(processing_profile, project_id)
+
+    profile = profiling_requested(x_scan_profile)
+    try:
+        result = await processor.process_video(
+            project_id=project_id,
+            room_id=room_id,
+            scan_id=scan_id,
+            video=video,
+            trajectory=trajectory_points,
+            include_timings=timings,
+            profile=profile,
+            processing_profile=selected_profile,
+        )
+    except VideoTooLargeError as exc:
+        raise HTTPException(status_code=413, detail=str(exc)) from exc
+    except VideoDecodeError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except VideoBackendUnavailable as exc:
+        raise HTTPException(status_code=501, detail=str(exc)) from exc
+    profile_path = get_profile_store().get(scan_id) if profile else None
+    if profile_path is not None:
+        url = request.url_for("download_profile", scan_id=profile_path.stem)
+        response.headers["X-Profile-Url"] = url.path
+    return result
+
+
+@router.get("/profile/{scan_id}")
+async def download_profile(scan_id: str) -> FileResponse:
+    """Профиль запроса /process в формате свёрнутых стеков (flamegraph.pl, inferno, speedscope)."""
+    path = get_profile_store().get(scan_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No profile for scan_id {scan_id!r}")
+    return FileResponse(
+        path, media_type="text/plain; charset=utf-8", filename=f"{path.stem}{PROFILE_SUFFIX}"
     )
 
 
@@ -91,27 +221,194 @@ async def finish_scan(payload: ScanFinishRequest) -> ScanFinishResponse:
     return await processor.finish_scan(payload)
 
 
+def _is_document_image(filename: Optional[str]) -> bool:
+    return bool(filename) and filename.lower().endswith((".jpg", ".jpeg", ".png"))
+
+
+async def _read_document(document: UploadFile) -> bytes:
+    """
+    Байты загруженного документа блоками; больше ApiLimits.max_document_bytes — 413
+    без чтения остатка файла в память.
+    """
+    limit = settings.api.max_document_bytes
+    chunks: List[bytes] = []
+    size = 0
+    while True:
+        chunk = await document.read(_DOCUMENT_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Document {document.filename!r} exceeds {limit} bytes",
+            )
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _analyze_document_cached(
+    data: bytes,
+    scan_id: str,
+    reference_width_mm: Optional[float],
+) -> Tuple[DocumentScanResult, Optional[bool]]:
+    """
+    analyze_document_bytes через кэш результатов (ключ — байты изображения и reference_width_mm).
+    Возвращает (результат, cache_hit); cache_hit = None, если кэш выключен.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        with span("document_analyze"):
+            return analyze_document_bytes(data, scan_id, reference_width_mm), None
+    key = InputHasher("document").update_bytes("image", data).update_json(
+        "reference_width_mm", reference_width_mm
+    ).hexdigest()
+    cached = cache.get("document", key)
+    if cached is not None:
+        result = DocumentScanResult.model_validate_json(cached)
+        return result.model_copy(update={"scan_id": scan_id}), True
+    with span("document_analyze"):
+        result = analyze_document_bytes(data, scan_id, reference_width_mm)
+    cache.put("document", key, result.model_dump_json())
+    return result, False
+
+
 @router.post("/document", response_model=DocumentScanResult)
 async def process_document(
+    response: Response,
     scan_id: str = Form(...),
     document: UploadFile = File(..., description="Изображение документа (JPEG/PNG)"),
+    reference_width_mm: Optional[float] = Form(
+        None, gt=0, description="Известная ширина листа (мм)"
+    ),
 ) -> DocumentScanResult:
     """
     Сканирование документа (путь фото3д): параметры ширина/длина и распознавание содержимого.
     В т.ч. инженерные коммуникации (трубы, кабели, вентиляция, электропроводка).
+    Изображение анализируется прямо из байтов загрузки, без временного файла.
+    Повтор тех же байтов отдаётся из кэша результатов (заголовок X-Cache: HIT/MISS).
     """
-    if not document.filename or not document.filename.lower().endswith((".jpg", ".jpeg", ".png")):
+    if not _is_document_image(document.filename):
         raise HTTPException(
             status_code=400,
             detail="document must be JPEG or PNG",
         )
-    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(document.filename or "").suffix or ".jpg") as tmp:
-        content = await document.read()
-        tmp.write(content)
-        tmp_path = tmp.name
-    try:
-        result = analyze_document(tmp_path, scan_id=scan_id)
-        return result
-    finally:
-        Path(tmp_path).unlink(missing_ok=True)
+    content = await _read_document(document)
+    with in_flight(IN_FLIGHT_METRIC, kind="document_page"):
+        result, cache_hit = await run_in_threadpool(
+            _analyze_document_cached,
+            content,
+            scan_id,
+            reference_width_mm,
+        )
+    if cache_hit is not None:
+        response.headers["X-Cache"] = "HIT" if cache_hit else "MISS"
+    return result
+
+
+PendingPages = Dict[asyncio.Future, Tuple[int, Optional[str]]]
+
+
+async def _submit_document_pages(
+    documents: List[UploadFile],
+    scan_id: str,
+    reference_width_mm: Optional[float],
+) -> PendingPages:
+    """
+    Прочитать страницы и поставить их анализ в общий пул потоков.
+    Байты читаются до ответа: при потоковой выдаче загруженные файлы уже могут быть закрыты.
+    Все страницы читаются до постановки в пул: слишком большая страница (413) не оставляет
+    в пуле задач запроса, на который уже ответили ошибкой.
+    Страница считается в scan_in_flight{kind="document_page"} от постановки в очередь до готовности.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_document_executor(settings.executors.document_analysis_workers)
+    pages: PendingPages = {}
+    contents = [await _read_document(document) for document in documents]
+    for index, (document, data) in enumerate(zip(documents, contents)):
+        REGISTRY.add_gauge(IN_FLIGHT_METRIC, 1.0, kind="document_page")
+        future = loop.run_in_executor(
+            executor, _analyze_document_cached, data, scan_id, reference_width_mm
+        )
+        future.add_done_callback(
+            lambda _: REGISTRY.add_gauge(IN_FLIGHT_METRIC, -1.0, kind="document_page")
+        )
+        pages[future] = (index, document.filename)
+    return pages
+
+
+async def _iter_completed_pages(
+    pages: PendingPages, scan_id: str
+) -> AsyncIterator[DocumentPageResult]:
+    """Результаты страниц по мере готовности (не в порядке загрузки — номер страницы в index)."""
+    pending = set(pages)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in sorted(done, key=lambda f: pages[f][0]):
+            index, filename = pages[future]
+            try:
+                result, cache_hit = future.result()
+            except Exception as exc:
+                yield DocumentPageResult(
+                    index=index,
+                    filename=filename,
+                    result=DocumentScanResult(scan_id=scan_id, width_mm=0.0, length_mm=0.0),
+                    error=f"{type(exc).__name__}: {exc}",
+                )
+                continue
+            yield DocumentPageResult(
+                index=index, filename=filename, result=result, cache_hit=cache_hit
+            )
+
+
+@router.post("/document/batch", response_model=DocumentBatchResult)
+async def process_document_batch(
+    scan_id: str = Form(...),
+    documents: List[UploadFile] = File(..., description="Страницы документа (JPEG/PNG)"),
+    reference_width_mm: Optional[float] = Form(
+        None, gt=0, description="Известная ширина листа (мм)"
+    ),
+    stream: bool = Form(True, description="Отдавать страницы по мере готовности (NDJSON)"),
+):
+    """
+    Пакетное сканирование многостраничного документа: страницы анализируются параллельно.
+
+    stream=true — ответ application/x-ndjson: строка {"event": "page", "page": DocumentPageResult}
+    на каждую страницу по мере готовности, последняя строка
+    {"event": "summary", "summary": DocumentBatchSummary}.
+    stream=false — один DocumentBatchResult со страницами в порядке загрузки.
+    """
+    if len(documents) > settings.api.max_documents_per_batch:
+        raise HTTPException(
+            status_code=413,
+            detail=(
+                "Too many documents in batch. "
+                f"Max allowed: {settings.api.max_documents_per_batch}"
+            ),
+        )
+    invalid = [d.filename for d in documents if not _is_document_image(d.filename)]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"documents[] must be JPEG or PNG. Invalid: {invalid}",
+        )
+
+    started = time.perf_counter()
+    pending = await _submit_document_pages(documents, scan_id, reference_width_mm)
+    if not stream:
+        pages = [page async for page in _iter_completed_pages(pending, scan_id)]
+        pages.sort(key=lambda page: page.index)
+        summary = summarize_document_batch(scan_id, pages, time.perf_counter() - started)
+        return DocumentBatchResult(**summary.model_dump(), pages=pages)
+
+    async def ndjson() -> AsyncIterator[str]:
+        pages: List[DocumentPageResult] = []
+        async for page in _iter_completed_pages(pending, scan_id):
+            pages.append(page)
+            event = {"event": "page", "page": page.model_dump(mode="json")}
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+        summary = summarize_document_batch(scan_id, pages, time.perf_counter() - started)
+        event = {"event": "summary", "summary": summary.model_dump(mode="json")}
+        yield json.dumps(event, ensure_ascii=False) + "\n"
 
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
@@ -0,0 +1 @@
+"""Бенчмарки пайплайна сканирования: синтетические помещения и замеры этапов."""
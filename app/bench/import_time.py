@@ -0,0 +1,113 @@
+"""
+Время холодного импорта приложения: `import app.main` в свежем интерпретаторе.
+
+    python -m app.bench.import_time --repeats 5 --output import_time.json
+    python -m app.bench.import_time --max-seconds 1.0      # код выхода 1 при превышении
+
+Каждый повтор — отдельный процесс с `-X importtime`: в отчёт попадают медиана и минимум
+времени импорта, пиковый RSS, самые дорогие модули (суммарное время с подмодулями)
+и список тяжёлых модулей, которые не должны грузиться при старте (HEAVY_MODULES).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+# Модули, которые грузятся лениво (при первом запросе или прогреве), а не при импорте приложения
+HEAVY_MODULES: Sequence[str] = ("open3d", "sklearn", "joblib", "cv2")
+
+_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+peak_kb = peak if sys.platform != "darwin" else peak // 1024
+print(json.dumps({{"seconds": elapsed, "peak_rss_kb": peak_kb, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _parse_importtime(stderr: str) -> Dict[str, int]:
+    """Строки `import time: self | cumulative | name` → {модуль: суммарное время, мкс}."""
+    cumulative: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            value = int(parts[1])
+        except ValueError:
+            continue
+        cumulative[parts[2].strip()] = value
+    return cumulative
+
+
+def measure_import(module: str = "app.main", repeats: int = 5, top: int = 10) -> Dict[str, object]:
+    """Импортировать module в repeats свежих процессах; вернуть сводку."""
+    seconds: List[float] = []
+    rss_mb: List[float] = []
+    loaded: List[str] = []
+    modules_us: Dict[str, int] = {}
+    for _ in range(max(1, repeats)):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        probe = json.loads(proc.stdout.strip().splitlines()[-1])
+        seconds.append(probe["seconds"])
+        rss_mb.append(round(probe["peak_rss_kb"] / 1024.0, 1))
+        loaded = probe["modules"]
+        modules_us = _parse_importtime(proc.stderr)
+    top_level = (
+        (name, us) for name, us in modules_us.items() if "." not in name or name.startswith("app.")
+    )
+    slowest = sorted(
+        top_level,
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    return {
+        "module": module,
+        "repeats": len(seconds),
+        "seconds": {"median": round(statistics.median(seconds), 4), "min": round(min(seconds), 4)},
+        "peak_rss_mb": {"median": statistics.median(rss_mb)},
+        "heavy_modules_loaded": [name for name in HEAVY_MODULES if name in loaded],
+        "slowest_ms": {name: round(us / 1000.0, 1) for name, us in slowest},
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Время холодного импорта приложения")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument(
+        "--max-seconds", type=float, default=None, help="Бюджет: медиана выше — код выхода 1"
+    )
+    args = parser.parse_args(argv)
+
+    report = measure_import(args.module, repeats=args.repeats)
+    text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False)
+    print(text)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    if report["heavy_modules_loaded"]:
+        heavy = report["heavy_modules_loaded"]
+        print(f"heavy modules imported at startup: {heavy}", file=sys.stderr)
+        return 1
+    if args.max_seconds is not None and report["seconds"]["median"] > args.max_seconds:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
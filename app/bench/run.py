@@ -0,0 +1,410 @@
+"""
+Воспроизводимый бенчмарк пайплайна сканирования на синтетических помещениях.
+
+    python -m app.bench.run --suite quick --output bench.json
+    python -m app.bench.run --suite full --compare bench.json
+    python -m app.bench.run --suite scaling   # load_frames при 1, 2, 4, 8 потоках и процессах
+    python -m app.bench.run --suite profiles  # профили обработки fast, balanced, precise
+
+Каждый сценарий (форма помещения × шум × число кадров × разрешение × точность точек × доля
+выбросов) выполняется в отдельном процессе (spawn), чтобы пиковый RSS относился только к нему.
+Кадры отрисовываются и пишутся во временный каталог до замеров; этапы load_frames_to_pointcloud,
+detect_planes, find_junctions, _compute_missing_zones, _compute_dimensions и run_scan_inference
+замеряются по отдельности (медиана и минимум по --repeats повторам), внутренняя разбивка —
+спанами instrumentation.
+Отчёт — JSON с отсортированными ключами: его удобно сравнивать между коммитами (--compare).
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+REPORT_VERSION = 1
+
+STAGES: Tuple[str, ...] = (
+    "load_frames",
+    "detect_planes",
+    "junctions",
+    "missing_zones",
+    "dimensions",
+    "ml_inference",
+)
+
+SUITES: Dict[str, Dict[str, Sequence[object]]] = {
+    "quick": {
+        "rooms": ("box", "l_shape"),
+        "noise_m": (0.005,),
+        "frames": (12,),
+        "resolutions": ((320, 240),),
+        "precisions": ("float64", "float32"),
+    },
+    "full": {
+        "rooms": ("box", "l_shape"),
+        "noise_m": (0.0, 0.01, 0.03),
+        "frames": (12, 36),
+        "resolutions": ((320, 240), (640, 480)),
+        "precisions": ("float64", "float32"),
+        # Доля пикселей с ложной глубиной (блики, отражения) — нагрузка на фильтр выбросов
+        "outliers": (0.0, 0.01),
+    },
+    # Кривые масштабирования load_frames по ProcessingConfig.frame_workers для потоков и процессов
+    "scaling": {
+        "rooms": ("box",),
+        "noise_m": (0.005,),
+        "frames": (36,),
+        "resolutions": ((640, 480),),
+        "precisions": ("float64",),
+        "frame_backends": ("thread", "process"),
+        "frame_workers": (1, 2, 4, 8),
+    },
+    # Профили обработки (app.core.profiles) на батче, по которому выбраны их бюджеты задержки;
+    # точность точек — из профиля
+    "profiles": {
+        "rooms": ("box",),
+        "noise_m": (0.005,),
+        "frames": (30,),
+        "resolutions": ((640, 480),),
+        "precisions": (None,),
+        "processing_profiles": ("fast", "balanced", "precise"),
+    },
+}
+
+
+def scenarios(suite: str) -> List[Dict[str, object]]:
+    """
+    Декартово произведение параметров набора; имя сценария — стабильный ключ для сравнения
+    (для float64, без выбросов, потоков и их числа по умолчанию — без суффиксов, чтобы имена
+    совпадали со старыми отчётами). precision None — точность из параметров обработки.
+    """
+    spec = SUITES[suite]
+    result = []
+    for (
+        room, noise, frames, (w, h), precision, outliers, backend, workers, profile
+    ) in itertools.product(
+        spec["rooms"],
+        spec["noise_m"],
+        spec["frames"],
+        spec["resolutions"],
+        spec["precisions"],
+        spec.get("outliers", (0.0,)),
+        spec.get("frame_backends", (None,)),
+        spec.get("frame_workers", (None,)),
+        spec.get("processing_profiles", (None,)),
+    ):
+        suffix = "" if precision in (None, "float64") else f"-{precision}"
+        suffix += f"-o{outliers:g}" if outliers else ""
+        suffix += f"-{backend}" if backend not in (None, "thread") else ""
+        suffix += f"-w{workers}" if workers is not None else ""
+        suffix += f"-{profile}" if profile is not None else ""
+        result.append({
+            "name": f"{room}-n{noise:g}-f{frames}-{w}x{h}{suffix}",
+            "room": room,
+            "noise_m": float(noise),
+            "frames": int(frames),
+            "resolution": [int(w), int(h)],
+            "precision": precision,
+            "outlier_fraction": float(outliers),
+            "frame_backend": backend,
+            "frame_workers": workers,
+            "processing_profile": profile,
+        })
+    return result
+
+
+def _peak_rss_mb() -> float:
+    """Пиковый RSS процесса (ru_maxrss: КБ на Linux, байты на macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / scale, 1)
+
+
+def _timed(fn: Callable[[], object]) -> Tuple[object, float]:
+    started = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - started) * 1000.0
+
+
+def run_scenario(scenario: Dict[str, object], repeats: int = 3, seed: int = 0) -> Dict[str, object]:
+    """Отрисовать помещение, прогнать этапы repeats раз и собрать метрики сценария."""
+    from app.core.config import settings, use_processing
+    from app.core.instrumentation import collect_timings
+    from app.core.processing.junctions import find_junctions
+    from app.core.processing.point_cloud import load_frames_to_pointcloud
+    from app.core.processing.precision import resolve_point_dtype
+    from app.core.processing.ransac import detect_planes
+    from app.core.processing.scan_cloud import ScanCloud
+    from app.core.processing.scan_processor import ScanProcessor
+    from app.core.profiles import get_processing_profiles
+    from app.core.synthetic_room import make_room, render_scan
+    from app.ml.inference import run_scan_inference
+
+    proc = settings.processing
+    if scenario.get("processing_profile"):
+        proc = get_processing_profiles().resolve(str(scenario["processing_profile"])).processing
+    point_dtype = resolve_point_dtype(str(scenario.get("precision") or proc.point_precision))
+    room = make_room(str(scenario["room"]))
+    width, height = scenario["resolution"]
+    rendered = render_scan(
+        room,
+        frames=int(scenario["frames"]),
+        resolution=(int(width), int(height)),
+        noise_m=float(scenario["noise_m"]),
+        seed=seed,
+        outlier_fraction=float(scenario.get("outlier_fraction", 0.0)),
+    )
+
+    stage_ms: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    breakdown: Dict[str, List[float]] = {}
+    with tempfile.TemporaryDirectory(prefix="scan_bench_") as tmpdir:
+        frame_paths, depth_paths, trajectory_path = rendered.write(tmpdir)
+        for _ in range(max(1, repeats)):
+            with use_processing(proc), collect_timings() as timings:
+                cloud, ms = _timed(lambda: load_frames_to_pointcloud(
+                    frame_paths,
+                    trajectory_path,
+                    depth_paths,
+                    workers=scenario.get("frame_workers"),
+                    backend=scenario.get("frame_backend"),
+                ))
+                stage_ms["load_frames"].append(ms)
+                planes, ms = _timed(lambda: detect_planes(
+                    cloud,
+                    distance_threshold=proc.ransac_distance_threshold,
+                    ransac_n=proc.ransac_n,
+                    num_iterations=proc.ransac_iterations,
+                    max_planes=proc.ransac_max_planes,
+                    min_inliers=proc.ransac_min_inliers,
+                ))
+                stage_ms["detect_planes"].append(ms)
+                junctions, ms = _timed(lambda: find_junctions(planes))
+                stage_ms["junctions"].append(ms)
+                # Как в ScanProcessor: одно представление облака на все этапы пост-обработки
+                scan_cloud = ScanCloud.from_open3d(cloud, point_dtype)
+                _, ms = _timed(lambda: ScanProcessor._compute_missing_zones(
+                    scan_cloud, proc.occupancy_cell_size_m, dtype=point_dtype
+                ))
+                stage_ms["missing_zones"].append(ms)
+                dimensions, ms = _timed(lambda: ScanProcessor._compute_dimensions(
+                    scan_cloud, proc.ceiling_height_fraction, dtype=point_dtype
+                ))
+                stage_ms["dimensions"].append(ms)
+                (reveals, frame_planes), ms = _timed(lambda: run_scan_inference(
+                    scan_cloud,
+                    planes,
+                    dimensions,
+                    reveal_min_confidence=proc.reveal_min_confidence,
+                    frame_plane_min_confidence=proc.frame_plane_min_confidence,
+                    model_dir=proc.ml_model_dir or None,
+                    detect_openings=proc.opening_detection_enabled,
+                    point_dtype=point_dtype,
+                ))
+                stage_ms["ml_inference"].append(ms)
+            for stage, ms in timings.items():
+                breakdown.setdefault(stage, []).append(ms)
+
+    frames = int(scenario["frames"])
+    points = len(cloud.points)
+    total_ms = [sum(values) for values in zip(*stage_ms.values())]
+    median_total_s = statistics.median(total_ms) / 1000.0
+    truth = room.ground_truth()
+    measured = dimensions.model_dump()
+    return {
+        **scenario,
+        "repeats": max(1, repeats),
+        "points": points,
+        "planes": len(planes),
+        "junctions": len(junctions),
+        "stages_ms": {
+            stage: {"median": round(statistics.median(v), 3), "min": round(min(v), 3)}
+            for stage, v in stage_ms.items()
+        },
+        "breakdown_ms": {
+            stage: round(statistics.median(v), 3) for stage, v in sorted(breakdown.items())
+        },
+        "total_ms": {"median": round(median_total_s * 1000.0, 3), "min": round(min(total_ms), 3)},
+        "throughput": {
+            "frames_per_s": round(frames / median_total_s, 3) if median_total_s > 0 else None,
+            "points_per_s": round(points / median_total_s, 1) if median_total_s > 0 else None,
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+        "accuracy": {
+            "dimensions_m": {
+                key: {"truth": round(truth[key], 4), "measured": round(float(measured[key]), 4),
+                      "abs_error": round(abs(float(measured[key]) - truth[key]), 4)}
+                for key in ("length_m", "width_m", "wall_height_m")
+            },
+            "doors": {"truth": int(truth["doors"]),
+                      "detected": sum(1 for r in reveals if r.opening_type == "door")},
+            "windows": {"truth": int(truth["windows"]),
+                        "detected": sum(1 for r in reveals if r.opening_type == "window")},
+            "boxes": {"truth": int(truth["boxes"]), "frame_planes": len(frame_planes)},
+        },
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, check=True,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _environment() -> Dict[str, object]:
+    try:
+        import open3d as o3d
+        open3d_version: Optional[str] = o3d.__version__
+    except ImportError:
+        open3d_version = None
+    return {
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "open3d": open3d_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_suite(
+    suite: str = "quick",
+    repeats: int = 3,
+    isolate: bool = True,
+    only: Optional[Sequence[str]] = None,
+) -> Dict[str, object]:
+    """Прогнать набор; isolate — каждый сценарий в свежем процессе (честный peak RSS)."""
+    items = [s for s in scenarios(suite) if not only or s["name"] in only]
+    results: List[Dict[str, object]] = []
+    if isolate:
+        ctx = multiprocessing.get_context("spawn")
+        for scenario in items:
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                results.append(pool.submit(run_scenario, scenario, repeats).result())
+    else:
+        results = [run_scenario(scenario, repeats) for scenario in items]
+    return {
+        "version": REPORT_VERSION,
+        "suite": suite,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": _environment(),
+        "isolated": isolate,
+        "scenarios": results,
+    }
+
+
+def compare_reports(old: Dict[str, object], new: Dict[str, object]) -> List[str]:
+    """Строки сравнения: медиана каждого этапа и итог, относительное изменение к old."""
+    old_by_name = {s["name"]: s for s in old.get("scenarios", [])}
+    lines: List[str] = []
+    for scenario in new.get("scenarios", []):
+        base = old_by_name.get(scenario["name"])
+        if base is None:
+            lines.append(f"{scenario['name']}: нет в базовом отчёте")
+            continue
+        lines.append(scenario["name"])
+        rows = [(stage, base["stages_ms"].get(stage, {}).get("median"), values["median"])
+                for stage, values in scenario["stages_ms"].items()]
+        rows.append(("total", base["total_ms"]["median"], scenario["total_ms"]["median"]))
+        rows.append(("peak_rss_mb", base.get("peak_rss_mb"), scenario.get("peak_rss_mb")))
+        for name, before, after in rows:
+            if not before:
+                lines.append(f"  {name:<16} {'-':>10} → {after:>10}")
+                continue
+            delta = 100.0 * (after - before) / before
+            lines.append(f"  {name:<16} {before:>10} → {after:>10}  ({delta:+.1f}%)")
+    return lines
+
+
+def _print_summary(report: Dict[str, object]) -> None:
+    for s in report["scenarios"]:
+        dims = s["accuracy"]["dimensions_m"]
+        err = max(v["abs_error"] for v in dims.values())
+        print(
+            f"{s['name']:<28} total {s['total_ms']['median']:>9.1f} ms  "
+            f"{s['throughput']['frames_per_s']:>7.2f} fps  {s['points']:>7d} pts  "
+            f"rss {s['peak_rss_mb']:>7.1f} MB  max dim err {err:.3f} m"
+        )
+
+
+def scaling_curves(report: Dict[str, object]) -> Dict[str, List[Dict[str, float]]]:
+    """
+    Масштабирование load_frames по frame_workers: для сценариев, различающихся только числом
+    потоков (процессов), — медиана этапа и ускорение относительно наименьшего их числа.
+    Потоки и процессы — разные кривые (у процессов в имени суффикс -process).
+    """
+    groups: Dict[str, List[Dict[str, object]]] = {}
+    for s in report["scenarios"]:
+        if s.get("frame_workers") is not None:
+            groups.setdefault(s["name"].rsplit("-w", 1)[0], []).append(s)
+    curves: Dict[str, List[Dict[str, float]]] = {}
+    for base, items in sorted(groups.items()):
+        items.sort(key=lambda s: s["frame_workers"])
+        reference = items[0]["stages_ms"]["load_frames"]["median"]
+        curves[base] = [
+            {
+                "frame_workers": s["frame_workers"],
+                "load_frames_ms": s["stages_ms"]["load_frames"]["median"],
+                "speedup": round(reference / s["stages_ms"]["load_frames"]["median"], 3),
+            }
+            for s in items
+        ]
+    return curves
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Бенчмарк пайплайна сканирования на синтетических помещениях"
+    )
+    parser.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=None, help="Куда записать JSON-отчёт")
+    parser.add_argument(
+        "--compare", type=Path, default=None, help="Базовый JSON-отчёт для сравнения"
+    )
+    parser.add_argument(
+        "--scenario", action="append", default=None, help="Только указанные сценарии"
+    )
+    parser.add_argument("--no-isolate", action="store_true", help="Все сценарии в текущем процессе")
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        args.suite, repeats=args.repeats, isolate=not args.no_isolate, only=args.scenario
+    )
+    curves = scaling_curves(report)
+    if curves:
+        report["scaling"] = curves
+    _print_summary(report)
+    for base, points in curves.items():
+        print(f"{base}: " + "  ".join(
+            f"w{p['frame_workers']} {p['load_frames_ms']:.0f} ms ×{p['speedup']:.2f}"
+            for p in points
+        ))
+    if args.output:
+        text = json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + "\n"
+        args.output.write_text(text, encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print("\n".join(compare_reports(baseline, report)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
+from typing import Iterator, Optional
 
 
 @dataclass(frozen=True)
 class ApiLimits:
     max_frames_per_batch: int = 30
+    max_documents_per_batch: int = 50
+    # POST /video: предельный размер загрузки (копируется во временный файл блоками)
+    max_video_bytes: int = 512 * 1024 * 1024
+    # POST /document, /document/batch: предельный размер одной страницы (читается блоками)
+    max_document_bytes: int = 32 * 1024 * 1024
     require_depth_count_match: bool = True
 
 
@@ -18,6 +26,46 @@ class ProcessingConfig:
     ransac_max_planes: int = 8
     ransac_min_inliers: int = 500
 
+    # Точность точек в пост-обработке (покрытие, размеры, признаки, проёмы): "float64" | "float32".
+    # Open3D (слияние кадров, RANSAC) всегда во float64; суммы и средние — во float64
+    point_precision: str = "float64"
+
+    # Отбор кадров до слияния (frame_quality): резкость — дисперсия лапласиана яркости в масштабе
+    # 1/frame_quality_scale, не ниже абсолютного порога и доли от медианы батча; клиппинг —
+    # доля чёрных/пересвеченных пикселей. Кадры хуже порогов не сливаются.
+    # Резкость зависит от сцены (кадр однотонной стены ~ как смазанный), поэтому по умолчанию
+    # отсекаются только почти однородные кадры, а относительный порог выключен
+    frame_quality_enabled: bool = True
+    frame_quality_scale: int = 8
+    frame_min_sharpness: float = 1.0
+    frame_min_relative_sharpness: float = 0.0
+    frame_max_clipped_fraction: float = 0.6
+
+    # Слияние кадров: число потоков, декодирующих и проецирующих кадры (1 — последовательно,
+    # 0 — по числу CPU, не больше 4). Облака кадров складываются в порядке кадров — результат
+    # не зависит от числа потоков
+    frame_workers: int = 0
+    # "thread" — проекция в потоках процесса; "process" — в пуле из frame_workers процессов,
+    # кадры и точки передаются через разделяемую память (frame_transport.py)
+    frame_backend: str = "thread"
+
+    # Прореживание слитого облака (point_budget.py): воксель не меньше voxel_size_m; если точек
+    # больше point_budget, воксель увеличивается (до max_voxel_size_m), чтобы уложиться в бюджет.
+    # 0 — без бюджета, всегда voxel_size_m
+    voxel_size_m: float = 0.03
+    point_budget: int = 80000
+    max_voxel_size_m: float = 0.1
+    # Нормали — PCA по normals_knn ближайшим точкам в индексе хэш-сетки (spatial_index.py),
+    # общем с фильтром выбросов
+    normals_knn: int = 30
+
+    # Фильтр выбросов после прореживания (outliers.py): точка удаляется, если в кубе 3×3×3 ячеек
+    # со стороной outlier_cell_size_m (не меньше двух вокселей прореживания) вокруг неё меньше
+    # outlier_min_neighbors других точек
+    outlier_filter_enabled: bool = True
+    outlier_cell_size_m: float = 0.06
+    outlier_min_neighbors: int = 4
+
     # Coverage / missing zones
     occupancy_cell_size_m: float = 0.4
     max_missing_zones: int = 5
@@ -30,6 +78,9 @@ class ProcessingConfig:
     reveal_min_confidence: float = 0.6
     frame_plane_min_confidence: float = 0.6
 
+    # ML: поиск дверей/окон как прямоугольных дыр в стенах (дополняет классификатор плоскостей)
+    opening_detection_enabled: bool = True
+
     # ML: путь к директории с обученной моделью (пусто — использовать встроенную по умолчанию)
     ml_model_dir: str = ""
 
@@ -40,11 +91,98 @@ class ProcessingConfig:
     density_points_norm: int = 80000
 
 
+@dataclass(frozen=True)
+class ExecutorConfig:
+    # Пулы процесса общие для всех запросов, поэтому их размеры — не параметры профиля обработки.
+    # Потоков пула пайплайна /process и /video: столько сканов считается одновременно, остальные
+    # ждут в очереди (event loop не занят — /ready и загрузки обслуживаются во время обработки)
+    scan_workers: int = 2
+    # Анализ документов: число потоков пула для пакетного /document/batch
+    document_analysis_workers: int = 4
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    # Кэш результатов /process и /document по хэшу входов и конфигурации обработки
+    enabled: bool = True
+    memory_max_entries: int = 128
+    memory_max_bytes: int = 64 * 1024 * 1024
+    # Каталог дискового уровня (пусто — только память)
+    disk_dir: str = ""
+    disk_max_bytes: int = 512 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ProfilingConfig:
+    # Профилирование /process: по заголовку X-Scan-Profile: 1 (allow_header) или для каждого
+    # запроса (always)
+    allow_header: bool = True
+    always: bool = False
+    # Интервал сэмплирования стека (с)
+    sample_interval_s: float = 0.005
+    # Каталог профилей (пусто — <tmp>/scan_profiles) и его лимиты: старые профили удаляются
+    dir: str = ""
+    max_files: int = 50
+    max_bytes: int = 64 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class ReadinessConfig:
+    # Фоновый прогрев при старте (open3d, модель); до его окончания GET /ready отвечает 503
+    warmup_on_startup: bool = True
+    # Прогнать при прогреве синтетический скан через ScanProcessor
+    warmup_synthetic_scan: bool = True
+    # Насыщение: при стольких выполняющихся /process или страницах документов в очереди /ready — 503
+    max_in_flight_scans: int = 4
+    max_in_flight_document_pages: int = 200
+
+
+@dataclass(frozen=True)
+class VideoConfig:
+    # Выбор ключевых кадров POST /video по уменьшенной копии кадра (длинная сторона, px)
+    analysis_max_side_px: int = 160
+    # Резкость: минимальная дисперсия лапласиана уменьшенной копии (ниже — кадр смазан)
+    min_sharpness: float = 20.0
+    # Движение: минимальное среднее изменение яркости к прошлому ключевому кадру (доля 0..1)
+    min_motion: float = 0.04
+    # Брать резкий кадр не реже чем раз в max_interval_s, даже если камера почти неподвижна
+    max_interval_s: float = 1.0
+    max_keyframes: int = 60
+    # Очередь кадров между потоком декодирования и слиянием
+    decode_queue_size: int = 4
+
+
 @dataclass(frozen=True)
 class Settings:
     api: ApiLimits = ApiLimits()
     processing: ProcessingConfig = ProcessingConfig()
+    executors: ExecutorConfig = ExecutorConfig()
+    cache: CacheConfig = CacheConfig()
+    profiling: ProfilingConfig = ProfilingConfig()
+    readiness: ReadinessConfig = ReadinessConfig()
+    video: VideoConfig = VideoConfig()
 
 
 settings = Settings()
 
+# ProcessingConfig текущего запроса — профиль обработки (app/core/profiles.py);
+# None — settings.processing
+_current_processing: ContextVar[Optional[ProcessingConfig]] = ContextVar(
+    "processing_config", default=None
+)
+
+
+def processing_config() -> ProcessingConfig:
+    """Параметры обработки текущего запроса: выбранный профиль, иначе settings.processing."""
+    config = _current_processing.get()
+    return settings.processing if config is None else config
+
+
+@contextmanager
+def use_processing(config: ProcessingConfig) -> Iterator[ProcessingConfig]:
+    """Сделать config текущей конфигурацией обработки внутри блока (и в порождённых им задачах)."""
+    token = _current_processing.set(config)
+    try:
+        yield config
+    finally:
+        _current_processing.reset(token)
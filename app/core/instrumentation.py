@@ -0,0 +1,268 @@
+"""
+Лёгкая инструментация пайплайна: спаны этапов, гистограммы и счётчики в формате Prometheus.
+
+- span("stage") — контекстный менеджер: длительность этапа попадает в гистограмму
+  scan_stage_duration_seconds{stage="..."} и (если активен collect_timings) в разбивку текущего
+  запроса; повторные спаны одного этапа (например, по кадрам) суммируются.
+- observe(name, value, **labels) / inc(name, value, **labels) — гистограммы и счётчики
+  (точки на входе/выходе, найденные плоскости, пропущенные кадры).
+- in_flight(name, **labels) — gauge «сейчас выполняется» (запросы /process, страницы документов).
+- metric_labels(**labels) — метки для всех метрик внутри блока (прогрев: source="warmup").
+- REGISTRY.render() — текст для GET /metrics (text exposition format 0.0.4).
+
+Без внешних зависимостей: одна блокировка на реестр, накладные расходы — микросекунды на спан.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Границы бакетов (верхние, включительно)
+DURATION_BUCKETS_S: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+COUNT_BUCKETS: Tuple[float, ...] = (
+    0, 1, 2, 4, 8, 16, 32, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000,
+)
+
+STAGE_DURATION_METRIC = "scan_stage_duration_seconds"
+IN_FLIGHT_METRIC = "scan_in_flight"
+
+_METRIC_HELP: Dict[str, str] = {
+    STAGE_DURATION_METRIC: "Длительность этапов обработки (с)",
+    "scan_points": "Число точек облака на этапах (before/after downsample)",
+    "scan_voxel_size_m": "Размер вокселя прореживания, выбранный под бюджет точек (м)",
+    "scan_planes_found": "Число плоскостей, найденных RANSAC",
+    "scan_frames_total": "Кадры: обработанные и пропущенные (result=processed|skipped)",
+    "scan_requests_total": "Запросы обработки по результату кэша (cache=hit|miss|off)",
+    "scan_latency_budget_exceeded_total": (
+        "Запросы дольше бюджета задержки своего профиля обработки"
+    ),
+    "scan_frame_backend_fallback_total": (
+        "Сканы с frame_backend=process, спроецированные в потоках: мало места в /dev/shm "
+        "(reason=shm)"
+    ),
+    IN_FLIGHT_METRIC: (
+        "Выполняющиеся сейчас запросы /process и /video (kind=process, включая ждущие пула), сканы "
+        "в потоках пула пайплайна (kind=scan_pipeline) и страницы документов (kind=document_page)"
+    ),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последний — +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in items)
+    return "{" + body + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """Потокобезопасный реестр гистограмм и счётчиков с метками."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._bucket_bounds: Dict[str, Tuple[float, ...]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+
+    def observe(
+        self, name: str, value: float, buckets: Sequence[float] = COUNT_BUCKETS, **labels: str
+    ) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            bounds = self._bucket_bounds.setdefault(name, tuple(buckets))
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(bounds)
+            hist.observe(float(value))
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + float(value)
+
+    def add_gauge(self, name: str, delta: float, **labels: str) -> None:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + float(delta)
+
+    def gauge_value(self, name: str, **labels: str) -> float:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            return self._gauges.get(name, {}).get(key, 0.0)
+
+    def histogram_count(self, name: str, **labels: str) -> int:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            hist = self._histograms.get(name, {}).get(key)
+            return hist.count if hist is not None else 0
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            return self._counters.get(name, {}).get(key, 0.0)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._bucket_bounds.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus: # HELP / # TYPE, бакеты нарастающим итогом, _sum, _count."""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._histograms):
+                lines.append(f"# HELP {name} {_METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key in sorted(self._histograms[name]):
+                    hist = self._histograms[name][key]
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                        cumulative += count
+                        le = _format_labels(key, ("le", _format_number(bound)))
+                        lines.append(f"{name}_bucket{le} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_number(hist.total)}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+            for name in sorted(self._counters):
+                lines.append(f"# HELP {name} {_METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key in sorted(self._counters[name]):
+                    value = _format_number(self._counters[name][key])
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted(self._gauges):
+                lines.append(f"# HELP {name} {_METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} gauge")
+                for key in sorted(self._gauges[name]):
+                    value = _format_number(self._gauges[name][key])
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# Разбивка времени текущего запроса (этап → мс); None — разбивка не собирается
+_current_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("scan_timings", default=None)
+# Спаны одного запроса могут закрываться в нескольких потоках (пул кадров)
+_timings_lock = threading.Lock()
+# Метки, добавляемые к метрикам внутри metric_labels; None — без дополнительных меток
+_extra_labels: ContextVar[Optional[Dict[str, str]]] = ContextVar("metric_labels", default=None)
+
+
+@contextmanager
+def metric_labels(**labels: str) -> Iterator[None]:
+    """
+    Добавить метки ко всем метрикам, записанным внутри блока (в том числе в потоках пулов,
+    получивших контекст запроса). Gauge с лишней меткой — отдельный ряд: прогрев
+    (source="warmup") не считается в scan_in_flight{kind="process"} и не влияет на /ready.
+    """
+    token = _extra_labels.set({**(_extra_labels.get() or {}), **labels})
+    try:
+        yield
+    finally:
+        _extra_labels.reset(token)
+
+
+def _with_extra(labels: Dict[str, str]) -> Dict[str, str]:
+    extra = _extra_labels.get()
+    return {**extra, **labels} if extra else labels
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Замерить этап: гистограмма длительности + разбивка текущего запроса (если собирается)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record_stage(stage, time.perf_counter() - started)
+
+
+def record_timings(timings: Dict[str, float]) -> None:
+    """
+    Учесть этапы, замеренные вне текущего процесса (этап → мс, как у collect_timings):
+    спаны дочерних процессов пула кадров попадают в гистограмму и разбивку запроса.
+    """
+    for stage, ms in timings.items():
+        _record_stage(stage, ms / 1000.0)
+
+
+def _record_stage(stage: str, elapsed: float) -> None:
+    REGISTRY.observe(
+        STAGE_DURATION_METRIC, elapsed, buckets=DURATION_BUCKETS_S, **_with_extra({"stage": stage})
+    )
+    timings = _current_timings.get()
+    if timings is not None:
+        with _timings_lock:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000.0
+
+
+@contextmanager
+def collect_timings() -> Iterator[Dict[str, float]]:
+    """Собирать разбивку по этапам для спанов внутри блока; возвращает словарь этап → мс."""
+    timings: Dict[str, float] = {}
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def observe(
+    name: str, value: float, buckets: Sequence[float] = COUNT_BUCKETS, **labels: str
+) -> None:
+    """Наблюдение в гистограмму-счётчик (точки, плоскости и т.п.)."""
+    REGISTRY.observe(name, value, buckets=buckets, **_with_extra(labels))
+
+
+def inc(name: str, value: float = 1.0, **labels: str) -> None:
+    """Увеличить счётчик."""
+    REGISTRY.inc(name, value, **_with_extra(labels))
+
+
+@contextmanager
+def in_flight(name: str, **labels: str) -> Iterator[None]:
+    """Gauge name{labels} на 1 больше, пока выполняется блок."""
+    labels = _with_extra(labels)
+    REGISTRY.add_gauge(name, 1.0, **labels)
+    try:
+        yield
+    finally:
+        REGISTRY.add_gauge(name, -1.0, **labels)
@@ -0,0 +1,153 @@
+"""
+Оценка качества кадров до слияния: смаз (дисперсия лапласиана) и экспозиция (клиппинг гистограммы).
+
+Кадр оценивается по яркости в масштабе 1/scale: для JPEG её даёт сам декодер (Pillow draft —
+масштабирование DCT, полный кадр не декодируется), для кадра в памяти — усреднение блоками.
+Оценка всего батча векторизована: миниатюры одного размера складываются в массив (N, h, w).
+
+Кадр отбрасывается, если он смазан (резкость ниже frame_min_sharpness или доли
+frame_min_relative_sharpness от медианы батча) либо слишком тёмный/пересвеченный
+(доля пикселей у краёв гистограммы выше frame_max_clipped_fraction). Если порогам
+не соответствует ни один кадр, используются все: пустое облако хуже шумного.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import ProcessingConfig
+from app.core.processing.image_decode import decode_image
+
+# Уровни яркости, с которых пиксель считается чёрным / пересвеченным
+DARK_LEVEL = 16
+BRIGHT_LEVEL = 245
+
+
+@dataclass
+class FrameScore:
+    index: int
+    sharpness: float
+    dark_fraction: float
+    bright_fraction: float
+    accepted: bool = True
+    reason: Optional[str] = None
+
+
+def downscale_gray(rgb: np.ndarray, max_side_px: int) -> np.ndarray:
+    """Яркость (float32) копии, прореженной с целым шагом до max_side_px по длинной стороне."""
+    step = max(1, int(np.ceil(max(rgb.shape[:2]) / max(1, max_side_px))))
+    small = rgb[::step, ::step]
+    if small.ndim == 2:
+        return small.astype(np.float32)
+    return (
+        0.299 * small[:, :, 0].astype(np.float32)
+        + 0.587 * small[:, :, 1]
+        + 0.114 * small[:, :, 2]
+    )
+
+
+def laplacian_variance(gray: np.ndarray) -> np.ndarray | float:
+    """
+    Резкость: дисперсия 4-связного лапласиана (размытый кадр — малое значение).
+    Для (h, w) — число, для (N, h, w) — массив (N,).
+    """
+    if gray.shape[-2] < 3 or gray.shape[-1] < 3:
+        return 0.0 if gray.ndim == 2 else np.zeros(gray.shape[0])
+    gray = gray.astype(np.float32, copy=False)
+    lap = (
+        gray[..., :-2, 1:-1] + gray[..., 2:, 1:-1] + gray[..., 1:-1, :-2] + gray[..., 1:-1, 2:]
+        - 4.0 * gray[..., 1:-1, 1:-1]
+    )
+    variance = lap.var(axis=(-2, -1), dtype=np.float64)
+    return float(variance) if gray.ndim == 2 else variance
+
+
+def gray_thumbnail(image: np.ndarray, scale: int = 8) -> np.ndarray:
+    """Яркость кадра в памяти (RGB или серый, uint8) в масштабе 1/scale — среднее по блокам."""
+    h, w = (image.shape[0] // scale) * scale, (image.shape[1] // scale) * scale
+    if h == 0 or w == 0:
+        return downscale_gray(image, 1)
+    gray = downscale_gray(image[:h, :w], max(image.shape[:2]))
+    return gray.reshape(h // scale, scale, w // scale, scale).mean(axis=(1, 3), dtype=np.float32)
+
+
+def gray_thumbnail_from_bytes(data: bytes, scale: int = 8) -> Optional[np.ndarray]:
+    """
+    Яркость закодированного кадра в масштабе ~1/scale. JPEG декодируется сразу в уменьшенном
+    виде (draft), прочие форматы — целиком с уменьшением. None — нет Pillow, файл не читается
+    или слишком велик (image_decode.decode_image): такой кадр помечается unscored.
+    """
+    def thumbnail(img: object) -> np.ndarray:
+        target = (max(1, img.size[0] // scale), max(1, img.size[1] // scale))
+        img.draft("L", target)
+        if img.mode != "L":
+            img = img.convert("L")
+        if img.size[0] > target[0] * 2:
+            img = img.reduce(max(1, img.size[0] // target[0]))
+        return np.asarray(img, dtype=np.float32)
+
+    return decode_image(data, thumbnail)
+
+
+def clipped_fractions(stack: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Доли чёрных и пересвеченных пикселей для (N, h, w) — массивы (N,)."""
+    pixels = stack.shape[1] * stack.shape[2]
+    dark = np.count_nonzero(stack <= DARK_LEVEL, axis=(1, 2)) / pixels
+    bright = np.count_nonzero(stack >= BRIGHT_LEVEL, axis=(1, 2)) / pixels
+    return dark, bright
+
+
+def score_thumbnails(
+    thumbnails: Sequence[Optional[np.ndarray]],
+    config: ProcessingConfig,
+) -> List[FrameScore]:
+    """
+    Оценить и отобрать кадры батча по миниатюрам (None — кадр не оценивается и не отбрасывается).
+    Миниатюры одного размера обрабатываются одним векторным проходом. reason у принятого
+    кадра — причина, по которой он был бы отброшен, если порогам не соответствует ни один кадр.
+    """
+    groups: Dict[tuple, List[int]] = defaultdict(list)
+    for index, thumb in enumerate(thumbnails):
+        if thumb is not None:
+            groups[thumb.shape].append(index)
+
+    # Без миниатюры (нет Pillow, формат не читается) кадр не оценивается —
+    # решает декодер при слиянии
+    scores: List[FrameScore] = [
+        FrameScore(
+            index=i, sharpness=0.0, dark_fraction=0.0, bright_fraction=0.0, reason="unscored"
+        )
+        for i in range(len(thumbnails))
+    ]
+    for indices in groups.values():
+        stack = np.stack([thumbnails[i] for i in indices])
+        sharpness = np.atleast_1d(laplacian_variance(stack))
+        dark, bright = clipped_fractions(stack)
+        for k, i in enumerate(indices):
+            scores[i] = FrameScore(
+                index=i,
+                sharpness=round(float(sharpness[k]), 3),
+                dark_fraction=round(float(dark[k]), 4),
+                bright_fraction=round(float(bright[k]), 4),
+            )
+
+    readable = [s for s in scores if s.reason != "unscored"]
+    if not readable:
+        return scores
+    median = float(np.median([s.sharpness for s in readable]))
+    min_sharpness = max(config.frame_min_sharpness, config.frame_min_relative_sharpness * median)
+    for s in readable:
+        # Экспозиция первой: у тёмного или пересвеченного кадра и резкость низкая
+        if s.dark_fraction > config.frame_max_clipped_fraction:
+            s.accepted, s.reason = False, "underexposed"
+        elif s.bright_fraction > config.frame_max_clipped_fraction:
+            s.accepted, s.reason = False, "overexposed"
+        elif s.sharpness < min_sharpness:
+            s.accepted, s.reason = False, "blurred"
+    if not any(s.accepted for s in readable):
+        for s in readable:
+            s.accepted = True
+    return scores
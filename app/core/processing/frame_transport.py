@@ -0,0 +1,291 @@
+"""
+Передача кадров в процессы-обработчики через разделяемую память.
+
+Кадр (цвет и глубина) копируется в сегмент multiprocessing.shared_memory один раз; в процесс
+пула уходит только дескриптор — имя сегмента, смещения и формы массивов, поза 4×4. Точки и
+цвета кадра обработчик пишет сразу в отдельный выходной сегмент, заранее выделенный на h·w
+точек (страницы tmpfs выделяются при записи, так что неиспользованный хвост памяти не
+занимает), и возвращает только число точек. Точки хранятся по координатам (3, h·w), как их
+считает проекция. Родитель копирует из выходного сегмента только n точек кадра и сразу
+освобождает оба сегмента: в /dev/shm лежат лишь кадры в работе (не больше 2 * workers).
+
+Все сегменты создаёт и удаляет родитель (SharedFrameTransport.close): упавший обработчик
+не оставляет файлов в /dev/shm. Если /dev/shm меньше нужного (в Docker по умолчанию 64 МБ),
+запись в сегмент завершила бы процесс по SIGBUS — fits() проверяет место заранее.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import multiprocessing.util
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.instrumentation import collect_timings, record_timings
+from app.core.profiling import StackSampler, active_sampler, sample_worker_task
+
+# Смещение массива в сегменте, форма, dtype
+ArraySpec = Tuple[int, Tuple[int, ...], str]
+# project(color, depth, transform, (точки (3, h·w) float64, цвета (h·w, 3) uint8)) -> число точек:
+# первые n столбцов/строк выходных массивов
+ProjectFn = Callable[
+    [np.ndarray, Optional[np.ndarray], np.ndarray, Tuple[np.ndarray, np.ndarray]], int
+]
+
+# Выравнивание массивов в сегменте (строка кэша)
+_ALIGN = 64
+# tmpfs, в котором multiprocessing.shared_memory создаёт сегменты (Linux)
+SHM_DIR = "/dev/shm"
+
+
+@dataclass(frozen=True)
+class SharedFrame:
+    """Дескриптор кадра: входной сегмент (цвет, глубина), выходной (точки, цвета) и поза."""
+    source: str
+    color: ArraySpec
+    depth: Optional[ArraySpec]
+    target: str
+    points: ArraySpec
+    colors: ArraySpec
+    transform: np.ndarray
+
+
+def _layout(arrays: Sequence[Tuple[Tuple[int, ...], np.dtype]]) -> Tuple[List[ArraySpec], int]:
+    """Смещения массивов подряд с выравниванием и общий размер сегмента (не меньше 1 байта)."""
+    specs: List[ArraySpec] = []
+    offset = 0
+    for shape, dtype in arrays:
+        offset = -(-offset // _ALIGN) * _ALIGN
+        specs.append((offset, tuple(int(n) for n in shape), np.dtype(dtype).str))
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+    return specs, max(1, offset)
+
+
+def _frame_layouts(
+    color: np.ndarray, depth: Optional[np.ndarray]
+) -> Tuple[Tuple[List[ArraySpec], int], Tuple[List[ArraySpec], int]]:
+    """Раскладка входного (цвет, глубина) и выходного (точки, цвета) сегментов кадра."""
+    arrays = [(color.shape, color.dtype)]
+    if depth is not None:
+        arrays.append((depth.shape, depth.dtype))
+    pixels = color.shape[0] * color.shape[1]
+    return _layout(arrays), _layout([((3, pixels), np.float64), ((pixels, 3), np.uint8)])
+
+
+def shared_memory_free(path: str = SHM_DIR) -> Optional[int]:
+    """Свободное место в tmpfs разделяемой памяти (байт); None — не удалось определить."""
+    try:
+        stat = os.statvfs(path)
+    except (OSError, AttributeError):
+        return None
+    return stat.f_bavail * stat.f_frsize
+
+
+def _view(segment: SharedMemory, spec: ArraySpec) -> np.ndarray:
+    offset, shape, dtype = spec
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf, offset=offset)
+
+
+def _project_shared(project: ProjectFn, frame: SharedFrame) -> Tuple[int, Dict[str, float]]:
+    """Выполняется в процессе пула: спроецировать кадр из сегмента и записать точки в выходной."""
+    source = SharedMemory(frame.source)
+    target = SharedMemory(frame.target)
+    try:
+        return _project_segments(project, frame, source, target)
+    finally:
+        source.close()
+        target.close()
+
+
+def _project_segments(
+    project: ProjectFn,
+    frame: SharedFrame,
+    source: SharedMemory,
+    target: SharedMemory,
+) -> Tuple[int, Dict[str, float]]:
+    # Представления сегментов живут только в этой функции: иначе close() не отпустит буфер
+    color = _view(source, frame.color)
+    depth = _view(source, frame.depth) if frame.depth is not None else None
+    out = (_view(target, frame.points), _view(target, frame.colors))
+    with collect_timings() as timings:
+        count = project(color, depth, frame.transform, out)
+    return count, timings
+
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Общий пул процессов на число обработчиков. Процессы запускаются через spawn: fork
+    процесса с потоками (uvicorn, пулы Open3D) небезопасен. Запуск — один раз на пул.
+    """
+    workers = max(1, max_workers)
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            if not _pools:
+                # В дочернем процессе multiprocessing при выходе сначала ждёт своих детей и лишь
+                # потом останавливает пулы concurrent.futures — без явной остановки это зависание.
+                # Приоритет выше, чем у закрытия очередей пула (10): им ещё нужно отправить сигнал
+                multiprocessing.util.Finalize(None, shutdown_process_pools, exitpriority=100)
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return pool
+
+
+def shutdown_process_pools() -> None:
+    """Остановить все пулы процессов (при выходе процесса вызывается автоматически)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    # Пул с упавшим процессом больше не принимает задачи: следующий запрос создаст новый
+    with _pools_lock:
+        for workers, existing in list(_pools.items()):
+            if existing is pool:
+                del _pools[workers]
+
+
+class SharedFrameTransport:
+    """
+    Проекция кадров в пуле процессов через разделяемую память. Точки, выданные map(), —
+    копии: сегменты кадра освобождаются сразу после ответа обработчика.
+
+        with SharedFrameTransport(project, workers=4) as transport:
+            if transport.fits(color, depth):
+                cloud = merge(transport.map(frames))
+    """
+
+    def __init__(self, project: ProjectFn, workers: int) -> None:
+        self._project = project
+        self._workers = max(1, workers)
+        self._segments: Dict[str, SharedMemory] = {}
+
+    def __enter__(self) -> "SharedFrameTransport":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def fits(
+        self, color: np.ndarray, depth: Optional[np.ndarray], free: Optional[int] = None
+    ) -> bool:
+        """
+        Хватит ли места в /dev/shm (или free байт) на 2 * workers кадров такого размера —
+        столько map() держит в работе. Место не определить (не Linux) — True.
+        """
+        free = shared_memory_free() if free is None else free
+        if free is None:
+            return True
+        (_, source_size), (_, target_size) = _frame_layouts(color, depth)
+        return 2 * self._workers * (source_size + target_size) <= free
+
+    def _allocate(self, size: int) -> SharedMemory:
+        segment = SharedMemory(create=True, size=size)
+        self._segments[segment.name] = segment
+        return segment
+
+    def _release(self, name: str) -> None:
+        segment = self._segments.pop(name)
+        try:
+            segment.close()
+        except BufferError:
+            # Массивы над сегментом ещё живы: отображение снимет сборщик мусора
+            pass
+        segment.unlink()
+
+    def put(
+        self, color: np.ndarray, depth: Optional[np.ndarray], transform: np.ndarray
+    ) -> SharedFrame:
+        """Скопировать кадр во входной сегмент и выделить выходной на каждый пиксель."""
+        ((color_spec, *depth_spec), source_size), ((points_spec, colors_spec), target_size) = (
+            _frame_layouts(color, depth)
+        )
+        source = self._allocate(source_size)
+        _view(source, color_spec)[...] = color
+        if depth is not None:
+            _view(source, depth_spec[0])[...] = depth
+        target = self._allocate(target_size)
+        return SharedFrame(
+            source=source.name,
+            color=color_spec,
+            depth=depth_spec[0] if depth_spec else None,
+            target=target.name,
+            points=points_spec,
+            colors=colors_spec,
+            transform=np.asarray(transform, dtype=np.float64),
+        )
+
+    def map(
+        self, frames: Iterable[Optional[Tuple[np.ndarray, Optional[np.ndarray], np.ndarray]]]
+    ) -> Iterator[Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """
+        Точки и цвета кадров (color, depth, transform) в порядке входа; None проходит как None.
+        В работе не больше 2 * workers кадров, источник читается лениво. Спаны обработчиков
+        добавляются в разбивку текущего запроса, их стеки — в профиль, если он снимается.
+        """
+        pool = get_process_pool(self._workers)
+        sampler = active_sampler()
+        interval_s = sampler.interval_s if sampler is not None else None
+        pending: Deque[Tuple[Optional[SharedFrame], Optional[Future]]] = deque()
+        try:
+            for item in frames:
+                if item is None:
+                    pending.append((None, None))
+                else:
+                    frame = self.put(*item)
+                    future = pool.submit(
+                        sample_worker_task, interval_s, _project_shared, self._project, frame
+                    )
+                    pending.append((frame, future))
+                if len(pending) >= 2 * self._workers:
+                    yield self._result(pending.popleft(), sampler)
+            while pending:
+                yield self._result(pending.popleft(), sampler)
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+
+    def _result(
+        self,
+        entry: Tuple[Optional[SharedFrame], Optional[Future]],
+        sampler: Optional[StackSampler],
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        frame, future = entry
+        if frame is None or future is None:
+            return None
+        (count, timings), samples = future.result()
+        record_timings(timings)
+        if sampler is not None and samples:
+            sampler.merge(samples, "frame-process")
+        self._release(frame.source)
+        target = self._segments[frame.target]
+        # Копия n точек вместо h·w·27 байт сегмента до конца слияния; представления временные
+        points = _view(target, frame.points)[:, :count].copy()
+        colors = _view(target, frame.colors)[:count].copy()
+        self._release(frame.target)
+        return points.T, colors
+
+    def close(self) -> None:
+        """Удалить оставшиеся сегменты (кадры, прерванные ошибкой или выходом из map())."""
+        for name in list(self._segments):
+            self._release(name)
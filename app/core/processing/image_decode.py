@@ -0,0 +1,54 @@
+"""
+Декодирование загруженных изображений (Pillow) с защитой от «бомб»: файл в десятки КБ
+может объявить изображение в сотни мегапикселей. Image.open читает только заголовок,
+поэтому размер проверяется до декодирования пикселей.
+"""
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Callable, Optional, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+
+
+def _too_large(size: Tuple[int, int], max_pixels: Optional[int]) -> bool:
+    # max_pixels — Image.MAX_IMAGE_PIXELS; None в Pillow означает «без порога»
+    return max_pixels is not None and size[0] * size[1] > max_pixels
+
+
+def decode_image(data: bytes, decode: Callable[..., T]) -> Optional[T]:
+    """
+    decode(PIL.Image) для изображения из байтов. None — нет Pillow, файл не читается или
+    в нём больше Image.MAX_IMAGE_PIXELS пикселей.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        img = Image.open(io.BytesIO(data))
+        if _too_large(img.size, Image.MAX_IMAGE_PIXELS):
+            return None
+        return decode(img)
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError):
+        # DecompressionBombError — не OSError: без него «бомба» дошла бы до ответа 500
+        return None
+
+
+def exceeds_pixel_limit(source: Union[bytes, str, Path]) -> bool:
+    """
+    Заголовок изображения объявляет больше Image.MAX_IMAGE_PIXELS пикселей. Для декодеров
+    без такой проверки (Open3D); нечитаемый файл или отсутствие Pillow — False.
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return False
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            return _too_large(img.size, Image.MAX_IMAGE_PIXELS)
+    except Image.DecompressionBombError:
+        return True
+    except (OSError, ValueError, SyntaxError):
+        return False
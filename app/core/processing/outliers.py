@@ -0,0 +1,47 @@
+"""
+Фильтр выбросов облака точек по соседям на хэш-сетке вокселей (без KD-дерева).
+
+Точки раскладываются по кубическим ячейкам со стороной cell_size_m (spatial_index.VoxelIndex).
+Для каждой занятой ячейки число точек в кубе 3×3×3 соседних ячеек считается
+27 поисками по отсортированным ключам: стоимость O(C log C) по числу занятых ячеек C,
+а не по числу пар точек. Точка — выброс, если в этом кубе кроме неё меньше min_neighbors точек:
+одиночные «висящие» точки от бликов и отражений не доходят до RANSAC и размеров.
+"""
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from app.core.processing.spatial_index import VoxelIndex
+
+
+def grid_neighbour_counts(points: np.ndarray, cell_size_m: float) -> np.ndarray:
+    """Для каждой точки (n, 3) — число других точек в кубе 3×3×3 ячеек вокруг её ячейки."""
+    return VoxelIndex(points, cell_size_m).cube_counts()
+
+
+def outlier_mask(points: np.ndarray, cell_size_m: float, min_neighbors: int) -> np.ndarray:
+    """Маска точек, которые остаются (True), и выбросов (False)."""
+    return grid_neighbour_counts(points, cell_size_m) >= min_neighbors
+
+
+def remove_grid_outliers(
+    point_cloud: object,
+    cell_size_m: float,
+    min_neighbors: int,
+    index: Optional[VoxelIndex] = None,
+) -> Tuple[object, VoxelIndex, int]:
+    """
+    Open3D PointCloud без выбросов (цвета и нормали сохраняются), индекс его точек и число
+    удалённых точек. Готовый index по точкам облака переиспользуется (cell_size_m тогда не нужен).
+    """
+    if index is None:
+        index = VoxelIndex(np.asarray(point_cloud.points), cell_size_m)
+    if len(index) == 0 or min_neighbors <= 0:
+        return point_cloud, index, 0
+    keep = index.cube_counts() >= min_neighbors
+    removed = int(len(keep) - np.count_nonzero(keep))
+    if removed == 0:
+        return point_cloud, index, 0
+    return point_cloud.select_by_index(np.flatnonzero(keep).tolist()), index.subset(keep), removed
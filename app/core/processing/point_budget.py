@@ -0,0 +1,89 @@
+"""
+Бюджет точек: размер вокселя прореживания подбирается под скан так, чтобы в облаке осталось
+не больше point_budget точек. Тогда стоимость RANSAC, признаков и покрытия ограничена
+одинаково для санузла и для зала.
+
+Число точек поверхности при вокселе v ведёт себя как N ∝ v^-k (k ≈ 2 для стен и пола).
+Первый проход — прореживание минимальным вокселем; если точек больше бюджета, следующий
+размер считается по степенному закону, показатель k уточняется секущей в log-log по двум
+последним замерам. Каждый замер — прореживание уже прореженного облака (оно в разы меньше
+исходного), поэтому 2–3 уточнения стоят меньше первого прохода.
+"""
+from __future__ import annotations
+
+import math
+from typing import Callable, Dict, Optional, Tuple
+
+from app.core.config import ProcessingConfig
+
+# Бакеты гистограммы scan_voxel_size_m (м)
+VOXEL_SIZE_BUCKETS_M = (0.02, 0.03, 0.04, 0.05, 0.06, 0.08, 0.1, 0.15, 0.2)
+# Цель уточнения — чуть ниже бюджета: закон N ∝ v^-k приближённый
+_TARGET_FRACTION = 0.95
+# Достаточно близко к бюджету — дальше не уточняем
+_ACCEPT_FRACTION = 0.8
+# Допустимый показатель степени: от «линий» до объёмного шума
+_MIN_EXPONENT, _MAX_EXPONENT = 1.0, 3.0
+
+
+def choose_voxel_size(
+    count_at: Callable[[float], int],
+    budget: int,
+    min_voxel_m: float,
+    max_voxel_m: float,
+    iterations: int = 3,
+) -> Tuple[float, int]:
+    """
+    Наименьший найденный воксель из [min_voxel_m, max_voxel_m], при котором count_at(v) <= budget,
+    и число точек при нём. count_at вызывается не больше 1 + iterations раз. Если бюджет
+    не достигнут и при max_voxel_m, возвращается max_voxel_m; budget <= 0 — бюджета нет.
+    """
+    voxel, count = min_voxel_m, count_at(min_voxel_m)
+    if budget <= 0 or count <= budget or max_voxel_m <= min_voxel_m:
+        return voxel, count
+
+    # over — последний замер выше бюджета, under — наименьший воксель, уложившийся в бюджет
+    over: Tuple[float, int] = (voxel, count)
+    under: Optional[Tuple[float, int]] = None
+    exponent = 2.0
+    for _ in range(iterations):
+        over_voxel, over_count = over
+        target = over_voxel * (over_count / (budget * _TARGET_FRACTION)) ** (1.0 / exponent)
+        target = min(max_voxel_m, target)
+        if target <= over_voxel or (under is not None and target >= under[0]):
+            break
+        target_count = count_at(target)
+        if 0 < target_count < over_count:
+            measured = math.log(over_count / target_count) / math.log(target / over_voxel)
+            exponent = min(_MAX_EXPONENT, max(_MIN_EXPONENT, measured))
+        if target_count > budget:
+            over = (target, target_count)
+            if target >= max_voxel_m:
+                break
+            continue
+        under = (target, target_count)
+        if target_count >= budget * _ACCEPT_FRACTION:
+            break
+    return under if under is not None else over
+
+
+def downsample_to_budget(point_cloud: object, config: ProcessingConfig) -> Tuple[object, float]:
+    """
+    Прореженное Open3D-облако и выбранный размер вокселя (м). Без бюджета
+    (config.point_budget <= 0) — одно прореживание вокселем config.voxel_size_m.
+    """
+    base = point_cloud.voxel_down_sample(voxel_size=config.voxel_size_m)
+    clouds: Dict[float, object] = {config.voxel_size_m: base}
+
+    def count_at(voxel_m: float) -> int:
+        if voxel_m not in clouds:
+            clouds[voxel_m] = base.voxel_down_sample(voxel_size=voxel_m)
+        return len(clouds[voxel_m].points)
+
+    voxel, _ = choose_voxel_size(
+        count_at,
+        budget=config.point_budget,
+        min_voxel_m=config.voxel_size_m,
+        max_voxel_m=config.max_voxel_size_m,
+    )
+    return clouds[voxel], voxel
@@ -1,11 +1,53 @@
 from __future__ import annotations
 
+import contextvars
+import itertools
 import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
 import numpy as np
-import open3d as o3d
+
+from app.core.config import processing_config
+from app.core.instrumentation import inc, observe, span
+from app.core.processing.frame_transport import SharedFrameTransport
+from app.core.processing.image_decode import exceeds_pixel_limit
+from app.core.processing.outliers import remove_grid_outliers
+from app.core.processing.point_budget import VOXEL_SIZE_BUCKETS_M, downsample_to_budget
+from app.core.processing.spatial_index import VoxelIndex
+from app.core.processing.trajectory import (
+    frame_transforms,
+    interpolate_poses,
+    pose_matrices,
+    quaternions_to_matrices,
+    trajectory_arrays,
+)
+from app.core.profiling import run_sampled
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+if TYPE_CHECKING:  # open3d импортируется при первом вызове: импорт модуля занимает секунды
+    import open3d as o3d
 
 
 def _quaternion_to_rotation_matrix(quat: List[float]) -> np.ndarray:
@@ -14,25 +56,7 @@ def _quaternion_to_rotation_matrix(quat: List[float]) -> np.ndarray:
     """
     if len(quat) != 4:
         return np.eye(3, dtype=np.float64)
-
-    qx, qy, qz, qw = quat
-    norm = np.sqrt(qx * qx + qy * qy + qz * qz + qw * qw)
-    if norm == 0:
-        return np.eye(3, dtype=np.float64)
-    qx, qy, qz, qw = qx / norm, qy / norm, qz / norm, qw / norm
-
-    xx, yy, zz = qx * qx, qy * qy, qz * qz
-    xy, xz, yz = qx * qy, qx * qz, qy * qz
-    wx, wy, wz = qw * qx, qw * qy, qw * qz
-
-    return np.array(
-        [
-            [1 - 2 * (yy + zz), 2 * (xy - wz), 2 * (xz + wy)],
-            [2 * (xy + wz), 1 - 2 * (xx + zz), 2 * (yz - wx)],
-            [2 * (xz - wy), 2 * (yz + wx), 1 - 2 * (xx + yy)],
-        ],
-        dtype=np.float64,
-    )
+    return quaternions_to_matrices(np.asarray(quat, dtype=np.float64))[0]
 
 
 def _load_trajectory(trajectory_json_path: str) -> List[Dict[str, Any]]:
@@ -51,18 +75,9 @@ def _load_trajectory(trajectory_json_path: str) -> List[Dict[str, Any]]:
     return []
 
 
-def _frame_transform(frame_pose: Dict[str, Any]) -> np.ndarray:
-    transform = np.eye(4, dtype=np.float64)
-    position = frame_pose.get("position") or [0.0, 0.0, 0.0]
-    rotation = frame_pose.get("rotation") or [0.0, 0.0, 0.0, 1.0]
-
-    if isinstance(position, list) and len(position) == 3:
-        transform[:3, 3] = np.array(position, dtype=np.float64)
-    transform[:3, :3] = _quaternion_to_rotation_matrix(rotation if isinstance(rotation, list) else [])
-    return transform
-
-
 def _depth_image_from_path(depth_path: Path) -> Optional[o3d.geometry.Image]:
+    import open3d as o3d
+
     if not depth_path.exists():
         return None
 
@@ -93,84 +108,427 @@ def _depth_image_from_path(depth_path: Path) -> Optional[o3d.geometry.Image]:
     return o3d.geometry.Image(depth_np.astype(np.uint16))
 
 
-def load_frames_to_pointcloud(
-    frame_paths: List[str],
-    trajectory_json_path: str,
-    depth_paths: Optional[List[str]] = None,
-) -> o3d.geometry.PointCloud:
+@dataclass
+class FrameData:
     """
-    Build a single Open3D point cloud from a list of JPEG frames and trajectory.
-
-    Notes:
-    - If depth_paths are provided, they are used as true depth input.
-    - If no depth is provided, this function creates synthetic depth from luminance
-      as a temporary approximation.
-    - Trajectory poses are applied to each frame cloud as rigid transforms.
+    A frame already in memory: RGB uint8 (h, w, 3) or grayscale, optional depth
+    (uint16 millimeters array or Open3D image) and either a ready camera-to-world
+    pose (4x4) or a capture time t, in which case the pose is interpolated from
+    the trajectory.
     """
-    if not frame_paths:
-        return o3d.geometry.PointCloud()
-
-    trajectory = _load_trajectory(trajectory_json_path)
-    merged = o3d.geometry.PointCloud()
-
-    for idx, frame_path in enumerate(frame_paths):
-        image_path = Path(frame_path)
-        if not image_path.exists():
-            continue
-
-        color_o3d = o3d.io.read_image(str(image_path))
-        color_np = np.asarray(color_o3d)
-        if color_np.size == 0:
-            continue
-
+    color: np.ndarray
+    depth: Optional[Any] = None
+    pose: Optional[np.ndarray] = None
+    t: Optional[float] = None
+
+
+def _synthetic_depth(color_np: np.ndarray) -> np.ndarray:
+    # Synthetic depth from luminance: range ~0.5m..3.0m, then convert to mm.
+    gray = (
+        0.299 * color_np[:, :, 0]
+        + 0.587 * color_np[:, :, 1]
+        + 0.114 * color_np[:, :, 2]
+    ) / 255.0
+    depth_m = 0.5 + (1.0 - gray) * 2.5
+    return (depth_m * 1000.0).astype(np.uint16)
+
+
+# Depth maps are millimeters; depth beyond the truncation distance is treated as missing
+_DEPTH_SCALE = np.float32(1000.0)
+_DEPTH_TRUNC_M = np.float32(5.0)
+
+FramePoints = Tuple[np.ndarray, np.ndarray]
+
+
+@lru_cache(maxsize=8)
+def _pixel_rays(width: int, height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Flat x/z and y/z of each pixel's ray for the default intrinsics (f = max(w, h), center)."""
+    focal = float(max(width, height))
+    ray_x = np.tile((np.arange(width) - width / 2.0) / focal, height)
+    ray_y = np.repeat((np.arange(height) - height / 2.0) / focal, width)
+    ray_x.flags.writeable = False
+    ray_y.flags.writeable = False
+    return ray_x, ray_y
+
+
+def _frame_points(
+    frame: FrameData,
+    transform: np.ndarray,
+    out: Optional[FramePoints] = None,
+) -> FramePoints:
+    """
+    World points (n, 3) and uint8 colors (n, 3) of one frame: pinhole back-projection
+    of valid depth pixels in row-major order. Done in NumPy rather than Open3D: Open3D holds
+    the GIL for the whole call, NumPy releases it, so frames back-project in parallel threads.
+    With `out` ((3, h*w) float64 and (h*w, 3) uint8) the result is written there and returned
+    as views of it.
+    """
+    with span("load_frames.depth"):
         # Ensure 3-channel uint8 color image.
+        color_np = frame.color
         if color_np.ndim == 2:
             color_np = np.stack([color_np, color_np, color_np], axis=-1)
         elif color_np.shape[2] == 4:
             color_np = color_np[:, :, :3]
-        color_np = color_np.astype(np.uint8)
-        color_o3d = o3d.geometry.Image(color_np)
+        color_np = np.asarray(color_np, dtype=np.uint8)
+
+        depth_np = _synthetic_depth(color_np) if frame.depth is None else np.asarray(frame.depth)
+        if depth_np.shape[:2] != color_np.shape[:2]:
+            # Open3D rejected mismatched color/depth sizes with an empty image as well
+            return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.uint8)
+        # Meters in float32, as Open3D converts depth images; beyond the truncation -> no depth
+        depth_m = depth_np.astype(np.float32) / _DEPTH_SCALE
+        depth_m[depth_m > _DEPTH_TRUNC_M] = 0.0
+
+    with span("load_frames.backproject"):
+        pixels = np.flatnonzero(depth_m > 0)
+        z = depth_m.ravel()[pixels].astype(np.float64)
+        ray_x, ray_y = _pixel_rays(color_np.shape[1], color_np.shape[0])
+        ray_x, ray_y = ray_x[pixels], ray_y[pixels]
+        # world = R @ (ray * z) + t, one coordinate at a time: no (n, 3) temporaries
+        rotation, shift = transform[:3, :3], transform[:3, 3]
+        world = np.empty((3, len(z))) if out is None else out[0][:, :len(z)]
+        for axis in range(3):
+            row = world[axis]
+            np.multiply(ray_x, rotation[axis, 0], out=row)
+            row += rotation[axis, 1] * ray_y
+            row += rotation[axis, 2]
+            row *= z
+            row += shift[axis]
+        if out is None:
+            colors = np.take(color_np.reshape(-1, 3), pixels, axis=0)
+        else:
+            # mode="clip" writes straight into out ("raise" buffers it); pixels are in range
+            colors = np.take(
+                color_np.reshape(-1, 3), pixels, axis=0, out=out[1][:len(z)], mode="clip"
+            )
+    # (n, 3) view; the merge concatenates frames into one contiguous array anyway
+    return world.T, colors
+
+
+def _project_into(
+    color: np.ndarray, depth: Optional[np.ndarray], transform: np.ndarray, out: FramePoints
+) -> int:
+    """_frame_points into shared-memory buffers: the entry point of frame_transport workers."""
+    points, _ = _frame_points(FrameData(color=color, depth=depth), transform, out=out)
+    return len(points)
+
+
+_frame_executors: Dict[int, ThreadPoolExecutor] = {}
+_frame_executors_lock = threading.Lock()
+
+
+def get_frame_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    Process-wide thread pool for per-frame decode and back-projection, one per worker
+    count. Shared by all requests, so concurrent scans do not multiply the thread count.
+    """
+    workers = max(1, max_workers)
+    with _frame_executors_lock:
+        executor = _frame_executors.get(workers)
+        if executor is None:
+            executor = _frame_executors[workers] = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="frame-fusion",
+            )
+        return executor
+
+
+def _map_ordered(fn: Callable[[T], R], items: Iterable[T], workers: int) -> Iterator[R]:
+    """
+    fn over items on the frame pool, results in input order (so the merged cloud does not
+    depend on thread timing). At most 2 * workers items are in flight; items are pulled
+    lazily, so a generator source keeps its own memory bound. workers <= 1 runs inline.
+    """
+    if workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    executor = get_frame_executor(workers)
+    pending: Deque[Future] = deque()
+    try:
+        for item in items:
+            # Each task runs in a copy of the caller's context: spans land in its timings,
+            # and the worker thread is sampled while the request is being profiled
+            pending.append(executor.submit(contextvars.copy_context().run, run_sampled, fn, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _frame_workers(workers: Optional[int]) -> int:
+    if workers is None:
+        workers = processing_config().frame_workers
+    # 0 — by CPU count: on a single core the pool only adds overhead
+    return workers if workers > 0 else min(4, os.cpu_count() or 1)
+
+
+FRAME_BACKENDS = ("thread", "process")
+
+
+def _frame_backend(backend: Optional[str]) -> str:
+    if backend is None:
+        backend = processing_config().frame_backend
+    if backend not in FRAME_BACKENDS:
+        raise ValueError(f"Unknown frame backend {backend!r}, expected one of {FRAME_BACKENDS}")
+    return backend
+
+
+PosedFrame = Tuple[FrameData, np.ndarray]
+
+
+def _posed_frame(
+    item: Tuple[int, Optional[FrameData]],
+    times: np.ndarray,
+    quats: np.ndarray,
+    translations: np.ndarray,
+) -> Optional[PosedFrame]:
+    idx, frame = item
+    if frame is None or frame.color.size == 0:
+        return None
+    transform = frame.pose
+    if transform is None and frame.t is not None:
+        rot, shift = interpolate_poses(times, quats, translations, np.array([frame.t]))
+        transform = pose_matrices(rot, shift)[0]
+    elif transform is None and idx < len(quats):
+        transform = pose_matrices(quats[idx:idx + 1], translations[idx:idx + 1])[0]
+    elif transform is None:
+        transform = np.eye(4)
+    return frame, transform
 
-        depth_o3d: Optional[o3d.geometry.Image] = None
-        if depth_paths and idx < len(depth_paths):
-            depth_o3d = _depth_image_from_path(Path(depth_paths[idx]))
 
-        if depth_o3d is None:
-            # Synthetic depth from luminance: range ~0.5m..3.0m, then convert to mm.
-            gray = (
-                0.299 * color_np[:, :, 0]
-                + 0.587 * color_np[:, :, 1]
-                + 0.114 * color_np[:, :, 2]
-            ) / 255.0
-            depth_m = 0.5 + (1.0 - gray) * 2.5
-            depth_mm = (depth_m * 1000.0).astype(np.uint16)
-            depth_o3d = o3d.geometry.Image(depth_mm)
-
-        rgbd = o3d.geometry.RGBDImage.create_from_color_and_depth(
-            color=color_o3d,
-            depth=depth_o3d,
-            depth_scale=1000.0,
-            depth_trunc=5.0,
-            convert_rgb_to_intensity=False,
-        )
+def _project_frame(posed: Optional[PosedFrame]) -> Optional[FramePoints]:
+    return None if posed is None else _frame_points(*posed)
+
 
-        height, width = color_np.shape[0], color_np.shape[1]
-        fx = float(max(width, height))
-        fy = float(max(width, height))
-        cx = width / 2.0
-        cy = height / 2.0
-        intrinsics = o3d.camera.PinholeCameraIntrinsic(width, height, fx, fy, cx, cy)
+def _fuse_in_processes(
+    frames: Iterable[Optional[PosedFrame]], workers: int
+) -> o3d.geometry.PointCloud:
+    """
+    Back-project on `workers` processes: frames travel through shared memory (frame_transport).
+    If /dev/shm cannot hold the frames in flight (sized by the first frame), falls back to
+    the thread pool and counts scan_frame_backend_fallback_total.
+    """
+    def arrays(posed: Optional[PosedFrame]) -> Optional[Tuple[np.ndarray, Any, np.ndarray]]:
+        if posed is None:
+            return None
+        frame, transform = posed
+        depth = None if frame.depth is None else np.asarray(frame.depth)
+        return frame.color, depth, transform
+
+    frames = iter(frames)
+    # Skipped frames before the first real one are kept: they still count as skipped
+    head: List[Optional[PosedFrame]] = []
+    for posed in frames:
+        head.append(posed)
+        if posed is not None:
+            break
+    items = itertools.chain(head, frames)
+    with SharedFrameTransport(_project_into, workers) as transport:
+        first = arrays(head[-1]) if head else None
+        if first is not None and not transport.fits(first[0], first[1]):
+            inc("scan_frame_backend_fallback_total", reason="shm")
+            return _fuse_clouds(_map_ordered(_project_frame, items, workers))
+        return _fuse_clouds(transport.map(arrays(posed) for posed in items))
+
+
+def fuse_frames(
+    frames: Iterable[Optional[FrameData]],
+    trajectory: Sequence[Any] = (),
+    workers: Optional[int] = None,
+    backend: Optional[str] = None,
+) -> o3d.geometry.PointCloud:
+    """
+    Fuse in-memory frames into a single point cloud (voxel downsampled to the
+    ProcessingConfig.point_budget, outliers removed when ProcessingConfig.outlier_filter_enabled,
+    with normals).
+
+    Frames are pulled one at a time, so `frames` may be a generator fed by a decoder
+    thread; back-projection runs on `workers` threads or, with backend="process", worker
+    processes (defaults: ProcessingConfig.frame_workers / frame_backend), and clouds are
+    merged in frame order. A None item counts as a skipped frame. Frames without a pose use
+    the pose interpolated at their t, or pose i of the trajectory for the i-th frame.
+    """
+    times, quats, translations = trajectory_arrays(trajectory)
+    workers = _frame_workers(workers)
+    posed = (_posed_frame(item, times, quats, translations) for item in enumerate(frames))
+    if _frame_backend(backend) == "process":
+        return _fuse_in_processes(posed, workers)
+    return _fuse_clouds(_map_ordered(_project_frame, posed, workers))
 
-        frame_cloud = o3d.geometry.PointCloud.create_from_rgbd_image(rgbd, intrinsics)
-        pose = trajectory[idx] if idx < len(trajectory) else {}
-        frame_cloud.transform(_frame_transform(pose))
-        merged += frame_cloud
 
+def _to_vector3d(
+    parts: List[np.ndarray], divisor: Optional[float] = None
+) -> o3d.utility.Vector3dVector:
+    """Concatenate (n, 3) arrays into an Open3D vector, emptying `parts` along the way."""
+    import open3d as o3d
+
+    merged = np.concatenate(parts)
+    parts.clear()
+    if divisor is not None:
+        merged = merged / divisor
+    return o3d.utility.Vector3dVector(merged)
+
+
+# Frames per merge chunk. Fixed rather than 2 * workers, so the cloud does not depend on
+# the worker count; 8 matches 2 * the default pool of up to 4 threads
+_MERGE_CHUNK_FRAMES = 8
+
+
+def _points_cloud(
+    points: List[np.ndarray], colors: List[np.ndarray]
+) -> o3d.geometry.PointCloud:
+    """Open3D cloud of per-frame points and uint8 colors, emptying both lists."""
+    import open3d as o3d
+
+    cloud = o3d.geometry.PointCloud()
+    # Each step drops its input before the next copy: peak is two copies of the cloud
+    cloud.points = _to_vector3d(points)
+    # Colors stay uint8 until here: 8x less to hold and copy per frame
+    cloud.colors = _to_vector3d(colors, divisor=255.0)
+    return cloud
+
+
+def _fuse_clouds(clouds: Iterable[Optional[FramePoints]]) -> o3d.geometry.PointCloud:
+    """
+    Merge frame clouds in order. Scans longer than _MERGE_CHUNK_FRAMES are merged chunk by
+    chunk: each chunk is voxel-downsampled at voxel_size_m as soon as it is full, so only one
+    chunk of raw frame points is held at a time instead of the whole scan.
+    """
+    import open3d as o3d
+
+    config = processing_config()
+    # The smallest voxel the budget downsample below can pick: chunks keep the detail it keeps
+    chunk_voxel_m = config.voxel_size_m
+    points: List[np.ndarray] = []
+    colors: List[np.ndarray] = []
+    chunks: List[o3d.geometry.PointCloud] = []
+    raw_points = 0
+    for cloud in clouds:
+        if cloud is None:
+            inc("scan_frames_total", result="skipped")
+            continue
+        if len(points) == _MERGE_CHUNK_FRAMES:
+            with span("load_frames.merge"):
+                chunks.append(_points_cloud(points, colors).voxel_down_sample(chunk_voxel_m))
+        points.append(cloud[0])
+        colors.append(cloud[1])
+        raw_points += len(cloud[0])
+        inc("scan_frames_total", result="processed")
+
+    merged = o3d.geometry.PointCloud()
+    if points:
+        with span("load_frames.merge"):
+            merged = _points_cloud(points, colors)
+            if chunks:
+                # The last chunk is downsampled the same way, then all chunks are joined
+                chunks.append(merged.voxel_down_sample(chunk_voxel_m))
+                merged = o3d.geometry.PointCloud()
+                merged.points = _to_vector3d([np.asarray(c.points) for c in chunks])
+                merged.colors = _to_vector3d([np.asarray(c.colors) for c in chunks])
+                chunks.clear()
+
+    observe("scan_points", raw_points, stage="before_downsample")
     if len(merged.points) == 0:
         return merged
 
-    merged = merged.voxel_down_sample(voxel_size=0.03)
+    with span("load_frames.voxel_down_sample"):
+        merged, voxel_size = downsample_to_budget(merged, config)
+    observe("scan_voxel_size_m", voxel_size, buckets=VOXEL_SIZE_BUCKETS_M)
+    observe("scan_points", len(merged.points), stage="after_downsample")
+    # Один индекс хэш-сетки на скан — для фильтра выбросов и нормалей. Ячейка растёт вместе
+    # с вокселем: иначе у точек стен при крупном вокселе не хватит соседей
+    with span("load_frames.spatial_index"):
+        index = VoxelIndex(
+            np.asarray(merged.points), max(config.outlier_cell_size_m, 2.0 * voxel_size)
+        )
+    if config.outlier_filter_enabled:
+        with span("load_frames.remove_outliers"):
+            merged, index, removed = remove_grid_outliers(
+                merged,
+                cell_size_m=index.cell_size_m,
+                min_neighbors=config.outlier_min_neighbors,
+                index=index,
+            )
+        inc("scan_outlier_points_removed_total", float(removed))
+        observe("scan_points", len(merged.points), stage="after_outlier_filter")
     if len(merged.points) > 0:
-        merged.estimate_normals()
+        with span("load_frames.estimate_normals"):
+            merged.normals = o3d.utility.Vector3dVector(index.normals(config.normals_knn))
     return merged
 
+
+def _decode_frame(
+    idx: int,
+    frame_paths: List[str],
+    depth_paths: Optional[List[str]],
+    transforms: np.ndarray,
+) -> Optional[PosedFrame]:
+    import open3d as o3d
+
+    image_path = Path(frame_paths[idx])
+    # Open3D декодирует любой объявленный размер: кадр-«бомба» в сотни мегапикселей пропускается
+    if not image_path.exists() or exceeds_pixel_limit(image_path):
+        return None
+
+    with span("load_frames.decode"):
+        color_np = np.asarray(o3d.io.read_image(str(image_path)))
+    if color_np.size == 0:
+        return None
+
+    depth_o3d: Optional[o3d.geometry.Image] = None
+    if depth_paths and idx < len(depth_paths):
+        with span("load_frames.depth"):
+            depth_o3d = _depth_image_from_path(Path(depth_paths[idx]))
+    return FrameData(color=color_np, depth=depth_o3d), transforms[idx]
+
+
+def load_frames_to_pointcloud(
+    frame_paths: List[str],
+    trajectory_json_path: str,
+    depth_paths: Optional[List[str]] = None,
+    frame_times: Optional[List[float]] = None,
+    workers: Optional[int] = None,
+    backend: Optional[str] = None,
+) -> o3d.geometry.PointCloud:
+    """
+    Build a single Open3D point cloud from a list of JPEG frames and trajectory.
+
+    Notes:
+    - If depth_paths are provided, they are used as true depth input.
+    - If no depth is provided, this function creates synthetic depth from luminance
+      as a temporary approximation.
+    - Trajectory poses are applied to each frame cloud as rigid transforms; all transforms
+      are built in one vectorized call. Frame i uses pose i unless frame_times are given,
+      in which case poses are interpolated (SLERP) at those timestamps.
+    - Each frame is decoded and back-projected as one task on `workers` threads (default
+      ProcessingConfig.frame_workers); clouds are merged in frame order, so the result does
+      not depend on the worker count. With backend="process" frames are decoded on the
+      threads and back-projected in worker processes, see _fuse_in_processes.
+    """
+    import open3d as o3d
+
+    if not frame_paths:
+        return o3d.geometry.PointCloud()
+
+    trajectory = _load_trajectory(trajectory_json_path)
+    with span("load_frames.poses"):
+        transforms = frame_transforms(trajectory, len(frame_paths), frame_times)
+    workers = _frame_workers(workers)
+    if _frame_backend(backend) == "process":
+        posed = _map_ordered(
+            lambda idx: _decode_frame(idx, frame_paths, depth_paths, transforms),
+            range(len(frame_paths)),
+            workers,
+        )
+        return _fuse_in_processes(posed, workers)
+    clouds = _map_ordered(
+        lambda idx: _project_frame(_decode_frame(idx, frame_paths, depth_paths, transforms)),
+        range(len(frame_paths)),
+        workers,
+    )
+    return _fuse_clouds(clouds)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
-from typing import List
+from typing import TYPE_CHECKING, List
 
 import numpy as np
-import open3d as o3d
+
+from app.core.instrumentation import observe, span
+
+if TYPE_CHECKING:
+    import open3d as o3d
 
 
 def _normalize_plane(plane_model: np.ndarray) -> np.ndarray:
@@ -46,6 +50,8 @@ def detect_planes(
           2) ceiling (if detected)
           3) walls (0..N)
     """
+    import open3d as o3d
+
     if not isinstance(point_cloud, o3d.geometry.PointCloud) or len(point_cloud.points) == 0:
         return []
 
@@ -56,11 +62,12 @@ def detect_planes(
         if len(remaining.points) < max(min_inliers, ransac_n):
             break
 
-        plane_model, inliers = remaining.segment_plane(
-            distance_threshold=distance_threshold,
-            ransac_n=ransac_n,
-            num_iterations=num_iterations,
-        )
+        with span("detect_planes.segment_plane"):
+            plane_model, inliers = remaining.segment_plane(
+                distance_threshold=distance_threshold,
+                ransac_n=ransac_n,
+                num_iterations=num_iterations,
+            )
 
         if len(inliers) < min_inliers:
             break
@@ -80,8 +87,10 @@ def detect_planes(
             }
         )
 
-        remaining = remaining.select_by_index(inliers, invert=True)
+        with span("detect_planes.split_inliers"):
+            remaining = remaining.select_by_index(inliers, invert=True)
 
+    observe("scan_planes_found", len(candidates))
     if not candidates:
         return []
 
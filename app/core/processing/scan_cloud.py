@@ -0,0 +1,120 @@
+"""
+ScanCloud — облако точек скана после слияния в виде NumPy-массивов, общих для всех этапов.
+
+Создаётся один раз после load_frames_to_pointcloud и передаётся в размеры, покрытие и ML:
+точки (и нормали/цвета, если есть) приводятся к точности ProcessingConfig.point_precision
+один раз, производные величины (границы, проекция XZ) считаются при первом обращении.
+Атрибут .points совместим с функциями, принимающими Open3D PointCloud «или объект с .points».
+Обратно в Open3D — to_open3d() (исходный объект, если облако построено из него).
+"""
+from __future__ import annotations
+
+from functools import cached_property
+from typing import TYPE_CHECKING, Optional, Tuple
+
+import numpy as np
+
+from app.core.processing.precision import cloud_points
+
+if TYPE_CHECKING:
+    import open3d as o3d
+
+
+class ScanCloud:
+    """Точки (n, 3) одной точности, ленивые нормали/цвета и производные величины."""
+
+    def __init__(
+        self,
+        points: np.ndarray,
+        normals: Optional[np.ndarray] = None,
+        colors: Optional[np.ndarray] = None,
+        dtype: type = np.float64,
+        source: Optional["o3d.geometry.PointCloud"] = None,
+    ) -> None:
+        self.points = np.ascontiguousarray(np.asarray(points, dtype=dtype).reshape(-1, 3))
+        self._raw_normals = normals
+        self._raw_colors = colors
+        self._source = source
+
+    def _attribute(self, values: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if values is None:
+            return None
+        array = np.asarray(values, dtype=self.dtype).reshape(-1, 3)
+        return np.ascontiguousarray(array) if len(array) == len(self) and len(self) else None
+
+    @cached_property
+    def normals(self) -> Optional[np.ndarray]:
+        """Нормали (n, 3) в точности облака; приводятся при первом обращении."""
+        return self._attribute(self._raw_normals)
+
+    @cached_property
+    def colors(self) -> Optional[np.ndarray]:
+        """Цвета (n, 3) в [0, 1]; приводятся при первом обращении."""
+        return self._attribute(self._raw_colors)
+
+    @classmethod
+    def from_open3d(cls, cloud: object, dtype: type = np.float64) -> "ScanCloud":
+        """
+        Из Open3D PointCloud (или объекта с .points): для float64 — представления без копии.
+        Нормали и цвета не копируются, пока к ним не обратились.
+        """
+        has_normals = getattr(cloud, "has_normals", lambda: False)()
+        has_colors = getattr(cloud, "has_colors", lambda: False)()
+        normals = np.asarray(cloud.normals) if has_normals else None
+        colors = np.asarray(cloud.colors) if has_colors else None
+        points = cloud_points(cloud, dtype)
+        return cls(points, normals=normals, colors=colors, dtype=dtype, source=cloud)
+
+    @classmethod
+    def wrap(cls, cloud: object, dtype: type = np.float64) -> "ScanCloud":
+        """Тот же ScanCloud, если точность совпадает; иначе — новый поверх cloud."""
+        if isinstance(cloud, cls) and cloud.dtype == np.dtype(dtype):
+            return cloud
+        if isinstance(cloud, cls):
+            return cls(
+                cloud.points,
+                cloud._raw_normals,
+                cloud._raw_colors,
+                dtype=dtype,
+                source=cloud._source,
+            )
+        return cls.from_open3d(cloud, dtype)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.points.dtype
+
+    def __len__(self) -> int:
+        return int(self.points.shape[0])
+
+    @cached_property
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(min_xyz, max_xyz) во float64; для пустого облака — нули."""
+        if len(self) == 0:
+            return np.zeros(3), np.zeros(3)
+        # По столбцам: min(axis=0) по массиву (n, 3) в разы медленнее трёх редукций по столбцу
+        columns = [self.points[:, axis] for axis in range(3)]
+        return (
+            np.array([float(c.min()) for c in columns]),
+            np.array([float(c.max()) for c in columns]),
+        )
+
+    @cached_property
+    def xz(self) -> np.ndarray:
+        """Проекция на пол: непрерывный массив (n, 2) координат x, z."""
+        return np.ascontiguousarray(self.points[:, [0, 2]])
+
+    def to_open3d(self) -> "o3d.geometry.PointCloud":
+        """Open3D PointCloud: исходный объект, если есть, иначе новый (float64)."""
+        if self._source is not None and hasattr(self._source, "points"):
+            return self._source
+        import open3d as o3d
+
+        cloud = o3d.geometry.PointCloud()
+        cloud.points = o3d.utility.Vector3dVector(self.points.astype(np.float64))
+        if self.normals is not None:
+            cloud.normals = o3d.utility.Vector3dVector(self.normals.astype(np.float64))
+        if self.colors is not None:
+            cloud.colors = o3d.utility.Vector3dVector(self.colors.astype(np.float64))
+        self._source = cloud
+        return cloud
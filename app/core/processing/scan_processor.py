@@ -1,37 +1,108 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import dataclasses
 import json
+import sys
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import IO, Any, Callable, Coroutine, Dict, List, Optional, Tuple, TypeVar
 
 import numpy as np
-
 from fastapi import UploadFile
 
-from app.core.config import settings
+from app.core.config import processing_config, settings, use_processing
+from app.core.instrumentation import IN_FLIGHT_METRIC, collect_timings, in_flight, inc, span
+from app.core.processing.frame_quality import (
+    FrameScore,
+    gray_thumbnail_from_bytes,
+    score_thumbnails,
+)
 from app.core.processing.junctions import find_junctions
-from app.core.processing.point_cloud import load_frames_to_pointcloud
+from app.core.processing.point_cloud import FrameData, fuse_frames, load_frames_to_pointcloud
+from app.core.processing.precision import resolve_point_dtype
 from app.core.processing.ransac import detect_planes
+from app.core.processing.scan_cloud import ScanCloud
+from app.core.processing.video import (
+    VideoStats,
+    background_iter,
+    iter_video_frames,
+    select_keyframes,
+    spool_upload,
+)
+from app.core.profiles import ProcessingProfile, get_processing_profiles
+from app.core.profiling import profile_request
+from app.core.result_cache import InputHasher, ResultCache, get_result_cache
 from app.ml.inference import run_scan_inference
 from app.models.schemas import (
     Artifacts,
     CoverageData,
     CoverageWebLine,
     Dimensions,
+    FramePlane,
+    FrameQuality,
     Junction,
     MissingZone,
+    ProcessingProfileSummary,
     QualityMetrics,
     Reveal,
-    FramePlane,
     ScanFinishRequest,
     ScanFinishResponse,
     ScanProcessResponse,
     TrajectoryPoint,
+    VideoSummary,
+)
+
+T = TypeVar("T")
+
+# Пул потоков CPU-части пайплайна /process и /video (один на процесс)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# scan_id запроса с X-Scan-Profile: профилируется поток пула, выполняющий его пайплайн
+_profiled_scan: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "profiled_scan", default=None
 )
 
 
+def get_scan_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    Пул потоков пайплайна сканов (создаётся один раз на процесс). Слияние кадров, RANSAC и ML
+    идут в нём, а не в event loop: /ready, /metrics и чтение загрузок других запросов
+    обслуживаются во время обработки, одновременно считается не больше max_workers сканов.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, max_workers),
+                thread_name_prefix="scan-pipeline",
+            )
+        return _executor
+
+
+def _pipeline_task(fn: Callable[..., T], *args: Any) -> T:
+    # Корневой кадр профиля запроса — этот кадр в потоке пула
+    with in_flight(IN_FLIGHT_METRIC, kind="scan_pipeline"):
+        scan_id = _profiled_scan.get()
+        if scan_id is None:
+            return fn(*args)
+        with profile_request(scan_id, root_frame=sys._getframe()):
+            return fn(*args)
+
+
+async def _offload(fn: Callable[..., T], *args: Any) -> T:
+    """fn(*args) в пуле get_scan_executor с контекстом запроса (разбивка, профиль обработки)."""
+    executor = get_scan_executor(settings.executors.scan_workers)
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, context.run, _pipeline_task, fn, *args
+    )
+
+
 class ScanProcessor:
     """
     Заглушка под будущую интеграцию Open3D/ML.
@@ -40,14 +111,56 @@ class ScanProcessor:
     - реконструкция/поиск плоскостей;
     - вычисление junctions и dimensions.
     """
-    def __init__(self) -> None:
+    def __init__(self, cache: Optional[ResultCache] = None) -> None:
         self._sessions: Dict[str, ScanProcessResponse] = {}
+        self._cache = cache if cache is not None else get_result_cache()
+
+    @staticmethod
+    def _input_key(
+        frame_items: List[Tuple[str, bytes]],
+        depth_items: List[Tuple[str, bytes]],
+        trajectory_payload: List[dict],
+    ) -> str:
+        """
+        Ключ кэша: байты кадров и depth (с расширением — от него зависит декодер), траектория,
+        конфигурация.
+        """
+        hasher = InputHasher("process")
+        for ext, data in frame_items:
+            hasher.update_bytes(f"frame{ext.lower()}", data)
+        for ext, data in depth_items:
+            hasher.update_bytes(f"depth{ext.lower()}", data)
+        hasher.update_json("trajectory", trajectory_payload)
+        hasher.update_config(processing_config())
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _from_cache(cached: str, scan_id: str, started_at: float) -> ScanProcessResponse:
+        """Ответ из кэша: scan_id текущего запроса, cache_hit и фактическое время ответа."""
+        response = ScanProcessResponse.model_validate_json(cached)
+        quality = response.quality_metrics.model_copy(update={
+            "cache_hit": True,
+            "processing_time_ms": int((time.perf_counter() - started_at) * 1000),
+        })
+        return response.model_copy(update={"scan_id": scan_id, "quality_metrics": quality})
+
+    @staticmethod
+    def _score_frames(frame_items: List[Tuple[str, bytes]]) -> List[FrameScore]:
+        """
+        Оценка кадров батча по миниатюрам 1/frame_quality_scale
+        (JPEG — без полного декодирования).
+        """
+        config = processing_config()
+        scale = config.frame_quality_scale
+        thumbnails = [gray_thumbnail_from_bytes(data, scale) for _, data in frame_items]
+        return score_thumbnails(thumbnails, config)
 
     @staticmethod
     def _build_coverage_from_trajectory(
         point_cloud: object,
         trajectory: Optional[List[TrajectoryPoint]],
         frames_count: int,
+        dtype: type = np.float64,
     ) -> CoverageData:
         web_lines: List[CoverageWebLine] = []
         if trajectory and len(trajectory) > 1:
@@ -64,7 +177,8 @@ class ScanProcessor:
 
         missing_zones, cloud_coverage = ScanProcessor._compute_missing_zones(
             point_cloud,
-            cell_size_m=settings.processing.occupancy_cell_size_m,
+            cell_size_m=processing_config().occupancy_cell_size_m,
+            dtype=dtype,
         )
         # Blend point-cloud coverage with frame progress so early scans are not 0%.
         percentage = 0.7 * cloud_coverage + 0.3 * min(100.0, 10.0 + frames_count * 2.5)
@@ -78,13 +192,11 @@ class ScanProcessor:
     def _compute_dimensions(
         point_cloud: object,
         ceiling_height_fraction: float = 0.55,
+        dtype: type = np.float64,
     ) -> Dimensions:
-        try:
-            points = np.asarray(point_cloud.points)
-        except Exception:
-            points = np.empty((0, 3))
+        cloud = ScanCloud.wrap(point_cloud, dtype)
 
-        if points.size == 0:
+        if len(cloud) == 0:
             return Dimensions(
                 length_m=0.0,
                 width_m=0.0,
@@ -96,18 +208,17 @@ class ScanProcessor:
                 diagonal_m=None,
             )
 
-        min_xyz = points.min(axis=0)
-        max_xyz = points.max(axis=0)
+        min_xyz, max_xyz = cloud.bounds
         extent = np.maximum(max_xyz - min_xyz, 0.0)
         height = float(extent[1])
 
         # Длина и ширина — по верхней части (потолок), чтобы не учитывать фоновый шум на полу
         y_min, y_max = float(min_xyz[1]), float(max_xyz[1])
         threshold = y_min + (y_max - y_min) * ceiling_height_fraction
-        upper = points[points[:, 1] >= threshold]
+        upper = cloud.xz[cloud.points[:, 1] >= threshold]
         if upper.size > 0:
-            min_xz = upper[:, [0, 2]].min(axis=0)
-            max_xz = upper[:, [0, 2]].max(axis=0)
+            min_xz = upper.min(axis=0)
+            max_xz = upper.max(axis=0)
             dim_x = float(np.maximum(max_xz[0] - min_xz[0], 0.0))
             dim_z = float(np.maximum(max_xz[1] - min_xz[1], 0.0))
         else:
@@ -137,24 +248,23 @@ class ScanProcessor:
     def _compute_missing_zones(
         point_cloud: object,
         cell_size_m: float,
+        dtype: type = np.float64,
     ) -> Tuple[List[MissingZone], float]:
         """
         Build a simple occupancy grid on XZ plane and return:
         - missing zones as coarse rectangular polygons
         - coverage percentage
         """
-        try:
-            points = np.asarray(point_cloud.points, dtype=np.float64)
-        except Exception:
-            points = np.empty((0, 3), dtype=np.float64)
+        cloud = ScanCloud.wrap(point_cloud, dtype)
 
-        if points.size == 0:
+        if len(cloud) == 0:
             return [], 0.0
 
-        x = points[:, 0]
-        z = points[:, 2]
-        min_x, max_x = float(x.min()), float(x.max())
-        min_z, max_z = float(z.min()), float(z.max())
+        x = cloud.xz[:, 0]
+        z = cloud.xz[:, 1]
+        min_xyz, max_xyz = cloud.bounds
+        min_x, max_x = float(min_xyz[0]), float(max_xyz[0])
+        min_z, max_z = float(min_xyz[2]), float(max_xyz[2])
 
         span_x = max_x - min_x
         span_z = max_z - min_z
@@ -196,7 +306,7 @@ class ScanProcessor:
                             stack.append((nxn, nzn))
 
                 # Ignore tiny holes.
-                if len(cells) < settings.processing.tiny_hole_cells_threshold:
+                if len(cells) < processing_config().tiny_hole_cells_threshold:
                     continue
 
                 xs = [c[0] for c in cells]
@@ -222,7 +332,7 @@ class ScanProcessor:
             return abs((bx - ax) * (dz - az))
 
         missing_zones.sort(key=zone_area, reverse=True)
-        missing_zones = missing_zones[: settings.processing.max_missing_zones]
+        missing_zones = missing_zones[: processing_config().max_missing_zones]
 
         return missing_zones, float(np.clip(coverage_percent, 0.0, 100.0))
 
@@ -234,50 +344,315 @@ class ScanProcessor:
         frames: List[UploadFile],
         trajectory: Optional[List[TrajectoryPoint]] = None,
         depth: Optional[List[UploadFile]] = None,
+        include_timings: bool = False,
+        profile: bool = False,
+        processing_profile: Optional[ProcessingProfile] = None,
+    ) -> ScanProcessResponse:
+        """
+        Обработка батча кадров. Каждый этап замеряется спаном (instrumentation.span):
+        гистограммы — в /metrics, разбивка по этапам — в quality_metrics.timings_ms
+        при include_timings. profile — сэмплирующий профиль пайплайна этого запроса
+        сохраняется под scan_id (app.core.profiling). processing_profile — параметры
+        обработки (app.core.profiles); None — профиль проекта или по умолчанию.
+        """
+        pipeline = self._process_scan(project_id, room_id, scan_id, frames, trajectory, depth)
+        if processing_profile is None:
+            processing_profile = get_processing_profiles().resolve(project_id=project_id)
+        return await self._run_pipeline(
+            pipeline, scan_id, include_timings, profile, processing_profile
+        )
+
+    async def process_video(
+        self,
+        project_id: str,
+        room_id: str,
+        scan_id: str,
+        video: UploadFile,
+        trajectory: Optional[List[TrajectoryPoint]] = None,
+        include_timings: bool = False,
+        profile: bool = False,
+        processing_profile: Optional[ProcessingProfile] = None,
+    ) -> ScanProcessResponse:
+        """
+        Скан из видео: ключевые кадры декодируются в фоновом потоке (app.core.processing.video)
+        и сливаются в облако точек прямо из памяти; дальше — тот же конвейер, что у process_scan.
+        Позы кадров интерполируются по t траектории (секунды от начала видео).
+        """
+        pipeline = self._process_video(project_id, room_id, scan_id, video, trajectory)
+        if processing_profile is None:
+            processing_profile = get_processing_profiles().resolve(project_id=project_id)
+        return await self._run_pipeline(
+            pipeline, scan_id, include_timings, profile, processing_profile
+        )
+
+    async def _run_pipeline(
+        self,
+        pipeline: Coroutine[Any, Any, ScanProcessResponse],
+        scan_id: str,
+        include_timings: bool,
+        profile: bool,
+        processing_profile: ProcessingProfile,
+    ) -> ScanProcessResponse:
+        profiled = _profiled_scan.set(scan_id if profile else None)
+        try:
+            with (
+                in_flight(IN_FLIGHT_METRIC, kind="process"),
+                use_processing(processing_profile.processing),
+                collect_timings() as timings,
+                span("process_scan"),
+            ):
+                response = await pipeline
+        finally:
+            _profiled_scan.reset(profiled)
+        cache_hit = response.quality_metrics.cache_hit
+        cache = "off" if cache_hit is None else ("hit" if cache_hit else "miss")
+        inc("scan_requests_total", cache=cache)
+        response = self._with_profile(response, processing_profile)
+        if scan_id in self._sessions:
+            # /finish отвечает сохранённым результатом — с тем же профилем
+            self._sessions[scan_id] = response
+        if not include_timings:
+            return response
+        quality = response.quality_metrics.model_copy(
+            update={"timings_ms": {stage: round(ms, 3) for stage, ms in timings.items()}}
+        )
+        return response.model_copy(update={"quality_metrics": quality})
+
+    @staticmethod
+    def _with_profile(
+        response: ScanProcessResponse, profile: ProcessingProfile
+    ) -> ScanProcessResponse:
+        """Профиль в ответе (и для кэшированного): имя, бюджет и уложился ли запрос в него."""
+        elapsed_ms = response.quality_metrics.processing_time_ms
+        within_budget = None if elapsed_ms is None else elapsed_ms <= profile.latency_budget_ms
+        if within_budget is False:
+            inc("scan_latency_budget_exceeded_total", profile=profile.name)
+        return response.model_copy(update={"processing_profile": ProcessingProfileSummary(
+            name=profile.name,
+            latency_budget_ms=profile.latency_budget_ms,
+            within_budget=within_budget,
+        )})
+
+    async def _process_scan(
+        self,
+        project_id: str,
+        room_id: str,
+        scan_id: str,
+        frames: List[UploadFile],
+        trajectory: Optional[List[TrajectoryPoint]],
+        depth: Optional[List[UploadFile]],
     ) -> ScanProcessResponse:
-        _ = (project_id, room_id, depth)
+        _ = (project_id, room_id)
         started_at = time.perf_counter()
 
+        with span("read_uploads"):
+            frame_items = [
+                (Path(f.filename or "").suffix or ".jpg", await f.read()) for f in frames
+            ]
+            depth_items = [
+                (Path(d.filename or "").suffix or ".png", await d.read()) for d in (depth or [])
+            ]
+        return await _offload(
+            self._scan_frames, scan_id, frame_items, depth_items, trajectory, started_at
+        )
+
+    def _scan_frames(
+        self,
+        scan_id: str,
+        frame_items: List[Tuple[str, bytes]],
+        depth_items: List[Tuple[str, bytes]],
+        trajectory: Optional[List[TrajectoryPoint]],
+        started_at: float,
+    ) -> ScanProcessResponse:
+        """Пайплайн /process по прочитанным байтам (в потоке пула get_scan_executor)."""
+        trajectory_payload = [tp.model_dump() for tp in (trajectory or [])]
+        cache_key: Optional[str] = None
+        if self._cache is not None:
+            with span("cache_lookup"):
+                cache_key = self._input_key(frame_items, depth_items, trajectory_payload)
+                cached = self._cache.get("process", cache_key)
+            if cached is not None:
+                response = self._from_cache(cached, scan_id, started_at)
+                self._sessions[scan_id] = response
+                return response
+
+        scores: List[FrameScore] = []
+        kept = list(range(len(frame_items)))
+        if processing_config().frame_quality_enabled and frame_items:
+            with span("frame_quality"):
+                scores = self._score_frames(frame_items)
+            kept = [score.index for score in scores if score.accepted]
+            inc("scan_frames_total", float(len(frame_items) - len(kept)), result="rejected")
+
         frame_paths: List[str] = []
         depth_paths: List[str] = []
         with tempfile.TemporaryDirectory(prefix="scan_processor_") as tmpdir:
             tmp = Path(tmpdir)
-            for idx, frame in enumerate(frames):
-                ext = Path(frame.filename or "").suffix or ".jpg"
-                frame_path = tmp / f"frame_{idx:04d}{ext}"
-                frame_bytes = await frame.read()
-                frame_path.write_bytes(frame_bytes)
-                frame_paths.append(str(frame_path))
-
-            for idx, depth_item in enumerate(depth or []):
-                depth_ext = Path(depth_item.filename or "").suffix or ".png"
-                depth_path = tmp / f"depth_{idx:04d}{depth_ext}"
-                depth_bytes = await depth_item.read()
-                depth_path.write_bytes(depth_bytes)
-                depth_paths.append(str(depth_path))
-
-            trajectory_path = tmp / "trajectory.json"
-            trajectory_payload = [tp.model_dump() for tp in (trajectory or [])]
-            trajectory_path.write_text(
-                json.dumps(trajectory_payload, ensure_ascii=False),
-                encoding="utf-8",
-            )
+            with span("write_temp"):
+                # Отброшенные кадры не пишутся и не декодируются;
+                # depth и позы берутся по исходному индексу
+                for idx in kept:
+                    ext, frame_bytes = frame_items[idx]
+                    frame_path = tmp / f"frame_{idx:04d}{ext}"
+                    frame_path.write_bytes(frame_bytes)
+                    frame_paths.append(str(frame_path))
+
+                for idx in kept:
+                    if idx >= len(depth_items):
+                        break
+                    depth_ext, depth_bytes = depth_items[idx]
+                    depth_path = tmp / f"depth_{idx:04d}{depth_ext}"
+                    depth_path.write_bytes(depth_bytes)
+                    depth_paths.append(str(depth_path))
+
+                trajectory_path = tmp / "trajectory.json"
+                kept_poses = [
+                    trajectory_payload[idx] if idx < len(trajectory_payload) else {}
+                    for idx in kept
+                ]
+                trajectory_path.write_text(
+                    json.dumps(kept_poses, ensure_ascii=False),
+                    encoding="utf-8",
+                )
+
+            with span("load_frames"):
+                point_cloud = load_frames_to_pointcloud(
+                    frame_paths=frame_paths,
+                    trajectory_json_path=str(trajectory_path),
+                    depth_paths=depth_paths if depth_paths else None,
+                )
+
+        response = self._analyze_point_cloud(
+            scan_id,
+            point_cloud,
+            trajectory,
+            len(frame_items),
+            started_at,
+            cache_enabled=cache_key is not None,
+        )
+        if scores:
+            quality = response.quality_metrics.model_copy(update={
+                "frames_rejected": len(frame_items) - len(kept),
+                "frame_scores": [FrameQuality(**dataclasses.asdict(score)) for score in scores],
+            })
+            response = response.model_copy(update={"quality_metrics": quality})
+        self._sessions[scan_id] = response
+        if cache_key is not None:
+            self._cache.put("process", cache_key, response.model_dump_json())
+        return response
+
+    async def _process_video(
+        self,
+        project_id: str,
+        room_id: str,
+        scan_id: str,
+        video: UploadFile,
+        trajectory: Optional[List[TrajectoryPoint]],
+    ) -> ScanProcessResponse:
+        _ = (project_id, room_id)
+        started_at = time.perf_counter()
+        suffix = Path(video.filename or "").suffix.lower() or ".mp4"
+        return await _offload(self._scan_video, scan_id, video.file, suffix, trajectory, started_at)
 
-            point_cloud = load_frames_to_pointcloud(
-                frame_paths=frame_paths,
-                trajectory_json_path=str(trajectory_path),
-                depth_paths=depth_paths if depth_paths else None,
+    def _scan_video(
+        self,
+        scan_id: str,
+        video_file: IO[bytes],
+        suffix: str,
+        trajectory: Optional[List[TrajectoryPoint]],
+        started_at: float,
+    ) -> ScanProcessResponse:
+        """Пайплайн /video (в потоке пула get_scan_executor): выгрузка видео, кадры, анализ."""
+        trajectory_payload = [tp.model_dump() for tp in (trajectory or [])]
+        stats = VideoStats()
+
+        with tempfile.TemporaryDirectory(prefix="scan_video_") as tmpdir:
+            video_path = Path(tmpdir) / f"video{suffix}"
+            with span("read_uploads"):
+                digest = spool_upload(video_file, video_path, settings.api.max_video_bytes)
+
+            cache_key: Optional[str] = None
+            if self._cache is not None:
+                with span("cache_lookup"):
+                    hasher = InputHasher("video").update_bytes("video", digest.encode("ascii"))
+                    hasher.update_json("trajectory", trajectory_payload)
+                    hasher.update_config(processing_config()).update_config(settings.video)
+                    cache_key = hasher.hexdigest()
+                    cached = self._cache.get("process", cache_key)
+                if cached is not None:
+                    response = self._from_cache(cached, scan_id, started_at)
+                    self._sessions[scan_id] = response
+                    return response
+
+            # Декодирование и выбор ключевых кадров — в фоновом потоке,
+            # слияние — здесь по мере готовности
+            keyframes = background_iter(
+                select_keyframes(
+                    iter_video_frames(video_path, stats),
+                    settings.video,
+                    stats,
+                    max_clipped_fraction=(
+                        processing_config().frame_max_clipped_fraction
+                        if processing_config().frame_quality_enabled
+                        else 1.0
+                    ),
+                ),
+                queue_size=settings.video.decode_queue_size,
             )
+            with span("load_frames"):
+                point_cloud = fuse_frames(
+                    (FrameData(color=keyframe.rgb, t=keyframe.t) for keyframe in keyframes),
+                    trajectory_payload,
+                )
+
+        response = self._analyze_point_cloud(
+            scan_id,
+            point_cloud,
+            trajectory,
+            len(stats.keyframe_times_s),
+            started_at,
+            cache_enabled=cache_key is not None,
+        )
+        response = response.model_copy(update={"video": VideoSummary(
+            fps=stats.fps,
+            duration_s=stats.duration_s,
+            frames_decoded=stats.frames_decoded,
+            frames_blurred=stats.frames_blurred,
+            frames_badly_exposed=stats.frames_badly_exposed,
+            keyframes=len(stats.keyframe_times_s),
+            keyframe_times_s=stats.keyframe_times_s,
+        )})
+        self._sessions[scan_id] = response
+        if cache_key is not None:
+            self._cache.put("process", cache_key, response.model_dump_json())
+        return response
+
+    def _analyze_point_cloud(
+        self,
+        scan_id: str,
+        point_cloud: object,
+        trajectory: Optional[List[TrajectoryPoint]],
+        frames_count: int,
+        started_at: float,
+        cache_enabled: bool,
+    ) -> ScanProcessResponse:
+        """Плоскости, стыки, размеры, покрытие, ML и метрики качества по слитому облаку точек."""
+        config = processing_config()
+        with span("detect_planes"):
             planes = detect_planes(
                 point_cloud=point_cloud,
-                distance_threshold=settings.processing.ransac_distance_threshold,
-                ransac_n=settings.processing.ransac_n,
-                num_iterations=settings.processing.ransac_iterations,
-                max_planes=settings.processing.ransac_max_planes,
-                min_inliers=settings.processing.ransac_min_inliers,
+                distance_threshold=config.ransac_distance_threshold,
+                ransac_n=config.ransac_n,
+                num_iterations=config.ransac_iterations,
+                max_planes=config.ransac_max_planes,
+                min_inliers=config.ransac_min_inliers,
             )
+        with span("junctions"):
             raw_junctions = find_junctions(planes)
 
+        # Один набор NumPy-массивов облака для размеров, покрытия и ML
+        # (без повторных преобразований)
+        cloud = ScanCloud.from_open3d(point_cloud, resolve_point_dtype(config.point_precision))
         junctions: List[Junction] = [
             Junction(
                 type=item["type"],
@@ -289,22 +664,30 @@ class ScanProcessor:
             for item in raw_junctions
         ]
 
-        dimensions = self._compute_dimensions(
-            point_cloud,
-            ceiling_height_fraction=settings.processing.ceiling_height_fraction,
-        )
-        coverage = self._build_coverage_from_trajectory(point_cloud, trajectory, len(frames))
+        with span("dimensions"):
+            dimensions = self._compute_dimensions(
+                cloud,
+                ceiling_height_fraction=config.ceiling_height_fraction,
+                dtype=cloud.dtype,
+            )
+        with span("coverage"):
+            coverage = self._build_coverage_from_trajectory(
+                cloud, trajectory, frames_count, cloud.dtype
+            )
         reveals: List[Reveal] = []
         frame_planes: List[FramePlane] = []
         try:
-            reveals, frame_planes = run_scan_inference(
-                point_cloud,
-                planes,
-                dimensions,
-                reveal_min_confidence=settings.processing.reveal_min_confidence,
-                frame_plane_min_confidence=settings.processing.frame_plane_min_confidence,
-                model_dir=settings.processing.ml_model_dir or None,
-            )
+            with span("ml_inference"):
+                reveals, frame_planes = run_scan_inference(
+                    cloud,
+                    planes,
+                    dimensions,
+                    reveal_min_confidence=config.reveal_min_confidence,
+                    frame_plane_min_confidence=config.frame_plane_min_confidence,
+                    model_dir=config.ml_model_dir or None,
+                    detect_openings=config.opening_detection_enabled,
+                    point_dtype=cloud.dtype,
+                )
         except Exception:
             pass
         frame_linear_m_total = sum(fp.linear_m for fp in frame_planes)
@@ -313,17 +696,13 @@ class ScanProcessor:
         avg_junction_conf = (
             float(np.mean([j.confidence for j in junctions])) if junctions else 0.0
         )
-        points_count = 0
-        try:
-            points_count = len(point_cloud.points)
-        except Exception:
-            points_count = 0
-        density_score = min(1.0, points_count / float(settings.processing.density_points_norm))
+        points_count = len(cloud)
+        density_score = min(1.0, points_count / float(config.density_points_norm))
 
         quality_score = (
-            settings.processing.quality_weight_coverage * (coverage.percentage / 100.0)
-            + settings.processing.quality_weight_junction_conf * avg_junction_conf
-            + settings.processing.quality_weight_density * density_score
+            config.quality_weight_coverage * (coverage.percentage / 100.0)
+            + config.quality_weight_junction_conf * avg_junction_conf
+            + config.quality_weight_density * density_score
         )
         processing_time_ms = int((time.perf_counter() - started_at) * 1000)
         quality = QualityMetrics(
@@ -333,9 +712,10 @@ class ScanProcessor:
             processing_time_ms=processing_time_ms,
             points_count=points_count,
             planes_count=len(planes),
+            cache_hit=False if cache_enabled else None,
         )
 
-        response = ScanProcessResponse(
+        return ScanProcessResponse(
             scan_id=scan_id,
             coverage=coverage,
             junctions=junctions,
@@ -345,8 +725,6 @@ class ScanProcessor:
             frame_planes=frame_planes,
             frame_linear_m_total=frame_linear_m_total,
         )
-        self._sessions[scan_id] = response
-        return response
 
     async def finish_scan(self, payload: ScanFinishRequest) -> ScanFinishResponse:
         base = self._sessions.get(payload.scan_id)
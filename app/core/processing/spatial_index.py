@@ -0,0 +1,257 @@
+"""
+Пространственный индекс облака скана — хэш-сетка вокселей без KD-дерева.
+
+Ячейка (кубическая, со стороной cell_size_m) кодируется одним int64-ключом; точки упорядочены
+по ключу, у каждой занятой ячейки — смещение первой точки и их число (CSR). Соседи ячейки —
+27 ячеек куба 3×3×3, находятся поиском по отсортированным ключам один раз на индекс.
+Индекс строится один раз после прореживания и переиспользуется этапами: счёт соседей
+(фильтр выбросов), kNN (нормали), поиск в радиусе. subset() даёт индекс подмножества точек
+без повторной сортировки.
+
+Запросы точны, пока радиус не больше cell_size_m: кандидаты — точки 27 соседних ячеек.
+kNN возвращает k ближайших среди этих кандидатов (для нормалей этого достаточно).
+"""
+from __future__ import annotations
+
+from functools import cached_property
+from itertools import product
+from typing import Dict, Iterator, Tuple
+
+import numpy as np
+
+# Биты на координату ячейки в ключе: до 2**21 ячеек по оси (при 6 см — 125 км)
+_KEY_BITS = 21
+_KEY_MASK = (1 << _KEY_BITS) - 1
+_NEIGHBOUR_OFFSETS = np.array(
+    [
+        (dx << (2 * _KEY_BITS)) + (dy << _KEY_BITS) + dz
+        for dx, dy, dz in product((-1, 0, 1), repeat=3)
+    ],
+    dtype=np.int64,
+)
+# Точек в блоке запроса: матрица кандидатов блока (block × max кандидатов) держится в памяти
+_QUERY_BLOCK = 4096
+
+
+def cell_keys(points: np.ndarray, cell_size_m: float) -> np.ndarray:
+    """int64-ключи ячеек точек (n, 3); начало сетки — минимум облака."""
+    # +1: у соседей слева координата ячейки не уходит в минус
+    cells = np.floor((points - points.min(axis=0)) / cell_size_m).astype(np.int64) + 1
+    np.clip(cells, 0, _KEY_MASK - 1, out=cells)
+    return (cells[:, 0] << (2 * _KEY_BITS)) | (cells[:, 1] << _KEY_BITS) | cells[:, 2]
+
+
+class VoxelIndex:
+    """Точки (n, 3), упорядоченные по ячейкам хэш-сетки, и запросы соседей по ней."""
+
+    def __init__(self, points: np.ndarray, cell_size_m: float) -> None:
+        self.points = np.asarray(points).reshape(-1, 3)
+        self.cell_size_m = float(cell_size_m)
+        if len(self.points) == 0:
+            self._init_sorted(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+            return
+        keys = cell_keys(self.points, self.cell_size_m)
+        order = np.argsort(keys, kind="stable")
+        self._init_sorted(keys[order], order)
+
+    def _init_sorted(self, sorted_keys: np.ndarray, order: np.ndarray) -> None:
+        n = len(order)
+        boundaries = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+        self._sorted_keys = sorted_keys
+        # order — номера точек по возрастанию ключа;
+        # ячейка i — order[starts[i]:starts[i] + counts[i]]
+        self.order = order
+        if n:
+            self.starts = np.concatenate([[0], boundaries]).astype(np.int64)
+        else:
+            self.starts = np.zeros(0, np.int64)
+        self.cells = sorted_keys[self.starts]
+        self.counts = np.diff(np.append(self.starts, n))
+        self.point_cell = np.empty(n, dtype=np.int64)
+        self.point_cell[order] = np.repeat(np.arange(len(self.cells)), self.counts)
+
+    def __len__(self) -> int:
+        return int(self.points.shape[0])
+
+    def subset(self, mask: np.ndarray) -> "VoxelIndex":
+        """Индекс точек points[mask] на той же сетке — без пересчёта ключей и сортировки."""
+        mask = np.asarray(mask, dtype=bool)
+        keep_sorted = mask[self.order]
+        renumber = np.cumsum(mask) - 1
+        index = VoxelIndex.__new__(VoxelIndex)
+        index.points = self.points[mask]
+        index.cell_size_m = self.cell_size_m
+        index._init_sorted(self._sorted_keys[keep_sorted], renumber[self.order[keep_sorted]])
+        return index
+
+    @cached_property
+    def neighbour_cells(self) -> np.ndarray:
+        """(C, 27): номера соседних занятых ячеек куба 3×3×3 (сама ячейка — тоже), -1 — пустая."""
+        # Сентинел в конце: промах поиска указывает на него
+        sorted_cells = np.append(self.cells, np.iinfo(np.int64).max)
+        neighbours = self.cells[:, None] + _NEIGHBOUR_OFFSETS[None, :]
+        pos = np.searchsorted(sorted_cells, neighbours)
+        return np.where(sorted_cells[pos] == neighbours, pos, -1)
+
+    def cube_counts(self) -> np.ndarray:
+        """Для каждой точки — число других точек в кубе 3×3×3 ячеек вокруг её ячейки."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64)
+        neighbours = self.neighbour_cells
+        counts = np.where(neighbours >= 0, self.counts[neighbours], 0).sum(axis=1)
+        return counts[self.point_cell] - 1
+
+    @cached_property
+    def _candidates(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Кандидаты-соседи каждой ячейки подряд: (смещения, длины, номера точек)."""
+        neighbours = self.neighbour_cells
+        pair_counts = np.where(neighbours >= 0, self.counts[neighbours], 0).ravel()
+        pair_starts = np.where(neighbours >= 0, self.starts[neighbours], 0).ravel()
+        lengths = pair_counts.reshape(len(self.cells), len(_NEIGHBOUR_OFFSETS)).sum(axis=1)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        # Позиции в order: для пары (ячейка, сосед) — starts[сосед] + 0..count-1
+        pair_offsets = np.cumsum(pair_counts) - pair_counts
+        positions = np.repeat(pair_starts - pair_offsets, pair_counts)
+        positions += np.arange(pair_counts.sum())
+        return offsets, lengths, self.order[positions]
+
+    @cached_property
+    def _columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Выборка по непрерывному столбцу быстрее, чем строк (b, m, 3) из массива (n, 3)
+        return tuple(
+            np.ascontiguousarray(self.points[:, axis], dtype=np.float64) for axis in range(3)
+        )
+
+    def _candidate_blocks(
+        self,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, Tuple[np.ndarray, ...], np.ndarray]]:
+        """
+        Блоки запросов по всем точкам: номера точек (b,), кандидаты (b, m), смещения кандидатов
+        от точки по осям (3 × (b, m)) и квадраты расстояний (b, m); несуществующий кандидат —
+        номер -1, нулевое смещение и расстояние inf.
+        """
+        offsets, lengths, flat = self._candidates
+        # Точки по числу кандидатов: в блоке строки почти одной длины, мало пустых столбцов
+        point_lengths = lengths[self.point_cell]
+        query_order = np.argsort(point_lengths, kind="stable")
+        for begin in range(0, len(self), _QUERY_BLOCK):
+            ids = query_order[begin:begin + _QUERY_BLOCK]
+            cells = self.point_cell[ids]
+            width = int(point_lengths[ids[-1]])
+            column = np.arange(width)
+            valid = column[None, :] < lengths[cells][:, None]
+            slots = np.minimum(offsets[cells][:, None] + column[None, :], len(flat) - 1)
+            candidates = np.where(valid, flat[slots], -1)
+            diff = tuple(
+                np.where(valid, values[candidates] - values[ids][:, None], 0.0)
+                for values in self._columns
+            )
+            dist2 = diff[0] * diff[0] + diff[1] * diff[1] + diff[2] * diff[2]
+            dist2[~valid] = np.inf
+            yield ids, candidates, diff, dist2
+
+    def radius_counts(self, radius_m: float) -> np.ndarray:
+        """
+        Для каждой точки — число других точек на расстоянии не больше radius_m
+        (<= cell_size_m).
+        """
+        if radius_m > self.cell_size_m:
+            raise ValueError("radius_m must not exceed cell_size_m")
+        result = np.zeros(len(self), dtype=np.int64)
+        for ids, _, _, dist2 in self._candidate_blocks():
+            result[ids] = np.count_nonzero(dist2 <= radius_m * radius_m, axis=1) - 1
+        return result
+
+    @staticmethod
+    def _nearest(dist2: np.ndarray, k: int) -> np.ndarray:
+        """Столбцы k ближайших кандидатов в каждой строке (b, min(k, m)), без упорядочивания."""
+        if dist2.shape[1] <= k:
+            return np.broadcast_to(np.arange(dist2.shape[1]), dist2.shape)
+        return np.argpartition(dist2, k - 1, axis=1)[:, :k]
+
+    def knn(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (n, k) номеров k ближайших точек (включая саму точку) по возрастанию расстояния и (n, k)
+        расстояний; если кандидатов меньше k — номер -1 и расстояние inf.
+        """
+        indices = np.full((len(self), k), -1, dtype=np.int64)
+        distances = np.full((len(self), k), np.inf)
+        for ids, candidates, _, dist2 in self._candidate_blocks():
+            nearest = self._nearest(dist2, k)
+            d2 = np.take_along_axis(dist2, nearest, axis=1)
+            order = np.argsort(d2, axis=1)
+            width = nearest.shape[1]
+            indices[ids, :width] = np.take_along_axis(
+                np.take_along_axis(candidates, nearest, axis=1), order, axis=1
+            )
+            distances[ids, :width] = np.sqrt(np.take_along_axis(d2, order, axis=1))
+        indices[~np.isfinite(distances)] = -1
+        return indices, distances
+
+    def normals(self, k: int = 30) -> np.ndarray:
+        """
+        Нормали (n, 3) по PCA k ближайших точек: собственный вектор наименьшего собственного
+        значения ковариации. При менее чем 3 соседях — (0, 0, 1).
+        """
+        normals = np.tile(np.array([0.0, 0.0, 1.0]), (len(self), 1))
+        for ids, _, diff, dist2 in self._candidate_blocks():
+            nearest = self._nearest(dist2, k)
+            count = np.isfinite(np.take_along_axis(dist2, nearest, axis=1)).sum(axis=1)
+            # Смещения от самой точки (у несуществующих — нули): ковариация по моментам без
+            # потери точности на больших координатах
+            d = [np.take_along_axis(component, nearest, axis=1) for component in diff]
+            c = np.maximum(count, 1).astype(np.float64)
+            mean = [component.sum(axis=1) / c for component in d]
+            cov = {
+                (i, j): (d[i] * d[j]).sum(axis=1) / c - mean[i] * mean[j]
+                for i in range(3) for j in range(i, 3)
+            }
+            ok = count >= 3
+            normals[ids[ok]] = _smallest_eigenvectors(cov)[ok]
+        return normals
+
+
+def _smallest_eigenvectors(cov: Dict[Tuple[int, int], np.ndarray]) -> np.ndarray:
+    """
+    Единичные собственные векторы наименьшего собственного значения симметричных матриц 3×3,
+    заданных компонентами cov[(i, j)], i <= j (массивы (b,)). Собственное значение — по
+    тригонометрической формуле, вектор — наибольшее векторное произведение строк A - λI;
+    если собственное значение кратное (линия, изотропное облако) — np.linalg.eigh.
+    """
+    a00, a01, a02 = cov[(0, 0)], cov[(0, 1)], cov[(0, 2)]
+    a11, a12, a22 = cov[(1, 1)], cov[(1, 2)], cov[(2, 2)]
+    q = (a00 + a11 + a22) / 3.0
+    b00, b11, b22 = a00 - q, a11 - q, a22 - q
+    off = a01 * a01 + a02 * a02 + a12 * a12
+    p = np.sqrt((b00 * b00 + b11 * b11 + b22 * b22 + 2.0 * off) / 6.0)
+    safe_p = np.where(p > 0, p, 1.0)
+    det = (
+        b00 * (b11 * b22 - a12 * a12)
+        - a01 * (a01 * b22 - a12 * a02)
+        + a02 * (a01 * a12 - b11 * a02)
+    )
+    r = np.clip(det / (2.0 * safe_p ** 3), -1.0, 1.0)
+    smallest = q + 2.0 * p * np.cos(np.arccos(r) / 3.0 + 2.0 * np.pi / 3.0)
+
+    rows = (
+        np.stack([a00 - smallest, a01, a02], axis=1),
+        np.stack([a01, a11 - smallest, a12], axis=1),
+        np.stack([a02, a12, a22 - smallest], axis=1),
+    )
+    crosses = np.stack([
+        np.cross(rows[0], rows[1]), np.cross(rows[0], rows[2]), np.cross(rows[1], rows[2]),
+    ], axis=1)
+    lengths = np.einsum("bck,bck->bc", crosses, crosses)
+    best = lengths.argmax(axis=1)
+    picked = crosses[np.arange(len(best)), best]
+    length = np.sqrt(lengths[np.arange(len(best)), best])
+
+    # Кратное наименьшее значение: строки A - λI почти параллельны, произведения ~0
+    scale = np.maximum(np.abs(np.stack(rows, axis=1)).max(axis=(1, 2)), np.finfo(np.float64).tiny)
+    degenerate = length <= 1e-6 * scale * scale
+    vectors = picked / np.where(degenerate, 1.0, length)[:, None]
+    if degenerate.any():
+        matrices = np.stack([rows[0], rows[1], rows[2]], axis=1)[degenerate]
+        matrices += smallest[degenerate][:, None, None] * np.eye(3)
+        vectors[degenerate] = np.linalg.eigh(matrices)[1][:, :, 0]
+    return vectors
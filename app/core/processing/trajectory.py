@@ -0,0 +1,176 @@
+"""
+Траектория камеры в виде массивов: позы всех кадров одним векторизованным вызовом.
+
+Список поз ({"t", "position", "rotation"} или TrajectoryPoint) один раз переводится в массивы
+t (N,), кватернионы (N, 4) [qx, qy, qz, qw] и переносы (N, 3); матрицы (N, 4, 4) строятся
+без цикла по позам. Для кадров, чьи времена лежат между позами (видео с частотой кадров
+выше частоты трекинга), поза интерполируется: перенос — линейно, поворот — SLERP.
+
+Некорректные позы ведут себя как в исходном покадровом коде: позиция не из 3 чисел — ноль,
+поворот не из 4 чисел или нулевой — единичный.
+"""
+from __future__ import annotations
+
+from typing import Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+_IDENTITY_QUATERNION = np.array([0.0, 0.0, 0.0, 1.0])
+# Ниже этого угла между кватернионами SLERP вырождается — берём нормированный lerp
+_SLERP_LINEAR_THRESHOLD = 1e-6
+
+
+def _field(pose: Any, name: str) -> Any:
+    if isinstance(pose, dict):
+        return pose.get(name)
+    return getattr(pose, name, None)
+
+
+def _vector(value: Any, size: int) -> Optional[Tuple[float, ...]]:
+    if not isinstance(value, (list, tuple)) or len(value) != size:
+        return None
+    try:
+        return tuple(float(v) for v in value)
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_quaternions(quaternions: np.ndarray) -> np.ndarray:
+    """Нормировать кватернионы (N, 4); нулевые и нечисловые заменяются единичным."""
+    quats = np.asarray(quaternions, dtype=np.float64).reshape(-1, 4)
+    norms = np.linalg.norm(quats, axis=1)
+    valid = np.isfinite(norms) & (norms > 0)
+    out = np.tile(_IDENTITY_QUATERNION, (len(quats), 1))
+    out[valid] = quats[valid] / norms[valid, None]
+    return out
+
+
+def trajectory_arrays(poses: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Позы → (t (N,), кватернионы (N, 4), переносы (N, 3)), кватернионы нормированы.
+    Поза без t получает свой индекс.
+    """
+    count = len(poses)
+    times = np.arange(count, dtype=np.float64)
+    quats = np.tile(_IDENTITY_QUATERNION, (count, 1))
+    translations = np.zeros((count, 3), dtype=np.float64)
+    for i, pose in enumerate(poses):
+        t = _field(pose, "t")
+        if isinstance(t, (int, float)) and not isinstance(t, bool):
+            times[i] = float(t)
+        position = _vector(_field(pose, "position"), 3)
+        if position is not None:
+            translations[i] = position
+        rotation = _vector(_field(pose, "rotation") or list(_IDENTITY_QUATERNION), 4)
+        quats[i] = rotation if rotation is not None else (0.0, 0.0, 0.0, 0.0)
+    return times, normalize_quaternions(quats), translations
+
+
+def quaternions_to_matrices(quaternions: np.ndarray) -> np.ndarray:
+    """Кватернионы (N, 4) [qx, qy, qz, qw] → матрицы поворота (N, 3, 3)."""
+    q = normalize_quaternions(quaternions)
+    qx, qy, qz, qw = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    xx, yy, zz = qx * qx, qy * qy, qz * qz
+    xy, xz, yz = qx * qy, qx * qz, qy * qz
+    wx, wy, wz = qw * qx, qw * qy, qw * qz
+
+    rot = np.empty((len(q), 3, 3), dtype=np.float64)
+    rot[:, 0, 0] = 1 - 2 * (yy + zz)
+    rot[:, 0, 1] = 2 * (xy - wz)
+    rot[:, 0, 2] = 2 * (xz + wy)
+    rot[:, 1, 0] = 2 * (xy + wz)
+    rot[:, 1, 1] = 1 - 2 * (xx + zz)
+    rot[:, 1, 2] = 2 * (yz - wx)
+    rot[:, 2, 0] = 2 * (xz - wy)
+    rot[:, 2, 1] = 2 * (yz + wx)
+    rot[:, 2, 2] = 1 - 2 * (xx + yy)
+    return rot
+
+
+def pose_matrices(quaternions: np.ndarray, translations: np.ndarray) -> np.ndarray:
+    """Кватернионы (N, 4) и переносы (N, 3) → однородные преобразования (N, 4, 4)."""
+    rot = quaternions_to_matrices(quaternions)
+    transforms = np.zeros((len(rot), 4, 4), dtype=np.float64)
+    transforms[:, :3, :3] = rot
+    transforms[:, :3, 3] = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+    transforms[:, 3, 3] = 1.0
+    return transforms
+
+
+def slerp(q0: np.ndarray, q1: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """
+    Сферическая интерполяция нормированных кватернионов (N, 4) с долями alpha (N,).
+    Идёт по кратчайшей дуге (q и -q — один поворот).
+    """
+    q0 = np.asarray(q0, dtype=np.float64).reshape(-1, 4)
+    q1 = np.asarray(q1, dtype=np.float64).reshape(-1, 4)
+    alpha = np.asarray(alpha, dtype=np.float64).reshape(-1, 1)
+
+    dot = np.einsum("ij,ij->i", q0, q1)
+    q1 = np.where(dot[:, None] < 0, -q1, q1)
+    dot = np.clip(np.abs(dot), 0.0, 1.0)
+
+    theta = np.arccos(dot)[:, None]
+    sin_theta = np.sin(theta)
+    linear = sin_theta[:, 0] < _SLERP_LINEAR_THRESHOLD
+    safe_sin = np.where(linear[:, None], 1.0, sin_theta)
+    w0 = np.where(linear[:, None], 1.0 - alpha, np.sin((1.0 - alpha) * theta) / safe_sin)
+    w1 = np.where(linear[:, None], alpha, np.sin(alpha * theta) / safe_sin)
+    return normalize_quaternions(w0 * q0 + w1 * q1)
+
+
+def interpolate_poses(
+    times: np.ndarray,
+    quaternions: np.ndarray,
+    translations: np.ndarray,
+    query_times: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Позы в моменты query_times (M,): перенос — линейно, поворот — SLERP между соседними позами.
+    За пределами траектории — крайняя поза. Позы сортируются по t (устойчиво).
+    """
+    query = np.asarray(query_times, dtype=np.float64).reshape(-1)
+    if len(times) == 0:
+        return np.tile(_IDENTITY_QUATERNION, (len(query), 1)), np.zeros((len(query), 3))
+
+    order = np.argsort(times, kind="stable")
+    times = np.asarray(times, dtype=np.float64)[order]
+    quats = np.asarray(quaternions, dtype=np.float64)[order]
+    trans = np.asarray(translations, dtype=np.float64)[order]
+    if len(times) == 1:
+        return np.repeat(quats, len(query), axis=0), np.repeat(trans, len(query), axis=0)
+
+    left = np.clip(np.searchsorted(times, query, side="right") - 1, 0, len(times) - 2)
+    right = left + 1
+    span = times[right] - times[left]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = np.where(span > 0, (query - times[left]) / span, 0.0)
+    alpha = np.clip(alpha, 0.0, 1.0)
+
+    out_trans = trans[left] + alpha[:, None] * (trans[right] - trans[left])
+    out_quats = slerp(quats[left], quats[right], alpha)
+    return out_quats, out_trans
+
+
+def frame_transforms(
+    poses: Sequence[Any],
+    frame_count: int,
+    frame_times: Optional[Sequence[float]] = None,
+) -> np.ndarray:
+    """
+    Преобразования камера → мир для frame_count кадров, (frame_count, 4, 4).
+
+    Без frame_times кадр i берёт позу i (как раньше; кадрам без позы — единичная матрица).
+    С frame_times поза каждого кадра интерполируется по t траектории.
+    """
+    times, quats, translations = trajectory_arrays(poses)
+    if frame_times is not None:
+        targets = np.asarray(frame_times)[:frame_count]
+        quats, translations = interpolate_poses(times, quats, translations, targets)
+        transforms = pose_matrices(quats, translations)
+    else:
+        transforms = pose_matrices(quats[:frame_count], translations[:frame_count])
+    if len(transforms) < frame_count:
+        pad = np.tile(np.eye(4), (frame_count - len(transforms), 1, 1))
+        transforms = np.concatenate([transforms, pad])
+    return transforms
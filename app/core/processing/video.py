@@ -0,0 +1,243 @@
+"""
+Видео скана (MP4) → ключевые кадры в памяти для слияния в облако точек.
+
+Декодирование (OpenCV, опциональная зависимость) и выбор ключевых кадров идут в фоновом
+потоке; поток пайплайна получает кадры через ограниченную очередь (background_iter)
+и сразу сливает их (point_cloud.fuse_frames) — промежуточные JPEG не пишутся, а в памяти
+одновременно не больше decode_queue_size кадров.
+
+Ключевой кадр выбирается по уменьшенной копии (длинная сторона analysis_max_side_px):
+резкость — дисперсия лапласиана, движение — среднее изменение яркости относительно
+прошлого ключевого кадра. Кадр берётся, если он достаточно резкий, не тёмный и не пересвеченный
+(frame_quality.clipped_fractions) и камера сдвинулась (или с прошлого ключевого кадра прошло
+max_interval_s).
+"""
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import queue
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from app.core.config import VideoConfig
+from app.core.processing.frame_quality import clipped_fractions, downscale_gray, laplacian_variance
+from app.core.profiling import run_sampled
+
+T = TypeVar("T")
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v")
+_COPY_CHUNK_BYTES = 1024 * 1024
+
+
+class VideoBackendUnavailable(RuntimeError):
+    """OpenCV не установлен: декодировать видео нечем."""
+
+
+class VideoDecodeError(ValueError):
+    """Файл не открывается как видео."""
+
+
+class VideoTooLargeError(ValueError):
+    """Загрузка превышает ApiLimits.max_video_bytes."""
+
+
+@dataclass
+class VideoKeyframe:
+    index: int
+    t: float
+    rgb: np.ndarray
+    sharpness: float
+    motion: float
+
+
+@dataclass
+class VideoStats:
+    """Сводка декодирования; заполняется потоком декодирования, читается после него."""
+    fps: float = 0.0
+    frames_decoded: int = 0
+    duration_s: float = 0.0
+    frames_blurred: int = 0
+    frames_badly_exposed: int = 0
+    keyframe_times_s: List[float] = field(default_factory=list)
+
+
+def spool_upload(source: BinaryIO, target: Path, max_bytes: int) -> str:
+    """
+    Скопировать загрузку в target блоками (без чтения целиком в память); вернуть blake2b-хэш.
+    Превышение max_bytes — VideoTooLargeError.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    written = 0
+    with target.open("wb") as out:
+        while True:
+            chunk = source.read(_COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                raise VideoTooLargeError(f"Video exceeds {max_bytes} bytes")
+            digest.update(chunk)
+            out.write(chunk)
+    return digest.hexdigest()
+
+
+def iter_video_frames(
+    path: str | Path,
+    stats: Optional[VideoStats] = None,
+) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """Кадры видео по порядку: (индекс, время с, RGB uint8 (h, w, 3))."""
+    try:
+        import cv2
+    except ImportError as exc:
+        raise VideoBackendUnavailable("Video decoding requires opencv-python-headless") from exc
+
+    capture = cv2.VideoCapture(str(path))
+    if not capture.isOpened():
+        raise VideoDecodeError(f"Cannot open video {Path(path).name!r}")
+    stats = stats if stats is not None else VideoStats()
+    stats.fps = float(capture.get(cv2.CAP_PROP_FPS) or 0.0)
+    index = 0
+    try:
+        while True:
+            ok, bgr = capture.read()
+            if not ok:
+                break
+            position_ms = capture.get(cv2.CAP_PROP_POS_MSEC)
+            if position_ms and position_ms > 0:
+                t = position_ms / 1000.0
+            else:
+                t = index / stats.fps if stats.fps > 0 else float(index)
+            stats.frames_decoded = index + 1
+            stats.duration_s = t
+            yield index, t, cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+            index += 1
+    finally:
+        capture.release()
+
+
+class KeyframeSelector:
+    """Потоковый выбор ключевых кадров по резкости и движению (см. модуль)."""
+
+    def __init__(self, config: VideoConfig, max_clipped_fraction: float = 1.0) -> None:
+        self.config = config
+        self.max_clipped_fraction = max_clipped_fraction
+        self._last_gray: Optional[np.ndarray] = None
+        self._last_t: Optional[float] = None
+        self.selected = 0
+        self.blurred = 0
+        self.badly_exposed = 0
+
+    @property
+    def full(self) -> bool:
+        return self.selected >= self.config.max_keyframes
+
+    def consider(self, index: int, t: float, rgb: np.ndarray) -> Optional[VideoKeyframe]:
+        """Ключевой кадр или None, если кадр размыт либо камера почти не сдвинулась."""
+        if self.full:
+            return None
+        gray = downscale_gray(rgb, self.config.analysis_max_side_px)
+        dark, bright = clipped_fractions(gray[None])
+        if max(float(dark[0]), float(bright[0])) > self.max_clipped_fraction:
+            self.badly_exposed += 1
+            return None
+        sharpness = laplacian_variance(gray)
+        if sharpness < self.config.min_sharpness:
+            self.blurred += 1
+            return None
+        if self._last_gray is None or self._last_gray.shape != gray.shape:
+            motion = 1.0
+        else:
+            motion = float(np.abs(gray - self._last_gray).mean(dtype=np.float64)) / 255.0
+        waited = self._last_t is None or t - self._last_t >= self.config.max_interval_s
+        if motion < self.config.min_motion and not waited:
+            return None
+        self._last_gray = gray
+        self._last_t = t
+        self.selected += 1
+        return VideoKeyframe(index=index, t=t, rgb=rgb, sharpness=sharpness, motion=motion)
+
+
+def select_keyframes(
+    frames: Iterable[Tuple[int, float, np.ndarray]],
+    config: VideoConfig,
+    stats: Optional[VideoStats] = None,
+    max_clipped_fraction: float = 1.0,
+) -> Iterator[VideoKeyframe]:
+    """
+    Ключевые кадры из потока кадров; после max_keyframes декодирование прекращается.
+    Кадры с долей чёрных/пересвеченных пикселей выше max_clipped_fraction не берутся.
+    """
+    selector = KeyframeSelector(config, max_clipped_fraction)
+    for index, t, rgb in frames:
+        keyframe = selector.consider(index, t, rgb)
+        if stats is not None:
+            stats.frames_blurred = selector.blurred
+            stats.frames_badly_exposed = selector.badly_exposed
+        if keyframe is not None:
+            if stats is not None:
+                stats.keyframe_times_s.append(round(t, 4))
+            yield keyframe
+        if selector.full:
+            break
+
+
+_DONE = object()
+
+
+def background_iter(source: Iterable[T], queue_size: int = 4) -> Iterator[T]:
+    """
+    Выполнять source в фоновом потоке, отдавая элементы через очередь размера queue_size.
+    Исключение источника пробрасывается потребителю; при досрочном закрытии генератора
+    поток останавливается после текущего элемента.
+    """
+    items: "queue.Queue[object]" = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        iterator = iter(source)
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+        except BaseException as exc:  # передаём потребителю
+            put(exc)
+            return
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()  # генератор источника освобождает декодер
+        put(_DONE)
+
+    # Поток работает в копии контекста запроса: декодирование попадает в его профиль
+    thread = threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(run_sampled, produce),
+        name="scan-video-decode",
+        daemon=True,
+    )
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item  # type: ignore[misc]
+    finally:
+        stop.set()
+        thread.join()
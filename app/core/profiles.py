@@ -0,0 +1,302 @@
+"""
+Именованные профили обработки: параметры ProcessingConfig под класс устройства и бюджет задержки.
+
+- fast — дешёвые телефоны: крупнее воксель, вдвое меньше бюджет точек, меньше итераций RANSAC;
+- balanced — значения ProcessingConfig по умолчанию;
+- precise — LiDAR: мельче воксель и ячейки покрытия, больше точек и итераций.
+
+Профиль выбирается на запрос (поле processing_profile в /process и /video), иначе по project_id
+из файла профилей, иначе берётся профиль по умолчанию. На время запроса его ProcessingConfig
+становится текущим (config.use_processing): settings не меняются и не перезагружаются.
+
+Источники, каждый следующий поверх предыдущего:
+- встроенные профили (BUILTIN_PROFILES);
+- JSON-файл из переменной SCAN_PROFILES_FILE:
+      {"default": "balanced",
+       "profiles": {"lidar": {"base": "precise", "latency_budget_ms": 20000,
+                              "processing": {"voxel_size_m": 0.015}}},
+       "projects": {"<project_id>": "fast"}}
+  Поля профиля, не заданные в файле, берутся из base (по умолчанию — из одноимённого
+  встроенного профиля, для нового — из balanced);
+- переменные окружения: SCAN_PROFILE_DEFAULT=<имя> и SCAN_PROFILE_<ИМЯ>__<ПОЛЕ>=<значение>,
+  где поле — параметр ProcessingConfig или LATENCY_BUDGET_MS, например
+  SCAN_PROFILE_FAST__RANSAC_ITERATIONS=200.
+
+Всё проверяется при загрузке (create_app): неизвестные поля и профили, типы, диапазоны —
+ValueError с указанием источника значения, сервис не стартует с ошибочной конфигурацией.
+"""
+from __future__ import annotations
+
+import dataclasses
+import json
+import math
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from app.core.config import ExecutorConfig, ProcessingConfig, settings
+from app.core.processing.point_cloud import FRAME_BACKENDS
+from app.core.processing.precision import POINT_DTYPES
+
+PROFILES_FILE_ENV = "SCAN_PROFILES_FILE"
+DEFAULT_PROFILE_ENV = "SCAN_PROFILE_DEFAULT"
+_PROFILE_ENV_PREFIX = "SCAN_PROFILE_"
+_PROFILE_KEYS = {"base", "latency_budget_ms", "processing"}
+
+_NAME_RE = re.compile(r"^[a-z][a-z0-9_]*$")
+_BOOL_VALUES = {
+    "1": True, "true": True, "yes": True, "on": True,
+    "0": False, "false": False, "no": False, "off": False,
+}
+
+# Бюджет задержки (мс) и отличия от ProcessingConfig() для встроенных профилей. Бюджеты —
+# обработка батча 30 кадров 640×480 с depth (python -m app.bench.run --suite profiles) с запасом
+BUILTIN_PROFILES: Dict[str, Tuple[int, Dict[str, Any]]] = {
+    "fast": (3000, {
+        "ransac_iterations": 300,
+        "ransac_max_planes": 6,
+        "voxel_size_m": 0.04,
+        "point_budget": 40000,
+        "max_voxel_size_m": 0.12,
+        "normals_knn": 16,
+        "outlier_cell_size_m": 0.08,
+        "occupancy_cell_size_m": 0.5,
+        "point_precision": "float32",
+        "density_points_norm": 40000,
+    }),
+    "balanced": (6000, {}),
+    "precise": (15000, {
+        "ransac_distance_threshold": 0.02,
+        "ransac_iterations": 2000,
+        "ransac_max_planes": 12,
+        "voxel_size_m": 0.02,
+        "point_budget": 200000,
+        "max_voxel_size_m": 0.06,
+        "outlier_cell_size_m": 0.04,
+        "occupancy_cell_size_m": 0.25,
+        "density_points_norm": 200000,
+    }),
+}
+DEFAULT_PROFILE = "balanced"
+
+# Параметры, которые должны быть строго больше нуля (остальные числа — не меньше нуля)
+_POSITIVE_FIELDS = frozenset({
+    "ransac_distance_threshold",
+    "ransac_iterations",
+    "ransac_max_planes",
+    "frame_quality_scale",
+    "voxel_size_m",
+    "max_voxel_size_m",
+    "normals_knn",
+    "outlier_cell_size_m",
+    "occupancy_cell_size_m",
+    "density_points_norm",
+})
+_FRACTION_FIELDS = frozenset({
+    "frame_min_relative_sharpness",
+    "frame_max_clipped_fraction",
+    "ceiling_height_fraction",
+    "reveal_min_confidence",
+    "frame_plane_min_confidence",
+})
+_CHOICES: Dict[str, Tuple[str, ...]] = {
+    "point_precision": tuple(sorted(POINT_DTYPES)),
+    "frame_backend": FRAME_BACKENDS,
+}
+
+
+@dataclass(frozen=True)
+class ProcessingProfile:
+    """Профиль: имя, бюджет задержки обработки запроса (мс) и параметры обработки."""
+    name: str
+    latency_budget_ms: int
+    processing: ProcessingConfig
+
+
+@dataclass(frozen=True)
+class ProcessingProfiles:
+    """Загруженные профили, профиль по умолчанию и привязка project_id → профиль."""
+    profiles: Dict[str, ProcessingProfile]
+    default: str
+    projects: Dict[str, str] = dataclasses.field(default_factory=dict)
+
+    def resolve(
+        self, name: Optional[str] = None, project_id: Optional[str] = None
+    ) -> ProcessingProfile:
+        """Профиль запроса: явно выбранный, иначе по project_id, иначе по умолчанию."""
+        if name:
+            if name not in self.profiles:
+                raise ValueError(
+                    f"Unknown processing profile {name!r}; expected one of {sorted(self.profiles)}"
+                )
+            return self.profiles[name]
+        return self.profiles[self.projects.get(project_id or "", self.default)]
+
+
+def _coerce(field: str, value: Any, where: str) -> Any:
+    """Значение параметра в тип его значения по умолчанию (строки — из окружения)."""
+    expected = type(getattr(ProcessingConfig, field))
+    if isinstance(value, str) and expected is not str:
+        text = value.strip().lower()
+        try:
+            if expected is bool:
+                return _BOOL_VALUES[text]
+            return expected(text)
+        except (KeyError, ValueError):
+            raise ValueError(f"{where}: {value!r} is not a valid {expected.__name__}") from None
+    if expected is float and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if type(value) is not expected:
+        raise ValueError(f"{where}: expected {expected.__name__}, got {type(value).__name__}")
+    return value
+
+
+def _latency_budget(value: Any, where: str) -> int:
+    if isinstance(value, str):
+        try:
+            value = int(value.strip())
+        except ValueError:
+            raise ValueError(f"{where}: {value!r} is not a valid int") from None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"{where}: expected int, got {type(value).__name__}")
+    return value
+
+
+def _validate(profile: ProcessingProfile, where: str) -> None:
+    if not _NAME_RE.match(profile.name):
+        raise ValueError(f"{where}: profile name must match {_NAME_RE.pattern}")
+    if profile.latency_budget_ms <= 0:
+        raise ValueError(f"{where}.latency_budget_ms must be > 0")
+    config = profile.processing
+    for field in dataclasses.fields(config):
+        value = getattr(config, field.name)
+        if field.name in _CHOICES and value not in _CHOICES[field.name]:
+            raise ValueError(f"{where}.{field.name}: {value!r} not in {_CHOICES[field.name]}")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if not math.isfinite(value) or value < 0 or (value == 0 and field.name in _POSITIVE_FIELDS):
+            bound = "> 0" if field.name in _POSITIVE_FIELDS else ">= 0"
+            raise ValueError(f"{where}.{field.name} must be finite and {bound}, got {value!r}")
+        if field.name in _FRACTION_FIELDS and value > 1:
+            raise ValueError(f"{where}.{field.name} must be within [0, 1], got {value!r}")
+    if config.ransac_n < 3:
+        raise ValueError(f"{where}.ransac_n must be >= 3")
+    if config.max_voxel_size_m < config.voxel_size_m:
+        raise ValueError(f"{where}.max_voxel_size_m must be >= voxel_size_m")
+
+
+def _build(
+    name: str,
+    base: ProcessingProfile,
+    overrides: Mapping[str, Any],
+    latency_budget_ms: Optional[Any],
+    where: str,
+) -> ProcessingProfile:
+    known = {field.name for field in dataclasses.fields(ProcessingConfig)}
+    unknown = sorted(set(overrides) - known)
+    pools = sorted(set(unknown) & {field.name for field in dataclasses.fields(ExecutorConfig)})
+    if pools:
+        # Пулы общие для всех запросов: размер из профиля действовал бы не на свой запрос
+        raise ValueError(
+            f"{where}: {pools} are process-wide pool sizes, not processing parameters; "
+            "set them in settings.executors"
+        )
+    if unknown:
+        raise ValueError(f"{where}: unknown processing parameters {unknown}")
+    values = {key: _coerce(key, value, f"{where}.{key}") for key, value in overrides.items()}
+    budget = base.latency_budget_ms
+    if latency_budget_ms is not None:
+        budget = _latency_budget(latency_budget_ms, f"{where}.latency_budget_ms")
+    return ProcessingProfile(name, budget, dataclasses.replace(base.processing, **values))
+
+
+def _builtin_profiles(base: ProcessingConfig) -> Dict[str, ProcessingProfile]:
+    return {
+        name: ProcessingProfile(name, budget, dataclasses.replace(base, **overrides))
+        for name, (budget, overrides) in BUILTIN_PROFILES.items()
+    }
+
+
+def _apply_file(
+    profiles: Dict[str, ProcessingProfile], path: Path
+) -> Tuple[Optional[str], Dict[str, str]]:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as exc:
+        raise ValueError(f"{path}: cannot read processing profiles: {exc}") from exc
+    if not isinstance(raw, dict) or set(raw) - {"default", "profiles", "projects"}:
+        raise ValueError(f"{path}: expected an object with keys default, profiles, projects")
+    entries = raw.get("profiles", {})
+    projects = raw.get("projects", {})
+    if not isinstance(entries, dict) or not isinstance(projects, dict):
+        raise ValueError(f"{path}: profiles and projects must be objects")
+
+    for name, entry in entries.items():
+        where = f"{path}:profiles.{name}"
+        if not isinstance(entry, dict) or set(entry) - _PROFILE_KEYS:
+            raise ValueError(f"{where}: expected an object with keys {sorted(_PROFILE_KEYS)}")
+        base_name = entry.get("base", name if name in profiles else DEFAULT_PROFILE)
+        if base_name not in profiles:
+            raise ValueError(f"{where}.base: unknown profile {base_name!r}")
+        overrides = entry.get("processing", {})
+        if not isinstance(overrides, dict):
+            raise ValueError(f"{where}.processing must be an object")
+        budget = entry.get("latency_budget_ms")
+        profiles[name] = _build(name, profiles[base_name], overrides, budget, where)
+
+    default = raw.get("default")
+    if default is not None and not isinstance(default, str):
+        raise ValueError(f"{path}:default must be a profile name")
+    if not all(isinstance(key, str) and isinstance(value, str) for key, value in projects.items()):
+        raise ValueError(f"{path}:projects must map project_id to a profile name")
+    return default, dict(projects)
+
+
+def _apply_environment(profiles: Dict[str, ProcessingProfile], environ: Mapping[str, str]) -> None:
+    overrides: Dict[str, Dict[str, str]] = {}
+    for key, value in sorted(environ.items()):
+        if not key.startswith(_PROFILE_ENV_PREFIX) or "__" not in key:
+            continue
+        profile, field = key[len(_PROFILE_ENV_PREFIX):].split("__", 1)
+        if profile.lower() not in profiles:
+            raise ValueError(f"{key}: unknown processing profile {profile.lower()!r}")
+        overrides.setdefault(profile.lower(), {})[field.lower()] = value
+    for name, fields in overrides.items():
+        budget = fields.pop("latency_budget_ms", None)
+        where = f"env {_PROFILE_ENV_PREFIX}{name.upper()}"
+        profiles[name] = _build(name, profiles[name], fields, budget, where)
+
+
+def load_processing_profiles(
+    environ: Optional[Mapping[str, str]] = None,
+    base: Optional[ProcessingConfig] = None,
+) -> ProcessingProfiles:
+    """Встроенные профили, затем файл SCAN_PROFILES_FILE, затем переменные окружения."""
+    environ = os.environ if environ is None else environ
+    profiles = _builtin_profiles(settings.processing if base is None else base)
+    default, projects = DEFAULT_PROFILE, {}
+
+    path = environ.get(PROFILES_FILE_ENV)
+    if path:
+        file_default, projects = _apply_file(profiles, Path(path))
+        default = file_default or default
+    _apply_environment(profiles, environ)
+    default = environ.get(DEFAULT_PROFILE_ENV) or default
+
+    for name, profile in profiles.items():
+        _validate(profile, f"profile {name!r}")
+    if default not in profiles:
+        raise ValueError(f"default processing profile {default!r} is not defined")
+    for project_id, name in projects.items():
+        if name not in profiles:
+            raise ValueError(f"project {project_id!r}: unknown processing profile {name!r}")
+    return ProcessingProfiles(profiles=profiles, default=default, projects=projects)
+
+
+@lru_cache(maxsize=1)
+def get_processing_profiles() -> ProcessingProfiles:
+    """Профили процесса: загружаются один раз (при создании приложения) из файла и окружения."""
+    return load_processing_profiles()
@@ -0,0 +1,305 @@
+"""
+Профилирование отдельного запроса /process по требованию (заголовок X-Scan-Profile или конфиг).
+
+Сэмплирующий профилировщик: фоновый поток раз в sample_interval_s снимает стек потока пула
+пайплайна, выполняющего запрос (sys._current_frames), и учитывает только стеки, проходящие
+через корневой кадр запроса (кадр _pipeline_task в этом потоке). Чтение загрузок в event loop
+в профиль не попадает, время других запросов — тоже: поток пула занят одним сканом.
+
+Задачи запроса в других потоках (проекция кадров в пуле frame-fusion, декодирование видео)
+запускаются через run_sampled: пока задача выполняется, её поток сэмплируется тем же
+профилировщиком (активный — в контекстной переменной, контекст копируется в задачу). Процессы
+пула frame_transport сэмплируют себя сами (sample_worker_task) и возвращают стеки с результатом.
+Стеки других потоков идут под корнем запроса с псевдокадром «[имя потока]»; время потоков
+суммируется, как в любом многопоточном профиле.
+
+Результат — свёрнутые стеки (collapsed/folded: «корень;...;лист N» в строке), их читают
+flamegraph.pl, inferno и speedscope. Профили хранятся в ограниченном каталоге
+({scan_id}.folded, самые старые удаляются при превышении лимитов).
+
+Если профилирование для запроса не запрошено, ничего не создаётся: ни потока, ни обёрток.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from app.core.config import ProfilingConfig, settings
+
+PROFILE_SUFFIX = ".folded"
+_TRUTHY = {"1", "true", "yes", "on"}
+_UNSAFE_ID_CHARS = re.compile(r"[^A-Za-z0-9._-]")
+
+T = TypeVar("T")
+# Стек (от корня к листу) и число сэмплов
+Samples = Dict[Tuple[str, ...], int]
+
+
+def profiling_requested(
+    header_value: Optional[str], config: ProfilingConfig = settings.profiling
+) -> bool:
+    """Нужно ли профилировать запрос: всегда по конфигу или по заголовку, если он разрешён."""
+    if config.always:
+        return True
+    return config.allow_header and (header_value or "").strip().lower() in _TRUTHY
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or Path(code.co_filename).stem
+    return f"{module}:{code.co_name}:{code.co_firstlineno}"
+
+
+class StackSampler:
+    """
+    Сэмплирование стека потока (по умолчанию — текущего); root_frame — учитывать только стеки
+    через этот кадр. attach()/detach() добавляют на время другие потоки того же запроса.
+    """
+
+    def __init__(
+        self,
+        interval_s: float = 0.005,
+        thread_id: Optional[int] = None,
+        root_frame: Optional[FrameType] = None,
+    ) -> None:
+        self.interval_s = interval_s
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.root_frame = root_frame
+        self.samples: Counter = Counter()
+        self.elapsed_s = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self._lock = threading.Lock()
+        # Поток → (корневой кадр, префикс его стеков)
+        self._threads: Dict[int, Tuple[Optional[FrameType], Tuple[str, ...]]] = {
+            self.thread_id: (root_frame, ())
+        }
+
+    def _prefix(self, name: str) -> Tuple[str, ...]:
+        # Стеки других потоков — под корнем основного потока, чтобы у профиля был один корень
+        root = () if self.root_frame is None else (_frame_label(self.root_frame),)
+        return root + (f"[{name}]",)
+
+    def attach(
+        self, thread_id: int, root_frame: Optional[FrameType], name: Optional[str] = None
+    ) -> None:
+        """Сэмплировать и поток thread_id (стеки через root_frame) до detach()."""
+        prefix = () if name is None else self._prefix(name)
+        with self._lock:
+            self._threads[thread_id] = (root_frame, prefix)
+
+    def detach(self, thread_id: int) -> None:
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def merge(self, samples: Samples, name: str) -> None:
+        """Добавить стеки, снятые в другом процессе, под псевдокадром «[name]»."""
+        prefix = self._prefix(name)
+        with self._lock:
+            for stack, count in samples.items():
+                self.samples[prefix + tuple(stack)] += count
+
+    def drain(self) -> Samples:
+        """Забрать накопленные сэмплы (счётчик обнуляется)."""
+        with self._lock:
+            samples, self.samples = dict(self.samples), Counter()
+        return samples
+
+    def start(self) -> "StackSampler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="scan-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed_s = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, (root_frame, prefix) in self._threads.items():
+                    stack = self._stack(frames.get(thread_id), root_frame)
+                    if stack:
+                        self.samples[prefix + stack] += 1
+
+    @staticmethod
+    def _stack(frame: Optional[FrameType], root_frame: Optional[FrameType]) -> Tuple[str, ...]:
+        labels: List[str] = []
+        while frame is not None:
+            labels.append(_frame_label(frame))
+            if frame is root_frame:
+                return tuple(reversed(labels))
+            frame = frame.f_back
+        return () if root_frame is not None else tuple(reversed(labels))
+
+    def folded(self) -> str:
+        """Свёрнутые стеки: строка «кадр;кадр;...;кадр число_сэмплов», от корня к листу."""
+        lines = [f"{';'.join(stack)} {count}" for stack, count in sorted(self.samples.items())]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+def _safe_profile_id(scan_id: str) -> str:
+    return _UNSAFE_ID_CHARS.sub("_", scan_id)[:128] or "_"
+
+
+class ProfileStore:
+    """Каталог профилей {scan_id}.folded, ограниченный числом файлов и суммарным размером."""
+
+    def __init__(
+        self, directory: str | Path, max_files: int = 50, max_bytes: int = 64 * 1024 * 1024
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: ProfilingConfig) -> "ProfileStore":
+        directory = config.dir or Path(tempfile.gettempdir()) / "scan_profiles"
+        return cls(directory, max_files=config.max_files, max_bytes=config.max_bytes)
+
+    def path_for(self, scan_id: str) -> Path:
+        return self.directory / f"{_safe_profile_id(scan_id)}{PROFILE_SUFFIX}"
+
+    def get(self, scan_id: str) -> Optional[Path]:
+        path = self.path_for(scan_id)
+        return path if path.is_file() else None
+
+    def save(self, scan_id: str, folded: str) -> Optional[Path]:
+        """Записать профиль (атомарно) и вытеснить старые; None — запись не удалась."""
+        path = self.path_for(scan_id)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with self._lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                tmp.write_text(folded, encoding="utf-8")
+                os.replace(tmp, path)
+            except OSError:
+                tmp.unlink(missing_ok=True)
+                return None
+            self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: Path) -> None:
+        entries = []
+        for path in self.directory.glob(f"*{PROFILE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort(key=lambda item: item[0])
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if count <= self.max_files and total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            count -= 1
+            total -= size
+
+
+_profile_store: Optional[ProfileStore] = None
+_profile_store_lock = threading.Lock()
+
+
+def get_profile_store() -> ProfileStore:
+    """Общий каталог профилей процесса по settings.profiling."""
+    global _profile_store
+    with _profile_store_lock:
+        if _profile_store is None:
+            _profile_store = ProfileStore.from_config(settings.profiling)
+        return _profile_store
+
+
+# Профилировщик запроса, выполняющегося в этом контексте; None — запрос не профилируется
+_active_sampler: ContextVar[Optional[StackSampler]] = ContextVar("active_sampler", default=None)
+
+
+@contextmanager
+def profile_request(scan_id: str, root_frame: Optional[FrameType] = None) -> Iterator[StackSampler]:
+    """
+    Сэмплировать текущий поток (и задачи, запущенные из блока через run_sampled)
+    и сохранить профиль под scan_id.
+    """
+    sampler = StackSampler(settings.profiling.sample_interval_s, root_frame=root_frame).start()
+    token = _active_sampler.set(sampler)
+    try:
+        yield sampler
+    finally:
+        _active_sampler.reset(token)
+        sampler.stop()
+        get_profile_store().save(scan_id, sampler.folded())
+
+
+def active_sampler() -> Optional[StackSampler]:
+    """Профилировщик текущего запроса; None — запрос не профилируется."""
+    return _active_sampler.get()
+
+
+def run_sampled(fn: Callable[..., T], *args: Any) -> T:
+    """
+    fn(*args) в потоке пула или фоновом потоке запроса. Если запрос профилируется (контекст
+    скопирован из него), поток сэмплируется, пока выполняется fn.
+    """
+    sampler = _active_sampler.get()
+    if sampler is None:
+        return fn(*args)
+    thread_id = threading.get_ident()
+    sampler.attach(thread_id, sys._getframe(), threading.current_thread().name)
+    try:
+        return fn(*args)
+    finally:
+        sampler.detach(thread_id)
+
+
+# Сэмплер процесса-обработчика (frame_transport): один на процесс, работает, пока процесс жив.
+# Сэмплирует поток задачи только во время профилируемых задач, поэтому короткие задачи
+# попадают в профиль пропорционально длительности, а не теряются до первого тика
+_worker_sampler: Optional[StackSampler] = None
+_worker_sampler_lock = threading.Lock()
+
+
+def sample_worker_task(
+    interval_s: Optional[float], fn: Callable[..., T], *args: Any
+) -> Tuple[T, Samples]:
+    """
+    В процессе пула: fn(*args) и стеки, снятые за время выполнения (раз в interval_s; None —
+    без сэмплирования). Стеки передаются родителю, он добавляет их в профиль (merge).
+    """
+    global _worker_sampler
+    if interval_s is None:
+        return fn(*args), {}
+    with _worker_sampler_lock:
+        if _worker_sampler is None or _worker_sampler.interval_s != interval_s:
+            if _worker_sampler is not None:
+                _worker_sampler.stop()
+            _worker_sampler = StackSampler(interval_s)
+            # Между задачами поток простаивает: сэмплируется только во время задач
+            _worker_sampler.detach(_worker_sampler.thread_id)
+            _worker_sampler.start()
+        sampler = _worker_sampler
+    thread_id = threading.get_ident()
+    sampler.attach(thread_id, sys._getframe())
+    try:
+        result = fn(*args)
+    finally:
+        sampler.detach(thread_id)
+    return result, sampler.drain()
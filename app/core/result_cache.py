@@ -0,0 +1,204 @@
+"""
+Кэш результатов обработки по содержимому входа (content-addressed).
+
+Ключ — blake2b по всем входам запроса (кадры, depth, траектория, документ) и по активной
+конфигурации обработки: повторная загрузка тех же байтов (ретрай мобильного клиента)
+возвращает готовый ответ без пересчёта. Значения хранятся как JSON-строки ответа.
+
+Уровни:
+  - память — LRU с ограничением по числу записей и суммарному размеру;
+  - диск (опционально) — файлы {namespace}-{key}.json, вытеснение самых давно использованных
+    (по mtime, он обновляется при попадании) при превышении лимита размера.
+"""
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import CacheConfig, settings
+
+# Версия формата кэша: увеличить при изменении конвейера, меняющем ответы при тех же входах
+CACHE_FORMAT_VERSION = 2
+
+
+class InputHasher:
+    """
+    Потоковый хэш входов запроса. Каждая часть хэшируется с тегом и длиной — части
+    не склеиваются.
+    """
+
+    def __init__(self, namespace: str) -> None:
+        self._h = hashlib.blake2b(digest_size=20)
+        self.update_bytes("namespace", f"{namespace}:v{CACHE_FORMAT_VERSION}".encode("utf-8"))
+
+    def update_bytes(self, tag: str, data: bytes) -> "InputHasher":
+        header = f"{tag}:{len(data)}:".encode("utf-8")
+        self._h.update(header)
+        self._h.update(data)
+        return self
+
+    def update_json(self, tag: str, payload: object) -> "InputHasher":
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return self.update_bytes(tag, encoded.encode("utf-8"))
+
+    def update_config(self, config: object) -> "InputHasher":
+        """Учесть dataclass-конфигурацию (например, settings.processing): параметры меняют ключ."""
+        return self.update_json(type(config).__name__, dataclasses.asdict(config))
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+class ResultCache:
+    """Двухуровневый кэш JSON-ответов: LRU в памяти и опциональный каталог на диске."""
+
+    def __init__(
+        self,
+        memory_max_entries: int = 128,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str | Path] = None,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+    ) -> None:
+        self.memory_max_entries = memory_max_entries
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: CacheConfig) -> "ResultCache":
+        return cls(
+            memory_max_entries=config.memory_max_entries,
+            memory_max_bytes=config.memory_max_bytes,
+            disk_dir=config.disk_dir or None,
+            disk_max_bytes=config.disk_max_bytes,
+        )
+
+    @staticmethod
+    def _entry_key(namespace: str, key: str) -> str:
+        return f"{namespace}-{key}"
+
+    def _disk_path(self, entry: str) -> Path:
+        return self.disk_dir / f"{entry}.json"
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        """JSON ответа по ключу или None. Попадание на диске поднимает запись в память."""
+        entry = self._entry_key(namespace, key)
+        with self._lock:
+            value = self._memory.get(entry)
+            if value is not None:
+                self._memory.move_to_end(entry)
+                self.hits += 1
+                return value
+
+        value = self._disk_get(entry)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._memory_put(entry, value)
+        return value
+
+    def put(self, namespace: str, key: str, value: str) -> None:
+        entry = self._entry_key(namespace, key)
+        with self._lock:
+            self._memory_put(entry, value)
+        self._disk_put(entry, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.disk_dir is not None:
+            for path in self.disk_dir.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def _memory_put(self, entry: str, value: str) -> None:
+        size = len(value)
+        if size > self.memory_max_bytes:
+            return
+        old = self._memory.pop(entry, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[entry] = value
+        self._memory_bytes += size
+        while self._memory and (
+            len(self._memory) > self.memory_max_entries
+            or self._memory_bytes > self.memory_max_bytes
+        ):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _disk_get(self, entry: str) -> Optional[str]:
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(entry)
+        try:
+            value = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def _disk_put(self, entry: str, value: str) -> None:
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(entry)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_text(value, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        """Удалить самые давно использованные файлы, пока каталог больше disk_max_bytes."""
+        entries = []
+        total = 0
+        for path in self.disk_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.disk_max_bytes:
+            return
+        for _, size, path in sorted(entries, key=lambda item: item[0]):
+            path.unlink(missing_ok=True)
+            total -= size
+            if total <= self.disk_max_bytes:
+                break
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Общий кэш процесса по settings.cache; None, если кэш выключен."""
+    global _result_cache
+    if not settings.cache.enabled:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache.from_config(settings.cache)
+        return _result_cache
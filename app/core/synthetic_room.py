@@ -0,0 +1,335 @@
+"""
+Синтетические помещения с известной геометрией для прогрева, бенчмарков и тестов пайплайна.
+
+Помещение — многоугольник пола в плоскости XZ (Y — вверх), высота, проёмы в стенах
+и короба (осевые параллелепипеды). render_scan трассирует лучи из камер по траектории
+и выдаёт кадры в том виде, в каком их принимает load_frames_to_pointcloud:
+цвет (uint8 RGB), depth (uint16, мм; 0 — нет данных) и поза {position, rotation [qx, qy, qz, qw]}.
+Интринсики — как в point_cloud.py: fx = fy = max(w, h), cx = w / 2, cy = h / 2.
+"""
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+Point2 = Tuple[float, float]
+
+
+@dataclass(frozen=True)
+class Opening:
+    """Проём в стене wall (ребро footprint[wall] → footprint[wall + 1])."""
+    wall: int
+    kind: str  # "door" | "window"
+    offset_m: float  # от начала ребра до края проёма
+    width_m: float
+    height_m: float
+    sill_m: float = 0.0
+
+
+@dataclass(frozen=True)
+class Box:
+    """Короб: осевой параллелепипед [min_xyz, max_xyz]."""
+    min_xyz: Tuple[float, float, float]
+    max_xyz: Tuple[float, float, float]
+
+
+@dataclass(frozen=True)
+class RoomSpec:
+    name: str
+    footprint: Tuple[Point2, ...]  # вершины пола (x, z) против часовой стрелки
+    height_m: float
+    openings: Tuple[Opening, ...] = ()
+    boxes: Tuple[Box, ...] = ()
+    viewpoints: Tuple[Point2, ...] = ()  # точки съёмки (x, z); пусто — центр bbox
+
+    def ground_truth(self) -> Dict[str, float]:
+        """Эталон в терминах ScanProcessor._compute_dimensions (длина/ширина — по bbox в XZ)."""
+        pts = np.asarray(self.footprint, dtype=np.float64)
+        span = pts.max(axis=0) - pts.min(axis=0)
+        x, z = pts[:, 0], pts[:, 1]
+        area = 0.5 * abs(float(np.dot(x, np.roll(z, -1)) - np.dot(z, np.roll(x, -1))))
+        perimeter = float(np.linalg.norm(np.roll(pts, -1, axis=0) - pts, axis=1).sum())
+        return {
+            "length_m": float(span.max()),
+            "width_m": float(span.min()),
+            "wall_height_m": float(self.height_m),
+            "floor_area_m2": area,
+            "perimeter_m": perimeter,
+            "doors": float(sum(1 for o in self.openings if o.kind == "door")),
+            "windows": float(sum(1 for o in self.openings if o.kind == "window")),
+            "boxes": float(len(self.boxes)),
+        }
+
+
+def box_room(
+    length_m: float = 4.0,
+    width_m: float = 3.0,
+    height_m: float = 2.7,
+    with_openings: bool = True,
+    with_box: bool = True,
+) -> RoomSpec:
+    """Прямоугольная комната: дверь и окно в длинных стенах, короб в углу."""
+    openings: Tuple[Opening, ...] = ()
+    if with_openings:
+        openings = (
+            Opening(wall=0, kind="door", offset_m=0.6, width_m=0.9, height_m=2.05),
+            Opening(wall=2, kind="window", offset_m=1.2, width_m=1.4, height_m=1.3, sill_m=0.85),
+        )
+    boxes: Tuple[Box, ...] = ()
+    if with_box:
+        boxes = (Box((length_m - 0.35, 0.0, width_m - 0.35), (length_m, height_m, width_m)),)
+    return RoomSpec(
+        name="box",
+        footprint=((0.0, 0.0), (length_m, 0.0), (length_m, width_m), (0.0, width_m)),
+        height_m=height_m,
+        openings=openings,
+        boxes=boxes,
+        viewpoints=((length_m / 2.0, width_m / 2.0),),
+    )
+
+
+def l_shaped_room(
+    length_m: float = 5.0,
+    width_m: float = 4.0,
+    notch_m: Tuple[float, float] = (2.0, 1.8),
+    height_m: float = 2.6,
+    with_openings: bool = True,
+) -> RoomSpec:
+    """Г-образная комната: прямоугольник length×width без угла notch (по x, по z)."""
+    nx, nz = notch_m
+    footprint = (
+        (0.0, 0.0),
+        (length_m, 0.0),
+        (length_m, width_m - nz),
+        (length_m - nx, width_m - nz),
+        (length_m - nx, width_m),
+        (0.0, width_m),
+    )
+    openings: Tuple[Opening, ...] = ()
+    if with_openings:
+        openings = (
+            Opening(wall=0, kind="window", offset_m=1.0, width_m=1.2, height_m=1.2, sill_m=0.9),
+            Opening(wall=5, kind="door", offset_m=1.2, width_m=0.8, height_m=2.0),
+        )
+    return RoomSpec(
+        name="l_shape",
+        footprint=footprint,
+        height_m=height_m,
+        openings=openings,
+        viewpoints=(
+            ((length_m - nx) / 2.0, width_m / 2.0),
+            (length_m - nx / 2.0, (width_m - nz) / 2.0),
+        ),
+    )
+
+
+ROOM_FACTORIES = {
+    "box": box_room,
+    "l_shape": l_shaped_room,
+}
+
+
+def _matrix_to_quaternion(rot: np.ndarray) -> List[float]:
+    """Матрица поворота 3×3 → [qx, qy, qz, qw] (обратное к _quaternion_to_rotation_matrix)."""
+    m = rot
+    trace = m[0, 0] + m[1, 1] + m[2, 2]
+    if trace > 0:
+        s = 2.0 * np.sqrt(trace + 1.0)
+        q = [(m[2, 1] - m[1, 2]) / s, (m[0, 2] - m[2, 0]) / s, (m[1, 0] - m[0, 1]) / s, 0.25 * s]
+    elif m[0, 0] > m[1, 1] and m[0, 0] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[0, 0] - m[1, 1] - m[2, 2])
+        q = [0.25 * s, (m[0, 1] + m[1, 0]) / s, (m[0, 2] + m[2, 0]) / s, (m[2, 1] - m[1, 2]) / s]
+    elif m[1, 1] > m[2, 2]:
+        s = 2.0 * np.sqrt(1.0 + m[1, 1] - m[0, 0] - m[2, 2])
+        q = [(m[0, 1] + m[1, 0]) / s, 0.25 * s, (m[1, 2] + m[2, 1]) / s, (m[0, 2] - m[2, 0]) / s]
+    else:
+        s = 2.0 * np.sqrt(1.0 + m[2, 2] - m[0, 0] - m[1, 1])
+        q = [(m[0, 2] + m[2, 0]) / s, (m[1, 2] + m[2, 1]) / s, 0.25 * s, (m[1, 0] - m[0, 1]) / s]
+    return [float(v) for v in q]
+
+
+def camera_rotation(yaw_rad: float, pitch_rad: float) -> np.ndarray:
+    """
+    Камера → мир: столбцы [вправо, вниз, вперёд] (оси камеры Open3D: x вправо, y вниз,
+    z вперёд).
+    """
+    forward = np.array([
+        np.cos(pitch_rad) * np.cos(yaw_rad),
+        np.sin(pitch_rad),
+        np.cos(pitch_rad) * np.sin(yaw_rad),
+    ])
+    up = np.array([0.0, 1.0, 0.0]) - np.sin(pitch_rad) * forward
+    up /= np.linalg.norm(up)
+    down = -up
+    right = np.cross(down, forward)
+    return np.column_stack([right, down, forward])
+
+
+def _cast_rays(
+    spec: RoomSpec, origin: np.ndarray, dirs: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ближайшее пересечение лучей origin + t·dirs с помещением.
+    Возвращает (t, surface): surface 0 — пол, 1 — потолок, 2 + i — стена i, -1 — короб,
+    -2 — нет попадания (луч ушёл в проём).
+    """
+    n = dirs.shape[0]
+    t_best = np.full(n, np.inf)
+    surface = np.full(n, -2, dtype=np.int64)
+    eps = 1e-6
+
+    dy = dirs[:, 1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t_floor = np.where(dy < -eps, -origin[1] / dy, np.inf)
+        t_ceil = np.where(dy > eps, (spec.height_m - origin[1]) / dy, np.inf)
+    for t_plane, surf in ((t_floor, 0), (t_ceil, 1)):
+        closer = t_plane < t_best
+        t_best[closer] = t_plane[closer]
+        surface[closer] = surf
+
+    pts = np.asarray(spec.footprint, dtype=np.float64)
+    ox, oz = origin[0], origin[2]
+    dx, dz = dirs[:, 0], dirs[:, 2]
+    wall_s = np.zeros(n)
+    for i in range(pts.shape[0]):
+        p, q = pts[i], pts[(i + 1) % pts.shape[0]]
+        ex, ez = q[0] - p[0], q[1] - p[1]
+        wx, wz = p[0] - ox, p[1] - oz
+        denom = dx * ez - dz * ex
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (wx * ez - wz * ex) / denom
+            s = (wx * dz - wz * dx) / denom
+        hit = (np.abs(denom) > eps) & (t > eps) & (s >= 0.0) & (s <= 1.0) & (t < t_best)
+        t_best[hit] = t[hit]
+        surface[hit] = 2 + i
+        wall_s[hit] = s[hit] * np.hypot(ex, ez)
+
+    # Проёмы: попадание в прямоугольник проёма — луч уходит наружу, данных нет.
+    with np.errstate(invalid="ignore"):
+        hit_y = origin[1] + t_best * dy
+    for opening in spec.openings:
+        on_wall = surface == 2 + opening.wall
+        y = hit_y
+        inside = (
+            on_wall
+            & (wall_s >= opening.offset_m) & (wall_s <= opening.offset_m + opening.width_m)
+            & (y >= opening.sill_m) & (y <= opening.sill_m + opening.height_m)
+        )
+        t_best[inside] = np.inf
+        surface[inside] = -2
+
+    for box in spec.boxes:
+        lo = np.asarray(box.min_xyz) - origin
+        hi = np.asarray(box.max_xyz) - origin
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t1 = lo[None, :] / dirs
+            t2 = hi[None, :] / dirs
+        t_near = np.nanmax(np.minimum(t1, t2), axis=1)
+        t_far = np.nanmin(np.maximum(t1, t2), axis=1)
+        hit = (t_near <= t_far) & (t_near > eps) & (t_near < t_best)
+        t_best[hit] = t_near[hit]
+        surface[hit] = -1
+    return t_best, surface
+
+
+_SURFACE_COLORS = {0: (150, 120, 90), 1: (235, 235, 235), -1: (200, 190, 170)}
+_WALL_COLOR = (210, 205, 190)
+
+
+@dataclass
+class RenderedScan:
+    """Отрисованный скан: кадры, depth и позы в формате входа /process."""
+    spec: RoomSpec
+    colors: List[np.ndarray] = field(default_factory=list)
+    depths: List[np.ndarray] = field(default_factory=list)
+    poses: List[Dict[str, List[float]]] = field(default_factory=list)
+
+    def write(self, directory: str | Path) -> Tuple[List[str], List[str], str]:
+        """Записать кадры (JPEG), depth (PNG uint16) и trajectory.json; вернуть пути."""
+        import open3d as o3d
+
+        out = Path(directory)
+        out.mkdir(parents=True, exist_ok=True)
+        frame_paths: List[str] = []
+        depth_paths: List[str] = []
+        for i, (color, depth) in enumerate(zip(self.colors, self.depths)):
+            frame_path = out / f"frame_{i:04d}.jpg"
+            depth_path = out / f"depth_{i:04d}.png"
+            o3d.io.write_image(str(frame_path), o3d.geometry.Image(np.ascontiguousarray(color)))
+            o3d.io.write_image(str(depth_path), o3d.geometry.Image(np.ascontiguousarray(depth)))
+            frame_paths.append(str(frame_path))
+            depth_paths.append(str(depth_path))
+        trajectory_path = out / "trajectory.json"
+        payload = [{"t": float(i), **pose} for i, pose in enumerate(self.poses)]
+        trajectory_path.write_text(json.dumps(payload), encoding="utf-8")
+        return frame_paths, depth_paths, str(trajectory_path)
+
+
+def render_scan(
+    spec: RoomSpec,
+    frames: int = 12,
+    resolution: Tuple[int, int] = (320, 240),
+    noise_m: float = 0.0,
+    seed: int = 0,
+    camera_height_m: float = 1.5,
+    pitches_deg: Sequence[float] = (-40.0, 0.0, 40.0),
+    outlier_fraction: float = 0.0,
+) -> RenderedScan:
+    """
+    Отрисовать скан: камеры в точках spec.viewpoints, поворот по кругу с чередованием наклона
+    (иначе при fx = max(w, h) пол и потолок не попадают в кадр).
+
+    noise_m: СКО гауссова шума глубины (м).
+    outlier_fraction: доля пикселей с ложной глубиной между камерой и стеной (блики, отражения).
+    """
+    rng = np.random.default_rng(seed)
+    w, h = resolution
+    fx = float(max(w, h))
+    cx, cy = w / 2.0, h / 2.0
+    uu, vv = np.meshgrid(np.arange(w, dtype=np.float64), np.arange(h, dtype=np.float64))
+    cam_dirs = np.column_stack([((uu - cx) / fx).ravel(), ((vv - cy) / fx).ravel(), np.ones(w * h)])
+
+    viewpoints = spec.viewpoints or (tuple(np.asarray(spec.footprint).mean(axis=0)),)
+    scan = RenderedScan(spec=spec)
+    for i in range(frames):
+        vx, vz = viewpoints[i % len(viewpoints)]
+        origin = np.array([vx, camera_height_m, vz])
+        yaw = 2.0 * np.pi * i / max(frames, 1) + 0.3 * (i % len(viewpoints))
+        pitch = np.deg2rad(pitches_deg[i % len(pitches_deg)])
+        rot = camera_rotation(yaw, pitch)
+
+        t, surface = _cast_rays(spec, origin, cam_dirs @ rot.T)
+        valid = np.isfinite(t)
+        # Камера смотрит вдоль z, направление луча в камере — (x, y, 1): параметр t и есть глубина.
+        depth_m = np.where(valid, t, 0.0)
+        if noise_m > 0:
+            depth_m = np.where(valid, depth_m + rng.normal(0.0, noise_m, depth_m.shape), 0.0)
+        if outlier_fraction > 0:
+            spikes = valid & (rng.random(depth_m.shape) < outlier_fraction)
+            depth_m = np.where(spikes, rng.uniform(0.3, 1.0, depth_m.shape) * depth_m, depth_m)
+        depth_mm = np.clip(depth_m * 1000.0, 0, 65535).astype(np.uint16).reshape(h, w)
+
+        color = np.empty((w * h, 3), dtype=np.float64)
+        color[:] = _WALL_COLOR
+        for surf, rgb in _SURFACE_COLORS.items():
+            color[surface == surf] = rgb
+        color[~valid] = (40, 60, 90)
+        shade = 0.85 + 0.15 * np.clip(1.0 - depth_m / 6.0, 0.0, 1.0)
+        color = color * shade[:, None] + rng.normal(0.0, 4.0, color.shape)
+        scan.colors.append(np.clip(color, 0, 255).astype(np.uint8).reshape(h, w, 3))
+        scan.depths.append(depth_mm)
+        scan.poses.append({"position": origin.tolist(), "rotation": _matrix_to_quaternion(rot)})
+    return scan
+
+
+def make_room(shape: str, **kwargs: object) -> RoomSpec:
+    """Помещение по имени формы (ROOM_FACTORIES)."""
+    factory = ROOM_FACTORIES.get(shape)
+    if factory is None:
+        raise ValueError(f"Unknown room shape {shape!r}; expected one of {sorted(ROOM_FACTORIES)}")
+    return factory(**kwargs)
+
@@ -0,0 +1,133 @@
+"""
+Прогрев процесса после старта: загрузка тяжёлых модулей вне пути первого запроса.
+
+Open3D и модель классификатора не импортируются при импорте приложения (холодный старт
+контейнера — доли секунды); warm_up() загружает их в фоне и прогоняет крошечный синтетический
+скан через ScanProcessor (первые аллокации, RANSAC, признаки, классификатор), а GET /ready
+отвечает 200, только когда прогрев завершён без ошибок. Запросы, пришедшие раньше, тоже
+обслуживаются — модули подгрузятся при первом использовании.
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class WarmupState:
+    started: bool = False
+    done: bool = False
+    error: Optional[str] = None
+    steps_ms: Dict[str, float] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "started": self.started,
+            "done": self.done,
+            "error": self.error,
+            "steps_ms": dict(self.steps_ms),
+        }
+
+
+def _import_open3d() -> None:
+    import open3d  # noqa: F401
+
+
+def _load_classifier() -> None:
+    from app.core.config import settings
+    from app.ml.inference import _resolve_classifier
+
+    _resolve_classifier(None, settings.processing.ml_model_dir or None)
+
+
+def _import_document_decoder() -> None:
+    try:
+        import PIL.Image  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _synthetic_scan() -> None:
+    """
+    Скан прямоугольной комнаты (6 кадров 160×120 с depth) через ScanProcessor.process_scan.
+    Отдельный маленький кэш результатов: прогрев не занимает место в кэше процесса.
+    Метрики прогона помечены source="warmup" (не смешиваются с запросами и не насыщают /ready).
+    """
+    from app.core.config import settings
+
+    if not settings.readiness.warmup_synthetic_scan:
+        return
+
+    from fastapi import UploadFile
+
+    from app.core.instrumentation import metric_labels
+    from app.core.processing.scan_processor import ScanProcessor
+    from app.core.result_cache import ResultCache
+    from app.core.synthetic_room import box_room, render_scan
+    from app.models.schemas import TrajectoryPoint
+
+    def _upload(path: str) -> UploadFile:
+        return UploadFile(io.BytesIO(Path(path).read_bytes()), filename=Path(path).name)
+
+    scan = render_scan(box_room(), frames=6, resolution=(160, 120), noise_m=0.005)
+    with tempfile.TemporaryDirectory(prefix="scan_warmup_") as tmpdir:
+        frame_paths, depth_paths, trajectory_path = scan.write(tmpdir)
+        frames = [_upload(p) for p in frame_paths]
+        depth = [_upload(p) for p in depth_paths]
+        trajectory = [
+            TrajectoryPoint.model_validate(item)
+            for item in json.loads(Path(trajectory_path).read_text(encoding="utf-8"))
+        ]
+    processor = ScanProcessor(cache=ResultCache(memory_max_entries=1))
+    with metric_labels(source="warmup"):
+        asyncio.run(processor.process_scan("warmup", "warmup", "warmup", frames, trajectory, depth))
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("import_open3d", _import_open3d),
+    ("load_classifier", _load_classifier),
+    ("import_pillow", _import_document_decoder),
+    ("synthetic_scan", _synthetic_scan),
+]
+
+_state = WarmupState()
+
+
+def warmup_state() -> WarmupState:
+    return _state
+
+
+def warm_up(
+    steps: Optional[List[Tuple[str, Callable[[], None]]]] = None,
+    state: Optional[WarmupState] = None,
+) -> WarmupState:
+    """Выполнить шаги прогрева (один раз на состояние); ошибка шага не мешает остальным."""
+    state = state if state is not None else _state
+    with state._lock:
+        if state.started:
+            return state
+        state.started = True
+    for name, step in steps if steps is not None else WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as exc:  # прогрев не должен ронять процесс
+            state.error = f"{name}: {exc}"
+        state.steps_ms[name] = round((time.perf_counter() - started) * 1000.0, 1)
+    state.done = True
+    return state
+
+
+def start_warmup_thread() -> threading.Thread:
+    """Запустить warm_up в фоновом потоке-демоне (не блокирует старт сервера)."""
+    thread = threading.Thread(target=warm_up, name="scan-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,18 +1,38 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
+from app.api.endpoints.health import router as health_router
+from app.api.endpoints.metrics import router as metrics_router
 from app.api.endpoints.scan import router as scan_router
+from app.core.config import settings
+from app.core.profiles import get_processing_profiles
+from app.core.warmup import start_warmup_thread
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Тяжёлые модули (open3d, модель) грузятся в фоне: сервер принимает соединения сразу
+    if settings.readiness.warmup_on_startup:
+        start_warmup_thread()
+    yield
 
 
 def create_app() -> FastAPI:
+    # Ошибка в файле профилей обработки или переменных окружения — при старте, а не в запросе
+    get_processing_profiles()
     app = FastAPI(
         title="PROFI-A Scan Service",
         version="1.0.0",
         docs_url="/docs",
         redoc_url="/redoc",
+        lifespan=lifespan,
     )
     app.include_router(scan_router, prefix="/api/v1/scan", tags=["scan"])
+    app.include_router(metrics_router, tags=["metrics"])
+    app.include_router(health_router, tags=["health"])
     return app
 
 
 app = create_app()
-
@@ -4,6 +4,6 @@
 # - размеры помещения, откосы (дверь/окно), плоскости короба по вертикали.
 
 from app.ml.features import extract_plane_features
-from app.ml.inference import run_scan_inference
+from app.ml.inference import run_batch_inference, run_scan_inference
 
-__all__ = ["extract_plane_features", "run_scan_inference"]
+__all__ = ["extract_plane_features", "run_batch_inference", "run_scan_inference"]
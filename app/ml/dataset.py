@@ -1,18 +1,33 @@
 """
 Датасет для обучения модели классификации плоскостей.
 Формат: директория с JSON-аннотациями и (опционально) сохранёнными признаками.
+
+Признаки каждого исходного файла (или облака точек) можно кэшировать на диске в колоночном
+бинарном формате: пара .npy (X — признаки, y — метки) с ключом из хэша содержимого и версии
+схемы признаков. Части сводятся в один файл X/y, который при обучении открывается через
+memory-map: датасет не загружается в память целиком, JSON повторно не разбирается.
 """
 from __future__ import annotations
 
+import hashlib
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from types import SimpleNamespace
+from typing import Callable, List, Optional, Tuple, TypeVar
 
 import numpy as np
 
-from app.ml.features import extract_plane_features
+from app.core.processing.precision import cloud_points
+from app.ml.features import FEATURE_COUNT, FEATURE_SCHEMA_VERSION, extract_plane_features
 from app.ml.model import PLANE_LABELS
 
+# Тип меток в кэше (фиксированная ширина — можно открывать через mmap)
+_LABEL_DTYPE = "<U16"
+
+T = TypeVar("T")
+
 
 def load_annotation_file(path: Path) -> List[Tuple[np.ndarray, str]]:
     """
@@ -48,52 +63,245 @@ def save_annotation_file(samples: List[Tuple[np.ndarray, str]], path: Path) -> N
     path.write_text(json.dumps({"planes": planes}, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
+def _file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Хэш содержимого файла (потоково, без чтения целиком в память)."""
+    h = hashlib.blake2b(digest_size=16)
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache_key(digest: str) -> str:
+    return f"{digest}-v{FEATURE_SCHEMA_VERSION}"
+
+
+def _cache_paths(cache_dir: Path, key: str) -> Tuple[Path, Path]:
+    return cache_dir / f"{key}.X.npy", cache_dir / f"{key}.y.npy"
+
+
+def _write_npy_atomic(path: Path, array: np.ndarray) -> None:
+    """Запись .npy через временный файл: параллельные процессы не увидят недописанный кэш."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as fh:
+        np.save(fh, array)
+    os.replace(tmp, path)
+
+
+def _store_cached(cache_dir: Path, key: str, X: np.ndarray, y: np.ndarray) -> Tuple[Path, Path]:
+    x_path, y_path = _cache_paths(cache_dir, key)
+    _write_npy_atomic(x_path, X)
+    _write_npy_atomic(y_path, y)
+    return x_path, y_path
+
+
+def _load_cached(x_path: Path, y_path: Path) -> Tuple[np.ndarray, np.ndarray]:
+    return np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r")
+
+
+def _samples_to_arrays(samples: List[Tuple[np.ndarray, str]]) -> Tuple[np.ndarray, np.ndarray]:
+    if not samples:
+        return np.empty((0, 0), dtype=np.float64), np.empty(0, dtype=_LABEL_DTYPE)
+    X = np.vstack([f for f, _ in samples]).astype(np.float64, copy=False)
+    y = np.array([label for _, label in samples], dtype=_LABEL_DTYPE)
+    return X, y
+
+
+def _featurize_annotation_file(
+    path: Path,
+    cache_dir: Optional[Path],
+) -> Optional[Tuple[object, object]]:
+    """
+    Обработать один *_planes.json (выполняется в процессе-воркере).
+    С cache_dir возвращает пути к .npy (через процессы передаются только пути),
+    без кэша — сами массивы. None — в файле нет примеров.
+    """
+    if cache_dir is not None:
+        key = _cache_key(_file_digest(path))
+        x_path, y_path = _cache_paths(cache_dir, key)
+        if x_path.exists() and y_path.exists():
+            return str(x_path), str(y_path)
+
+    X, y = _samples_to_arrays(load_annotation_file(path))
+    if cache_dir is not None:
+        x_path, y_path = _store_cached(cache_dir, key, X, y)
+        return str(x_path), str(y_path)
+    if y.size == 0:
+        return None
+    return X, y
+
+
+def _resolve_jobs(n_jobs: Optional[int]) -> int:
+    if n_jobs is None or n_jobs <= 0:
+        return max(1, os.cpu_count() or 1)
+    return n_jobs
+
+
+def _map_jobs(
+    fn: Callable[..., T],
+    args: List[Tuple[object, ...]],
+    n_jobs: Optional[int],
+) -> List[T]:
+    """fn(*a) для каждого набора аргументов: в пуле процессов при n_jobs > 1, иначе подряд."""
+    jobs = min(_resolve_jobs(n_jobs), max(1, len(args)))
+    if jobs <= 1:
+        return [fn(*a) for a in args]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(fn, *zip(*args), chunksize=max(1, len(args) // (jobs * 4))))
+
+
+def _empty_dataset() -> Tuple[np.ndarray, np.ndarray]:
+    return np.empty((0, FEATURE_COUNT)), np.empty(0, dtype=_LABEL_DTYPE)
+
+
+def _stack_parts(parts: List[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    parts = [(X, y) for X, y in parts if y.shape[0] > 0]
+    if not parts:
+        return _empty_dataset()
+    X = np.concatenate([X for X, _ in parts], axis=0)
+    y = np.concatenate([y for _, y in parts])
+    return X, y
+
+
+def _consolidate_cached(
+    cache_dir: Path,
+    cached: List[Tuple[Path, Path]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Сводный X/y по кэшам отдельных источников — файл на диске, открытый через memory-map:
+    датасет не загружается в память целиком. Ключ — список ключей частей в порядке сборки,
+    поэтому повторное обучение на тех же файлах только открывает готовую пару .npy.
+    """
+    names = "\n".join(x_path.name[: -len(".X.npy")] for x_path, _ in cached)
+    digest = hashlib.blake2b(names.encode("utf-8"), digest_size=16).hexdigest()
+    x_path, y_path = _cache_paths(cache_dir, f"dataset-{_cache_key(digest)}")
+    if x_path.exists() and y_path.exists():
+        return _load_cached(x_path, y_path)
+
+    parts = [_load_cached(*paths) for paths in cached]
+    parts = [(X, y) for X, y in parts if y.shape[0] > 0]
+    if not parts:
+        return _empty_dataset()
+    rows = sum(y.shape[0] for _, y in parts)
+    tmp = x_path.with_name(f"{x_path.name}.{os.getpid()}.tmp")
+    out = np.lib.format.open_memmap(
+        tmp, mode="w+", dtype=np.float64, shape=(rows, parts[0][0].shape[1])
+    )
+    offset = 0
+    for X, _ in parts:
+        out[offset:offset + X.shape[0]] = X
+        offset += X.shape[0]
+    out.flush()
+    del out
+    os.replace(tmp, x_path)
+    _write_npy_atomic(y_path, np.concatenate([y for _, y in parts]))
+    return _load_cached(x_path, y_path)
+
+
+def _collect(
+    results: List[Optional[Tuple[object, object]]],
+    cache_dir: Optional[Path],
+) -> Tuple[np.ndarray, np.ndarray]:
+    items = [item for item in results if item is not None]
+    if cache_dir is not None:
+        return _consolidate_cached(cache_dir, [(Path(x), Path(y)) for x, y in items])
+    return _stack_parts(items)
+
+
 def build_dataset_from_scan_dirs(
     scan_dirs: List[Path],
     annotation_suffix: str = "_planes.json",
-) -> Tuple[np.ndarray, List[str]]:
+    cache_dir: Optional[Path] = None,
+    n_jobs: Optional[int] = 1,
+) -> Tuple[np.ndarray, np.ndarray]:
     """
     Собрать X, y из нескольких директорий сканов.
     В каждой директории ожидается файл *_planes.json с аннотациями плоскостей.
-    """
-    X_list: List[np.ndarray] = []
-    y_list: List[str] = []
 
+    cache_dir: директория кэша признаков (.npy по хэшу файла и версии схемы признаков);
+        X и y возвращаются как memory-map сводного файла кэша.
+    n_jobs: число процессов для разбора файлов (1 — последовательно, None/<=0 — все ядра).
+    """
+    files: List[Path] = []
     for d in scan_dirs:
         if not d.is_dir():
             continue
-        for f in d.glob("*" + annotation_suffix):
-            for feat, label in load_annotation_file(f):
-                X_list.append(feat)
-                y_list.append(label)
+        files.extend(sorted(d.glob("*" + annotation_suffix)))
+
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+
+    results = _map_jobs(_featurize_annotation_file, [(f, cache_dir) for f in files], n_jobs)
+    return _collect(results, cache_dir)
+
+
+def _point_cloud_cache_key(
+    points: np.ndarray,
+    planes: List[List[object]],
+    labels: List[str],
+    distance_threshold: float,
+) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(points).tobytes())
+    payload = [planes, labels, distance_threshold]
+    h.update(json.dumps(payload, default=lambda o: np.asarray(o).tolist()).encode("utf-8"))
+    return _cache_key(h.hexdigest())
 
-    if not X_list:
-        return np.empty((0, 15)), []
 
-    X = np.vstack(X_list)
-    return X, y_list
+def _featurize_point_cloud(
+    points: np.ndarray,
+    planes: List[List[object]],
+    labels: List[str],
+    distance_threshold: float,
+    cache_dir: Optional[Path],
+) -> Optional[Tuple[object, object]]:
+    """
+    Признаки плоскостей одного облака (выполняется в процессе-воркере). Возвращает то же,
+    что _featurize_annotation_file: пути к .npy с cache_dir, иначе массивы.
+    """
+    if cache_dir is not None:
+        key = _point_cloud_cache_key(points, planes, labels, distance_threshold)
+        x_path, y_path = _cache_paths(cache_dir, key)
+        if x_path.exists() and y_path.exists():
+            return str(x_path), str(y_path)
+
+    samples: List[Tuple[np.ndarray, str]] = []
+    extracted = extract_plane_features(SimpleNamespace(points=points), planes, distance_threshold)
+    for (feat, _, _), label in zip(extracted, labels):
+        if label in PLANE_LABELS:
+            samples.append((feat, label))
+    X, y = _samples_to_arrays(samples)
+    if cache_dir is not None:
+        x_path, y_path = _store_cached(cache_dir, key, X, y)
+        return str(x_path), str(y_path)
+    if y.size == 0:
+        return None
+    return X, y
 
 
 def build_dataset_from_point_clouds(
     scan_list: List[Tuple[object, List[List[object]], List[str]]],
     distance_threshold: float = 0.05,
-) -> Tuple[np.ndarray, List[str]]:
+    cache_dir: Optional[Path] = None,
+    n_jobs: Optional[int] = 1,
+) -> Tuple[np.ndarray, np.ndarray]:
     """
     Собрать датасет из списка (point_cloud, planes, labels_per_plane).
     labels_per_plane: метка для каждой плоскости в том же порядке, что и planes.
+
+    cache_dir: кэш признаков по хэшу облака, плоскостей и версии схемы признаков —
+        extract_plane_features не пересчитывается при повторном обучении; X и y — memory-map.
+    n_jobs: число процессов для извлечения признаков (как в build_dataset_from_scan_dirs).
     """
-    X_list: List[np.ndarray] = []
-    y_list: List[str] = []
+    if cache_dir is not None:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
 
-    for point_cloud, planes, labels in scan_list:
-        if len(labels) != len(planes):
-            continue
-        extracted = extract_plane_features(point_cloud, planes, distance_threshold)
-        for (feat, _, _), label in zip(extracted, labels):
-            if label in PLANE_LABELS:
-                X_list.append(feat)
-                y_list.append(label)
-
-    if not X_list:
-        return np.empty((0, 15)), []
-    return np.vstack(X_list), y_list
+    args: List[Tuple[object, ...]] = [
+        (cloud_points(point_cloud), planes, labels, distance_threshold, cache_dir)
+        for point_cloud, planes, labels in scan_list
+        if len(labels) == len(planes)
+    ]
+    results = _map_jobs(_featurize_point_cloud, args, n_jobs)
+    return _collect(results, cache_dir)
@@ -1,36 +1,355 @@
 """
 Анализ документа для пути фото3д/сканировать: параметры (ширина, длина) и распознавание содержимого.
 В т.ч. инженерные коммуникации (трубы, кабели, вентиляция, электропроводка).
-Встраиваемая ИИ-модель для сканера документа.
+
+Конвейер на NumPy, без временных файлов:
+  1. декодирование прямо из байтов загрузки (Pillow; у JPEG декодируется только яркость);
+  2. детекция листа на уровне пирамиды со стороной ≤ DETECT_MAX_SIDE_PX: порог Отсу,
+     крупнейшая светлая компонента, четырёхугольник по экстремумам в собственных осях листа;
+  3. уточнение углов только в маленьких окнах полного разрешения вокруг грубых оценок;
+  4. размеры: соотношение сторон листа → ближайший стандартный формат (эталон)
+     либо масштаб по известной ширине листа (reference_width_mm);
+  5. содержимое (текст, таблица, чертёж) — по сериям «чернил» на уровне ≤ CONTENT_MAX_SIDE_PX.
+Встраиваемая ИИ-модель может заменить шаг 5 (см. README_DOCUMENT.md).
 """
 from __future__ import annotations
 
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
 
+from app.core.processing.image_decode import decode_image
+from app.ml.openings import binary_closing, label_runs, mask_runs
 from app.models.schemas import (
     ContentLabel,
+    DocumentBatchSummary,
+    DocumentPageResult,
     DocumentScanResult,
     RecognizedContentItem,
 )
 
+# Наибольшая сторона уровня пирамиды для поиска листа и для анализа содержимого (px)
+DETECT_MAX_SIDE_PX = 512
+CONTENT_MAX_SIDE_PX = 1024
+# Полуразмер окна уточнения угла в пикселях уровня детекции
+REFINE_RADIUS_PX = 3
+# Лист меньше этой доли кадра не считается найденным — берётся весь кадр
+MIN_DOCUMENT_AREA_FRACTION = 0.05
+# Относительный допуск совпадения соотношения сторон со стандартным форматом
+FORMAT_ASPECT_TOLERANCE = 0.04
+
+# Стандартные форматы: (короткая, длинная) сторона в мм. У серии A соотношение сторон одно (√2),
+# поэтому без эталона выбирается A4 — самый частый формат документов.
+PAPER_FORMATS_MM: Dict[str, Tuple[float, float]] = {
+    "A4": (210.0, 297.0),
+    "Letter": (215.9, 279.4),
+    "Legal": (215.9, 355.6),
+}
+DEFAULT_WIDTH_MM = PAPER_FORMATS_MM["A4"][0]
+
+# «Чернила» — пиксели темнее фона листа не менее чем на INK_CONTRAST уровней яркости
+INK_CONTRAST = 60
+# Серия чернил длиннее этой доли ширины (высоты) листа — линия чертежа/таблицы
+LINE_MIN_FRACTION = 0.25
+# Строка считается строкой текста, если доля чернил в ней (без длинных линий) выше порога
+TEXT_ROW_INK_FRACTION = 0.02
+
+# Общий пул потоков для пакетного анализа: декодирование Pillow и операции NumPy отпускают GIL
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+ENGINEERING_LABELS = {"инженерные_коммуникации", "трубы", "кабели", "вентиляция", "электропроводка"}
+# Классификатор содержимого распознаёт инженерные коммуникации (поле engineering_detection
+# ответа). Встроенный (_classify_content) их не выдаёт, поэтому has_engineering_communications=False
+# у него значит «не найдены встроенным классификатором». Модель с метками ENGINEERING_LABELS
+# включает флаг.
+ENGINEERING_DETECTION = False
+
+# Угол → знаки (sa, sb): угол — максимум sa·a + sb·b в собственных осях листа
+# (a — вдоль длинной стороны)
+_CORNER_SIGNS = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]], dtype=np.float64)
 
-def _analyze_image_stub(
-    image_path: Path,
-) -> Tuple[float, float, List[Tuple[str, float]]]:
+
+def _decode_gray(data: bytes) -> Optional[object]:
     """
-    Заглушка анализа изображения. Возвращает (width_mm, length_mm, [(label, confidence), ...]).
-    Реальная реализация: подставить вызов ИИ-модели (классификация + детекция + OCR/размеры).
+    Декодировать изображение из байтов в PIL.Image режима L; None — нет Pillow, файл не
+    читается или слишком велик (image_decode.decode_image).
     """
-    # По размеру файла или разрешению можно грубо оценить «документ»; для точных размеров нужна эталонная линейка в кадре или модель.
-    width_mm = 210.0  # A4 по умолчанию
-    length_mm = 297.0
-    # Заглушка распознавания: предполагаем возможное наличие инженерских коммуникаций
-    content: List[Tuple[str, float]] = [
-        ("инженерные_коммуникации", 0.5),
-        ("схема", 0.4),
-    ]
-    return width_mm, length_mm, content
+    return decode_image(data, _load_gray)
+
+
+def _load_gray(img: object) -> object:
+    # JPEG: декодер отдаёт только яркостный канал, без перевода YCbCr → RGB.
+    img.draft("L", img.size)
+    if img.mode != "L":
+        img = img.convert("L")
+    img.load()
+    return img
+
+
+def _pyramid_level(img: object, max_side: int) -> Tuple[np.ndarray, int]:
+    """Уровень пирамиды (усреднение блоками factor×factor) со стороной ≤ max_side и его factor."""
+    factor = max(1, int(np.ceil(max(img.size) / float(max_side))))
+    level = img.reduce(factor) if factor > 1 else img
+    return np.asarray(level, dtype=np.uint8), factor
+
+
+def _box_blur3(gray: np.ndarray) -> np.ndarray:
+    """Сглаживание 3×3 (края — повтором), результат float32."""
+    padded = np.pad(gray.astype(np.float32), 1, mode="edge")
+    h, w = gray.shape
+    out = np.zeros((h, w), dtype=np.float32)
+    for dr in range(3):
+        for dc in range(3):
+            out += padded[dr:dr + h, dc:dc + w]
+    return out / 9.0
+
+
+def _otsu_threshold(gray: np.ndarray) -> float:
+    """Порог Отсу по гистограмме 0..255."""
+    values = np.clip(gray, 0, 255).astype(np.uint8).ravel()
+    hist = np.bincount(values, minlength=256).astype(np.float64)
+    p = hist / max(hist.sum(), 1.0)
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * np.arange(256))
+    denom = omega * (1.0 - omega)
+    sigma_b = np.where(denom > 1e-12, (mu[-1] * omega - mu) ** 2 / np.maximum(denom, 1e-12), 0.0)
+    return float(np.argmax(sigma_b)) + 0.5
+
+
+def _largest_component_runs(
+    mask: np.ndarray,
+) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Серии (row, start, end) крупнейшей связной компоненты маски."""
+    rows, starts, ends = mask_runs(mask)
+    if rows.size == 0:
+        return None
+    labels = label_runs(rows, starts, ends)
+    _, inverse = np.unique(labels, return_inverse=True)
+    areas = np.bincount(inverse, weights=ends - starts)
+    keep = inverse == int(np.argmax(areas))
+    return rows[keep], starts[keep], ends[keep]
+
+
+def _runs_orientation(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> float:
+    """Угол главной оси области, заданной сериями (моменты считаются по сериям аналитически)."""
+    s = starts.astype(np.float64)
+    e = ends.astype(np.float64) - 1.0
+    r = rows.astype(np.float64)
+    n = e - s + 1.0
+    sx = (s + e) * n / 2.0
+    sxx = (e * (e + 1) * (2 * e + 1) - (s - 1) * s * (2 * s - 1)) / 6.0
+    total = n.sum()
+    mx, my = sx.sum() / total, (r * n).sum() / total
+    cxx = sxx.sum() / total - mx * mx
+    cyy = (r * r * n).sum() / total - my * my
+    cxy = (r * sx).sum() / total - mx * my
+    return 0.5 * float(np.arctan2(2.0 * cxy, cxx - cyy))
+
+
+def _order_corners(corners: np.ndarray) -> np.ndarray:
+    """Упорядочить углы как [TL, TR, BR, BL] в координатах изображения (y вниз)."""
+    center = corners.mean(axis=0)
+    angles = np.arctan2(corners[:, 1] - center[1], corners[:, 0] - center[0])
+    ordered = corners[np.argsort(angles)]
+    return np.roll(ordered, -int(np.argmin(ordered.sum(axis=1))), axis=0)
+
+
+def _coarse_quad(
+    level: np.ndarray,
+) -> Tuple[Optional[np.ndarray], float, float]:
+    """
+    Четырёхугольник листа на уровне детекции: (углы (4, 2) в px уровня, угол осей листа, порог).
+    Углы — None, если светлой компоненты достаточной площади нет.
+    """
+    smooth = _box_blur3(level)
+    threshold = _otsu_threshold(smooth)
+    component = _largest_component_runs(binary_closing(smooth > threshold))
+    if component is None:
+        return None, 0.0, threshold
+    rows, starts, ends = component
+    if float((ends - starts).sum()) < MIN_DOCUMENT_AREA_FRACTION * level.size:
+        return None, 0.0, threshold
+
+    theta = _runs_orientation(rows, starts, ends)
+    # Экстремумы линейной функции по области достигаются на концах серий.
+    xs = np.concatenate([starts, ends - 1]).astype(np.float64)
+    ys = np.concatenate([rows, rows]).astype(np.float64)
+    a = xs * np.cos(theta) + ys * np.sin(theta)
+    b = -xs * np.sin(theta) + ys * np.cos(theta)
+    score = _CORNER_SIGNS[:, :1] * a[None, :] + _CORNER_SIGNS[:, 1:] * b[None, :]
+    idx = np.argmax(score, axis=1)
+    return np.column_stack([xs[idx], ys[idx]]), theta, threshold
+
+
+def _refine_corners(
+    img: object,
+    corners_level: np.ndarray,
+    factor: int,
+    theta: float,
+    threshold: float,
+) -> np.ndarray:
+    """
+    Уточнить углы в окнах полного разрешения вокруг грубых оценок (порядок углов — как
+    в _CORNER_SIGNS).
+    Из полного изображения вырезаются только окна; весь кадр в NumPy не копируется.
+    """
+    full_w, full_h = img.size
+    corners = (corners_level + 0.5) * factor - 0.5
+    if factor == 1:
+        return corners
+    radius = REFINE_RADIUS_PX * factor + 2
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    refined = corners.copy()
+    for i, (cx, cy) in enumerate(corners):
+        x0, y0 = max(0, int(cx) - radius), max(0, int(cy) - radius)
+        x1, y1 = min(full_w, int(cx) + radius + 1), min(full_h, int(cy) + radius + 1)
+        if x1 - x0 < 3 or y1 - y0 < 3:
+            continue
+        patch = np.asarray(img.crop((x0, y0, x1, y1)), dtype=np.uint8)
+        py, px = np.nonzero(_box_blur3(patch) > threshold)
+        if px.size == 0 or px.size == patch.size:
+            continue
+        xs, ys = px + float(x0), py + float(y0)
+        # Угол сохраняет свой «знак» из грубой оценки — экстремум той же функции внутри окна.
+        a = xs * cos_t + ys * sin_t
+        b = -xs * sin_t + ys * cos_t
+        sa, sb = _CORNER_SIGNS[i]
+        j = int(np.argmax(sa * a + sb * b))
+        refined[i] = (xs[j], ys[j])
+    return refined
+
+
+def _quad_sides(corners: np.ndarray) -> Tuple[float, float]:
+    """Средние длины противоположных сторон [TL, TR, BR, BL]: (горизонтальная, вертикальная)."""
+    tl, tr, br, bl = corners
+    horizontal = 0.5 * (np.linalg.norm(tr - tl) + np.linalg.norm(br - bl))
+    vertical = 0.5 * (np.linalg.norm(bl - tl) + np.linalg.norm(br - tr))
+    return float(horizontal), float(vertical)
+
+
+def estimate_size_mm(
+    aspect: float,
+    reference_width_mm: Optional[float] = None,
+) -> Tuple[float, float, Optional[str]]:
+    """
+    Размеры листа по соотношению сторон (длинная / короткая ≥ 1).
+
+    reference_width_mm: известная ширина (короткая сторона) листа — масштаб берётся из неё.
+    Без неё эталон — ближайший стандартный формат (PAPER_FORMATS_MM) в пределах допуска;
+    если формат не найден, ширина принимается равной ширине A4.
+
+    Returns:
+        (width_mm, length_mm, paper_format или None)
+    """
+    aspect = max(float(aspect), 1.0)
+    if reference_width_mm is not None and reference_width_mm > 0:
+        return float(reference_width_mm), float(reference_width_mm) * aspect, None
+    best_name, best_err = None, FORMAT_ASPECT_TOLERANCE
+    for name, (short, long) in PAPER_FORMATS_MM.items():
+        err = abs(aspect / (long / short) - 1.0)
+        if err <= best_err:
+            best_name, best_err = name, err
+    if best_name is not None:
+        short, long = PAPER_FORMATS_MM[best_name]
+        return short, long, best_name
+    return DEFAULT_WIDTH_MM, DEFAULT_WIDTH_MM * aspect, None
+
+
+def _homography(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Гомография 3×3, переводящая 4 точки src в 4 точки dst (DLT, h33 = 1)."""
+    A = np.zeros((8, 8))
+    rhs = np.zeros(8)
+    for i, ((x, y), (u, v)) in enumerate(zip(src, dst)):
+        A[2 * i] = [x, y, 1, 0, 0, 0, -u * x, -u * y]
+        A[2 * i + 1] = [0, 0, 0, x, y, 1, -v * x, -v * y]
+        rhs[2 * i], rhs[2 * i + 1] = u, v
+    return np.append(np.linalg.solve(A, rhs), 1.0).reshape(3, 3)
+
+
+def _rectify(gray: np.ndarray, corners: np.ndarray, size: Tuple[float, float]) -> np.ndarray:
+    """
+    Выпрямить лист: выборка (ближайший пиксель) по гомографии из прямоугольника size = (w, h)
+    в четырёхугольник corners [TL, TR, BR, BL]. Поля 4% отсекают край листа и тень от него.
+    """
+    out_w, out_h = max(int(round(size[0])), 1), max(int(round(size[1])), 1)
+    rect = np.array(
+        [[0, 0], [out_w - 1, 0], [out_w - 1, out_h - 1], [0, out_h - 1]], dtype=np.float64
+    )
+    try:
+        H = _homography(rect, corners)
+    except np.linalg.LinAlgError:
+        return np.empty((0, 0), dtype=gray.dtype)
+    mx, my = int(out_w * 0.04), int(out_h * 0.04)
+    xs = np.arange(mx, out_w - mx, dtype=np.float64)
+    ys = np.arange(my, out_h - my, dtype=np.float64)
+    # Строки гомографии раскладываются по осям: H·(x, y, 1) = H[:, 0]·x + H[:, 1]·y + H[:, 2].
+    den = (H[2, 0] * xs)[None, :] + (H[2, 1] * ys + H[2, 2])[:, None]
+    px = ((H[0, 0] * xs)[None, :] + (H[0, 1] * ys + H[0, 2])[:, None]) / den
+    py = ((H[1, 0] * xs)[None, :] + (H[1, 1] * ys + H[1, 2])[:, None]) / den
+    h, w = gray.shape
+    px = np.clip(np.rint(px), 0, w - 1).astype(np.intp)
+    py = np.clip(np.rint(py), 0, h - 1).astype(np.intp)
+    return gray[py, px]
+
+
+def _line_bands(long_rows: np.ndarray, n_rows: int) -> int:
+    """
+    Число полос из подряд идущих строк, содержащих длинную серию (одна линия толщиной
+    в несколько px).
+    """
+    present = np.zeros(n_rows + 1, dtype=np.int8)
+    present[1:][long_rows] = 1
+    return int(np.count_nonzero(np.diff(present) == 1))
+
+
+def _text_bands(lines: np.ndarray, lengths: np.ndarray, n_lines: int, line_len: int) -> int:
+    """Число полос подряд идущих строк с долей чернил коротких серий выше TEXT_ROW_INK_FRACTION."""
+    ink = np.bincount(lines, weights=lengths, minlength=n_lines) / line_len
+    return _line_bands(np.flatnonzero(ink > TEXT_ROW_INK_FRACTION), n_lines)
+
+
+def _classify_content(gray: np.ndarray) -> List[Tuple[str, float]]:
+    """
+    Распознавание содержимого листа по «чернилам»: длинные горизонтальные/вертикальные серии —
+    линии (таблица, чертёж), чередование строк с короткими сериями — текст.
+    Возвращает [(label, confidence), ...].
+    """
+    h, w = gray.shape
+    if h < 8 or w < 8:
+        return []
+    paper = float(np.percentile(gray, 90))
+    # Закрытие 3×3 склеивает тонкие линии, разорванные выборкой при выпрямлении.
+    ink = binary_closing(gray < paper - INK_CONTRAST)
+    if not ink.any():
+        return []
+
+    rows, starts, ends = mask_runs(ink)
+    long_h = (ends - starts) >= LINE_MIN_FRACTION * w
+    n_h = _line_bands(np.unique(rows[long_h]), h)
+    cols, c_starts, c_ends = mask_runs(ink.T)
+    long_v = (c_ends - c_starts) >= LINE_MIN_FRACTION * h
+    n_v = _line_bands(np.unique(cols[long_v]), w)
+
+    # Строки текста — полосы строк (или столбцов, если лист повёрнут на 90°) с короткими сериями.
+    n_text = max(
+        _text_bands(rows[~long_h], (ends - starts)[~long_h], h, w),
+        _text_bands(cols[~long_v], (c_ends - c_starts)[~long_v], w, h),
+    )
+
+    content: List[Tuple[str, float]] = []
+    if n_h >= 3 and n_v >= 3:
+        content.append(("таблица", min(0.9, 0.5 + 0.05 * (min(n_h, n_v) - 3))))
+    elif n_h + n_v >= 2:
+        content.append(("чертёж", min(0.8, 0.4 + 0.05 * (n_h + n_v - 2))))
+    if n_text >= 3:
+        content.append(("текст", min(0.9, 0.4 + 0.05 * (n_text - 3))))
+    if not content:
+        content.append(("другое", 0.3))
+    return content
 
 
 def _ensure_content_label(s: str) -> ContentLabel:
@@ -52,40 +371,81 @@ def _ensure_content_label(s: str) -> ContentLabel:
     return s if s in allowed else "другое"
 
 
-def analyze_document(
-    image_path: str | Path,
+def _has_engineering(content: Iterable[RecognizedContentItem]) -> bool:
+    return any(item.label in ENGINEERING_LABELS and item.confidence >= 0.3 for item in content)
+
+
+def _empty_result(scan_id: str) -> DocumentScanResult:
+    return DocumentScanResult(
+        scan_id=scan_id,
+        width_mm=0.0,
+        length_mm=0.0,
+        content=[],
+        has_engineering_communications=False,
+        engineering_detection=ENGINEERING_DETECTION,
+    )
+
+
+def analyze_document_bytes(
+    data: bytes,
     scan_id: str = "",
+    reference_width_mm: Optional[float] = None,
 ) -> DocumentScanResult:
     """
-    Анализ одного изображения документа: ширина, длина, распознавание содержимого
-    (инженерные коммуникации, трубы, кабели, схема и т.д.).
+    Анализ изображения документа, переданного байтами (JPEG/PNG): углы листа, ширина, длина,
+    распознавание содержимого. Файл на диск не пишется.
+
+    Args:
+        data: содержимое файла изображения
+        scan_id: идентификатор сканирования
+        reference_width_mm: известная ширина листа (мм); без неё — по стандартному формату
 
-    Вход: путь к файлу изображения (JPEG/PNG).
-    Выход: DocumentScanResult с width_mm, length_mm и списком content.
+    Returns:
+        DocumentScanResult; при нечитаемом изображении — нулевые размеры и пустое содержимое.
     """
-    path = Path(image_path)
-    if not path.is_file():
-        return DocumentScanResult(
-            scan_id=scan_id,
-            width_mm=0.0,
-            length_mm=0.0,
-            content=[],
-            has_engineering_communications=False,
+    img = _decode_gray(data) if data else None
+    if img is None:
+        return _empty_result(scan_id)
+    full_w, full_h = img.size
+
+    level, factor = _pyramid_level(img, DETECT_MAX_SIDE_PX)
+    coarse, theta, threshold = _coarse_quad(level)
+    if coarse is None:
+        # Лист не отделяется от фона (скан «в край» или однотонный кадр) — лист занимает весь кадр.
+        corners = np.array(
+            [[0, 0], [full_w - 1, 0], [full_w - 1, full_h - 1], [0, full_h - 1]],
+            dtype=np.float64,
         )
+    else:
+        corners = _order_corners(_refine_corners(img, coarse, factor, theta, threshold))
+
+    side_h, side_v = _quad_sides(corners)
+    aspect = max(side_h, side_v) / max(min(side_h, side_v), 1.0)
+    width_mm, length_mm, paper_format = estimate_size_mm(aspect, reference_width_mm)
 
-    width_mm, length_mm, raw_content = _analyze_image_stub(path)
+    content_level, content_factor = _pyramid_level(img, CONTENT_MAX_SIDE_PX)
+    raw_content = _classify_content(_rectify(
+        content_level,
+        (corners + 0.5) / content_factor - 0.5,
+        (side_h / content_factor, side_v / content_factor),
+    ))
+
+    bbox = [
+        float(corners[:, 0].min()) / full_w,
+        float(corners[:, 1].min()) / full_h,
+        float(corners[:, 0].max() + 1) / full_w,
+        float(corners[:, 1].max() + 1) / full_h,
+    ]
+    bbox = [min(max(v, 0.0), 1.0) for v in bbox]
     content_list: List[RecognizedContentItem] = [
         RecognizedContentItem(
             label=_ensure_content_label(label),
             confidence=conf,
+            bbox=bbox,
         )
         for label, conf in raw_content
     ]
-    engineering_labels = {"инженерные_коммуникации", "трубы", "кабели", "вентиляция", "электропроводка"}
-    has_eng = any(
-        item.label in engineering_labels and item.confidence >= 0.3
-        for item in content_list
-    )
+    has_eng = _has_engineering(content_list)
 
     return DocumentScanResult(
         scan_id=scan_id,
@@ -93,4 +453,72 @@ def analyze_document(
         length_mm=length_mm,
         content=content_list,
         has_engineering_communications=has_eng,
+        engineering_detection=ENGINEERING_DETECTION,
+        paper_format=paper_format,
+        corners=[[float(x) / full_w, float(y) / full_h] for x, y in corners],
+    )
+
+
+def analyze_document(
+    image_path: str | Path,
+    scan_id: str = "",
+    reference_width_mm: Optional[float] = None,
+) -> DocumentScanResult:
+    """
+    Анализ одного изображения документа по пути к файлу (JPEG/PNG).
+    Обёртка над analyze_document_bytes.
+    """
+    path = Path(image_path)
+    if not path.is_file():
+        return _empty_result(scan_id)
+    return analyze_document_bytes(
+        path.read_bytes(), scan_id=scan_id, reference_width_mm=reference_width_mm
+    )
+
+
+def get_document_executor(max_workers: int) -> ThreadPoolExecutor:
+    """
+    Пул потоков для анализа страниц (создаётся один раз на процесс).
+    Общий для всех запросов — ограничивает суммарную загрузку CPU пакетными запросами.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, max_workers),
+                thread_name_prefix="document-analyzer",
+            )
+        return _executor
+
+
+def summarize_document_batch(
+    scan_id: str,
+    pages: List[DocumentPageResult],
+    elapsed_s: float,
+) -> DocumentBatchSummary:
+    """
+    Сводка по страницам пакета: по каждой метке — максимальный confidence (bbox не переносится,
+    он относится к своей странице); инженерные коммуникации — если есть хотя бы на одной странице.
+    engineering_detection — их распознавали на всех успешно разобранных страницах.
+    """
+    best: Dict[str, float] = {}
+    has_eng = False
+    analysed = [page for page in pages if page.error is None]
+    for page in pages:
+        has_eng = has_eng or page.result.has_engineering_communications
+        for item in page.result.content:
+            best[item.label] = max(best.get(item.label, 0.0), item.confidence)
+    content = [
+        RecognizedContentItem(label=label, confidence=conf)
+        for label, conf in sorted(best.items(), key=lambda kv: -kv[1])
+    ]
+    return DocumentBatchSummary(
+        scan_id=scan_id,
+        pages_count=len(pages),
+        failed_pages=sum(1 for page in pages if page.error is not None),
+        content=content,
+        has_engineering_communications=has_eng or _has_engineering(content),
+        engineering_detection=bool(analysed)
+        and all(page.result.engineering_detection for page in analysed),
+        processing_time_ms=elapsed_s * 1000.0,
     )
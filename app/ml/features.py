@@ -8,115 +8,242 @@ from typing import List, Optional, Tuple
 
 import numpy as np
 
-
-def _plane_distance(points: np.ndarray, normal: np.ndarray, d: float) -> np.ndarray:
-    """Расстояние от точек до плоскости n·x + d = 0."""
-    return np.abs(points @ np.asarray(normal, dtype=np.float64) + d)
+from app.core.processing.precision import cloud_points
+
+# Версия схемы вектора признаков: увеличивать при любом изменении состава/порядка признаков,
+# чтобы закэшированные датасеты (dataset.py) пересчитывались.
+# v1 — 14 признаков; v2 — те же 14 на прежних местах + моменты, extents в (u, v), плотность, дыры.
+FEATURE_SCHEMA_VERSION = 2
+FEATURE_COUNT = 21
+
+FEATURE_NAMES = [
+    "normal_x", "normal_y", "normal_z",
+    "centroid_x", "centroid_y", "centroid_z",
+    "height_y", "extent_x", "extent_z",
+    "area_approx",
+    "aspect",
+    "is_horizontal",
+    "is_vertical",
+    "log_inliers",
+    # v2
+    "planarity",        # (λ2 - λ3) / λ1
+    "linearity",        # (λ1 - λ2) / λ1
+    "thickness_m",      # sqrt(λ3): разброс точек поперёк плоскости
+    "extent_u",         # размах в собственной системе плоскости (u — горизонталь для стен)
+    "extent_v",
+    "density_per_m2",   # точек на м² прямоугольника (u, v)
+    "hole_ratio",       # доля пустых ячеек сетки occupancy внутри прямоугольника (u, v)
+]
+
+# Размер ячейки сетки (м) для оценки доли дыр в плоскости
+HOLE_CELL_SIZE_M = 0.1
+
+
+def _parse_planes(planes: List[List[object]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Нормированные нормали (k, 3) и смещения d (k,) для корректных элементов [normal, d]."""
+    normals: List[np.ndarray] = []
+    offsets: List[float] = []
+    for plane_item in planes:
+        if not isinstance(plane_item, list) or len(plane_item) != 2:
+            continue
+        normal_raw, d_raw = plane_item[0], plane_item[1]
+        try:
+            normal = np.asarray(normal_raw, dtype=np.float64)
+            if normal.shape != (3,):
+                continue
+            nnorm = np.linalg.norm(normal)
+            if nnorm < 1e-10:
+                continue
+            normals.append(normal / nnorm)
+            offsets.append(float(d_raw) / nnorm)
+        except (TypeError, ValueError):
+            continue
+    if not normals:
+        return np.empty((0, 3), dtype=np.float64), np.empty(0, dtype=np.float64)
+    return np.vstack(normals), np.asarray(offsets, dtype=np.float64)
 
 
-def _inliers_for_plane(
-    points: np.ndarray,
-    normal: np.ndarray,
-    d: float,
-    distance_threshold: float = 0.05,
+def plane_basis(normals: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ортонормированный базис (u, v) в каждой плоскости, (k, 3) каждый.
+    Для стен u — горизонталь вдоль стены, v — вертикаль; для пола/потолка u опирается на ось X.
+    """
+    normals = np.asarray(normals, dtype=np.float64).reshape(-1, 3)
+    ref = np.tile(np.array([0.0, 1.0, 0.0]), (normals.shape[0], 1))
+    ref[np.abs(normals[:, 1]) >= 0.9] = [1.0, 0.0, 0.0]
+    u = np.cross(ref, normals)
+    u /= np.maximum(np.linalg.norm(u, axis=1, keepdims=True), 1e-12)
+    v = np.cross(normals, u)
+    return u, v
+
+
+def _grouped_hole_ratio(
+    u: np.ndarray,
+    v: np.ndarray,
+    group: np.ndarray,
+    u_min: np.ndarray,
+    v_min: np.ndarray,
+    extent_u: np.ndarray,
+    extent_v: np.ndarray,
+    cell_size: float,
 ) -> np.ndarray:
-    """Индексы точек, принадлежащих плоскости."""
-    dist = _plane_distance(points, normal, d)
-    return np.flatnonzero(dist <= distance_threshold)
-
-
-def _vertical_extent(inlier_points: np.ndarray) -> float:
-    """Высота по Y (вертикаль)."""
-    if inlier_points.size == 0:
-        return 0.0
-    return float(np.ptp(inlier_points[:, 1]))
-
+    """Доля пустых ячеек occupancy-сетки (u, v) каждой плоскости — один проход по всем точкам."""
+    nu = np.maximum(1, np.ceil(extent_u / cell_size).astype(np.int64))
+    nv = np.maximum(1, np.ceil(extent_v / cell_size).astype(np.int64))
+    cells_total = nu * nv
+    cell_offset = np.concatenate([[0], np.cumsum(cells_total)[:-1]])
 
-def _horizontal_extents(inlier_points: np.ndarray) -> Tuple[float, float]:
-    """Размах по X и Z (горизонталь)."""
-    if inlier_points.size == 0:
-        return 0.0, 0.0
-    return float(np.ptp(inlier_points[:, 0])), float(np.ptp(inlier_points[:, 2]))
+    cu = np.minimum(((u - u_min[group]) / cell_size).astype(np.int64), nu[group] - 1)
+    cv = np.minimum(((v - v_min[group]) / cell_size).astype(np.int64), nv[group] - 1)
+    occupied = np.zeros(int(cells_total.sum()), dtype=bool)
+    occupied[cell_offset[group] + cu * nv[group] + cv] = True
+    return 1.0 - np.add.reduceat(occupied, cell_offset) / cells_total
 
 
 def extract_plane_features(
     point_cloud: object,
     planes: List[List[object]],
     distance_threshold: float = 0.05,
+    dtype: type = np.float64,
 ) -> List[Tuple[np.ndarray, Optional[np.ndarray], int]]:
     """
     Для каждой плоскости из списка (формат [normal, d]) выделяет inlier-точки
-    и считает вектор признаков.
+    и считает вектор признаков (FEATURE_NAMES, версия FEATURE_SCHEMA_VERSION).
+
+    Все плоскости обрабатываются вместе: расстояния — одним матричным умножением,
+    принадлежность точек — пары (плоскость, точка), упорядоченные по плоскости,
+    статистики (суммы, моменты, min/max в (u, v)) — сгруппированными np.*.reduceat.
+    Точка может принадлежать нескольким плоскостям (как и при поплоскостном отборе).
 
     Args:
         point_cloud: Open3D PointCloud или объект с .points
         planes: список [normal, d], normal = [nx, ny, nz]
         distance_threshold: порог расстояния до плоскости (м)
+        dtype: точность точек и поточечной арифметики (np.float32 — вдвое меньше трафика памяти);
+            моменты накапливаются во float64, вектор признаков всегда float64
 
     Returns:
         Список (feature_vector, inlier_points, inlier_count) для каждой плоскости.
         inlier_points может быть None при отсутствии точек.
     """
-    try:
-        points = np.asarray(point_cloud.points, dtype=np.float64)
-    except Exception:
-        points = np.empty((0, 3), dtype=np.float64)
-
+    points = cloud_points(point_cloud, dtype)
     if points.size == 0:
         return []
 
-    result: List[Tuple[np.ndarray, Optional[np.ndarray], int]] = []
+    normals, offsets = _parse_planes(planes)
+    k = normals.shape[0]
+    if k == 0:
+        return []
 
-    for plane_item in planes:
-        if not isinstance(plane_item, list) or len(plane_item) != 2:
-            continue
-        normal_raw, d_raw = plane_item[0], plane_item[1]
-        try:
-            normal = np.asarray(normal_raw, dtype=np.float64)
-            if normal.shape != (3,):
-                continue
-            nnorm = np.linalg.norm(normal)
-            if nnorm < 1e-10:
-                continue
-            normal = normal / nnorm
-            d = float(d_raw) / nnorm
-        except (TypeError, ValueError):
-            continue
+    # Расстояния (k, n) покоординатно: для внутренней размерности 3 это быстрее matmul.
+    # Плоскость-major, поэтому flatnonzero сразу даёт пары, отсортированные по плоскости.
+    n_points = points.shape[0]
+    normals_p = normals.astype(points.dtype)
+    signed = np.multiply.outer(normals_p[:, 0], np.ascontiguousarray(points[:, 0]))
+    signed += np.multiply.outer(normals_p[:, 1], np.ascontiguousarray(points[:, 1]))
+    signed += np.multiply.outer(normals_p[:, 2], np.ascontiguousarray(points[:, 2]))
+    member = signed >= (-offsets - distance_threshold).astype(points.dtype)[:, None]
+    member &= signed <= (-offsets + distance_threshold).astype(points.dtype)[:, None]
+    flat = np.flatnonzero(member)
+    group = flat // n_points
+    point_idx = flat - group * n_points
+    counts = np.bincount(group, minlength=k)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    gathered = points[point_idx]
+
+    centroid = np.zeros((k, 3))
+    mins = np.zeros((k, 3))
+    maxs = np.zeros((k, 3))
+    cov = np.zeros((k, 3, 3))
+    u_min = np.zeros(k)
+    v_min = np.zeros(k)
+    extent_u = np.zeros(k)
+    extent_v = np.zeros(k)
+    hole_ratio = np.ones(k)
+    nonempty = counts > 0
+
+    if gathered.shape[0] > 0:
+        ne_starts = starts[nonempty]
+        ne_counts = counts[nonempty][:, None]
+        # Сдвиг к общему центру уменьшает потерю точности в E[xx^T] - E[x]E[x]^T.
+        shift = gathered.mean(axis=0, dtype=np.float64)
+        centered = gathered - shift.astype(gathered.dtype)
+        s1 = np.add.reduceat(centered, ne_starts, axis=0, dtype=np.float64)
+        # Вторые моменты: 6 уникальных произведений xx, yy, zz, xy, xz, yz.
+        products = centered[:, [0, 1, 2, 0, 0, 1]] * centered[:, [0, 1, 2, 1, 2, 2]]
+        s2 = np.add.reduceat(products, ne_starts, axis=0, dtype=np.float64) / ne_counts
+        mean_c = s1 / ne_counts
+        centroid[nonempty] = mean_c + shift
+        second = s2[:, [0, 3, 4, 3, 1, 5, 4, 5, 2]].reshape(-1, 3, 3)
+        cov[nonempty] = second - mean_c[:, :, None] * mean_c[:, None, :]
+        mins[nonempty] = np.minimum.reduceat(gathered, ne_starts, axis=0)
+        maxs[nonempty] = np.maximum.reduceat(gathered, ne_starts, axis=0)
+
+        basis_u, basis_v = plane_basis(normals)
+        pu = np.einsum("ij,ij->i", gathered, basis_u.astype(gathered.dtype)[group])
+        pv = np.einsum("ij,ij->i", gathered, basis_v.astype(gathered.dtype)[group])
+        u_min[nonempty] = np.minimum.reduceat(pu, ne_starts)
+        v_min[nonempty] = np.minimum.reduceat(pv, ne_starts)
+        extent_u[nonempty] = np.maximum.reduceat(pu, ne_starts) - u_min[nonempty]
+        extent_v[nonempty] = np.maximum.reduceat(pv, ne_starts) - v_min[nonempty]
+        hole_ratio = _grouped_hole_ratio(
+            pu, pv, group, u_min, v_min, extent_u, extent_v, HOLE_CELL_SIZE_M
+        )
+        hole_ratio[~nonempty] = 1.0
+
+    eig = np.linalg.eigvalsh(cov)[:, ::-1]  # λ1 >= λ2 >= λ3
+    eig = np.maximum(eig, 0.0)
+    lam1 = np.maximum(eig[:, 0], 1e-12)
+    planarity = (eig[:, 1] - eig[:, 2]) / lam1
+    linearity = (eig[:, 0] - eig[:, 1]) / lam1
+    thickness = np.sqrt(eig[:, 2])
+    density = counts / np.maximum(extent_u * extent_v, 1e-6)
+
+    extents = maxs - mins
+    height_y = extents[:, 1]
+    ext_x = extents[:, 0]
+    ext_z = extents[:, 2]
 
-        idx = _inliers_for_plane(points, normal, d, distance_threshold)
-        inlier_points = points[idx] if len(idx) > 0 else np.empty((0, 3))
-        n_inliers = len(idx)
+    result: List[Tuple[np.ndarray, Optional[np.ndarray], int]] = []
+    for i in range(k):
+        normal = normals[i]
+        n_inliers = int(counts[i])
 
         # Признаки
         ny = float(normal[1])
         is_horizontal = abs(ny) >= 0.8
         is_vertical = abs(ny) < 0.35
-
-        centroid = inlier_points.mean(axis=0) if inlier_points.size > 0 else np.zeros(3)
-        height_y = _vertical_extent(inlier_points)
-        ext_x, ext_z = _horizontal_extents(inlier_points)
+        h, ex, ez = float(height_y[i]), float(ext_x[i]), float(ext_z[i])
 
         # Площадь (приближение): для вертикальной плоскости = height * width (max of ext_x, ext_z)
         if is_vertical:
-            area_approx = height_y * max(ext_x, ext_z, 1e-6)
+            area_approx = h * max(ex, ez, 1e-6)
         else:
-            area_approx = ext_x * ext_z if (ext_x > 1e-6 and ext_z > 1e-6) else 0.0
+            area_approx = ex * ez if (ex > 1e-6 and ez > 1e-6) else 0.0
 
-        aspect = height_y / max(ext_x, ext_z, 1e-6) if is_vertical else max(ext_x, ext_z) / max(height_y, 1e-6)
+        aspect = h / max(ex, ez, 1e-6) if is_vertical else max(ex, ez) / max(h, 1e-6)
 
         # Вектор признаков для классификатора
         feature = np.array([
             normal[0], normal[1], normal[2],
-            centroid[0], centroid[1], centroid[2],
-            height_y, ext_x, ext_z,
+            centroid[i, 0], centroid[i, 1], centroid[i, 2],
+            h, ex, ez,
             area_approx,
             aspect,
             1.0 if is_horizontal else 0.0,
             1.0 if is_vertical else 0.0,
             np.log1p(n_inliers),
+            planarity[i],
+            linearity[i],
+            thickness[i],
+            extent_u[i],
+            extent_v[i],
+            density[i],
+            hole_ratio[i],
         ], dtype=np.float64)
 
-        result.append((feature, inlier_points if inlier_points.size > 0 else None, n_inliers))
+        inlier_points = gathered[starts[i]:starts[i] + n_inliers] if n_inliers else None
+        result.append((feature, inlier_points, n_inliers))
 
     return result
 
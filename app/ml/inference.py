@@ -4,25 +4,68 @@
 """
 from __future__ import annotations
 
-from typing import List, Optional, Tuple
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from pathlib import Path
-
+from app.core.instrumentation import span
 from app.ml.features import extract_plane_features
-from app.ml.model import PlaneClassifier
+from app.ml.model import PLANE_LABELS, PlaneClassifier
+from app.ml.openings import detect_wall_openings
 from app.models.schemas import Dimensions, FramePlane, Reveal
 
 _DEFAULT_MODEL_DIR = Path(__file__).resolve().parent / "models"
 
+# Один скан для пакетного вывода: (облако точек, плоскости [normal, d], размеры помещения)
+ScanInput = Tuple[object, List[List[object]], Dimensions]
+
+# Проём из дыры в стене считается дублем откоса от классификатора, если центры ближе (м)
+_OPENING_DEDUP_DISTANCE_M = 0.5
+
+
+# Загруженные модели: директория → (mtime meta.json, классификатор). Одна запись на каталог:
+# перезаписанная модель вытесняет прежнюю, а не копится в памяти
+_classifier_cache: Dict[str, Tuple[float, PlaneClassifier]] = {}
+_classifier_cache_lock = threading.Lock()
+
+
+def _load_classifier_cached(model_dir: Path) -> Optional[PlaneClassifier]:
+    """Модель из model_dir, загруженная один раз на процесс; None — в каталоге нет модели."""
+    try:
+        key = str(model_dir.resolve())
+        mtime = (model_dir / "meta.json").stat().st_mtime
+    except OSError:
+        return None
+    with _classifier_cache_lock:
+        cached = _classifier_cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        clf = PlaneClassifier(use_heuristic_only=True)
+        if not clf.load(str(model_dir)):
+            return None
+        _classifier_cache[key] = (mtime, clf)
+        return clf
+
 
 def _load_classifier_if_exists() -> Optional[PlaneClassifier]:
     """Загружает обученную модель из app/ml/models при наличии."""
-    clf = PlaneClassifier(use_heuristic_only=True)
-    if (_DEFAULT_MODEL_DIR / "meta.json").exists() and clf.load(str(_DEFAULT_MODEL_DIR)):
-        return clf
-    return None
+    return _load_classifier_cached(_DEFAULT_MODEL_DIR)
+
+
+def _resolve_classifier(
+    classifier: Optional[PlaneClassifier],
+    model_dir: Optional[str],
+) -> PlaneClassifier:
+    """Явно переданный классификатор, иначе модель из model_dir, иначе модель по умолчанию."""
+    if classifier is not None:
+        return classifier
+    if model_dir:
+        return _load_classifier_cached(Path(model_dir)) or PlaneClassifier(use_heuristic_only=True)
+    return _load_classifier_if_exists() or PlaneClassifier(use_heuristic_only=True)
 
 
 def _plane_extent_meters(inlier_points: Optional[np.ndarray]) -> Tuple[float, float, float]:
@@ -33,95 +76,194 @@ def _plane_extent_meters(inlier_points: Optional[np.ndarray]) -> Tuple[float, fl
     return float(np.ptp(p[:, 0])), float(np.ptp(p[:, 1])), float(np.ptp(p[:, 2]))
 
 
-def run_scan_inference(
-    point_cloud: object,
-    planes: List[List[object]],
-    dimensions: Dimensions,
-    classifier: Optional[PlaneClassifier] = None,
-    distance_threshold: float = 0.05,
-    reveal_min_confidence: float = 0.6,
-    frame_plane_min_confidence: float = 0.6,
-    model_dir: Optional[str] = None,
+def _layout_outputs(
+    extracted: List[Tuple[np.ndarray, Optional[np.ndarray], int]],
+    labels: Sequence[str],
+    reveal_min_confidence: float,
+    frame_plane_min_confidence: float,
 ) -> Tuple[List[Reveal], List[FramePlane]]:
-    """
-    По облаку точек и списку плоскостей определяет откосы (дверь/окно) и плоскости короба.
-    Элементы с confidence ниже порогов не включаются в результат.
-
-    Returns:
-        (reveals, frame_planes)
-    """
-    extracted = extract_plane_features(point_cloud, planes, distance_threshold)
-    if not extracted:
-        return [], []
-
-    if classifier is not None:
-        clf = classifier
-    elif model_dir:
-        clf = PlaneClassifier(use_heuristic_only=True)
-        if not clf.load(model_dir):
-            clf = PlaneClassifier(use_heuristic_only=True)
-    else:
-        clf = _load_classifier_if_exists() or PlaneClassifier(use_heuristic_only=True)
-    features = np.vstack([e[0] for e in extracted])
-    labels = clf.predict(features)
-
+    """Раскладка классифицированных плоскостей по разделам «Откосы» и «Короба»."""
     reveals: List[Reveal] = []
     frame_planes: List[FramePlane] = []
 
-    for (feat, inlier_pts, _), label in zip(extracted, labels):
+    for (_, inlier_pts, _), label in zip(extracted, labels):
+        if label not in ("door", "window", "reveal", "frame"):
+            continue
         w, h, d = _plane_extent_meters(inlier_pts)
         # Размеры в разумных пределах (метры)
         width_m = max(0.1, min(5.0, w + 0.05))
         height_m = max(0.1, min(4.0, h + 0.05))
         depth_m = max(0.0, min(1.0, d))
 
-        centroid = inlier_pts.mean(axis=0) if inlier_pts is not None and inlier_pts.size else np.zeros(3)
+        centroid = (
+            inlier_pts.mean(axis=0) if inlier_pts is not None and inlier_pts.size else np.zeros(3)
+        )
         pos = [float(centroid[0]), float(centroid[1]), float(centroid[2])]
 
         conf_reveal = 0.85 if label == "door" or label == "window" else 0.7
         conf_frame = 0.8
 
-        if label == "door":
-            if conf_reveal >= reveal_min_confidence:
-                reveals.append(Reveal(
-                    opening_type="door",
-                    width_m=width_m,
-                    height_m=height_m,
-                    depth_m=depth_m,
-                    position_3d=pos,
-                    confidence=conf_reveal,
-                ))
-        elif label == "window":
-            if conf_reveal >= reveal_min_confidence:
-                reveals.append(Reveal(
-                    opening_type="window",
-                    width_m=width_m,
-                    height_m=height_m,
-                    depth_m=depth_m,
-                    position_3d=pos,
-                    confidence=conf_reveal,
-                ))
-        elif label == "reveal":
+        if label in ("door", "window", "reveal"):
             if conf_reveal >= reveal_min_confidence:
                 reveals.append(Reveal(
-                    opening_type="window",
+                    opening_type="door" if label == "door" else "window",
                     width_m=width_m,
                     height_m=height_m,
                     depth_m=depth_m,
                     position_3d=pos,
                     confidence=conf_reveal,
                 ))
-        elif label == "frame":
-            if conf_frame >= frame_plane_min_confidence:
-                linear_m = height_m
-                frame_planes.append(FramePlane(
-                    width_m=width_m,
-                    height_m=height_m,
-                    linear_m=linear_m,
-                    position_3d=pos,
-                    direction=None,
-                    plane_index=len(frame_planes),
-                    confidence=conf_frame,
-                ))
+        elif conf_frame >= frame_plane_min_confidence:
+            frame_planes.append(FramePlane(
+                width_m=width_m,
+                height_m=height_m,
+                linear_m=height_m,
+                position_3d=pos,
+                direction=None,
+                plane_index=len(frame_planes),
+                confidence=conf_frame,
+            ))
 
     return reveals, frame_planes
+
+
+def _wall_openings(
+    extracted: List[Tuple[np.ndarray, Optional[np.ndarray], int]],
+    labels: Sequence[str],
+    existing: List[Reveal],
+    min_confidence: float,
+) -> List[Reveal]:
+    """Проёмы из дыр в стенах (openings.py) без дублей уже найденных классификатором откосов."""
+    # Подоконник отсчитывается от пола: самая низкая плоскость с меткой floor (centroid_y)
+    floors = [float(feat[4]) for (feat, _, _), label in zip(extracted, labels) if label == "floor"]
+    floor_height_m = min(floors) if floors else None
+    found: List[Reveal] = []
+    for (feat, inlier_pts, _), label in zip(extracted, labels):
+        if label != "wall" or feat[12] < 0.5:  # только вертикальные стены
+            continue
+        for opening in detect_wall_openings(
+            inlier_pts, feat[:3], min_confidence=min_confidence, floor_height_m=floor_height_m
+        ):
+            center = np.asarray(opening.position_3d)
+            duplicate = any(
+                r.opening_type == opening.opening_type
+                and r.position_3d is not None
+                and np.linalg.norm((np.asarray(r.position_3d) - center)[[0, 2]])
+                < _OPENING_DEDUP_DISTANCE_M
+                for r in existing + found
+            )
+            if not duplicate:
+                found.append(opening)
+    return found
+
+
+@dataclass
+class BatchInferenceResult:
+    """Пакетный вывод: по каждому скану (reveals, frame_planes), метки и вероятности плоскостей."""
+
+    results: List[Tuple[List[Reveal], List[FramePlane]]] = field(default_factory=list)
+    labels: List[List[str]] = field(default_factory=list)
+    probabilities: List[np.ndarray] = field(default_factory=list)
+    planes_count: int = 0
+    elapsed_s: float = 0.0
+
+    @property
+    def scans_count(self) -> int:
+        return len(self.results)
+
+    @property
+    def planes_per_sec(self) -> float:
+        return self.planes_count / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def scans_per_sec(self) -> float:
+        return self.scans_count / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+def run_batch_inference(
+    scans: Sequence[ScanInput],
+    classifier: Optional[PlaneClassifier] = None,
+    distance_threshold: float = 0.05,
+    reveal_min_confidence: float = 0.6,
+    frame_plane_min_confidence: float = 0.6,
+    model_dir: Optional[str] = None,
+    detect_openings: bool = True,
+    point_dtype: type = np.float64,
+) -> BatchInferenceResult:
+    """
+    Пакетный вывод по многим сканам (переобработка архива, A/B-сравнение классификаторов).
+
+    Признаки считаются один раз на облако, все строки признаков складываются в одну матрицу
+    и классифицируются одним вызовом predict_proba; результаты раскладываются обратно по сканам.
+    Пропускная способность — BatchInferenceResult.planes_per_sec / scans_per_sec.
+    detect_openings: дополнительно искать двери/окна как дыры в стенах (openings.py).
+    point_dtype: точность точек при расчёте признаков и проёмов (ProcessingConfig.point_precision).
+    """
+    started_at = time.perf_counter()
+    clf = _resolve_classifier(classifier, model_dir)
+
+    with span("ml.features"):
+        extracted_per_scan = [
+            extract_plane_features(point_cloud, planes, distance_threshold, dtype=point_dtype)
+            for point_cloud, planes, _ in scans
+        ]
+    counts = [len(extracted) for extracted in extracted_per_scan]
+    total = sum(counts)
+
+    proba = np.empty((0, len(PLANE_LABELS)), dtype=np.float64)
+    if total:
+        features = np.vstack([e[0] for extracted in extracted_per_scan for e in extracted])
+        with span("ml.classify"):
+            proba = clf.predict_proba(features)
+    all_labels = [PLANE_LABELS[i] for i in np.argmax(proba, axis=1)] if total else []
+
+    result = BatchInferenceResult(planes_count=total)
+    offset = 0
+    for extracted, count in zip(extracted_per_scan, counts):
+        labels = all_labels[offset:offset + count]
+        result.labels.append(labels)
+        result.probabilities.append(proba[offset:offset + count])
+        with span("ml.layout"):
+            reveals, frame_planes = _layout_outputs(
+                extracted, labels, reveal_min_confidence, frame_plane_min_confidence
+            )
+        if detect_openings:
+            with span("ml.openings"):
+                reveals += _wall_openings(extracted, labels, reveals, reveal_min_confidence)
+        result.results.append((reveals, frame_planes))
+        offset += count
+
+    result.elapsed_s = time.perf_counter() - started_at
+    return result
+
+
+def run_scan_inference(
+    point_cloud: object,
+    planes: List[List[object]],
+    dimensions: Dimensions,
+    classifier: Optional[PlaneClassifier] = None,
+    distance_threshold: float = 0.05,
+    reveal_min_confidence: float = 0.6,
+    frame_plane_min_confidence: float = 0.6,
+    model_dir: Optional[str] = None,
+    detect_openings: bool = True,
+    point_dtype: type = np.float64,
+) -> Tuple[List[Reveal], List[FramePlane]]:
+    """
+    По облаку точек и списку плоскостей определяет откосы (дверь/окно) и плоскости короба.
+    Элементы с confidence ниже порогов не включаются в результат.
+
+    Returns:
+        (reveals, frame_planes)
+    """
+    batch = run_batch_inference(
+        [(point_cloud, planes, dimensions)],
+        classifier=classifier,
+        distance_threshold=distance_threshold,
+        reveal_min_confidence=reveal_min_confidence,
+        frame_plane_min_confidence=frame_plane_min_confidence,
+        model_dir=model_dir,
+        detect_openings=detect_openings,
+        point_dtype=point_dtype,
+    )
+    return batch.results[0]
@@ -1,36 +1,193 @@
 """
 Классификатор плоскостей: стена, пол, потолок, дверь, окно, откос, короб.
 Обучаемая модель на признаках из features.py.
+
+Обученный RandomForest дополнительно экспортируется в переносимый формат forest.npz
+(плоские массивы узлов всех деревьев), который читается и вычисляется только на NumPy —
+серверу не нужен scikit-learn/joblib.
 """
 from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import BinaryIO, Dict, List, Optional
 
 import numpy as np
 
+from app.ml.features import FEATURE_SCHEMA_VERSION
+
 # Метки, используемые в модели
 PLANE_LABELS = ["wall", "floor", "ceiling", "door", "window", "reveal", "frame"]
 DEFAULT_LABEL = "wall"
 
+# Версия формата forest.npz (увеличивать при несовместимых изменениях массивов)
+FOREST_FORMAT_VERSION = 1
+FOREST_FILENAME = "forest.npz"
+JOBLIB_FILENAME = "classifier.joblib"
+
+
+# Параметры RandomForest по умолчанию (переопределяются поиском в train.py --mode search)
+DEFAULT_FOREST_PARAMS: Dict[str, object] = {"n_estimators": 50, "max_depth": 10, "random_state": 42}
+
 
-def _get_sklearn_forest():
+def _get_sklearn_forest(params: Optional[Dict[str, object]] = None):
     try:
         from sklearn.ensemble import RandomForestClassifier
-        return RandomForestClassifier(n_estimators=50, max_depth=10, random_state=42)
+        return RandomForestClassifier(**{**DEFAULT_FOREST_PARAMS, **(params or {})})
     except ImportError:
         return None
 
 
+def export_forest_arrays(forest: object) -> Dict[str, np.ndarray]:
+    """
+    Выгрузить обученный sklearn RandomForestClassifier в плоские массивы.
+
+    Узлы всех деревьев склеиваются подряд; индексы детей переводятся в глобальные.
+    Возвращает словарь массивов:
+      feature (int32), threshold (float64), left/right (int32, -1 у листа),
+      value (n_nodes, n_classes) — нормированные вероятности классов в узле,
+      roots (int32) — индекс корня каждого дерева, classes (int64) — forest.classes_.
+    """
+    estimators = getattr(forest, "estimators_", None)
+    if not estimators:
+        raise ValueError("forest is not fitted")
+
+    features: List[np.ndarray] = []
+    thresholds: List[np.ndarray] = []
+    lefts: List[np.ndarray] = []
+    rights: List[np.ndarray] = []
+    values: List[np.ndarray] = []
+    roots: List[int] = []
+    offset = 0
+    for est in estimators:
+        tree = est.tree_
+        n_nodes = int(tree.node_count)
+        left = np.asarray(tree.children_left, dtype=np.int32)
+        right = np.asarray(tree.children_right, dtype=np.int32)
+        is_leaf = left < 0
+        # value: (n_nodes, 1, n_classes) -> (n_nodes, n_classes); нормировка как в predict_proba
+        value = np.asarray(tree.value, dtype=np.float64)[:, 0, :]
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+
+        features.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        thresholds.append(np.asarray(tree.threshold, dtype=np.float64))
+        lefts.append(np.where(is_leaf, -1, left + offset).astype(np.int32))
+        rights.append(np.where(is_leaf, -1, right + offset).astype(np.int32))
+        values.append(value / normalizer)
+        roots.append(offset)
+        offset += n_nodes
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.vstack(values),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "classes": np.asarray(forest.classes_, dtype=np.int64),
+        "n_features": np.asarray(int(getattr(forest, "n_features_in_", 0)), dtype=np.int64),
+        "format_version": np.asarray(FOREST_FORMAT_VERSION, dtype=np.int64),
+    }
+
+
+class NumpyForest:
+    """
+    Лес решающих деревьев на чистом NumPy (без sklearn).
+    Все деревья и все образцы обходятся одновременно: на каждом шаге спуска —
+    одна векторная операция по матрице (n_samples, n_trees) текущих узлов.
+    Предсказания и вероятности совпадают с RandomForestClassifier.predict/predict_proba.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.feature = np.asarray(arrays["feature"], dtype=np.intp)
+        self.threshold = np.asarray(arrays["threshold"], dtype=np.float64)
+        self.left = np.asarray(arrays["left"], dtype=np.intp)
+        self.right = np.asarray(arrays["right"], dtype=np.intp)
+        self.value = np.asarray(arrays["value"], dtype=np.float64)
+        self.roots = np.asarray(arrays["roots"], dtype=np.intp)
+        self.classes_ = np.asarray(arrays["classes"], dtype=np.int64)
+        self.n_features_in_ = int(arrays.get("n_features", 0))
+
+    @classmethod
+    def from_sklearn(cls, forest: object) -> "NumpyForest":
+        return cls(export_forest_arrays(forest))
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NumpyForest":
+        with np.load(str(path), allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        version = int(arrays.get("format_version", 0))
+        if version != FOREST_FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest format version: {version}")
+        return cls(arrays)
+
+    def save(self, path: str | Path | BinaryIO) -> None:
+        np.savez(
+            path if hasattr(path, "write") else str(path),
+            feature=self.feature.astype(np.int32),
+            threshold=self.threshold,
+            left=self.left.astype(np.int32),
+            right=self.right.astype(np.int32),
+            value=self.value,
+            roots=self.roots.astype(np.int32),
+            classes=self.classes_,
+            n_features=np.asarray(self.n_features_in_, dtype=np.int64),
+            format_version=np.asarray(FOREST_FORMAT_VERSION, dtype=np.int64),
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return int(self.roots.shape[0])
+
+    @property
+    def n_nodes(self) -> int:
+        return int(self.feature.shape[0])
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Индексы листьев (n_samples, n_trees) для каждого образца в каждом дереве."""
+        # sklearn сравнивает признаки во float32 с порогами float64 — повторяем то же приведение.
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_samples = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_samples, self.n_trees)).copy()
+        rows = np.arange(n_samples)[:, None]
+        active = self.left[nodes] >= 0
+        while active.any():
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nxt = np.where(go_left, self.left[nodes], self.right[nodes])
+            nodes = np.where(active, nxt, nodes)
+            active = self.left[nodes] >= 0
+        return nodes
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Вероятности классов (n_samples, n_classes), порядок — classes_."""
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        # Суммирование по деревьям в том же порядке, что и в sklearn.
+        for t in range(self.n_trees):
+            proba += self.value[leaves[:, t]]
+        proba /= max(1, self.n_trees)
+        return proba
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Индексы меток (значения из classes_)."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
 class PlaneClassifier:
     """
     Классификатор типа плоскости по вектору признаков.
     По умолчанию — эвристика (без sklearn); при наличии sklearn — RandomForest.
     """
 
-    def __init__(self, use_heuristic_only: bool = False):
-        self._clf = None if use_heuristic_only else _get_sklearn_forest()
+    def __init__(
+        self,
+        use_heuristic_only: bool = False,
+        forest_params: Optional[Dict[str, object]] = None,
+    ):
+        self._clf = None if use_heuristic_only else _get_sklearn_forest(forest_params)
         self._label_to_idx = {lbl: i for i, lbl in enumerate(PLANE_LABELS)}
         self._idx_to_label = PLANE_LABELS
 
@@ -41,13 +198,41 @@ class PlaneClassifier:
         idx = np.array([self._label_to_idx.get(lbl, 0) for lbl in y])
         self._clf.fit(X, idx)
 
+    def _model_input(self, X: np.ndarray) -> np.ndarray:
+        """
+        Схема признаков расширяется только дописыванием в конец (features.FEATURE_NAMES),
+        поэтому модель, обученная на более коротком векторе, получает его префикс.
+        """
+        n_features = int(getattr(self._clf, "n_features_in_", 0) or 0)
+        if n_features and X.ndim == 2 and X.shape[1] > n_features:
+            return X[:, :n_features]
+        return X
+
     def predict(self, X: np.ndarray) -> List[str]:
         """Предсказать метки для X (n_samples, n_features)."""
         if self._clf is not None:
-            idx = self._clf.predict(X)
+            idx = self._clf.predict(self._model_input(np.asarray(X)))
             return [self._idx_to_label[i] for i in idx]
         return self._predict_heuristic(X)
 
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """
+        Вероятности меток (n_samples, len(PLANE_LABELS)), столбцы в порядке PLANE_LABELS.
+        Для эвристики — one-hot по предсказанной метке.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        out = np.zeros((X.shape[0], len(PLANE_LABELS)), dtype=np.float64)
+        if X.shape[0] == 0:
+            return out
+        if self._clf is not None:
+            proba = self._clf.predict_proba(self._model_input(X))
+            classes = np.asarray(self._clf.classes_, dtype=np.intp)
+            out[:, classes] = proba
+            return out
+        idx = [self._label_to_idx.get(lbl, 0) for lbl in self._predict_heuristic(X)]
+        out[np.arange(X.shape[0]), idx] = 1.0
+        return out
+
     def _predict_heuristic(self, X: np.ndarray) -> List[str]:
         """Эвристика без ML: по нормали и размерам."""
         out = []
@@ -79,21 +264,45 @@ class PlaneClassifier:
                 out.append(DEFAULT_LABEL)
         return out
 
+    def export_numpy(self, path: str) -> bool:
+        """Экспортировать обученный лес в переносимый forest.npz (только NumPy при загрузке)."""
+        if self._clf is None:
+            return False
+        forest = self._clf
+        if not isinstance(forest, NumpyForest):
+            forest = NumpyForest.from_sklearn(forest)
+        forest.save(Path(path) / FOREST_FILENAME)
+        return True
+
     def save(self, path: str) -> None:
-        """Сохранить модель в директорию (sklearn joblib + meta.json)."""
+        """Сохранить модель в директорию (forest.npz + sklearn joblib + meta.json)."""
         path = Path(path)
         path.mkdir(parents=True, exist_ok=True)
+        has_forest = False
         if self._clf is not None:
-            try:
-                import joblib
-                joblib.dump(self._clf, path / "classifier.joblib")
-            except ImportError:
-                pass
-        meta = {"labels": PLANE_LABELS, "has_clf": self._clf is not None}
+            has_forest = self.export_numpy(str(path))
+            if not isinstance(self._clf, NumpyForest):
+                try:
+                    import joblib
+                    joblib.dump(self._clf, path / JOBLIB_FILENAME)
+                except ImportError:
+                    pass
+        meta = {
+            "labels": PLANE_LABELS,
+            "feature_schema_version": FEATURE_SCHEMA_VERSION,
+            "n_features": int(getattr(self._clf, "n_features_in_", 0) or 0),
+            "has_clf": self._clf is not None,
+            "has_forest": has_forest,
+            "forest_format_version": FOREST_FORMAT_VERSION,
+        }
         (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
 
     def load(self, path: str) -> bool:
-        """Загрузить модель из директории."""
+        """
+        Загрузить модель из директории.
+        Предпочитается forest.npz (только NumPy); classifier.joblib — запасной вариант
+        для моделей, сохранённых до появления переносимого формата.
+        """
         path = Path(path)
         if not path.exists():
             return False
@@ -101,9 +310,16 @@ class PlaneClassifier:
         if meta_path.exists():
             meta = json.loads(meta_path.read_text(encoding="utf-8"))
             if meta.get("has_clf"):
-                try:
-                    import joblib
-                    self._clf = joblib.load(path / "classifier.joblib")
-                except Exception:
-                    self._clf = None
+                self._clf = None
+                if meta.get("has_forest") and (path / FOREST_FILENAME).exists():
+                    try:
+                        self._clf = NumpyForest.load(path / FOREST_FILENAME)
+                    except (OSError, KeyError, ValueError):
+                        self._clf = None
+                if self._clf is None:
+                    try:
+                        import joblib
+                        self._clf = joblib.load(path / JOBLIB_FILENAME)
+                    except Exception:
+                        self._clf = None
         return True
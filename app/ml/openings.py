@@ -0,0 +1,263 @@
+"""
+Поиск проёмов (двери/окна) как прямоугольных дыр в inlier-точках стены.
+
+Точки стены переводятся в систему (u, v) плоскости (u — вдоль стены, v — вверх) и
+растеризуются в occupancy-изображение. Пустые области выделяются по горизонтальным
+сериям пустых ячеек (run-length), склеенным между соседними строками; границы прямоугольника
+уточняются по интегральному изображению. Дыра у пола — дверь, выше — окно (с высотой подоконника).
+Высота подоконника отсчитывается от пола (плоскость пола скана), а не от нижней точки стены:
+низ стены часто закрыт мебелью или плинтусом.
+Всё векторно по изображению стены (десятки×сотни ячеек) — миллисекунды на стену.
+"""
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.ml.features import plane_basis
+from app.models.schemas import Reveal
+
+# Размер ячейки occupancy-изображения (м): чуть больше шага воксельной сетки облака
+OPENING_CELL_SIZE_M = 0.05
+
+# Допустимые размеры проёмов (м)
+DOOR_MIN_HEIGHT_M = 1.6
+DOOR_MAX_HEIGHT_M = 2.6
+DOOR_MAX_SILL_M = 0.1
+WINDOW_MIN_SILL_M = 0.2
+WINDOW_MIN_HEIGHT_M = 0.3
+WINDOW_MAX_HEIGHT_M = 2.4
+OPENING_MIN_WIDTH_M = 0.4
+OPENING_MAX_WIDTH_M = 3.0
+
+# Доля занятых ячеек в строке/столбце, выше которой край прямоугольника считается стеной
+_EDGE_OCCUPIED_FRACTION = 0.5
+# Минимальная «прямоугольность» компоненты: пустые ячейки / площадь её bbox
+_MIN_RECTANGULARITY = 0.6
+
+
+def binary_closing(occ: np.ndarray) -> np.ndarray:
+    """Морфологическое закрытие 3×3: закрывает пропуски между точками разреженного облака."""
+    h, w = occ.shape
+    padded = np.zeros((h + 2, w + 2), dtype=bool)
+    padded[1:-1, 1:-1] = occ
+    dilated = np.zeros_like(occ)
+    for dr in range(3):
+        for dc in range(3):
+            dilated |= padded[dr:dr + h, dc:dc + w]
+    padded = np.ones((h + 2, w + 2), dtype=bool)
+    padded[1:-1, 1:-1] = dilated
+    eroded = np.ones_like(occ)
+    for dr in range(3):
+        for dc in range(3):
+            eroded &= padded[dr:dr + h, dc:dc + w]
+    return eroded
+
+
+def mask_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Горизонтальные серии True-ячеек маски: (row, col_start, col_end) — col_end не включается."""
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    step = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(step == 1)
+    _, ends = np.nonzero(step == -1)
+    return rows, starts, ends
+
+
+def label_runs(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Номера связных компонент для серий: серии соседних строк, перекрывающиеся по столбцам."""
+    n = rows.shape[0]
+    labels = np.arange(n)
+    if n == 0:
+        return labels
+    # Серии упорядочены по строкам: пары (i из строки r, j из строки r+1) ищем через границы строк.
+    row_bounds = np.searchsorted(rows, np.arange(rows.max() + 2))
+    edges_a: List[np.ndarray] = []
+    edges_b: List[np.ndarray] = []
+    for r in range(rows.max()):
+        a = np.arange(row_bounds[r], row_bounds[r + 1])
+        b = np.arange(row_bounds[r + 1], row_bounds[r + 2])
+        if a.size == 0 or b.size == 0:
+            continue
+        overlap = (starts[a][:, None] < ends[b][None, :]) & (starts[b][None, :] < ends[a][:, None])
+        ia, ib = np.nonzero(overlap)
+        edges_a.append(a[ia])
+        edges_b.append(b[ib])
+    if not edges_a:
+        return labels
+    ea = np.concatenate(edges_a)
+    eb = np.concatenate(edges_b)
+    # Распространение минимальной метки по рёбрам + сжатие путей до сходимости.
+    while True:
+        low = np.minimum(labels[ea], labels[eb])
+        updated = labels.copy()
+        np.minimum.at(updated, ea, low)
+        np.minimum.at(updated, eb, low)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def _rect_sum(integral: np.ndarray, r0, r1, c0, c1):
+    """Сумма по прямоугольнику [r0, r1) × [c0, c1) по интегральному изображению (векторно)."""
+    return integral[r1, c1] - integral[r0, c1] - integral[r1, c0] + integral[r0, c0]
+
+
+def _trim_to_empty(
+    integral: np.ndarray,
+    r0: int,
+    r1: int,
+    c0: int,
+    c1: int,
+) -> Optional[Tuple[int, int, int, int]]:
+    """Сжать bbox дыры, отбрасывая крайние строки/столбцы, где преобладает стена."""
+    rows = np.arange(r0, r1)
+    row_frac = _rect_sum(integral, rows, rows + 1, c0, c1) / max(1, c1 - c0)
+    free = np.flatnonzero(row_frac <= _EDGE_OCCUPIED_FRACTION)
+    if free.size == 0:
+        return None
+    r0, r1 = r0 + int(free[0]), r0 + int(free[-1]) + 1
+
+    cols = np.arange(c0, c1)
+    col_frac = _rect_sum(integral, r0, r1, cols, cols + 1) / max(1, r1 - r0)
+    free = np.flatnonzero(col_frac <= _EDGE_OCCUPIED_FRACTION)
+    if free.size == 0:
+        return None
+    return r0, r1, c0 + int(free[0]), c0 + int(free[-1]) + 1
+
+
+def _ring_occupancy(integral: np.ndarray, r0: int, r1: int, c0: int, c1: int, width: int) -> float:
+    """Доля занятых ячеек в рамке шириной width вокруг прямоугольника (в пределах изображения)."""
+    h, w = integral.shape[0] - 1, integral.shape[1] - 1
+    R0, R1 = max(0, r0 - width), min(h, r1 + width)
+    C0, C1 = max(0, c0 - width), min(w, c1 + width)
+    outer_area = (R1 - R0) * (C1 - C0)
+    inner_area = (r1 - r0) * (c1 - c0)
+    if outer_area <= inner_area:
+        return 0.0
+    occupied = _rect_sum(integral, R0, R1, C0, C1) - _rect_sum(integral, r0, r1, c0, c1)
+    return float(occupied) / float(outer_area - inner_area)
+
+
+def detect_wall_openings(
+    inlier_points: Optional[np.ndarray],
+    normal: np.ndarray,
+    cell_size_m: float = OPENING_CELL_SIZE_M,
+    min_confidence: float = 0.0,
+    floor_height_m: Optional[float] = None,
+) -> List[Reveal]:
+    """
+    Найти двери и окна как прямоугольные дыры в inlier-точках одной стены.
+
+    Args:
+        inlier_points: точки стены (n, 3)
+        normal: нормаль стены (вертикальная плоскость)
+        cell_size_m: минимальный размер ячейки occupancy-изображения (м)
+        min_confidence: проёмы с меньшей уверенностью не возвращаются
+        floor_height_m: высота пола (координата Y); None — пол на уровне нижней точки стены
+
+    Returns:
+        Список Reveal с шириной, высотой, высотой подоконника (sill_height_m) и центром проёма.
+    """
+    if inlier_points is None or inlier_points.shape[0] < 50:
+        return []
+    normal = np.asarray(normal, dtype=np.float64)
+    normal = normal / max(np.linalg.norm(normal), 1e-12)
+    basis_u, basis_v = plane_basis(normal[None, :])
+    basis_u, basis_v = basis_u[0], basis_v[0]
+
+    # float32-точки (ProcessingConfig.point_precision) остаются float32; среднее — во float64
+    pts = np.asarray(inlier_points, dtype=np.result_type(inlier_points, np.float32))
+    pu = pts @ basis_u.astype(pts.dtype)
+    pv = pts @ basis_v.astype(pts.dtype)
+    offset_n = float(np.mean(pts @ normal.astype(pts.dtype), dtype=np.float64))
+    u_min, v_min = float(pu.min()), float(pv.min())
+    # Для разреженной стены ячейка укрупняется, чтобы в среднем на неё приходилось ~4 точки.
+    area = max((float(pu.max()) - u_min) * (float(pv.max()) - v_min), 1e-6)
+    cell_size_m = max(cell_size_m, 2.0 * float(np.sqrt(area / pts.shape[0])))
+    width = int(np.ceil((float(pu.max()) - u_min) / cell_size_m)) + 1
+    height = int(np.ceil((float(pv.max()) - v_min) / cell_size_m)) + 1
+    if width < 3 or height < 3:
+        return []
+    # v стены совпадает с Y: пол в координатах изображения (не выше нижней точки стены)
+    floor_v = v_min if floor_height_m is None else min(float(floor_height_m), v_min)
+
+    occ = np.zeros((height, width), dtype=bool)
+    occ[
+        ((pv - v_min) / cell_size_m).astype(np.int64),
+        ((pu - u_min) / cell_size_m).astype(np.int64),
+    ] = True
+    occ = binary_closing(occ)
+    integral = np.zeros((height + 1, width + 1), dtype=np.int64)
+    integral[1:, 1:] = occ.cumsum(axis=0).cumsum(axis=1)
+
+    rows, starts, ends = mask_runs(~occ)
+    if rows.size == 0:
+        return []
+    labels = label_runs(rows, starts, ends)
+    comp, inverse = np.unique(labels, return_inverse=True)
+    n_comp = comp.shape[0]
+    r_min = np.full(n_comp, height)
+    r_max = np.full(n_comp, -1)
+    c_min = np.full(n_comp, width)
+    c_max = np.full(n_comp, -1)
+    np.minimum.at(r_min, inverse, rows)
+    np.maximum.at(r_max, inverse, rows)
+    np.minimum.at(c_min, inverse, starts)
+    np.maximum.at(c_max, inverse, ends)
+    cells = np.bincount(inverse, weights=ends - starts, minlength=n_comp)
+
+    reveals: List[Reveal] = []
+    for i in range(n_comp):
+        r0, r1, c0, c1 = int(r_min[i]), int(r_max[i]) + 1, int(c_min[i]), int(c_max[i])
+        # Пустота у левого/правого/верхнего края — недосканированная область, а не проём.
+        if c0 == 0 or c1 == width or r1 == height:
+            continue
+        rectangularity = float(cells[i]) / float((r1 - r0) * (c1 - c0))
+        if rectangularity < _MIN_RECTANGULARITY:
+            continue
+        trimmed = _trim_to_empty(integral, r0, r1, c0, c1)
+        if trimmed is None:
+            continue
+        r0, r1, c0, c1 = trimmed
+
+        bottom_v, top_v = v_min + r0 * cell_size_m, v_min + r1 * cell_size_m
+        if r0 == 0:
+            # Дыра открыта к невидимому низу стены: проём продолжается до пола
+            bottom_v = floor_v
+        width_m = (c1 - c0) * cell_size_m
+        height_m = top_v - bottom_v
+        sill_m = bottom_v - floor_v
+        if not OPENING_MIN_WIDTH_M <= width_m <= OPENING_MAX_WIDTH_M:
+            continue
+        if sill_m <= DOOR_MAX_SILL_M and DOOR_MIN_HEIGHT_M <= height_m <= DOOR_MAX_HEIGHT_M:
+            opening_type = "door"
+            sill_m = 0.0
+        elif sill_m >= WINDOW_MIN_SILL_M and (
+            WINDOW_MIN_HEIGHT_M <= height_m <= WINDOW_MAX_HEIGHT_M
+        ):
+            opening_type = "window"
+        else:
+            continue
+
+        ring = _ring_occupancy(integral, r0, r1, c0, c1, width=2)
+        confidence = float(np.clip(0.4 + 0.3 * rectangularity + 0.3 * ring, 0.0, 0.95))
+        if confidence < min_confidence:
+            continue
+
+        center_u = u_min + 0.5 * (c0 + c1) * cell_size_m
+        center_v = 0.5 * (bottom_v + top_v)
+        center = center_u * basis_u + center_v * basis_v + offset_n * normal
+        reveals.append(Reveal(
+            opening_type=opening_type,
+            width_m=width_m,
+            height_m=height_m,
+            depth_m=0.0,
+            sill_height_m=sill_m,
+            position_3d=[float(center[0]), float(center[1]), float(center[2])],
+            confidence=confidence,
+        ))
+    return reveals
@@ -4,28 +4,331 @@
 Использование:
   python -m app.ml.train --data_dir ./data/annotations [--model_dir ./app/ml/models]
   или передача датасета через JSON/файлы аннотаций.
+  python -m app.ml.train --mode search --data_dir ./data/annotations [--grid grid.json] [--n_jobs 0]
+  — k-fold кросс-валидация по сетке гиперпараметров, замер задержки predict и отчёт
+  train_report.json / train_report.md рядом с meta.json; сохраняется лучшая модель.
+  python -m app.ml.train --export_numpy [--model_dir ./app/ml/models]
+  — перевести уже обученную classifier.joblib в переносимый forest.npz.
 """
 from __future__ import annotations
 
 import argparse
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
-from app.ml.dataset import build_dataset_from_scan_dirs, load_annotation_file
-from app.ml.model import PlaneClassifier, PLANE_LABELS
+from app.ml.dataset import build_dataset_from_scan_dirs
+from app.ml.features import FEATURE_SCHEMA_VERSION
+from app.ml.model import (
+    DEFAULT_FOREST_PARAMS,
+    FOREST_FILENAME,
+    PLANE_LABELS,
+    NumpyForest,
+    PlaneClassifier,
+    export_forest_arrays,
+)
+
+# Сетка поиска по умолчанию: размер леса против точности и задержки
+DEFAULT_SEARCH_GRID: Dict[str, List[Any]] = {
+    "n_estimators": [25, 50, 100],
+    "max_depth": [6, 10, None],
+    "min_samples_leaf": [1, 3],
+}
+REPORT_JSON = "train_report.json"
+REPORT_MD = "train_report.md"
+
+# Данные для процессов-воркеров: передаются один раз через initializer, а не в каждой задаче
+_WORKER_X: Optional[np.ndarray] = None
+_WORKER_Y: Optional[np.ndarray] = None
+
+
+def _init_worker(X: np.ndarray, y_idx: np.ndarray) -> None:
+    global _WORKER_X, _WORKER_Y
+    _WORKER_X, _WORKER_Y = X, y_idx
+
+
+def _load_grid(raw: Optional[str]) -> Dict[str, List[Any]]:
+    """Сетка из JSON-строки или пути к JSON-файлу; значения — списки вариантов."""
+    if not raw:
+        return dict(DEFAULT_SEARCH_GRID)
+    path = Path(raw)
+    grid = json.loads(path.read_text(encoding="utf-8") if path.is_file() else raw)
+    if not isinstance(grid, dict) or not grid:
+        raise ValueError("grid must be a non-empty JSON object")
+    return {k: v if isinstance(v, list) else [v] for k, v in grid.items()}
+
+
+def _expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _fold_indices(y_idx: np.ndarray, folds: int, seed: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Стратифицированные фолды, если каждой метки хватает на все фолды; иначе обычный KFold."""
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    _, counts = np.unique(y_idx, return_counts=True)
+    if counts.min() >= folds:
+        splitter = StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed)
+        return list(splitter.split(np.zeros(len(y_idx)), y_idx))
+    splitter = KFold(n_splits=folds, shuffle=True, random_state=seed)
+    return list(splitter.split(np.zeros(len(y_idx))))
+
+
+def _cv_fold_task(
+    candidate: int,
+    params: Dict[str, Any],
+    train_idx: np.ndarray,
+    test_idx: np.ndarray,
+) -> Tuple[int, np.ndarray, np.ndarray, float]:
+    clf = PlaneClassifier(forest_params=params)
+    started_at = time.perf_counter()
+    clf._clf.fit(_WORKER_X[train_idx], _WORKER_Y[train_idx])
+    fit_s = time.perf_counter() - started_at
+    return candidate, test_idx, clf._clf.predict(_WORKER_X[test_idx]), fit_s
+
+
+def _full_fit_task(candidate: int, params: Dict[str, Any]) -> Tuple[int, Dict[str, np.ndarray]]:
+    clf = PlaneClassifier(forest_params=params)
+    clf._clf.fit(_WORKER_X, _WORKER_Y)
+    return candidate, export_forest_arrays(clf._clf)
+
+
+def _forest_size_bytes(forest: NumpyForest) -> int:
+    buf = io.BytesIO()
+    forest.save(buf)
+    return len(buf.getvalue())
+
+
+def benchmark_predict_latency(
+    forest: NumpyForest,
+    X: np.ndarray,
+    batch_size: int = 1024,
+    repeats: int = 5,
+    seed: int = 0,
+) -> float:
+    """Медианная задержка predict_proba на пакете из batch_size плоскостей, мкс на плоскость."""
+    rng = np.random.default_rng(seed)
+    batch = X[rng.integers(0, X.shape[0], size=batch_size)]
+    forest.predict_proba(batch)  # прогрев
+    timings = []
+    for _ in range(max(1, repeats)):
+        started_at = time.perf_counter()
+        forest.predict_proba(batch)
+        timings.append(time.perf_counter() - started_at)
+    return float(np.median(timings) / batch_size * 1e6)
+
+
+def _per_label_accuracy(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, Optional[float]]:
+    out: Dict[str, Optional[float]] = {}
+    for idx, label in enumerate(PLANE_LABELS):
+        mask = y_true == idx
+        out[label] = float(np.mean(y_pred[mask] == idx)) if mask.any() else None
+    return out
+
+
+def run_search(
+    X: np.ndarray,
+    y: Sequence[str],
+    grid: Dict[str, List[Any]],
+    folds: int = 5,
+    n_jobs: Optional[int] = 1,
+    latency_batch: int = 1024,
+    seed: int = 42,
+) -> List[Dict[str, Any]]:
+    """
+    k-fold CV по всем комбинациям сетки (фолды и финальные обучения — параллельно в n_jobs
+    процессах), затем для каждой модели — размер forest.npz и задержка NumPy-инференса.
+    Возвращает список кандидатов с метриками в порядке сетки.
+    """
+    label_to_idx = {lbl: i for i, lbl in enumerate(PLANE_LABELS)}
+    y_idx = np.array([label_to_idx.get(lbl, 0) for lbl in y], dtype=np.int64)
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    candidates = _expand_grid(grid)
+    splits = _fold_indices(y_idx, folds, seed)
+
+    jobs = n_jobs if n_jobs and n_jobs > 0 else max(1, os.cpu_count() or 1)
+    predictions = [np.empty_like(y_idx) for _ in candidates]
+    fold_accuracy: List[List[float]] = [[] for _ in candidates]
+    fit_times: List[List[float]] = [[] for _ in candidates]
+    forests: Dict[int, Dict[str, np.ndarray]] = {}
+
+    fold_tasks = [
+        (ci, params, train_idx, test_idx)
+        for ci, params in enumerate(candidates)
+        for train_idx, test_idx in splits
+    ]
+    if jobs > 1:
+        with ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(X, y_idx)
+        ) as pool:
+            fold_results = list(pool.map(_cv_fold_task, *zip(*fold_tasks)))
+            full_results = list(pool.map(_full_fit_task, *zip(*enumerate(candidates))))
+    else:
+        _init_worker(X, y_idx)
+        fold_results = [_cv_fold_task(*task) for task in fold_tasks]
+        full_results = [_full_fit_task(ci, params) for ci, params in enumerate(candidates)]
+
+    for ci, test_idx, pred, fit_s in fold_results:
+        predictions[ci][test_idx] = pred
+        fold_accuracy[ci].append(float(np.mean(pred == y_idx[test_idx])))
+        fit_times[ci].append(fit_s)
+    for ci, arrays in full_results:
+        forests[ci] = arrays
+
+    report: List[Dict[str, Any]] = []
+    for ci, params in enumerate(candidates):
+        forest = NumpyForest(forests[ci])
+        report.append({
+            "params": params,
+            "cv_accuracy": float(np.mean(predictions[ci] == y_idx)),
+            "cv_accuracy_std": float(np.std(fold_accuracy[ci])),
+            "per_label_accuracy": _per_label_accuracy(y_idx, predictions[ci]),
+            "model_size_bytes": _forest_size_bytes(forest),
+            "n_nodes": forest.n_nodes,
+            "us_per_plane": benchmark_predict_latency(forest, X, batch_size=latency_batch),
+            "fit_time_s": float(np.mean(fit_times[ci])),
+        })
+    return report
+
+
+def select_best(
+    candidates: List[Dict[str, Any]],
+    max_us_per_plane: Optional[float] = None,
+) -> int:
+    """Индекс лучшего кандидата: точность CV, при равенстве — меньший размер модели."""
+    indices = list(range(len(candidates)))
+    if max_us_per_plane is not None:
+        fast = [i for i in indices if candidates[i]["us_per_plane"] <= max_us_per_plane]
+        indices = fast or indices
+    return max(
+        indices,
+        key=lambda i: (candidates[i]["cv_accuracy"], -candidates[i]["model_size_bytes"]),
+    )
+
+
+def _format_params(params: Dict[str, Any]) -> str:
+    return ", ".join(f"{k}={v}" for k, v in sorted(params.items()))
+
+
+def write_report(model_dir: Path, report: Dict[str, Any]) -> None:
+    """Записать отчёт поиска в train_report.json и train_report.md рядом с meta.json."""
+    model_dir.mkdir(parents=True, exist_ok=True)
+    (model_dir / REPORT_JSON).write_text(
+        json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+    )
+
+    lines = [
+        "# Отчёт обучения классификатора плоскостей",
+        "",
+        f"- Дата: {report['created_at']}",
+        f"- Примеров: {report['samples']}, признаков: {report['features']}"
+        f" (схема v{report['feature_schema_version']})",
+        f"- Фолдов CV: {report['folds']}, пакет для замера задержки: {report['latency_batch']}",
+        f"- Лучшая модель: {_format_params(report['candidates'][report['best']]['params'])}",
+        "",
+        "| # | Параметры | Точность CV | "
+        + " | ".join(PLANE_LABELS)
+        + " | Размер, КБ | мкс/плоскость |",
+        "|---|---|---|" + "---|" * len(PLANE_LABELS) + "---|---|",
+    ]
+    for i, cand in enumerate(report["candidates"]):
+        per_label = [
+            "—" if cand["per_label_accuracy"][lbl] is None
+            else f"{cand['per_label_accuracy'][lbl]:.3f}"
+            for lbl in PLANE_LABELS
+        ]
+        marker = "**" if i == report["best"] else ""
+        lines.append(
+            f"| {marker}{i}{marker} | {_format_params(cand['params'])} "
+            f"| {cand['cv_accuracy']:.3f} ± {cand['cv_accuracy_std']:.3f} | "
+            + " | ".join(per_label)
+            + f" | {cand['model_size_bytes'] / 1024:.1f} | {cand['us_per_plane']:.2f} |"
+        )
+    (model_dir / REPORT_MD).write_text("\n".join(lines) + "\n", encoding="utf-8")
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Обучение модели классификации плоскостей (путь фото 3D сканер)")
-    parser.add_argument("--data_dir", type=str, nargs="+", help="Директории с *_planes.json аннотациями")
-    parser.add_argument("--model_dir", type=str, default=None, help="Директория для сохранения модели")
-    parser.add_argument("--heuristic_only", action="store_true", help="Не обучать ML, только сохранить конфиг эвристики")
+    parser = argparse.ArgumentParser(
+        description="Обучение модели классификации плоскостей (путь фото 3D сканер)"
+    )
+    parser.add_argument(
+        "--data_dir", type=str, nargs="+", help="Директории с *_planes.json аннотациями"
+    )
+    parser.add_argument(
+        "--model_dir", type=str, default=None, help="Директория для сохранения модели"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=("fit", "search"),
+        default="fit",
+        help="fit — одна модель на всех данных; search — k-fold CV по сетке и отчёт",
+    )
+    parser.add_argument(
+        "--grid",
+        type=str,
+        default=None,
+        help="Сетка поиска: JSON-строка или путь к JSON, напр. '{\"n_estimators\": [25, 50]}'",
+    )
+    parser.add_argument("--folds", type=int, default=5, help="Число фолдов кросс-валидации")
+    parser.add_argument(
+        "--latency_batch",
+        type=int,
+        default=1024,
+        help="Размер пакета плоскостей для замера задержки predict",
+    )
+    parser.add_argument(
+        "--max_us_per_plane",
+        type=float,
+        default=None,
+        help="Ограничение задержки при выборе лучшей модели (мкс на плоскость)",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="Кэш признаков (.npy по хэшу файла и версии схемы признаков)",
+    )
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=1,
+        help="Число процессов для сборки датасета и кросс-валидации (<=0 — все ядра)",
+    )
+    parser.add_argument(
+        "--heuristic_only",
+        action="store_true",
+        help="Не обучать ML, только сохранить конфиг эвристики",
+    )
+    parser.add_argument(
+        "--export_numpy",
+        action="store_true",
+        help="Не обучать: экспортировать модель из --model_dir в forest.npz (NumPy-формат)",
+    )
     args = parser.parse_args()
 
-    model_dir = Path(args.model_dir) if args.model_dir else Path(__file__).resolve().parent / "models"
+    model_dir = (
+        Path(args.model_dir) if args.model_dir else Path(__file__).resolve().parent / "models"
+    )
     data_dirs = [Path(d) for d in (args.data_dir or [])]
 
+    if args.export_numpy:
+        clf = PlaneClassifier(use_heuristic_only=True)
+        if not clf.load(str(model_dir)) or not clf.export_numpy(str(model_dir)):
+            print("Нет обученной модели для экспорта в", model_dir)
+            return
+        clf.save(str(model_dir))
+        print("Экспортирован", FOREST_FILENAME, "в", model_dir)
+        return
+
     if args.heuristic_only:
         clf = PlaneClassifier(use_heuristic_only=True)
         model_dir.mkdir(parents=True, exist_ok=True)
@@ -37,9 +340,16 @@ def main() -> None:
         print("Укажите --data_dir с аннотациями или --heuristic_only для эвристики без обучения.")
         return
 
-    X, y = build_dataset_from_scan_dirs(data_dirs)
+    X, y = build_dataset_from_scan_dirs(
+        data_dirs,
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        n_jobs=args.n_jobs,
+    )
     if X.size == 0:
-        print("Нет данных для обучения. Добавьте JSON-файлы с полем 'planes': [ { 'features': [...], 'label': 'wall' } ]")
+        print(
+            "Нет данных для обучения. Добавьте JSON-файлы с полем "
+            "'planes': [ { 'features': [...], 'label': 'wall' } ]"
+        )
         return
 
     print(f"Примеров: {X.shape[0]}, признаков: {X.shape[1]}")
@@ -48,11 +358,41 @@ def main() -> None:
         if n:
             print(f"  {lbl}: {n}")
 
-    clf = PlaneClassifier(use_heuristic_only=False)
+    forest_params: Dict[str, Any] = dict(DEFAULT_FOREST_PARAMS)
+    if args.mode == "search":
+        grid = _load_grid(args.grid)
+        candidates = run_search(
+            X,
+            y,
+            grid,
+            folds=args.folds,
+            n_jobs=args.n_jobs,
+            latency_batch=args.latency_batch,
+        )
+        best = select_best(candidates, args.max_us_per_plane)
+        write_report(model_dir, {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "samples": int(X.shape[0]),
+            "features": int(X.shape[1]),
+            "feature_schema_version": FEATURE_SCHEMA_VERSION,
+            "folds": args.folds,
+            "latency_batch": args.latency_batch,
+            "grid": grid,
+            "candidates": candidates,
+            "best": best,
+        })
+        forest_params = candidates[best]["params"]
+        print(
+            f"Лучшая модель: {_format_params(forest_params)}; "
+            f"точность CV {candidates[best]['cv_accuracy']:.3f}, "
+            f"{candidates[best]['us_per_plane']:.2f} мкс/плоскость. Отчёт: {model_dir / REPORT_MD}"
+        )
+
+    clf = PlaneClassifier(use_heuristic_only=False, forest_params=forest_params)
     clf.fit(X, y)
     model_dir.mkdir(parents=True, exist_ok=True)
     clf.save(str(model_dir))
-    print("Модель сохранена в", model_dir)
+    print("Модель сохранена в", model_dir, f"(joblib + {FOREST_FILENAME} для NumPy-инференса)")
 
 
 if __name__ == "__main__":
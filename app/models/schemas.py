@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, Field, conlist
 
@@ -77,6 +77,9 @@ class Reveal(BaseModel):
     width_m: float = Field(..., ge=0.0)
     height_m: float = Field(..., ge=0.0)
     depth_m: float = Field(0.0, ge=0.0, description="Глубина откоса (м)")
+    sill_height_m: Optional[float] = Field(
+        None, ge=0.0, description="Высота низа проёма над полом (м); для двери 0"
+    )
     position_3d: Optional[Vec3] = None
     confidence: float = Field(0.8, ge=0.0, le=1.0)
 
@@ -93,6 +96,18 @@ class FramePlane(BaseModel):
     confidence: float = Field(0.8, ge=0.0, le=1.0)
 
 
+class FrameQuality(BaseModel):
+    index: int = Field(..., ge=0, description="Номер кадра в запросе")
+    sharpness: float = Field(..., ge=0.0, description="Дисперсия лапласиана яркости в масштабе 1/8")
+    dark_fraction: float = Field(..., ge=0.0, le=1.0)
+    bright_fraction: float = Field(..., ge=0.0, le=1.0)
+    accepted: bool = Field(True, description="Кадр слит в облако точек")
+    reason: Optional[str] = Field(
+        default=None,
+        description="blurred | underexposed | overexposed | unscored",
+    )
+
+
 class QualityMetrics(BaseModel):
     scan_quality: float = Field(..., ge=0.0, le=1.0)
     junction_count: int = Field(..., ge=0)
@@ -100,6 +115,56 @@ class QualityMetrics(BaseModel):
     processing_time_ms: Optional[int] = Field(default=None, ge=0)
     points_count: Optional[int] = Field(default=None, ge=0)
     planes_count: Optional[int] = Field(default=None, ge=0)
+    cache_hit: Optional[bool] = Field(
+        default=None,
+        description=(
+            "Ответ взят из кэша результатов (те же входы и конфигурация); None — кэш выключен"
+        ),
+    )
+    timings_ms: Optional[Dict[str, float]] = Field(
+        default=None,
+        description="Разбивка времени по этапам (мс); только при запросе с timings=true",
+    )
+    frames_rejected: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="Кадров отброшено до слияния (смаз, экспозиция); None — отбор выключен",
+    )
+    frame_scores: Optional[List[FrameQuality]] = Field(
+        default=None, description="Оценки качества кадров"
+    )
+
+
+class VideoSummary(BaseModel):
+    fps: float = Field(0.0, ge=0.0)
+    duration_s: float = Field(0.0, ge=0.0)
+    frames_decoded: int = Field(0, ge=0)
+    frames_blurred: int = Field(0, ge=0, description="Кадров пропущено: смаз")
+    frames_badly_exposed: int = Field(
+        0, ge=0, description="Кадров пропущено: тёмные или пересвеченные"
+    )
+    keyframes: int = Field(0, ge=0, description="Кадров отобрано и слито в облако точек")
+    keyframe_times_s: List[float] = Field(
+        default_factory=list, description="Время ключевых кадров в видео (с)"
+    )
+
+
+class ProcessingProfileSummary(BaseModel):
+    name: str = Field(
+        ..., description="Профиль обработки: fast | balanced | precise или из файла профилей"
+    )
+    latency_budget_ms: int = Field(
+        ..., gt=0, description="Бюджет времени обработки запроса в этом профиле"
+    )
+    within_budget: Optional[bool] = Field(
+        default=None,
+        description="processing_time_ms не превысило latency_budget_ms; None — время неизвестно",
+    )
+
+
+class ProcessingProfilesResponse(BaseModel):
+    default: str = Field(..., description="Профиль запросов без processing_profile")
+    latency_budgets_ms: Dict[str, int] = Field(..., description="Профиль → бюджет задержки (мс)")
 
 
 class ScanProcessResponse(BaseModel):
@@ -111,6 +176,13 @@ class ScanProcessResponse(BaseModel):
     reveals: List[Reveal] = Field(default_factory=list, description="Откосы (дверь/окно)")
     frame_planes: List[FramePlane] = Field(default_factory=list, description="Плоскости короба по вертикали")
     frame_linear_m_total: float = Field(0.0, ge=0.0, description="Сумма погонных метров по коробам (м.п.)")
+    video: Optional[VideoSummary] = Field(
+        default=None, description="Сводка декодирования для POST /video"
+    )
+    processing_profile: Optional[ProcessingProfileSummary] = Field(
+        default=None,
+        description="Профиль обработки, с которым посчитан ответ, и его бюджет задержки",
+    )
 
 
 class Artifacts(BaseModel):
@@ -167,4 +239,59 @@ class DocumentScanResult(BaseModel):
         False,
         description="Признак наличия инженерных коммуникаций на изображении",
     )
+    engineering_detection: bool = Field(
+        False,
+        description=(
+            "Классификатор содержимого распознаёт инженерные коммуникации; при false "
+            "has_engineering_communications=false не означает, что их нет"
+        ),
+    )
+    paper_format: Optional[str] = Field(
+        None,
+        description=(
+            "Стандартный формат листа, сопоставленный по соотношению сторон (A4, Letter, Legal)"
+        ),
+    )
+    corners: Optional[List[Vec2]] = Field(
+        None,
+        description="Углы листа [TL, TR, BR, BL] в долях 0..1 кадра",
+    )
+
+
+class DocumentPageResult(BaseModel):
+    """Результат анализа одной страницы пакета документов."""
+    index: int = Field(..., ge=0, description="Номер страницы в порядке загрузки")
+    filename: Optional[str] = None
+    result: DocumentScanResult
+    error: Optional[str] = Field(None, description="Ошибка анализа страницы (result тогда пустой)")
+    cache_hit: Optional[bool] = Field(
+        None, description="Результат страницы взят из кэша результатов"
+    )
+
+
+class DocumentBatchSummary(BaseModel):
+    """Сводка по пакету страниц: содержимое и признак инженерных коммуникаций по всем страницам."""
+    scan_id: str
+    pages_count: int = Field(..., ge=0)
+    failed_pages: int = Field(0, ge=0)
+    content: List[RecognizedContentItem] = Field(
+        default_factory=list,
+        description=(
+            "Объединённое содержимое: по каждой метке — максимальный confidence среди страниц"
+        ),
+    )
+    has_engineering_communications: bool = Field(
+        False,
+        description="Инженерные коммуникации есть хотя бы на одной странице",
+    )
+    engineering_detection: bool = Field(
+        False,
+        description="Инженерные коммуникации распознавались на всех разобранных страницах",
+    )
+    processing_time_ms: float = Field(..., ge=0.0)
+
+
+class DocumentBatchResult(DocumentBatchSummary):
+    """Пакет страниц документа: сводка и результаты страниц в порядке загрузки."""
+    pages: List[DocumentPageResult] = Field(default_factory=list)
 
@@ -0,0 +1,39 @@
+import base64
+import io
+from typing import Callable, Optional, Union
+
+import numpy as np
+import pytest
+
+# Корректный JPEG 1×1: загрузки, которым не важно содержимое кадра (Pillow не нужен)
+_TINY_JPEG = base64.b64decode(
+    b"/9j/4AAQSkZJRgABAQAAAQABAAD/2wCEAAkGBxAQEBAQEBAVEBUVFRUVFRUVFRUVFRUVFRUWFhUV"
+    b"FRUYHSggGBolGxUVITEhJSkrLi4uFx8zODMsNygtLisBCgoKDg0OGhAQGy0lICUtLS0tLS0tLS0tLS0t"
+    b"LS0tLS0tLS0tLS0tLS0tLS0tLS0tLS0tLS0tLS0tLf/AABEIAAEAAQMBIgACEQEDEQH/xAAXAAEBAQE"
+    b"AAAAAAAAAAAAAAAABAgME/8QAFhEBAQEAAAAAAAAAAAAAAAAAAAER/9oADAMBAAIQAxAAAAG7Qf/EAB"
+    b"gQAQEAAwAAAAAAAAAAAAAAAAEAEQIS/9oACAEBAAEFAoXo1//EABYRAQEBAAAAAAAAAAAAAAAAAAARAf"
+    b"/aAAgBAwEBPwGn/8QAFhEBAQEAAAAAAAAAAAAAAAAAABEh/9oACAECAQE/AYf/xAAbEAACAQUAAAAAAAA"
+    b"AAAAAAAABEQAhMUFRcf/aAAgBAQAGPwJRTY2dY//EABoQAQEAAwEBAAAAAAAAAAAAAAERACExQWH/2gAIAQ"
+    b"EAAT8h2S8xkqLzx7ZQmX//2gAMAwEAAgADAAAAEMf/xAAXEQADAQAAAAAAAAAAAAAAAAAAAREx/9oACAEDAQ"
+    b"E/EA5f/8QAFxEBAAMAAAAAAAAAAAAAAAAAAAERMf/aAAgBAgEBPxAzf//EABsQAQACAgMAAAAAAAAAAAAAAA"
+    b"EAEQAhMUFh/9oACAEBAAE/EDg8V5zaP8wWvDFQvO3Uo6f/2Q=="
+)
+
+
+@pytest.fixture
+def jpeg() -> Callable[..., bytes]:
+    """
+    Байты JPEG для загрузок: jpeg() — кадр 1×1, jpeg(seed) — шумовой кадр 64×48,
+    jpeg(rgb) — заданное изображение (uint8, h×w×3).
+    """
+    def encode(image: Optional[Union[int, np.ndarray]] = None, quality: int = 90) -> bytes:
+        if image is None:
+            return _TINY_JPEG
+        Image = pytest.importorskip("PIL.Image")
+        if isinstance(image, int):
+            image = (np.random.default_rng(image).random((48, 64, 3)) * 255).astype(np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(image).save(buffer, "JPEG", quality=quality)
+        return buffer.getvalue()
+
+    return encode
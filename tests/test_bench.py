@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("open3d")
+
+from app.bench.run import compare_reports, run_scenario, scaling_curves, scenarios  # noqa: E402
+from app.core.synthetic_room import box_room, l_shaped_room, render_scan  # noqa: E402
+
+
+def test_l_shaped_ground_truth():
+    truth = l_shaped_room().ground_truth()
+    assert (truth["length_m"], truth["width_m"]) == (5.0, 4.0)
+    assert truth["floor_area_m2"] == pytest.approx(5.0 * 4.0 - 2.0 * 1.8)
+    assert truth["doors"] == truth["windows"] == 1.0
+
+
+def test_render_scan_matches_loader_format():
+    scan = render_scan(box_room(), frames=3, resolution=(80, 60), noise_m=0.0)
+    assert len(scan.colors) == len(scan.depths) == len(scan.poses) == 3
+    assert scan.colors[0].shape == (60, 80, 3)
+    assert scan.depths[0].dtype.name == "uint16"
+    # Закрытая комната без шума: все лучи, кроме проёмов, попадают в поверхность не дальше диагонали
+    depth_m = scan.depths[0][scan.depths[0] > 0] / 1000.0
+    assert depth_m.size > 0.9 * scan.depths[0].size
+    assert depth_m.max() < 5.5
+    assert len(scan.poses[0]["rotation"]) == 4
+
+
+def test_scenario_report_is_close_to_ground_truth():
+    scenario = {
+        "name": "tiny", "room": "box", "noise_m": 0.0, "frames": 6, "resolution": [160, 120]
+    }
+    report = run_scenario(scenario, repeats=1)
+
+    assert set(report["stages_ms"]) == {
+        "load_frames", "detect_planes", "junctions", "missing_zones", "dimensions", "ml_inference",
+    }
+    assert report["points"] > 0 and report["peak_rss_mb"] > 0
+    dims = report["accuracy"]["dimensions_m"]
+    assert dims["length_m"]["abs_error"] < 0.15
+    assert dims["width_m"]["abs_error"] < 0.15
+    assert dims["wall_height_m"]["abs_error"] < 0.15
+
+    lines = compare_reports({"scenarios": [report]}, {"scenarios": [report]})
+    assert lines[0] == "tiny"
+    assert "(+0.0%)" in lines[-2]
+
+
+def test_quick_suite_scenario_names_are_stable():
+    assert [s["name"] for s in scenarios("quick")] == [
+        "box-n0.005-f12-320x240",
+        "box-n0.005-f12-320x240-float32",
+        "l_shape-n0.005-f12-320x240",
+        "l_shape-n0.005-f12-320x240-float32",
+    ]
+    assert len(scenarios("full")) == 2 * 3 * 2 * 2 * 2 * 2
+    assert "box-n0-f12-320x240-o0.01" in {s["name"] for s in scenarios("full")}
+
+
+def test_scaling_suite_varies_only_worker_count():
+    names = [s["name"] for s in scenarios("scaling")]
+    assert names == [
+        f"box-n0.005-f36-640x480{backend}-w{n}"
+        for backend in ("", "-process")
+        for n in (1, 2, 4, 8)
+    ]
+    assert all(s["frame_workers"] is None for s in scenarios("quick"))
+    assert all(s["frame_backend"] is None for s in scenarios("quick"))
+
+    report = {"scenarios": [
+        {"name": f"box-w{n}", "frame_workers": n, "stages_ms": {"load_frames": {"median": ms}}}
+        for n, ms in ((2, 60.0), (1, 100.0), (4, 40.0))
+    ]}
+    assert scaling_curves(report) == {"box": [
+        {"frame_workers": 1, "load_frames_ms": 100.0, "speedup": 1.0},
+        {"frame_workers": 2, "load_frames_ms": 60.0, "speedup": 1.667},
+        {"frame_workers": 4, "load_frames_ms": 40.0, "speedup": 2.5},
+    ]}
+
+
+def test_profiles_suite_names():
+    items = scenarios("profiles")
+    assert [s["name"] for s in items] == [
+        f"box-n0.005-f30-640x480-{name}" for name in ("fast", "balanced", "precise")
+    ]
+    # Точность точек — из профиля
+    assert all(s["precision"] is None for s in items)
+    assert all(s["processing_profile"] is None for s in scenarios("quick"))
@@ -0,0 +1,272 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from app.ml.document_analyzer import (
+    analyze_document_bytes,
+    estimate_size_mm,
+    summarize_document_batch,
+)
+from app.models.schemas import DocumentPageResult, DocumentScanResult, RecognizedContentItem
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+
+def _page_photo(
+    size=(1600, 1200),
+    short_px=600,
+    aspect=2 ** 0.5,
+    angle_deg=0.0,
+    table=True,
+    fmt="JPEG",
+):
+    """Светлый лист с текстом и таблицей на тёмном фоне, повёрнутый на angle_deg."""
+    w, h = size
+    long_px = short_px * aspect
+    t = np.deg2rad(angle_deg)
+    rot = np.array([[np.cos(t), -np.sin(t)], [np.sin(t), np.cos(t)]])
+    center = np.array([w / 2.0, h / 2.0])
+
+    def to_img(u, v):
+        return tuple(np.array([(u - 0.5) * short_px, (v - 0.5) * long_px]) @ rot.T + center)
+
+    img = Image.new("RGB", (w, h), (70, 60, 55))
+    draw = ImageDraw.Draw(img)
+    quad = [to_img(0, 0), to_img(1, 0), to_img(1, 1), to_img(0, 1)]
+    draw.polygon(quad, fill=(235, 235, 228))
+    rng = np.random.default_rng(0)
+    for k in range(12):
+        v, x = 0.1 + k * 0.035, 0.1
+        while x < 0.85:
+            length = rng.uniform(0.03, 0.09)
+            draw.line([to_img(x, v), to_img(x + length, v)], fill=(20, 20, 20), width=3)
+            x += length + 0.02
+    if table:
+        for k in range(6):
+            v = 0.6 + k * 0.06
+            draw.line([to_img(0.1, v), to_img(0.9, v)], fill=(10, 10, 10), width=3)
+        for k in range(5):
+            u = 0.1 + k * 0.2
+            draw.line([to_img(u, 0.6), to_img(u, 0.9)], fill=(10, 10, 10), width=3)
+    buf = io.BytesIO()
+    img.save(buf, fmt)
+    return buf.getvalue(), np.array(quad)
+
+
+def _corner_error_px(result, quad, size):
+    corners = np.array(result.corners) * np.array(size, dtype=np.float64)
+    return min(np.abs(np.roll(corners, k, axis=0) - quad).max() for k in range(4))
+
+
+@pytest.mark.parametrize("angle_deg", [0.0, 15.0, -35.0, 90.0])
+def test_detects_rotated_a4_sheet(angle_deg):
+    data, quad = _page_photo(angle_deg=angle_deg)
+    result = analyze_document_bytes(data, scan_id="d1")
+
+    assert result.scan_id == "d1"
+    assert result.paper_format == "A4"
+    assert (result.width_mm, result.length_mm) == (210.0, 297.0)
+    assert _corner_error_px(result, quad, (1600, 1200)) <= 4.0
+    labels = {item.label for item in result.content}
+    assert "текст" in labels
+    assert "таблица" in labels
+
+
+def test_letter_aspect_and_png_input():
+    data, _ = _page_photo(aspect=279.4 / 215.9, angle_deg=10.0, table=False, fmt="PNG")
+    result = analyze_document_bytes(data)
+    assert result.paper_format == "Letter"
+    assert result.width_mm == pytest.approx(215.9)
+    assert {item.label for item in result.content} == {"текст"}
+
+
+def test_reference_width_sets_scale():
+    data, _ = _page_photo()
+    result = analyze_document_bytes(data, reference_width_mm=420.0)
+    assert result.paper_format is None
+    assert result.width_mm == 420.0
+    assert result.length_mm == pytest.approx(594.0, rel=0.02)
+
+
+def test_unreadable_bytes_give_empty_result():
+    result = analyze_document_bytes(b"not an image", scan_id="bad")
+    assert result.width_mm == 0.0
+    assert result.content == []
+    assert result.corners is None
+
+
+def test_estimate_size_without_matching_format_uses_a4_width():
+    width, length, fmt = estimate_size_mm(1.0)
+    assert fmt is None
+    assert (width, length) == (210.0, 210.0)
+
+
+def _client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    return TestClient(app)
+
+
+def test_document_endpoint_analyzes_upload_bytes():
+    data, _ = _page_photo(angle_deg=20.0)
+    response = _client().post(
+        "/api/v1/scan/document",
+        data={"scan_id": "doc-1"},
+        files=[("document", ("page.jpg", data, "image/jpeg"))],
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["scan_id"] == "doc-1"
+    assert payload["paper_format"] == "A4"
+    assert len(payload["corners"]) == 4
+
+
+def _bomb_png(width, height):
+    """1-битный PNG, объявляющий width×height пикселей: заголовок и почти пустой IDAT."""
+    import struct
+    import zlib
+
+    def chunk(kind, payload):
+        return (struct.pack(">I", len(payload)) + kind + payload
+                + struct.pack(">I", zlib.crc32(kind + payload)))
+
+    header = struct.pack(">IIBBBBB", width, height, 1, 0, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(b"\x00" * 64)) + chunk(b"IEND", b""))
+
+
+@pytest.mark.filterwarnings("ignore::PIL.Image.DecompressionBombWarning")
+@pytest.mark.parametrize("side", [20000, 12000])
+def test_decompression_bomb_is_not_decoded(side):
+    # 20000² — выше 2×MAX_IMAGE_PIXELS (Pillow бросает DecompressionBombError),
+    # 12000² — между 1× и 2×
+    data = _bomb_png(side, side)
+    assert len(data) < 1024
+    result = analyze_document_bytes(data, "bomb")
+    assert (result.width_mm, result.length_mm, result.content) == (0.0, 0.0, [])
+
+    response = _client().post(
+        "/api/v1/scan/document",
+        data={"scan_id": "bomb"},
+        files=[("document", ("page.png", data, "image/png"))],
+    )
+    assert response.status_code == 200
+    assert response.json()["width_mm"] == 0.0
+
+
+def test_summary_combines_pages():
+    def page(index, items):
+        result = DocumentScanResult(
+            scan_id="s",
+            width_mm=210.0,
+            length_mm=297.0,
+            content=[RecognizedContentItem(label=label, confidence=conf) for label, conf in items],
+            has_engineering_communications=any(label == "трубы" for label, _ in items),
+        )
+        return DocumentPageResult(index=index, result=result)
+
+    summary = summarize_document_batch(
+        "s",
+        [page(0, [("текст", 0.6)]), page(1, [("текст", 0.8), ("трубы", 0.5)])],
+        elapsed_s=0.01,
+    )
+    assert summary.pages_count == 2
+    assert summary.has_engineering_communications
+    content = [(item.label, item.confidence) for item in summary.content]
+    assert content == [("текст", 0.8), ("трубы", 0.5)]
+
+
+def test_engineering_flag_reports_detector_capability(monkeypatch):
+    from app.ml import document_analyzer
+
+    data, _ = _page_photo(table=True)
+    result = analyze_document_bytes(data, "s")
+    # Встроенный классификатор коммуникации не распознаёт: признак False, но не «проверено»
+    assert result.has_engineering_communications is False
+    assert result.engineering_detection is False
+
+    monkeypatch.setattr(document_analyzer, "ENGINEERING_DETECTION", True)
+    assert analyze_document_bytes(data, "s").engineering_detection is True
+    pipes = [RecognizedContentItem(label="трубы", confidence=0.5)]
+    assert document_analyzer._has_engineering(pipes) is True
+
+
+def _batch_files():
+    files = []
+    for i, angle in enumerate([0.0, 20.0, -10.0]):
+        data, _ = _page_photo(angle_deg=angle, table=i != 1)
+        files.append(("documents", (f"p{i}.jpg", data, "image/jpeg")))
+    files.append(("documents", ("broken.png", b"not an image", "image/png")))
+    return files
+
+
+def test_document_batch_streams_pages_and_summary():
+    response = _client().post(
+        "/api/v1/scan/document/batch", data={"scan_id": "b1"}, files=_batch_files()
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+
+    assert [e["event"] for e in events] == ["page"] * 4 + ["summary"]
+    assert sorted(e["page"]["index"] for e in events[:4]) == [0, 1, 2, 3]
+    summary = events[-1]["summary"]
+    assert summary["pages_count"] == 4
+    # Встроенный классификатор коммуникации не распознаёт
+    assert summary["has_engineering_communications"] is False
+    assert summary["engineering_detection"] is False
+    assert {item["label"] for item in summary["content"]} == {"текст", "таблица"}
+
+
+def test_document_batch_without_stream_keeps_upload_order():
+    response = _client().post(
+        "/api/v1/scan/document/batch",
+        data={"scan_id": "b2", "stream": "false"},
+        files=_batch_files(),
+    )
+    assert response.status_code == 200
+    payload = response.json()
+    assert [p["index"] for p in payload["pages"]] == [0, 1, 2, 3]
+    assert [p["result"]["paper_format"] for p in payload["pages"]] == ["A4", "A4", "A4", None]
+
+
+def test_document_batch_rejects_non_image():
+    response = _client().post(
+        "/api/v1/scan/document/batch",
+        data={"scan_id": "b3"},
+        files=[("documents", ("notes.txt", b"text", "text/plain"))],
+    )
+    assert response.status_code == 400
+
+
+def test_oversized_document_is_rejected(monkeypatch):
+    from dataclasses import replace
+
+    from app.api.endpoints import scan
+    from app.core.config import Settings
+
+    limited = Settings(api=replace(Settings().api, max_document_bytes=1024))
+    monkeypatch.setattr(scan, "settings", limited)
+    data, _ = _page_photo()
+    assert len(data) > 1024
+
+    single = _client().post(
+        "/api/v1/scan/document",
+        data={"scan_id": "big"},
+        files=[("document", ("page.jpg", data, "image/jpeg"))],
+    )
+    assert single.status_code == 413
+    assert "exceeds 1024 bytes" in single.json()["detail"]
+
+    batch = _client().post(
+        "/api/v1/scan/document/batch",
+        data={"scan_id": "big"},
+        files=[("documents", ("small.png", b"x" * 10, "image/png")),
+               ("documents", ("page.jpg", data, "image/jpeg"))],
+    )
+    assert batch.status_code == 413
@@ -1,4 +1,3 @@
-import base64
 import json
 
 from fastapi.testclient import TestClient
@@ -9,27 +8,11 @@ from app.main import app
 client = TestClient(app)
 
 
-def _jpeg_bytes() -> bytes:
-    # Valid 1x1 JPEG.
-    return base64.b64decode(
-        b"/9j/4AAQSkZJRgABAQAAAQABAAD/2wCEAAkGBxAQEBAQEBAVEBUVFRUVFRUVFRUVFRUVFRUWFhUV"
-        b"FRUYHSggGBolGxUVITEhJSkrLi4uFx8zODMsNygtLisBCgoKDg0OGhAQGy0lICUtLS0tLS0tLS0tLS0t"
-        b"LS0tLS0tLS0tLS0tLS0tLS0tLS0tLS0tLS0tLS0tLf/AABEIAAEAAQMBIgACEQEDEQH/xAAXAAEBAQE"
-        b"AAAAAAAAAAAAAAAABAgME/8QAFhEBAQEAAAAAAAAAAAAAAAAAAAER/9oADAMBAAIQAxAAAAG7Qf/EAB"
-        b"gQAQEAAwAAAAAAAAAAAAAAAAEAEQIS/9oACAEBAAEFAoXo1//EABYRAQEBAAAAAAAAAAAAAAAAAAARAf"
-        b"/aAAgBAwEBPwGn/8QAFhEBAQEAAAAAAAAAAAAAAAAAABEh/9oACAECAQE/AYf/xAAbEAACAQUAAAAAAAA"
-        b"AAAAAAAABEQAhMUFRcf/aAAgBAQAGPwJRTY2dY//EABoQAQEAAwEBAAAAAAAAAAAAAAERACExQWH/2gAIAQ"
-        b"EAAT8h2S8xkqLzx7ZQmX//2gAMAwEAAgADAAAAEMf/xAAXEQADAQAAAAAAAAAAAAAAAAAAAREx/9oACAEDAQ"
-        b"E/EA5f/8QAFxEBAAMAAAAAAAAAAAAAAAAAAAERMf/aAAgBAgEBPxAzf//EABsQAQACAgMAAAAAAAAAAAAAAA"
-        b"EAEQAhMUFh/9oACAEBAAE/EDg8V5zaP8wWvDFQvO3Uo6f/2Q=="
-    )
-
-
-def _frame_file(name: str = "frame.jpg"):
-    return (name, _jpeg_bytes(), "image/jpeg")
+def _frame_file(data: bytes, name: str = "frame.jpg"):
+    return (name, data, "image/jpeg")
 
 
-def test_finish_with_existing_session():
+def test_finish_with_existing_session(jpeg):
     scan_id = "scan-finish-existing"
     trajectory = json.dumps(
         [
@@ -46,7 +29,7 @@ def test_finish_with_existing_session():
             "scan_id": scan_id,
             "trajectory": trajectory,
         },
-        files=[("frames", _frame_file())],
+        files=[("frames", _frame_file(jpeg()))],
     )
     assert process_resp.status_code == 200
 
@@ -0,0 +1,128 @@
+import tempfile
+import threading
+import time
+import weakref
+
+import numpy as np
+import pytest
+
+from app.core.instrumentation import REGISTRY, collect_timings
+from app.core.processing.point_cloud import (
+    _MERGE_CHUNK_FRAMES,
+    FrameData,
+    _fuse_clouds,
+    _map_ordered,
+    fuse_frames,
+    load_frames_to_pointcloud,
+)
+from app.core.synthetic_room import box_room, render_scan
+
+
+def test_map_ordered_keeps_input_order_and_bounds_in_flight():
+    started = []
+    lock = threading.Lock()
+
+    def items():
+        for i in range(20):
+            with lock:
+                started.append(i)
+            yield i
+
+    def slow_square(i):
+        time.sleep(0.002 * (i % 3))
+        return i * i
+
+    results = []
+    for value in _map_ordered(slow_square, items(), workers=3):
+        # Источник читается лениво: не больше 2 * workers элементов впереди потребителя
+        assert len(started) - len(results) <= 6
+        results.append(value)
+
+    assert results == [i * i for i in range(20)]
+    assert list(_map_ordered(slow_square, range(4), workers=1)) == [0, 1, 4, 9]
+
+
+def test_map_ordered_propagates_worker_errors():
+    def fail_on_two(i):
+        if i == 2:
+            raise ValueError("bad frame")
+        return i
+
+    with pytest.raises(ValueError, match="bad frame"):
+        list(_map_ordered(fail_on_two, range(5), workers=2))
+
+
+def test_parallel_fusion_matches_sequential():
+    pytest.importorskip("open3d")
+    scan = render_scan(box_room(), frames=6, resolution=(160, 120))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        frame_paths, depth_paths, trajectory_path = scan.write(tmpdir)
+        sequential = load_frames_to_pointcloud(frame_paths, trajectory_path, depth_paths, workers=1)
+        with collect_timings() as timings:
+            parallel = load_frames_to_pointcloud(
+                frame_paths, trajectory_path, depth_paths, workers=3
+            )
+
+    assert len(parallel.points) == len(sequential.points) > 0
+    np.testing.assert_array_equal(np.asarray(parallel.points), np.asarray(sequential.points))
+    np.testing.assert_array_equal(np.asarray(parallel.colors), np.asarray(sequential.colors))
+    # Спаны потоков пула попадают в разбивку запроса
+    assert timings["load_frames.decode"] > 0 and timings["load_frames.backproject"] > 0
+
+    frames = [FrameData(color=c, depth=d) for c, d in zip(scan.colors, scan.depths)]
+    np.testing.assert_array_equal(
+        np.asarray(fuse_frames(frames, scan.poses, workers=3).points),
+        np.asarray(fuse_frames(frames, scan.poses, workers=1).points),
+    )
+
+
+def test_merge_releases_frames_chunk_by_chunk():
+    pytest.importorskip("open3d")
+    rng = np.random.default_rng(0)
+    alive = []
+
+    def frames():
+        for i in range(3 * _MERGE_CHUNK_FRAMES):
+            points = rng.uniform(0.0, 3.0, (2000, 3))
+            alive.append(weakref.ref(points))
+            # Исходные точки держатся не дольше одной порции (+ текущий кадр)
+            assert sum(ref() is not None for ref in alive) <= _MERGE_CHUNK_FRAMES + 1
+            yield points, np.full((2000, 3), 128, dtype=np.uint8)
+
+    merged = _fuse_clouds(frames())
+    assert 0 < len(merged.points) < 3 * _MERGE_CHUNK_FRAMES * 2000
+
+
+def test_process_backend_matches_threads():
+    pytest.importorskip("open3d")
+    scan = render_scan(box_room(), frames=4, resolution=(160, 120))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        frame_paths, depth_paths, trajectory_path = scan.write(tmpdir)
+        threads = load_frames_to_pointcloud(frame_paths, trajectory_path, depth_paths, workers=1)
+        processes = load_frames_to_pointcloud(
+            frame_paths, trajectory_path, depth_paths, workers=2, backend="process"
+        )
+
+    np.testing.assert_array_equal(np.asarray(processes.points), np.asarray(threads.points))
+    np.testing.assert_array_equal(np.asarray(processes.colors), np.asarray(threads.colors))
+    with pytest.raises(ValueError, match="frame backend"):
+        load_frames_to_pointcloud(frame_paths, trajectory_path, depth_paths, backend="fork")
+
+
+def test_process_backend_falls_back_to_threads_without_shared_memory(monkeypatch):
+    pytest.importorskip("open3d")
+    from app.core.processing import frame_transport
+
+    scan = render_scan(box_room(), frames=4, resolution=(160, 120))
+    frames = [FrameData(color=c, depth=d) for c, d in zip(scan.colors, scan.depths)]
+    threads = fuse_frames(frames, scan.poses, workers=1)
+    before = REGISTRY.counter_value("scan_frame_backend_fallback_total", reason="shm")
+
+    monkeypatch.setattr(frame_transport, "shared_memory_free", lambda path=None: 0)
+    poses = [scan.poses[0]] + scan.poses
+    fallback = fuse_frames([None] + frames, poses, workers=2, backend="process")
+
+    assert REGISTRY.counter_value("scan_frame_backend_fallback_total", reason="shm") == before + 1
+    np.testing.assert_array_equal(np.asarray(fallback.points), np.asarray(threads.points))
@@ -0,0 +1,119 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+from app.core.config import ProcessingConfig
+from app.core.processing.frame_quality import (
+    gray_thumbnail,
+    gray_thumbnail_from_bytes,
+    laplacian_variance,
+    score_thumbnails,
+)
+from app.core.synthetic_room import box_room, render_scan
+
+
+def test_jpeg_draft_thumbnail_matches_block_mean(jpeg):
+    color = render_scan(box_room(), frames=1, resolution=(640, 480)).colors[0]
+
+    from_bytes = gray_thumbnail_from_bytes(jpeg(color), scale=8)
+    in_memory = gray_thumbnail(color, scale=8)
+
+    assert from_bytes.shape == in_memory.shape == (60, 80)
+    assert np.abs(from_bytes - in_memory).mean() < 3.0
+    assert gray_thumbnail_from_bytes(b"not an image") is None
+
+
+def test_decompression_bomb_frame_is_unscored(jpeg):
+    pytest.importorskip("PIL.Image")
+    import struct
+    import zlib
+
+    from app.core.processing.scan_processor import ScanProcessor
+
+    def chunk(kind, payload):
+        return (struct.pack(">I", len(payload)) + kind + payload
+                + struct.pack(">I", zlib.crc32(kind + payload)))
+
+    # 1-битный PNG, объявляющий 20000×20000 пикселей (Pillow: DecompressionBombError)
+    header = struct.pack(">IIBBBBB", 20000, 20000, 1, 0, 0, 0, 0)
+    bomb = (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(b"\x00" * 64)) + chunk(b"IEND", b""))
+    frame = jpeg(render_scan(box_room(), frames=1, resolution=(160, 120)).colors[0])
+
+    assert gray_thumbnail_from_bytes(bomb) is None
+    scores = ScanProcessor._score_frames([(".jpg", frame), (".jpg", bomb)])
+    assert [s.reason for s in scores][1] == "unscored"
+    assert all(s.accepted for s in scores)
+
+    # Слияние (Open3D) кадр-«бомбу» не декодирует
+    from app.core.processing.image_decode import exceeds_pixel_limit
+
+    assert exceeds_pixel_limit(bomb) and not exceeds_pixel_limit(frame)
+    assert not exceeds_pixel_limit(b"not an image")
+
+
+def test_batch_scores_reject_blurred_and_badly_exposed_frames():
+    rng = np.random.default_rng(0)
+    textured = [rng.uniform(40, 200, (30, 40)).astype(np.float32) for _ in range(3)]
+    flat = np.full((30, 40), 128.0, dtype=np.float32)
+    dark = np.full((30, 40), 5.0, dtype=np.float32)
+    bright = np.full((30, 40), 250.0, dtype=np.float32)
+    small = rng.uniform(40, 200, (20, 20)).astype(np.float32)
+
+    scores = score_thumbnails(textured + [flat, dark, bright, None, small], ProcessingConfig())
+
+    assert [s.accepted for s in scores] == [True, True, True, False, False, False, True, True]
+    assert [s.reason for s in scores[3:7]] == ["blurred", "underexposed", "overexposed", "unscored"]
+    assert scores[0].sharpness == pytest.approx(laplacian_variance(textured[0]), rel=1e-6)
+    assert scores[4].dark_fraction == 1.0
+
+    # Относительный порог: кадр намного мягче остальных батча
+    soft = textured[0] * 0.05 + 100.0
+    config = ProcessingConfig(frame_min_relative_sharpness=0.2)
+    relative = score_thumbnails(textured + [soft], config)
+    assert [s.reason for s in relative] == [None, None, None, "blurred"]
+
+
+def test_all_rejected_frames_are_kept():
+    flat = np.full((30, 40), 128.0, dtype=np.float32)
+
+    scores = score_thumbnails([flat, flat], ProcessingConfig())
+
+    assert all(s.accepted for s in scores)
+    assert all(s.reason == "blurred" for s in scores)
+
+
+def test_process_scan_drops_black_frame_before_fusion(tmp_path, jpeg):
+    pytest.importorskip("open3d")
+    from fastapi import UploadFile
+
+    from app.core.processing.scan_processor import ScanProcessor
+    from app.core.result_cache import ResultCache
+    from app.models.schemas import TrajectoryPoint
+
+    scan = render_scan(box_room(), frames=4, resolution=(160, 120))
+    colors = scan.colors[:2] + [np.zeros_like(scan.colors[0])] + scan.colors[2:]
+    depths = scan.depths[:2] + [scan.depths[0]] + scan.depths[2:]
+    poses = scan.poses[:2] + [scan.poses[0]] + scan.poses[2:]
+
+    def png(depth, index):
+        import open3d as o3d
+
+        path = tmp_path / f"d{index}.png"
+        o3d.io.write_image(str(path), o3d.geometry.Image(np.ascontiguousarray(depth)))
+        return path.read_bytes()
+
+    frames = [UploadFile(io.BytesIO(jpeg(c)), filename=f"f{i}.jpg") for i, c in enumerate(colors)]
+    depth = [UploadFile(io.BytesIO(png(d, i)), filename=f"d{i}.png") for i, d in enumerate(depths)]
+    trajectory = [TrajectoryPoint(t=float(i), **pose) for i, pose in enumerate(poses)]
+
+    processor = ScanProcessor(cache=ResultCache(memory_max_entries=1))
+    response = asyncio.run(processor.process_scan("p", "r", "fq", frames, trajectory, depth))
+
+    quality = response.quality_metrics
+    assert quality.frames_rejected == 1
+    assert [s.index for s in quality.frame_scores if not s.accepted] == [2]
+    assert quality.frame_scores[2].reason == "underexposed"
+    assert quality.points_count > 0
@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from app.core.instrumentation import collect_timings
+from app.core.processing.frame_transport import SharedFrameTransport, _layout
+from app.core.processing.point_cloud import FrameData, _frame_points, _project_into
+
+
+def _shm_names():
+    # Сегменты SharedMemory (psm_*); семафоры пула процессов (sem.*) живут вместе с пулом
+    names = os.listdir("/dev/shm") if os.path.isdir("/dev/shm") else []
+    return {name for name in names if name.startswith("psm_")}
+
+
+def test_layout_aligns_arrays():
+    specs, size = _layout([((3, 5, 3), np.uint8), ((3, 5), np.uint16), ((15, 3), np.float64)])
+
+    assert [offset for offset, _, _ in specs] == [0, 64, 128]
+    assert specs[1][1:] == ((3, 5), np.dtype(np.uint16).str)
+    assert size == 128 + 15 * 3 * 8
+
+
+def test_shared_projection_matches_in_process():
+    rng = np.random.default_rng(0)
+    color = rng.integers(0, 256, (24, 32, 3), dtype=np.uint8)
+    depth = rng.integers(0, 4000, (24, 32), dtype=np.uint16)
+    transform = np.eye(4)
+    transform[:3, 3] = [1.0, 2.0, 3.0]
+    before = _shm_names()
+
+    expected_points, expected_colors = _frame_points(FrameData(color, depth), transform)
+    synthetic_points, _ = _frame_points(FrameData(color), np.eye(4))
+
+    with collect_timings() as timings, SharedFrameTransport(_project_into, workers=2) as transport:
+        results = list(transport.map([(color, depth, transform), None, (color, None, np.eye(4))]))
+        np.testing.assert_array_equal(results[0][0], expected_points)
+        np.testing.assert_array_equal(results[0][1], expected_colors)
+        assert results[1] is None
+        np.testing.assert_array_equal(results[2][0], synthetic_points)
+        del results
+
+    # Спаны процессов пула попадают в разбивку запроса, сегменты удалены
+    assert timings["load_frames.backproject"] > 0
+    assert _shm_names() <= before
+
+
+def test_segments_are_released_as_frames_are_consumed():
+    frames = [(np.full((8, 8, 3), i, np.uint8), None, np.eye(4)) for i in range(6)]
+    with SharedFrameTransport(_project_into, workers=1) as transport:
+        results = []
+        for points, colors in transport.map(frames):
+            # Только кадры в работе (не больше 2 * workers), по входному и выходному сегменту
+            assert len(transport._segments) <= 2 * 2
+            results.append((points, colors))
+        assert not transport._segments
+    # Выданные точки — копии, после close() они остаются действительными
+    assert [int(colors[0, 0]) for _, colors in results] == list(range(6))
+
+    color, depth = np.zeros((480, 640, 3), np.uint8), np.zeros((480, 640), np.uint16)
+    assert transport.fits(color, depth, free=4 * 16 * 2**20)
+    assert not transport.fits(color, depth, free=16 * 2**20)
+
+
+def test_shared_projection_worker_errors_release_segments():
+    before = _shm_names()
+    with pytest.raises(IndexError):
+        with SharedFrameTransport(_project_into, workers=1) as transport:
+            # Поза не 4×4 — ошибка в процессе пула доходит до вызывающего
+            list(transport.map([(np.zeros((4, 4, 3), np.uint8), None, np.eye(3))]))
+    assert _shm_names() <= before
+
+
+def _transport_in_child():
+    with SharedFrameTransport(_project_into, workers=1) as transport:
+        list(transport.map([(np.full((4, 4, 3), 128, np.uint8), None, np.eye(4))]))
+
+
+def test_pool_in_child_process_exits():
+    # multiprocessing в дочернем процессе ждёт своих детей до остановки пулов concurrent.futures
+    child = multiprocessing.get_context("spawn").Process(target=_transport_in_child)
+    child.start()
+    child.join(timeout=60)
+    if child.is_alive():
+        child.kill()
+    assert child.exitcode == 0
@@ -0,0 +1,108 @@
+import io
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.instrumentation import (
+    IN_FLIGHT_METRIC,
+    REGISTRY,
+    STAGE_DURATION_METRIC,
+    MetricsRegistry,
+    collect_timings,
+    in_flight,
+    metric_labels,
+    span,
+)
+from app.main import app
+
+
+def test_registry_renders_prometheus_histograms_and_counters():
+    registry = MetricsRegistry()
+    for value in (0, 3, 3, 50):
+        registry.observe("scan_planes_found", value, buckets=(1, 10))
+    registry.inc("scan_frames_total", result="skipped")
+    registry.inc("scan_frames_total", 2, result="processed")
+
+    text = registry.render()
+    assert "# TYPE scan_planes_found histogram" in text
+    assert 'scan_planes_found_bucket{le="1"} 1' in text
+    assert 'scan_planes_found_bucket{le="10"} 3' in text
+    assert 'scan_planes_found_bucket{le="+Inf"} 4' in text
+    assert "scan_planes_found_sum 56" in text
+    assert "scan_planes_found_count 4" in text
+    assert 'scan_frames_total{result="processed"} 2' in text
+
+
+def test_gauge_tracks_in_flight_blocks():
+    registry = MetricsRegistry()
+    registry.add_gauge("scan_in_flight", 2, kind="process")
+    registry.add_gauge("scan_in_flight", -1, kind="process")
+    assert registry.gauge_value("scan_in_flight", kind="process") == 1
+    assert "# TYPE scan_in_flight gauge" in registry.render()
+    assert 'scan_in_flight{kind="process"} 1' in registry.render()
+
+    before = REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="unit")
+    with in_flight(IN_FLIGHT_METRIC, kind="unit"):
+        assert REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="unit") == before + 1
+    assert REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="unit") == before
+
+
+def test_metric_labels_mark_metrics_inside_block():
+    with metric_labels(source="unit"):
+        with span("unit_labelled"), in_flight(IN_FLIGHT_METRIC, kind="unit_labelled"):
+            # Отдельный ряд: метрики блока не смешиваются с рядом без метки
+            assert REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="unit_labelled", source="unit") == 1
+            assert REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="unit_labelled") == 0
+    with span("unit_labelled"):
+        pass
+    labelled = REGISTRY.histogram_count(STAGE_DURATION_METRIC, stage="unit_labelled", source="unit")
+    assert labelled == 1
+    assert REGISTRY.histogram_count(STAGE_DURATION_METRIC, stage="unit_labelled") == 1
+    assert REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="unit_labelled", source="unit") == 0
+
+
+def test_spans_accumulate_into_request_timings():
+    before = REGISTRY.histogram_count(STAGE_DURATION_METRIC, stage="unit_stage")
+    with collect_timings() as timings:
+        for _ in range(3):
+            with span("unit_stage"):
+                pass
+    with span("unit_stage"):  # вне collect_timings — только гистограмма
+        pass
+    assert list(timings) == ["unit_stage"]
+    assert timings["unit_stage"] >= 0.0
+    assert REGISTRY.histogram_count(STAGE_DURATION_METRIC, stage="unit_stage") == before + 4
+
+
+def test_process_timings_and_metrics_endpoint():
+    Image = pytest.importorskip("PIL.Image")
+    rgb = (np.random.default_rng(303).random((48, 64, 3)) * 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(rgb).save(buf, "JPEG")
+
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/scan/process",
+        data={"project_id": "p1", "room_id": "r1", "scan_id": "timed", "timings": "true"},
+        files=[("frames", ("f1.jpg", buf.getvalue(), "image/jpeg"))],
+    )
+    assert response.status_code == 200
+    timings = response.json()["quality_metrics"]["timings_ms"]
+    for stage in (
+        "process_scan",
+        "load_frames",
+        "load_frames.decode",
+        "detect_planes",
+        "junctions",
+        "coverage",
+    ):
+        assert stage in timings
+    assert timings["process_scan"] >= timings["load_frames"]
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert f'{STAGE_DURATION_METRIC}_bucket{{stage="load_frames",le="+Inf"}}' in metrics.text
+    assert 'scan_points_count{stage="before_downsample"}' in metrics.text
+    assert 'scan_frames_total{result="processed"}' in metrics.text
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.ml import dataset
+from app.ml.dataset import (
+    build_dataset_from_point_clouds,
+    build_dataset_from_scan_dirs,
+    save_annotation_file,
+)
+
+
+def _write_annotations(root, n_files: int = 4, n_planes: int = 5):
+    rng = np.random.default_rng(0)
+    for i in range(n_files):
+        samples = [(rng.normal(size=14), "wall" if j % 2 else "door") for j in range(n_planes)]
+        save_annotation_file(samples, root / f"scan{i}_planes.json")
+
+
+def test_cached_and_parallel_builds_match_plain_build(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    _write_annotations(data_dir)
+    cache_dir = tmp_path / "cache"
+
+    X_plain, y_plain = build_dataset_from_scan_dirs([data_dir])
+    X_cached, y_cached = build_dataset_from_scan_dirs([data_dir], cache_dir=cache_dir, n_jobs=2)
+
+    assert X_plain.shape == (20, 14)
+    np.testing.assert_array_equal(X_plain, X_cached)
+    np.testing.assert_array_equal(y_plain, y_cached)
+    # Части по файлам и один сводный файл; датасет отдаётся как memory-map, а не копия в памяти
+    assert len(list(cache_dir.glob("dataset-*.X.npy"))) == 1
+    assert len(list(cache_dir.glob("*.X.npy"))) == 5
+    assert isinstance(X_cached, np.memmap) and isinstance(y_cached, np.memmap)
+
+
+def test_cache_hit_skips_json_parsing(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    _write_annotations(data_dir, n_files=2)
+    cache_dir = tmp_path / "cache"
+    X_first, y_first = build_dataset_from_scan_dirs([data_dir], cache_dir=cache_dir)
+
+    def _fail(path):
+        raise AssertionError(f"annotation file re-parsed: {path}")
+
+    monkeypatch.setattr(dataset, "load_annotation_file", _fail)
+    X_second, y_second = build_dataset_from_scan_dirs([data_dir], cache_dir=cache_dir)
+    np.testing.assert_array_equal(X_first, X_second)
+    np.testing.assert_array_equal(y_first, y_second)
+
+
+def _labelled_clouds(n_scans: int = 3):
+    rng = np.random.default_rng(1)
+    scans = []
+    for _ in range(n_scans):
+        floor = np.column_stack([rng.uniform(0, 4, 500), np.zeros(500), rng.uniform(0, 3, 500)])
+        wall = np.column_stack([rng.uniform(0, 4, 500), rng.uniform(0, 2.7, 500), np.zeros(500)])
+        planes = [[[0.0, 1.0, 0.0], 0.0], [[0.0, 0.0, 1.0], 0.0]]
+        scans.append((SimpleNamespace(points=np.vstack([floor, wall])), planes, ["floor", "wall"]))
+    return scans
+
+
+def test_point_cloud_build_runs_in_process_pool_with_cache(tmp_path, monkeypatch):
+    scans = _labelled_clouds()
+    cache_dir = tmp_path / "cache"
+
+    X_plain, y_plain = build_dataset_from_point_clouds(scans)
+    X_cached, y_cached = build_dataset_from_point_clouds(scans, cache_dir=cache_dir, n_jobs=2)
+
+    assert X_plain.shape[0] == 6
+    np.testing.assert_allclose(X_plain, X_cached)
+    np.testing.assert_array_equal(y_plain, y_cached)
+    assert isinstance(X_cached, np.memmap)
+
+    def _fail(*args):
+        raise AssertionError("features re-extracted")
+
+    monkeypatch.setattr(dataset, "extract_plane_features", _fail)
+    again, _ = build_dataset_from_point_clouds(scans, cache_dir=cache_dir)
+    np.testing.assert_array_equal(again, X_cached)
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.ml.features import FEATURE_COUNT, FEATURE_NAMES, extract_plane_features
+
+
+def _wall_with_door(rng, step: float = 0.03):
+    """Стена 4×2.7 м в плоскости z=0 с проёмом 0.9×2.0 м."""
+    xs, ys = np.meshgrid(np.arange(0, 4, step), np.arange(0, 2.7, step))
+    xs, ys = xs.ravel(), ys.ravel()
+    keep = ~((xs > 1.0) & (xs < 1.9) & (ys < 2.0))
+    pts = np.column_stack([xs[keep], ys[keep], rng.normal(0, 0.003, keep.sum())])
+    return pts
+
+
+def _reference_prefix(points, normal, d, threshold):
+    """Первые 14 признаков, посчитанные напрямую по inlier-точкам одной плоскости."""
+    inl = points[np.abs(points @ normal + d) <= threshold]
+    h, ex, ez = np.ptp(inl[:, 1]), np.ptp(inl[:, 0]), np.ptp(inl[:, 2])
+    is_v = abs(normal[1]) < 0.35
+    area = h * max(ex, ez, 1e-6) if is_v else (ex * ez if ex > 1e-6 and ez > 1e-6 else 0.0)
+    aspect = h / max(ex, ez, 1e-6) if is_v else max(ex, ez) / max(h, 1e-6)
+    c = inl.mean(axis=0)
+    return np.array([
+        *normal, *c, h, ex, ez, area, aspect,
+        float(abs(normal[1]) >= 0.8), float(is_v), np.log1p(len(inl)),
+    ])
+
+
+def test_grouped_features_match_per_plane_reference():
+    rng = np.random.default_rng(0)
+    wall = _wall_with_door(rng)
+    floor = np.column_stack([rng.uniform(0, 4, 3000), np.zeros(3000), rng.uniform(0, 3, 3000)])
+    points = np.vstack([wall, floor])
+    planes = [[[0.0, 1.0, 0.0], 0.0], "bad", [[0.0, 0.0, 2.0], 0.0], [[1.0, 0.0, 0.0], -50.0]]
+
+    out = extract_plane_features(SimpleNamespace(points=points), planes, 0.05)
+
+    assert len(out) == 3  # некорректный элемент пропускается
+    assert len(FEATURE_NAMES) == FEATURE_COUNT
+    for (feat, inl, n), (normal, d) in zip(out[:2], [([0, 1, 0], 0.0), ([0, 0, 1], 0.0)]):
+        assert feat.shape == (FEATURE_COUNT,)
+        ref = _reference_prefix(points, np.asarray(normal, dtype=float), d, 0.05)
+        np.testing.assert_allclose(feat[:14], ref, rtol=1e-9, atol=1e-9)
+        assert inl.shape == (n, 3)
+
+    wall_feat = dict(zip(FEATURE_NAMES, out[1][0]))
+    assert wall_feat["planarity"] > 0.1
+    assert wall_feat["thickness_m"] < 0.01
+    assert abs(wall_feat["extent_u"] - 3.97) < 0.05
+    assert abs(wall_feat["extent_v"] - 2.67) < 0.05
+    # Проём 0.9×2.0 м в стене ~4×2.7 м: заметная доля пустых ячеек.
+    assert 0.1 < wall_feat["hole_ratio"] < 0.25
+
+    empty_feat, empty_inl, empty_n = out[2]
+    assert empty_n == 0 and empty_inl is None
+    assert empty_feat[FEATURE_NAMES.index("hole_ratio")] == 1.0
+
+
+def test_float32_points_give_same_features_within_tolerance():
+    rng = np.random.default_rng(1)
+    # Смещение от начала координат: float32 теряет точность раньше всего на больших координатах
+    wall = _wall_with_door(rng) + np.array([12.0, 0.0, 7.0])
+    floor = np.column_stack([rng.uniform(12, 16, 3000), np.zeros(3000), rng.uniform(7, 10, 3000)])
+    cloud = SimpleNamespace(points=np.vstack([wall, floor]))
+    planes = [[[0.0, 1.0, 0.0], 0.0], [[0.0, 0.0, 1.0], -7.0]]
+
+    ref = extract_plane_features(cloud, planes, 0.05)
+    f32 = extract_plane_features(cloud, planes, 0.05, dtype=np.float32)
+
+    for (feat64, pts64, n64), (feat32, pts32, n32) in zip(ref, f32):
+        assert n32 == n64
+        assert pts32.dtype == np.float32
+        assert feat32.dtype == np.float64
+        # hole_ratio — доля пустых ячеек сетки 0.1 м: размах на границе ячейки
+        # может округлиться иначе
+        hole = FEATURE_NAMES.index("hole_ratio")
+        rest = np.arange(FEATURE_COUNT) != hole
+        np.testing.assert_allclose(feat32[rest], feat64[rest], rtol=1e-4, atol=1e-4)
+        assert abs(feat32[hole] - feat64[hole]) < 0.01
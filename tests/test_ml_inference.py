@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.ml.inference import run_batch_inference, run_scan_inference
+from app.ml.model import PlaneClassifier
+from app.models.schemas import Dimensions
+
+
+def _dimensions() -> Dimensions:
+    return Dimensions(
+        length_m=4.0,
+        width_m=3.0,
+        wall_height_m=2.7,
+        perimeter_m=14.0,
+        floor_area_m2=12.0,
+        ceiling_area_m2=12.0,
+        wall_area_m2=37.8,
+    )
+
+
+def _room_cloud(seed: int):
+    rng = np.random.default_rng(seed)
+    floor = np.column_stack([rng.uniform(0, 4, 800), np.zeros(800), rng.uniform(0, 3, 800)])
+    wall = np.column_stack([rng.uniform(0, 4, 800), rng.uniform(0, 2.7, 800), np.zeros(800)])
+    # Отдельные вертикальные грани: проём (дверь) и плоскость короба.
+    door = np.column_stack([np.full(200, 5.0), rng.uniform(0, 1.5, 200), rng.uniform(1, 1.4, 200)])
+    box = np.column_stack([np.full(200, -2.0), rng.uniform(0, 1.8, 200), rng.uniform(0, 1.6, 200)])
+    points = np.vstack([floor, wall, door, box])
+    planes = [
+        [[0.0, 1.0, 0.0], 0.0],
+        [[0.0, 0.0, 1.0], 0.0],
+        [[1.0, 0.0, 0.0], -5.0],
+        [[1.0, 0.0, 0.0], 2.0],
+    ]
+    return SimpleNamespace(points=points), planes
+
+
+def test_batch_inference_matches_single_scan():
+    clf = PlaneClassifier(use_heuristic_only=True)
+    scans = []
+    for seed in range(3):
+        cloud, planes = _room_cloud(seed)
+        scans.append((cloud, planes, _dimensions()))
+
+    batch = run_batch_inference(scans, classifier=clf)
+
+    assert batch.scans_count == 3
+    assert batch.planes_count == 12
+    assert batch.labels[0] == ["floor", "wall", "door", "frame"]
+    assert batch.scans_per_sec > 0
+    for (cloud, planes, dims), (reveals, frame_planes) in zip(scans, batch.results):
+        single_reveals, single_frames = run_scan_inference(cloud, planes, dims, classifier=clf)
+        assert [r.model_dump() for r in reveals] == [r.model_dump() for r in single_reveals]
+        assert [f.model_dump() for f in frame_planes] == [f.model_dump() for f in single_frames]
+        assert [r.opening_type for r in reveals] == ["door"]
+        assert len(frame_planes) == 1
+
+
+def test_batch_inference_handles_empty_scans():
+    batch = run_batch_inference(
+        [(SimpleNamespace(points=np.empty((0, 3))), [], _dimensions())],
+        classifier=PlaneClassifier(use_heuristic_only=True),
+    )
+    assert batch.results == [([], [])]
+    assert batch.planes_count == 0
+
+
+def test_classifier_cache_keeps_latest_model_per_directory(tmp_path):
+    import os
+
+    from app.ml import inference
+
+    PlaneClassifier(use_heuristic_only=True).save(str(tmp_path))
+    first = inference._load_classifier_cached(tmp_path)
+    assert inference._load_classifier_cached(tmp_path) is first
+
+    # Переобученная модель (новый mtime meta.json) вытесняет прежнюю запись
+    meta = tmp_path / "meta.json"
+    stat = meta.stat()
+    os.utime(meta, (stat.st_atime, stat.st_mtime + 10))
+    second = inference._load_classifier_cached(tmp_path)
+
+    assert second is not first
+    key = str(tmp_path.resolve())
+    assert inference._classifier_cache[key] == (meta.stat().st_mtime, second)
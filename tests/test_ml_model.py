@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.ml.model import FOREST_FILENAME, PLANE_LABELS, NumpyForest, PlaneClassifier
+
+
+def _training_data(n: int = 300, n_features: int = 14):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n, n_features))
+    y_idx = (X[:, 0] > 0).astype(int) + 2 * (X[:, 3] > 0.5).astype(int)
+    y = [PLANE_LABELS[i] for i in y_idx]
+    return X, y
+
+
+def test_numpy_forest_matches_sklearn():
+    pytest.importorskip("sklearn")
+    X, y = _training_data()
+    clf = PlaneClassifier()
+    clf.fit(X, y)
+
+    forest = NumpyForest.from_sklearn(clf._clf)
+    X_test = np.random.default_rng(1).normal(size=(200, X.shape[1]))
+    np.testing.assert_allclose(
+        forest.predict_proba(X_test), clf._clf.predict_proba(X_test), rtol=0, atol=1e-12
+    )
+    np.testing.assert_array_equal(forest.predict(X_test), clf._clf.predict(X_test))
+
+
+def test_save_load_uses_numpy_forest(tmp_path):
+    pytest.importorskip("sklearn")
+    X, y = _training_data()
+    clf = PlaneClassifier()
+    clf.fit(X, y)
+    clf.save(str(tmp_path))
+
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    assert meta["has_forest"] is True
+    assert (tmp_path / FOREST_FILENAME).exists()
+
+    loaded = PlaneClassifier(use_heuristic_only=True)
+    assert loaded.load(str(tmp_path))
+    assert isinstance(loaded._clf, NumpyForest)
+    assert loaded.predict(X) == clf.predict(X)
+    proba = loaded.predict_proba(X)
+    assert proba.shape == (X.shape[0], len(PLANE_LABELS))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+
+
+def test_heuristic_predict_proba_is_one_hot():
+    clf = PlaneClassifier(use_heuristic_only=True)
+    X = np.zeros((3, 14))
+    X[:, 11] = 1.0  # horizontal
+    proba = clf.predict_proba(X)
+    assert proba.shape == (3, len(PLANE_LABELS))
+    np.testing.assert_array_equal(proba.sum(axis=1), np.ones(3))
+    assert [PLANE_LABELS[i] for i in proba.argmax(axis=1)] == clf.predict(X)
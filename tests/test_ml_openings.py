@@ -0,0 +1,58 @@
+import numpy as np
+
+from app.ml.openings import detect_wall_openings
+
+
+def _wall(step: float = 0.03, seed: int = 0):
+    """Стена 5×2.7 м в плоскости x=2 с дверью 0.9×2.0 м и окном 1.2×1.4 м (подоконник 0.9 м)."""
+    rng = np.random.default_rng(seed)
+    zs, ys = np.meshgrid(np.arange(0, 5, step), np.arange(0, 2.7, step))
+    zs, ys = zs.ravel(), ys.ravel()
+    door = (zs > 0.8) & (zs < 1.7) & (ys < 2.0)
+    window = (zs > 2.8) & (zs < 4.0) & (ys > 0.9) & (ys < 2.3)
+    keep = ~(door | window)
+    return np.column_stack([2.0 + rng.normal(0, 0.004, keep.sum()), ys[keep], zs[keep]])
+
+
+def test_detects_door_and_window_with_measured_sizes():
+    reveals = detect_wall_openings(_wall(), np.array([1.0, 0.0, 0.0]))
+    by_type = {r.opening_type: r for r in reveals}
+
+    assert set(by_type) == {"door", "window"}
+    door, window = by_type["door"], by_type["window"]
+    assert abs(door.width_m - 0.9) <= 0.1
+    assert abs(door.height_m - 2.0) <= 0.1
+    assert door.sill_height_m == 0.0
+    assert abs(door.position_3d[2] - 1.25) <= 0.1
+    assert abs(window.width_m - 1.2) <= 0.1
+    assert abs(window.height_m - 1.4) <= 0.1
+    assert abs(window.sill_height_m - 0.9) <= 0.1
+    assert abs(window.position_3d[0] - 2.0) <= 0.02
+    assert all(0.6 <= r.confidence <= 0.95 for r in reveals)
+
+
+def test_solid_or_sparse_wall_has_no_openings():
+    rng = np.random.default_rng(1)
+    zs, ys = np.meshgrid(np.arange(0, 4, 0.03), np.arange(0, 2.7, 0.03))
+    solid = np.column_stack([np.zeros(zs.size), ys.ravel(), zs.ravel()])
+    sparse = np.column_stack([np.zeros(600), rng.uniform(0, 2.7, 600), rng.uniform(0, 4, 600)])
+
+    assert detect_wall_openings(solid, np.array([1.0, 0.0, 0.0])) == []
+    assert detect_wall_openings(sparse, np.array([1.0, 0.0, 0.0])) == []
+
+
+def test_sill_is_measured_from_floor_when_wall_bottom_is_occluded():
+    # Нижние 0.4 м стены закрыты мебелью: точек стены ниже y=0.4 нет, пол — y=0
+    wall = _wall()
+    occluded = wall[wall[:, 1] >= 0.4]
+
+    reveals = detect_wall_openings(occluded, np.array([1.0, 0.0, 0.0]), floor_height_m=0.0)
+    by_type = {r.opening_type: r for r in reveals}
+
+    assert set(by_type) == {"door", "window"}
+    assert abs(by_type["window"].sill_height_m - 0.9) <= 0.1
+    assert abs(by_type["window"].height_m - 1.4) <= 0.1
+    # Дверь открыта к невидимому низу стены: высота — от пола
+    assert abs(by_type["door"].height_m - 2.0) <= 0.1
+    assert by_type["door"].sill_height_m == 0.0
+    assert abs(by_type["door"].position_3d[1] - 1.0) <= 0.1
@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.ml.model import PLANE_LABELS
+from app.ml.train import REPORT_JSON, REPORT_MD, run_search, select_best, write_report
+
+
+def test_search_reports_accuracy_size_and_latency(tmp_path):
+    pytest.importorskip("sklearn")
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(120, 14))
+    y = ["door" if row[0] > 0 else "wall" for row in X]
+    grid = {"n_estimators": [5, 10], "max_depth": [3]}
+
+    candidates = run_search(X, y, grid, folds=3, n_jobs=2, latency_batch=64)
+
+    assert [c["params"] for c in candidates] == [
+        {"max_depth": 3, "n_estimators": 5},
+        {"max_depth": 3, "n_estimators": 10},
+    ]
+    for cand in candidates:
+        assert 0.8 <= cand["cv_accuracy"] <= 1.0
+        assert set(cand["per_label_accuracy"]) == set(PLANE_LABELS)
+        assert cand["per_label_accuracy"]["floor"] is None
+        assert cand["model_size_bytes"] > 0
+        assert cand["us_per_plane"] > 0
+
+    best = select_best(candidates)
+    write_report(tmp_path, {
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "samples": 120,
+        "features": 14,
+        "feature_schema_version": 1,
+        "folds": 3,
+        "latency_batch": 64,
+        "grid": grid,
+        "candidates": candidates,
+        "best": best,
+    })
+    assert json.loads((tmp_path / REPORT_JSON).read_text(encoding="utf-8"))["best"] == best
+    assert "мкс/плоскость" in (tmp_path / REPORT_MD).read_text(encoding="utf-8")
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from app.core.processing.outliers import grid_neighbour_counts, outlier_mask, remove_grid_outliers
+
+
+def test_grid_counts_match_brute_force():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1.0, 1.0, (400, 3))
+    cell = 0.25
+
+    cells = np.floor((points - points.min(axis=0)) / cell).astype(int)
+    expected = [
+        int(np.all(np.abs(cells - cells[i]) <= 1, axis=1).sum()) - 1
+        for i in range(len(points))
+    ]
+
+    np.testing.assert_array_equal(grid_neighbour_counts(points, cell), expected)
+    assert grid_neighbour_counts(np.empty((0, 3)), cell).shape == (0,)
+
+
+def test_isolated_points_are_outliers_on_dense_surface():
+    xs, zs = np.meshgrid(np.arange(0.0, 2.0, 0.03), np.arange(0.0, 2.0, 0.03))
+    wall = np.column_stack([xs.ravel(), np.zeros(xs.size), zs.ravel()])
+    floaters = np.array([[1.0, 0.8, 1.0], [0.2, 1.5, 0.4], [1.7, -0.9, 1.9]])
+
+    keep = outlier_mask(np.vstack([wall, floaters]), cell_size_m=0.06, min_neighbors=4)
+
+    assert keep[: len(wall)].all()
+    assert not keep[len(wall):].any()
+
+
+def test_remove_grid_outliers_keeps_colors():
+    o3d = pytest.importorskip("open3d")
+    xs, zs = np.meshgrid(np.arange(0.0, 1.0, 0.03), np.arange(0.0, 1.0, 0.03))
+    wall = np.column_stack([xs.ravel(), np.zeros(xs.size), zs.ravel()])
+    points = np.vstack([wall, [[0.5, 0.7, 0.5]]])
+    cloud = o3d.geometry.PointCloud()
+    cloud.points = o3d.utility.Vector3dVector(points)
+    cloud.colors = o3d.utility.Vector3dVector(np.tile([0.2, 0.4, 0.6], (len(points), 1)))
+
+    filtered, index, removed = remove_grid_outliers(cloud, cell_size_m=0.06, min_neighbors=4)
+
+    assert removed == 1
+    assert len(filtered.points) == len(index) == len(wall)
+    np.testing.assert_array_equal(index.points, np.asarray(filtered.points))
+    np.testing.assert_allclose(np.asarray(filtered.colors)[0], [0.2, 0.4, 0.6])
+    again, same_index, removed = remove_grid_outliers(filtered, 0.06, 4, index=index)
+    assert (again, same_index, removed) == (filtered, index, 0)
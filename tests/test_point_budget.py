@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app.core.config import ProcessingConfig
+from app.core.processing.point_budget import choose_voxel_size, downsample_to_budget
+
+
+def _surface(points_at_3cm: float, exponent: float):
+    calls = []
+
+    def count_at(voxel_m: float) -> int:
+        calls.append(voxel_m)
+        return int(points_at_3cm * (0.03 / voxel_m) ** exponent)
+
+    return count_at, calls
+
+
+def test_small_scan_keeps_min_voxel():
+    count_at, calls = _surface(40_000, 2.0)
+
+    assert choose_voxel_size(count_at, 80_000, 0.03, 0.1) == (0.03, 40_000)
+    assert calls == [0.03]
+
+
+@pytest.mark.parametrize("exponent", [1.5, 2.0, 2.6])
+def test_large_scan_lands_just_under_budget(exponent):
+    count_at, calls = _surface(400_000, exponent)
+
+    voxel, count = choose_voxel_size(count_at, 80_000, 0.03, 0.1)
+
+    assert 0.8 * 80_000 <= count <= 80_000
+    assert count == count_at(voxel)
+    assert len(calls) <= 4
+
+
+def test_budget_unreachable_returns_max_voxel():
+    count_at, _ = _surface(10_000_000, 2.0)
+
+    voxel, count = choose_voxel_size(count_at, 80_000, 0.03, 0.1)
+
+    assert voxel == pytest.approx(0.1)
+    assert count > 80_000
+    assert choose_voxel_size(count_at, 0, 0.03, 0.1) == (0.03, 10_000_000)
+
+
+def test_downsample_to_budget_bounds_open3d_cloud():
+    o3d = pytest.importorskip("open3d")
+    xs, zs = np.meshgrid(np.arange(0.0, 6.0, 0.01), np.arange(0.0, 3.0, 0.01))
+    wall = np.column_stack([xs.ravel(), np.zeros(xs.size), zs.ravel()])
+    cloud = o3d.geometry.PointCloud()
+    cloud.points = o3d.utility.Vector3dVector(wall)
+
+    config = ProcessingConfig(point_budget=5_000)
+    budgeted, voxel = downsample_to_budget(cloud, config)
+    unbounded, base_voxel = downsample_to_budget(cloud, ProcessingConfig(point_budget=0))
+
+    assert base_voxel == 0.03 and len(unbounded.points) > 15_000
+    assert config.voxel_size_m < voxel <= config.max_voxel_size_m
+    assert 0.8 * 5_000 <= len(budgeted.points) <= 5_000
@@ -0,0 +1,145 @@
+import asyncio
+import io
+import json
+
+import numpy as np
+import pytest
+
+from app.core.config import ProcessingConfig, processing_config, settings, use_processing
+from app.core.profiles import BUILTIN_PROFILES, load_processing_profiles
+from app.core.synthetic_room import box_room, render_scan
+
+
+def test_builtin_profiles():
+    profiles = load_processing_profiles(environ={}, base=ProcessingConfig())
+
+    assert sorted(profiles.profiles) == sorted(BUILTIN_PROFILES)
+    assert profiles.default == "balanced"
+    assert profiles.resolve().processing == ProcessingConfig()
+    fast, precise = profiles.resolve("fast"), profiles.resolve("precise")
+    default_voxel = ProcessingConfig().voxel_size_m
+    assert fast.processing.voxel_size_m > default_voxel > precise.processing.voxel_size_m
+    assert fast.latency_budget_ms < profiles.resolve().latency_budget_ms < precise.latency_budget_ms
+    with pytest.raises(ValueError, match="Unknown processing profile 'lidar'"):
+        profiles.resolve("lidar")
+
+
+def test_file_profiles_and_projects(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({
+        "default": "fast",
+        "profiles": {
+            "lidar": {"base": "precise", "latency_budget_ms": 20000,
+                      "processing": {"voxel_size_m": 0.015}},
+            "fast": {"processing": {"ransac_iterations": "200"}},
+        },
+        "projects": {"tenant-a": "lidar"},
+    }), encoding="utf-8")
+
+    environ = {"SCAN_PROFILES_FILE": str(path)}
+    profiles = load_processing_profiles(environ=environ, base=ProcessingConfig())
+
+    lidar = profiles.resolve(project_id="tenant-a")
+    assert lidar.name == "lidar" and lidar.latency_budget_ms == 20000
+    assert lidar.processing.voxel_size_m == 0.015
+    # Остальные поля — из base
+    assert lidar.processing.point_budget == profiles.resolve("precise").processing.point_budget
+    assert profiles.resolve(project_id="other").name == "fast"
+    assert profiles.resolve("fast").processing.ransac_iterations == 200
+    # Явный выбор в запросе важнее привязки проекта
+    assert profiles.resolve("balanced", project_id="tenant-a").name == "balanced"
+
+
+def test_environment_overrides():
+    environ = {
+        "SCAN_PROFILE_DEFAULT": "precise",
+        "SCAN_PROFILE_FAST__RANSAC_ITERATIONS": "150",
+        "SCAN_PROFILE_FAST__FRAME_QUALITY_ENABLED": "off",
+        "SCAN_PROFILE_FAST__LATENCY_BUDGET_MS": "2500",
+    }
+
+    profiles = load_processing_profiles(environ=environ, base=ProcessingConfig())
+
+    fast = profiles.resolve("fast")
+    assert fast.processing.ransac_iterations == 150
+    assert fast.processing.frame_quality_enabled is False
+    assert fast.latency_budget_ms == 2500
+    assert profiles.resolve().name == "precise"
+
+
+@pytest.mark.parametrize("environ, message", [
+    ({"SCAN_PROFILE_FAST__RANSAC_ITERATION": "1"}, "unknown processing parameters"),
+    ({"SCAN_PROFILE_FAST__SCAN_WORKERS": "8"}, r"\['scan_workers'\] are process-wide pool sizes"),
+    ({"SCAN_PROFILE_TURBO__VOXEL_SIZE_M": "0.1"}, "unknown processing profile 'turbo'"),
+    ({"SCAN_PROFILE_FAST__VOXEL_SIZE_M": "abc"}, "not a valid float"),
+    ({"SCAN_PROFILE_FAST__VOXEL_SIZE_M": "0"}, r"voxel_size_m must be finite and > 0"),
+    ({"SCAN_PROFILE_FAST__MAX_VOXEL_SIZE_M": "0.01"}, "max_voxel_size_m must be >= voxel_size_m"),
+    ({"SCAN_PROFILE_FAST__REVEAL_MIN_CONFIDENCE": "1.5"}, r"within \[0, 1\]"),
+    ({"SCAN_PROFILE_FAST__POINT_PRECISION": "float16"}, "point_precision"),
+    ({"SCAN_PROFILE_FAST__LATENCY_BUDGET_MS": "0"}, "latency_budget_ms must be > 0"),
+    ({"SCAN_PROFILE_DEFAULT": "turbo"}, "default processing profile 'turbo'"),
+])
+def test_invalid_profiles_fail_at_load(environ, message):
+    with pytest.raises(ValueError, match=message):
+        load_processing_profiles(environ=environ, base=ProcessingConfig())
+
+
+def test_invalid_profiles_file(tmp_path):
+    path = tmp_path / "profiles.json"
+    environ = {"SCAN_PROFILES_FILE": str(path)}
+
+    path.write_text('{"profiles": {"lidar": {"base": "turbo"}}}', encoding="utf-8")
+    with pytest.raises(ValueError, match="lidar.base: unknown profile 'turbo'"):
+        load_processing_profiles(environ=environ, base=ProcessingConfig())
+    path.write_text('{"projects": {"tenant-a": "turbo"}}', encoding="utf-8")
+    with pytest.raises(ValueError, match="project 'tenant-a'"):
+        load_processing_profiles(environ=environ, base=ProcessingConfig())
+    path.write_text('{"profiles": {"Lidar": {}}}', encoding="utf-8")
+    with pytest.raises(ValueError, match="profile name must match"):
+        load_processing_profiles(environ=environ, base=ProcessingConfig())
+    path.write_text("{", encoding="utf-8")
+    with pytest.raises(ValueError, match="cannot read processing profiles"):
+        load_processing_profiles(environ=environ, base=ProcessingConfig())
+
+
+def test_use_processing_is_scoped():
+    fast = load_processing_profiles(environ={}).resolve("fast").processing
+
+    assert processing_config() is settings.processing
+    with use_processing(fast):
+        assert processing_config() is fast
+    assert processing_config() is settings.processing
+
+
+def test_process_scan_uses_profile(tmp_path, jpeg):
+    o3d = pytest.importorskip("open3d")
+    from fastapi import UploadFile
+
+    from app.core.processing.scan_processor import ScanProcessor
+    from app.core.result_cache import ResultCache
+    from app.models.schemas import TrajectoryPoint
+
+    scan = render_scan(box_room(), frames=4, resolution=(160, 120))
+    colors, depths = [jpeg(c) for c in scan.colors], []
+    for i, depth in enumerate(scan.depths):
+        path = tmp_path / f"d{i}.png"
+        o3d.io.write_image(str(path), o3d.geometry.Image(np.ascontiguousarray(depth)))
+        depths.append(path.read_bytes())
+    trajectory = [TrajectoryPoint(t=float(i), **pose) for i, pose in enumerate(scan.poses)]
+    profiles = load_processing_profiles(environ={})
+
+    def process(name):
+        frames = [UploadFile(io.BytesIO(c), filename=f"f{i}.jpg") for i, c in enumerate(colors)]
+        depth = [UploadFile(io.BytesIO(d), filename=f"d{i}.png") for i, d in enumerate(depths)]
+        processor = ScanProcessor(cache=ResultCache(memory_max_entries=1))
+        return asyncio.run(processor.process_scan(
+            "p", "r", name, frames, trajectory, depth, processing_profile=profiles.resolve(name)
+        ))
+
+    fast, precise = process("fast"), process("precise")
+
+    assert fast.processing_profile.name == "fast"
+    assert fast.processing_profile.latency_budget_ms == BUILTIN_PROFILES["fast"][0]
+    assert fast.processing_profile.within_budget is not None
+    # Параметры профиля действуют во всём пайплайне: у fast воксель крупнее — точек меньше
+    assert 0 < fast.quality_metrics.points_count < precise.quality_metrics.points_count
@@ -0,0 +1,144 @@
+import json
+import sys
+import time
+from dataclasses import replace
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import scan as scan_endpoint
+from app.core import profiling
+from app.core.config import ProfilingConfig, Settings
+from app.core.profiles import load_processing_profiles
+from app.core.profiling import ProfileStore, StackSampler, profiling_requested
+from app.core.synthetic_room import box_room, render_scan
+from app.main import app
+
+
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_root():
+    _busy(0.15)
+
+
+def test_sampler_keeps_only_stacks_through_root_frame():
+    root = sys._getframe()
+    sampler = StackSampler(interval_s=0.002, root_frame=root).start()
+    _profiled_root()
+    sampler.stop()
+    lines = sampler.folded().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        root = stack.split(";")[0].split(":")[1]
+        assert root == "test_sampler_keeps_only_stacks_through_root_frame"
+        assert int(count) > 0
+    assert any("_profiled_root" in line for line in lines)
+
+    # root_frame не кадр — ни один стек не совпадёт
+    other = StackSampler(interval_s=0.002, root_frame=_profiled_root.__code__).start()
+    _busy(0.05)
+    other.stop()
+    assert other.folded() == ""
+
+
+def test_profiling_requested_by_header_or_config():
+    assert profiling_requested("1", ProfilingConfig())
+    assert profiling_requested("true", ProfilingConfig())
+    assert not profiling_requested(None, ProfilingConfig())
+    assert not profiling_requested("1", ProfilingConfig(allow_header=False))
+    assert profiling_requested(None, ProfilingConfig(always=True))
+
+
+def test_store_is_bounded_and_sanitizes_ids(tmp_path):
+    store = ProfileStore(tmp_path, max_files=2)
+    store.save("../a", "a 1\n")
+    assert store.get("../a").parent == tmp_path
+    store.save("b", "b 1\n")
+    store.save("c", "c 1\n")
+    assert len(list(tmp_path.glob("*.folded"))) == 2
+    assert store.get("c").read_text() == "c 1\n"
+
+
+def test_process_profile_is_downloadable_only_when_requested(jpeg):
+    client = TestClient(app)
+
+    def post(scan_id, headers=None):
+        # разные кадры: повтор тех же байтов отдаётся из кэша результатов
+        return client.post(
+            "/api/v1/scan/process",
+            data={"project_id": "p1", "room_id": "r1", "scan_id": scan_id},
+            files=[("frames", ("f1.jpg", jpeg(len(scan_id)), "image/jpeg"))],
+            headers=headers or {},
+        )
+
+    plain = post("prof-off")
+    assert plain.status_code == 200
+    assert "X-Profile-Url" not in plain.headers
+    assert client.get("/api/v1/scan/profile/prof-off").status_code == 404
+
+    profiled = post("prof-on", {"X-Scan-Profile": "1"})
+    assert profiled.status_code == 200
+    url = profiled.headers["X-Profile-Url"]
+    assert url == "/api/v1/scan/profile/prof-on"
+    download = client.get(url)
+    assert download.status_code == 200
+    lines = download.text.splitlines()
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        # Профилируется поток пула пайплайна от кадра _pipeline_task
+        assert stack.split(";")[0].split(":")[1] == "_pipeline_task"
+        assert int(count) > 0
+    assert any(":_scan_frames:" in line for line in lines)
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_profile_samples_frame_fusion_workers(tmp_path, monkeypatch, jpeg, backend):
+    o3d = pytest.importorskip("open3d")
+    # Проекция кадров уходит в пул из двух потоков или процессов
+    monkeypatch.setattr(
+        scan_endpoint,
+        "get_processing_profiles",
+        lambda: load_processing_profiles(environ={
+            "SCAN_PROFILE_BALANCED__FRAME_WORKERS": "2",
+            "SCAN_PROFILE_BALANCED__FRAME_BACKEND": backend,
+        }),
+    )
+    fast_sampling = replace(Settings().profiling, sample_interval_s=0.001)
+    monkeypatch.setattr(profiling, "settings", Settings(profiling=fast_sampling))
+    scan = render_scan(box_room(), frames=8, resolution=(320, 240))
+    files = []
+    for i, (color, depth) in enumerate(zip(scan.colors, scan.depths)):
+        path = tmp_path / f"d{i}.png"
+        o3d.io.write_image(str(path), o3d.geometry.Image(np.ascontiguousarray(depth)))
+        files.append(("frames", (f"f{i}.jpg", jpeg(color), "image/jpeg")))
+        files.append(("depth", (f"d{i}.png", path.read_bytes(), "image/png")))
+    trajectory = [dict(t=float(i), **pose) for i, pose in enumerate(scan.poses)]
+    scan_id = f"prof-workers-{backend}"
+
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/scan/process",
+        data={
+            "project_id": "p1",
+            "room_id": "r1",
+            "scan_id": scan_id,
+            "trajectory": json.dumps(trajectory),
+        },
+        files=files,
+        headers={"X-Scan-Profile": "1"},
+    )
+    assert response.status_code == 200
+    lines = client.get(f"/api/v1/scan/profile/{scan_id}").text.splitlines()
+    # Стеки обработчиков — под корнем запроса, с псевдокадром потока или процесса
+    workers = [line for line in lines if ":_frame_points:" in line]
+    assert workers
+    for line in workers:
+        frames = line.rsplit(" ", 1)[0].split(";")
+        assert frames[0].split(":")[1] == "_pipeline_task"
+        assert frames[1].startswith("[")
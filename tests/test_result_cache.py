@@ -0,0 +1,77 @@
+import os
+
+from fastapi.testclient import TestClient
+
+from app.core.config import ProcessingConfig
+from app.core.result_cache import InputHasher, ResultCache
+from app.main import app
+
+
+def test_memory_tier_is_lru_bounded_by_entries_and_bytes():
+    cache = ResultCache(memory_max_entries=2, memory_max_bytes=10)
+    cache.put("ns", "a", "1111")
+    cache.put("ns", "b", "2222")
+    assert cache.get("ns", "a") == "1111"  # a — самая свежая
+    cache.put("ns", "c", "3333")
+    assert cache.get("ns", "b") is None
+    assert cache.get("ns", "a") == "1111"
+    cache.put("ns", "d", "44444444")  # по байтам остаётся только d
+    assert len(cache) == 1
+    assert cache.get("ns", "d") == "44444444"
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_disk_tier_survives_restart_and_evicts_oldest(tmp_path):
+    cache = ResultCache(memory_max_entries=1, disk_dir=tmp_path, disk_max_bytes=25)
+    cache.put("ns", "a", "x" * 10)
+    os.utime(tmp_path / "ns-a.json", (1, 1))
+    cache.put("ns", "b", "y" * 10)
+    cache.put("ns", "c", "z" * 10)  # 30 байт > 25 — вытесняется самый старый (a)
+
+    restarted = ResultCache(disk_dir=tmp_path, disk_max_bytes=25)
+    assert restarted.get("ns", "a") is None
+    assert restarted.get("ns", "b") == "y" * 10
+    assert restarted.get("ns", "c") == "z" * 10
+
+
+def test_input_hash_depends_on_parts_and_config():
+    def key(frames, config=ProcessingConfig()):
+        hasher = InputHasher("process")
+        for data in frames:
+            hasher.update_bytes("frame", data)
+        return hasher.update_config(config).hexdigest()
+
+    assert key([b"ab", b"c"]) == key([b"ab", b"c"])
+    assert key([b"ab", b"c"]) != key([b"a", b"bc"])
+    assert key([b"ab"]) != key([b"ab"], ProcessingConfig(ransac_iterations=10))
+
+
+def test_process_retry_is_served_from_cache(jpeg):
+    client = TestClient(app)
+    frame = jpeg(101)
+
+    def post(scan_id):
+        response = client.post(
+            "/api/v1/scan/process",
+            data={"project_id": "p1", "room_id": "r1", "scan_id": scan_id},
+            files=[("frames", ("f1.jpg", frame, "image/jpeg"))],
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    first = post("retry-1")
+    second = post("retry-2")
+    assert first["quality_metrics"]["cache_hit"] is False
+    assert second["quality_metrics"]["cache_hit"] is True
+    assert second["scan_id"] == "retry-2"
+    assert second["dimensions"] == first["dimensions"]
+
+
+def test_document_retry_reports_cache_header(jpeg):
+    client = TestClient(app)
+    files = [("document", ("page.jpg", jpeg(202), "image/jpeg"))]
+    first = client.post("/api/v1/scan/document", data={"scan_id": "d1"}, files=files)
+    second = client.post("/api/v1/scan/document", data={"scan_id": "d2"}, files=files)
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json()["scan_id"] == "d2"
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core.processing.scan_cloud import ScanCloud
+from app.core.processing.scan_processor import ScanProcessor
+
+
+def _room_points(rng):
+    floor = np.column_stack([rng.uniform(0, 4, 2000), np.zeros(2000), rng.uniform(0, 3, 2000)])
+    ceiling = floor + np.array([0.0, 2.7, 0.0])
+    return np.vstack([floor, ceiling])
+
+
+def test_float64_cloud_shares_memory_and_caches_derived_arrays():
+    points = _room_points(np.random.default_rng(0))
+    cloud = ScanCloud.from_open3d(SimpleNamespace(points=points))
+
+    assert np.shares_memory(cloud.points, points)
+    assert cloud.normals is None
+    assert cloud.xz is cloud.xz
+    np.testing.assert_allclose(cloud.bounds[1], [points[:, 0].max(), 2.7, points[:, 2].max()])
+    assert ScanCloud.wrap(cloud) is cloud
+
+
+def test_float32_wrap_and_stage_results_match_open3d_input():
+    o3d = pytest.importorskip("open3d")
+    points = _room_points(np.random.default_rng(1))
+    pc = o3d.geometry.PointCloud()
+    pc.points = o3d.utility.Vector3dVector(points)
+    pc.normals = o3d.utility.Vector3dVector(np.tile([0.0, 1.0, 0.0], (len(points), 1)))
+
+    cloud = ScanCloud.from_open3d(pc, np.float32)
+    assert cloud.points.dtype == np.float32
+    assert cloud.normals.dtype == np.float32
+    assert cloud.to_open3d() is pc
+    assert ScanCloud.wrap(cloud, np.float64).dtype == np.float64
+
+    dims32 = ScanProcessor._compute_dimensions(cloud, dtype=np.float32).model_dump()
+    dims64 = ScanProcessor._compute_dimensions(pc).model_dump()
+    assert dims32 == pytest.approx(dims64, abs=1e-5)
+    zones32, coverage32 = ScanProcessor._compute_missing_zones(cloud, 0.4, dtype=np.float32)
+    zones64, coverage64 = ScanProcessor._compute_missing_zones(pc, 0.4)
+    assert coverage32 == pytest.approx(coverage64)
+    assert len(zones32) == len(zones64)
+
+
+def test_to_open3d_builds_cloud_from_arrays():
+    o3d = pytest.importorskip("open3d")
+    points = np.ones((5, 3), dtype=np.float32)
+    cloud = ScanCloud(points, colors=np.full((5, 3), 0.5), dtype=np.float32)
+    pc = cloud.to_open3d()
+    assert isinstance(pc, o3d.geometry.PointCloud)
+    assert len(pc.points) == 5 and pc.has_colors()
@@ -0,0 +1,60 @@
+import numpy as np
+
+from app.core.processing.spatial_index import VoxelIndex
+
+
+def _brute_distances(points):
+    return np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+
+
+def test_radius_counts_and_knn_match_brute_force():
+    rng = np.random.default_rng(0)
+    points = rng.uniform(-1.0, 1.0, (500, 3))
+    index = VoxelIndex(points, cell_size_m=0.3)
+    dist = _brute_distances(points)
+
+    np.testing.assert_array_equal(index.radius_counts(0.3), (dist <= 0.3).sum(axis=1) - 1)
+
+    indices, distances = index.knn(4)
+    exact = np.sort(dist, axis=1)[:, :4]
+    # Соседи ближе стороны ячейки всегда среди кандидатов: там kNN точен
+    close = exact[:, -1] <= 0.3
+    np.testing.assert_allclose(distances[close], exact[close])
+    assert (indices[:, 0] == np.arange(len(points))).all()
+    assert close.mean() > 0.8
+
+
+def test_knn_pads_sparse_neighbourhoods():
+    points = np.array([[0.0, 0.0, 0.0], [0.05, 0.0, 0.0], [5.0, 5.0, 5.0]])
+
+    indices, distances = VoxelIndex(points, cell_size_m=0.1).knn(3)
+
+    np.testing.assert_array_equal(indices, [[0, 1, -1], [1, 0, -1], [2, -1, -1]])
+    assert np.isinf(distances[2, 1:]).all()
+
+
+def test_subset_matches_rebuilt_index():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(0.0, 2.0, (800, 3))
+    keep = rng.random(len(points)) > 0.3
+
+    subset = VoxelIndex(points, cell_size_m=0.25).subset(keep)
+
+    # Сетка подмножества — та же, что у исходного индекса (начало — минимум всех точек)
+    cells = np.floor((points - points.min(axis=0)) / 0.25).astype(int)[keep]
+    expected = [int(np.all(np.abs(cells - cell) <= 1, axis=1).sum()) - 1 for cell in cells]
+    np.testing.assert_array_equal(subset.points, points[keep])
+    np.testing.assert_array_equal(subset.cube_counts(), expected)
+    rebuilt = VoxelIndex(points[keep], 0.25)
+    np.testing.assert_array_equal(subset.radius_counts(0.25), rebuilt.radius_counts(0.25))
+
+
+def test_normals_of_tilted_plane():
+    xs, ys = np.meshgrid(np.arange(0.0, 1.0, 0.03), np.arange(0.0, 1.0, 0.03))
+    plane = np.column_stack([xs.ravel(), ys.ravel(), 0.5 * xs.ravel()])
+    expected = np.array([-0.5, 0.0, 1.0]) / np.linalg.norm([-0.5, 0.0, 1.0])
+
+    normals = VoxelIndex(plane, cell_size_m=0.06).normals(k=30)
+
+    np.testing.assert_allclose(np.abs(normals @ expected), 1.0, atol=1e-6)
+    assert VoxelIndex(np.empty((0, 3)), 0.06).normals().shape == (0, 3)
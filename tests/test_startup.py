@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.bench.import_time import measure_import
+from app.core.config import settings
+from app.core.instrumentation import IN_FLIGHT_METRIC, REGISTRY, STAGE_DURATION_METRIC, in_flight
+from app.core.processing.scan_processor import ScanProcessor
+from app.core.warmup import WarmupState, warm_up, warmup_state
+from app.main import create_app
+
+
+def test_app_import_does_not_load_heavy_modules():
+    report = measure_import("app.main", repeats=1)
+    assert report["heavy_modules_loaded"] == []
+    assert report["seconds"]["median"] > 0
+
+
+def test_warm_up_runs_steps_once_and_records_errors():
+    calls = []
+
+    def failing():
+        raise RuntimeError("boom")
+
+    state = WarmupState()
+    steps = [("ok", lambda: calls.append("ok")), ("bad", failing)]
+    warm_up(steps, state)
+    warm_up(steps, state)
+    assert calls == ["ok"]
+    assert state.done
+    assert state.error == "bad: boom"
+    assert set(state.steps_ms) == {"ok", "bad"}
+
+
+def test_ready_flips_after_background_warmup():
+    with TestClient(create_app()) as client:
+        deadline = time.monotonic() + 60
+        response = client.get("/ready")
+        while response.status_code == 503 and time.monotonic() < deadline:
+            assert response.json()["status"] == "warming_up"
+            time.sleep(0.05)
+            response = client.get("/ready")
+    assert response.status_code == 200
+    payload = response.json()
+    assert payload["status"] == "ready"
+    assert {"import_open3d", "synthetic_scan"} <= set(payload["warmup"]["steps_ms"])
+    assert payload["warmup"]["error"] is None
+    assert payload["in_flight"] == {"process": 0, "scan_pipeline": 0, "document_page": 0}
+    # Синтетический скан прогрева виден в /metrics только с меткой source="warmup"
+    warmup_stage = {"stage": "process_scan", "source": "warmup"}
+    assert REGISTRY.histogram_count(STAGE_DURATION_METRIC, **warmup_stage) == 1
+
+
+def test_health_is_live_and_ready_reports_saturation():
+    client = TestClient(create_app())
+    assert client.get("/health").json()["status"] == "ok"
+
+    state = warmup_state()
+    was_done, state.done = state.done, True
+    try:
+        with in_flight(IN_FLIGHT_METRIC, kind="process"):
+            extra = settings.readiness.max_in_flight_scans - 1
+            REGISTRY.add_gauge(IN_FLIGHT_METRIC, extra, kind="process")
+            saturated = client.get("/ready")
+            REGISTRY.add_gauge(IN_FLIGHT_METRIC, -extra, kind="process")
+        assert saturated.status_code == 503
+        assert saturated.json()["status"] == "saturated"
+        assert client.get("/ready").status_code == 200
+    finally:
+        state.done = was_done
+
+
+def test_ready_reports_failed_warmup():
+    client = TestClient(create_app())
+    state = warmup_state()
+    was_done, was_error = state.done, state.error
+    state.done, state.error = True, "import_open3d: No module named 'open3d'"
+    try:
+        response = client.get("/ready")
+    finally:
+        state.done, state.error = was_done, was_error
+    assert response.status_code == 503
+    assert response.json()["status"] == "warmup_failed"
+    assert response.json()["warmup"]["error"].startswith("import_open3d")
+
+
+def test_scan_pipeline_runs_off_the_event_loop(monkeypatch):
+    release = threading.Event()
+
+    def blocking_pipeline(self, scan_id, *args):
+        release.wait(10)
+        raise RuntimeError("stop")
+
+    monkeypatch.setattr(ScanProcessor, "_scan_frames", blocking_pipeline)
+
+    async def scenario():
+        task = asyncio.create_task(ScanProcessor().process_scan("p", "r", "busy", []))
+        deadline = time.monotonic() + 10
+        while REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="scan_pipeline") < 1:
+            assert time.monotonic() < deadline
+            await asyncio.sleep(0.01)
+        # Пайплайн занят в потоке пула, а event loop свободен: /ready и /metrics отвечают
+        assert REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="process") >= 1
+        release.set()
+        try:
+            await task
+        except RuntimeError:
+            pass
+
+    asyncio.run(scenario())
+    assert REGISTRY.gauge_value(IN_FLIGHT_METRIC, kind="scan_pipeline") == 0
@@ -0,0 +1,90 @@
+import numpy as np
+
+from app.core.processing.trajectory import (
+    frame_transforms,
+    interpolate_poses,
+    pose_matrices,
+    quaternions_to_matrices,
+    slerp,
+    trajectory_arrays,
+)
+from app.core.synthetic_room import _matrix_to_quaternion, camera_rotation
+from app.models.schemas import TrajectoryPoint
+
+
+def _yaw_quaternion(angle_rad):
+    return [0.0, float(np.sin(angle_rad / 2)), 0.0, float(np.cos(angle_rad / 2))]
+
+
+def test_vectorized_matrices_round_trip_camera_rotations():
+    rng = np.random.default_rng(0)
+    rotations = [
+        camera_rotation(rng.uniform(-np.pi, np.pi), rng.uniform(-0.5, 0.5)) for _ in range(20)
+    ]
+    quats = np.array([_matrix_to_quaternion(rot) for rot in rotations]) * 3.0  # ненормированные
+
+    np.testing.assert_allclose(quaternions_to_matrices(quats), np.stack(rotations), atol=1e-12)
+
+    translations = rng.normal(size=(20, 3))
+    transforms = pose_matrices(quats, translations)
+    assert transforms.shape == (20, 4, 4)
+    np.testing.assert_allclose(transforms[:, :3, 3], translations)
+    np.testing.assert_allclose(transforms[:, 3], np.tile([0.0, 0.0, 0.0, 1.0], (20, 1)))
+
+
+def test_trajectory_arrays_accepts_dicts_models_and_bad_poses():
+    poses = [
+        {"t": 0.5, "position": [1.0, 2.0, 3.0], "rotation": [0.0, 0.0, 0.0, 2.0]},
+        TrajectoryPoint(t=1.5, position=[4.0, 5.0, 6.0], rotation=_yaw_quaternion(0.3)),
+        {"position": [1.0, 2.0], "rotation": [0.0, 0.0, 0.0, 0.0]},
+    ]
+    times, quats, translations = trajectory_arrays(poses)
+
+    np.testing.assert_allclose(times, [0.5, 1.5, 2.0])
+    np.testing.assert_allclose(quats[0], [0.0, 0.0, 0.0, 1.0])
+    np.testing.assert_allclose(quats[1], _yaw_quaternion(0.3))
+    np.testing.assert_allclose(quats[2], [0.0, 0.0, 0.0, 1.0])
+    np.testing.assert_allclose(translations, [[1, 2, 3], [4, 5, 6], [0, 0, 0]])
+
+
+def test_slerp_follows_shortest_arc_at_constant_speed():
+    q0 = np.array([_yaw_quaternion(0.0)] * 3)
+    q1 = np.array([_yaw_quaternion(np.pi / 2)] * 3)
+    q1[2] *= -1  # тот же поворот
+
+    out = slerp(q0, q1, np.array([0.5, 0.25, 0.5]))
+
+    np.testing.assert_allclose(out[0], _yaw_quaternion(np.pi / 4), atol=1e-12)
+    np.testing.assert_allclose(out[1], _yaw_quaternion(np.pi / 8), atol=1e-12)
+    np.testing.assert_allclose(
+        quaternions_to_matrices(out[2:]), quaternions_to_matrices(out[:1]), atol=1e-12
+    )
+    np.testing.assert_allclose(slerp(q0[:1], q0[:1], np.array([0.3])), q0[:1])
+
+
+def test_interpolate_poses_between_and_outside_timestamps():
+    times = np.array([1.0, 0.0])  # порядок не важен
+    quats = np.array([_yaw_quaternion(np.pi / 2), _yaw_quaternion(0.0)])
+    translations = np.array([[2.0, 0.0, 0.0], [0.0, 0.0, 0.0]])
+
+    out_q, out_t = interpolate_poses(times, quats, translations, np.array([-1.0, 0.5, 0.75, 3.0]))
+
+    np.testing.assert_allclose(out_t[:, 0], [0.0, 1.0, 1.5, 2.0])
+    np.testing.assert_allclose(out_q[1], _yaw_quaternion(np.pi / 4), atol=1e-12)
+    np.testing.assert_allclose(out_q[2], _yaw_quaternion(3 * np.pi / 8), atol=1e-12)
+    np.testing.assert_allclose(out_q[3], _yaw_quaternion(np.pi / 2), atol=1e-12)
+
+
+def test_frame_transforms_by_index_pads_with_identity():
+    poses = [{"t": 0.0, "position": [1.0, 0.0, 0.0]}, {"t": 1.0, "position": [2.0, 0.0, 0.0]}]
+
+    by_index = frame_transforms(poses, 3)
+    assert by_index.shape == (3, 4, 4)
+    np.testing.assert_allclose(by_index[:, 0, 3], [1.0, 2.0, 0.0])
+    np.testing.assert_allclose(by_index[2], np.eye(4))
+
+    by_time = frame_transforms(poses, 3, frame_times=[0.0, 0.25, 0.5])
+    np.testing.assert_allclose(by_time[:, 0, 3], [1.0, 1.25, 1.5])
+    np.testing.assert_allclose(
+        frame_transforms([], 2, frame_times=[0.0, 1.0]), np.tile(np.eye(4), (2, 1, 1))
+    )
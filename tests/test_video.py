@@ -0,0 +1,154 @@
+import importlib.util
+import json
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import VideoConfig
+from app.core.processing.point_cloud import FrameData, fuse_frames, load_frames_to_pointcloud
+from app.core.processing.video import VideoStats, background_iter, select_keyframes
+from app.core.synthetic_room import box_room, render_scan
+from app.main import app
+
+
+def _box_blur(image: np.ndarray, k: int = 7) -> np.ndarray:
+    pad = ((k // 2, k // 2), (k // 2, k // 2), (0, 0))
+    padded = np.pad(image.astype(np.float64), pad, mode="edge")
+    h, w = image.shape[:2]
+    out = sum(padded[dy:dy + h, dx:dx + w] for dy in range(k) for dx in range(k))
+    return (out / (k * k)).astype(np.uint8)
+
+
+def test_keyframes_skip_blurred_and_static_frames():
+    colors = render_scan(box_room(), frames=3, resolution=(320, 240)).colors
+    # 30 к/с: кадр 0 стоит на месте, затем смазанный кадр 1, затем резкие 1 и 2
+    sequence = [colors[0]] * 5 + [_box_blur(colors[1]), colors[1], colors[2]]
+    frames = [(i, i / 30.0, rgb) for i, rgb in enumerate(sequence)]
+    config = VideoConfig(min_sharpness=50.0, min_motion=0.05, max_interval_s=1.0, max_keyframes=10)
+    stats = VideoStats()
+
+    keyframes = list(select_keyframes(frames, config, stats))
+
+    assert [k.index for k in keyframes] == [0, 6, 7]
+    assert stats.keyframe_times_s == [0.0, 0.2, 0.2333]
+    assert all(k.sharpness >= 50.0 for k in keyframes)
+    assert [k.index for k in select_keyframes(frames, VideoConfig(max_keyframes=1))] == [0]
+
+
+def test_background_iter_preserves_order_propagates_errors_and_stops_early():
+    assert list(background_iter(range(20), queue_size=2)) == list(range(20))
+
+    def failing():
+        yield 1
+        raise RuntimeError("decode failed")
+
+    with pytest.raises(RuntimeError, match="decode failed"):
+        list(background_iter(failing()))
+
+    produced = []
+
+    def endless():
+        i = 0
+        while True:
+            produced.append(i)
+            yield i
+            i += 1
+
+    before = threading.active_count()
+    items = background_iter(endless(), queue_size=1)
+    assert next(items) == 0
+    items.close()
+    assert threading.active_count() == before
+    assert len(produced) <= 4
+
+
+def test_in_memory_frames_fuse_like_files():
+    pytest.importorskip("open3d")
+    scan = render_scan(box_room(), frames=4, resolution=(160, 120))
+    trajectory = [{"t": i * 0.5, **pose} for i, pose in enumerate(scan.poses)]
+    in_memory = fuse_frames(
+        (
+            FrameData(color=c, depth=d, t=i * 0.5)
+            for i, (c, d) in enumerate(zip(scan.colors, scan.depths))
+        ),
+        trajectory,
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        frame_paths, depth_paths, trajectory_path = scan.write(tmpdir)
+        from_files = load_frames_to_pointcloud(frame_paths, trajectory_path, depth_paths)
+
+    assert len(in_memory.points) == len(from_files.points) > 0
+    np.testing.assert_allclose(
+        np.asarray(in_memory.points), np.asarray(from_files.points), atol=1e-9
+    )
+
+
+def test_video_endpoint_validates_upload():
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/scan/video",
+        data={"project_id": "p1", "room_id": "r1", "scan_id": "v1"},
+        files={"video": ("scan.avi", b"RIFF", "video/x-msvideo")},
+    )
+    assert response.status_code == 400
+    assert ".mp4" in response.json()["detail"]
+
+
+@pytest.mark.skipif(importlib.util.find_spec("cv2") is not None, reason="OpenCV installed")
+def test_video_endpoint_without_opencv_is_not_implemented():
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/scan/video",
+        data={"project_id": "p1", "room_id": "r1", "scan_id": "v3"},
+        files={"video": ("scan.mp4", b"\x00\x00\x00\x18ftypmp42", "video/mp4")},
+    )
+    assert response.status_code == 501
+    assert "opencv" in response.json()["detail"]
+
+
+def test_video_endpoint_builds_scan_from_mp4(tmp_path):
+    cv2 = pytest.importorskip("cv2")
+    pytest.importorskip("open3d")
+    scan = render_scan(box_room(), frames=6, resolution=(160, 120))
+    video_path = tmp_path / "scan.mp4"
+    writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*"mp4v"), 2.0, (160, 120))
+    for color in scan.colors:
+        writer.write(cv2.cvtColor(color, cv2.COLOR_RGB2BGR))
+    writer.release()
+    trajectory = [{"t": i * 0.5, **pose} for i, pose in enumerate(scan.poses)]
+
+    client = TestClient(app)
+    response = client.post(
+        "/api/v1/scan/video",
+        data={
+            "project_id": "p1",
+            "room_id": "r1",
+            "scan_id": "v2",
+            "trajectory": json.dumps(trajectory),
+        },
+        files={"video": ("scan.mp4", video_path.read_bytes(), "video/mp4")},
+    )
+
+    assert response.status_code == 200, response.text
+    video = response.json()["video"]
+    assert video["frames_decoded"] == 6
+    assert 1 <= video["keyframes"] <= 6
+    assert response.json()["quality_metrics"]["points_count"] > 0
+
+
+def test_keyframes_skip_badly_exposed_frames():
+    colors = render_scan(box_room(), frames=2, resolution=(320, 240)).colors
+    frames = [
+        (0, 0.0, np.zeros_like(colors[0])),
+        (1, 0.5, colors[0]),
+        (2, 1.0, np.full_like(colors[1], 255)),
+    ]
+    stats = VideoStats()
+
+    keyframes = list(select_keyframes(frames, VideoConfig(), stats, max_clipped_fraction=0.6))
+
+    assert [k.index for k in keyframes] == [1]
+    assert stats.frames_badly_exposed == 2